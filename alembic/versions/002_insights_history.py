@@ -0,0 +1,38 @@
+"""Period-indexed insights history with per-period fingerprints.
+
+Insights are now generated for every closed month and completed ISO week
+(not just the latest one).  Adds:
+  - insight_fingerprints: one hash per (granularity, period) of the period's
+    aggregate inputs.  The loader only rewrites periods whose hash changed.
+  - idx_insights_granularity_period on insights for per-period lookups.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "002"
+down_revision = "001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS analytics.insight_fingerprints (
+            period      VARCHAR(20) NOT NULL,
+            granularity VARCHAR(20) NOT NULL,
+            fingerprint CHAR(40)    NOT NULL,
+            PRIMARY KEY (granularity, period)
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_insights_granularity_period ON analytics.insights (granularity, period)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS analytics.idx_insights_granularity_period")
+    op.execute("DROP TABLE IF EXISTS analytics.insight_fingerprints")
@@ -0,0 +1,58 @@
+"""Denormalized period keys on the fact tables.
+
+Dashboard queries used to join dim_period on every fact-table read just to
+resolve a date into its month / quarter / ISO week label.  The loader now
+writes those labels onto each row, so the queries filter the fact table
+directly.  Adds:
+  - "YearMonth", "YearQuarter", "ISOWeekLabel" on sales, items and
+    customer_quality (NULL when the source date is missing from dim_period).
+  - btree indexes on sales/items ("YearMonth") and ("ISOWeekLabel").
+
+Source date per table (mirrors PERIOD_KEY_COLUMNS in cleancloud_to_duckdb.py):
+  - sales:            OrderCohortMonth (month/quarter), Earned_Date (week)
+  - items:            ItemDate
+  - customer_quality: OrderCohortMonth
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+_TABLES = ("sales", "items", "customer_quality")
+_INDEXES = {
+    "idx_sales_year_month": ("sales", "YearMonth"),
+    "idx_sales_iso_week": ("sales", "ISOWeekLabel"),
+    "idx_items_year_month": ("items", "YearMonth"),
+    "idx_items_iso_week": ("items", "ISOWeekLabel"),
+}
+
+
+def upgrade() -> None:
+    for table in _TABLES:
+        op.execute(f"""
+            ALTER TABLE analytics.{table}
+                ADD COLUMN IF NOT EXISTS "YearMonth"    VARCHAR(7),
+                ADD COLUMN IF NOT EXISTS "YearQuarter"  VARCHAR(7),
+                ADD COLUMN IF NOT EXISTS "ISOWeekLabel" VARCHAR(10)
+        """)
+    for name, (table, column) in _INDEXES.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON analytics.{table} ("{column}")')
+
+
+def downgrade() -> None:
+    for name in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS analytics.{name}")
+    for table in _TABLES:
+        op.execute(f"""
+            ALTER TABLE analytics.{table}
+                DROP COLUMN IF EXISTS "YearMonth",
+                DROP COLUMN IF EXISTS "YearQuarter",
+                DROP COLUMN IF EXISTS "ISOWeekLabel"
+        """)
@@ -0,0 +1,40 @@
+"""Per-partition content fingerprints for delta syncs.
+
+The Postgres sync used to ship every table in full on every run.  It now
+fingerprints the staged files per (table, month) and only ships months whose
+fingerprint changed; unchanged months are copied server-side from the live
+tables.  Adds:
+  - partition_manifest: row count, fingerprint and CSV bytes last shipped per
+    (table_name, month).  Month is 'YYYY-MM' of the table's partition date
+    (PARTITION_COLUMNS in cleancloud_to_postgres.py), '' for a missing date
+    or an unpartitioned table, and '*' for the whole-table layout entry
+    (columns, source format, loader version).
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS analytics.partition_manifest (
+            table_name  VARCHAR(50) NOT NULL,
+            month       VARCHAR(7)  NOT NULL,
+            row_count   BIGINT      NOT NULL,
+            fingerprint VARCHAR(64) NOT NULL,
+            csv_bytes   BIGINT      NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, month)
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS analytics.partition_manifest")
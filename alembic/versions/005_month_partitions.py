@@ -0,0 +1,164 @@
+"""Month-partitioned sales and items, BRIN date indexes, partition retention.
+
+Dashboard queries (section_data.py) filter the fact tables on the cohort
+month label "YearMonth" (migration 003) and aggregate whole months, so both
+tables are range-partitioned on it: Postgres prunes every month the query
+does not ask for, and the loader can replace a single month.  Changes:
+  - sales / items become PARTITION BY RANGE ("YearMonth") with one partition
+    per month (<table>_YYYY_MM, bounds 'YYYY-MM' to the next month) and a
+    <table>_default partition for rows whose date is not in dim_period.
+  - The surrogate "id" PRIMARY KEY is dropped (a partitioned table's keys
+    must include the nullable partition column); "id" keeps its sequence.
+  - BRIN instead of btree on the date columns: the loader writes rows in
+    date order within each COPY batch and a partition spans one month, so
+    block ranges stay narrow and each index is a few pages per partition.
+  - Composite indexes for the section_data query shapes: the
+    (OrderID_Std, MonthsSinceCohort) order-cohort join from items, and the
+    outstanding-balance filter (Paid = FALSE AND Source = 'CC_2025').
+    The per-month "YearMonth" btrees are dropped; pruning replaces them.
+  - create_month_partitions(parent, months) and
+    drop_expired_partitions(parent, keep_months), used by the loader every
+    sync (MOONWALK_PG_RETENTION_MONTHS; 0 keeps every month) and callable
+    from a scheduled job.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+_TABLES = ("sales", "items")
+
+_INDEXES = {
+    "sales": [
+        'CREATE INDEX idx_sales_customer ON analytics.sales ("CustomerID_Std")',
+        'CREATE INDEX idx_sales_order_cohort ON analytics.sales ("OrderID_Std", "MonthsSinceCohort")',
+        'CREATE INDEX idx_sales_iso_week ON analytics.sales ("ISOWeekLabel")',
+        'CREATE INDEX idx_sales_txn_type ON analytics.sales ("Transaction_Type")',
+        'CREATE INDEX idx_sales_cohort_month ON analytics.sales USING brin ("OrderCohortMonth")',
+        'CREATE INDEX idx_sales_earned_date ON analytics.sales USING brin ("Earned_Date")',
+        """CREATE INDEX idx_sales_outstanding ON analytics.sales ("CustomerID_Std", "Placed_Date")
+           WHERE "Paid" = FALSE AND "Source" = 'CC_2025' AND "Earned_Date" IS NOT NULL""",
+    ],
+    "items": [
+        'CREATE INDEX idx_items_customer ON analytics.items ("CustomerID_Std")',
+        'CREATE INDEX idx_items_order ON analytics.items ("OrderID_Std")',
+        'CREATE INDEX idx_items_iso_week ON analytics.items ("ISOWeekLabel")',
+        'CREATE INDEX idx_items_date ON analytics.items USING brin ("ItemDate")',
+    ],
+}
+
+# Flat-table indexes from migrations 001 and 003, restored by downgrade()
+_FLAT_INDEXES = {
+    "sales": {
+        "idx_sales_customer": "CustomerID_Std",
+        "idx_sales_order": "OrderID_Std",
+        "idx_sales_cohort_month": "OrderCohortMonth",
+        "idx_sales_earned_date": "Earned_Date",
+        "idx_sales_txn_type": "Transaction_Type",
+        "idx_sales_year_month": "YearMonth",
+        "idx_sales_iso_week": "ISOWeekLabel",
+    },
+    "items": {
+        "idx_items_customer": "CustomerID_Std",
+        "idx_items_order": "OrderID_Std",
+        "idx_items_date": "ItemDate",
+        "idx_items_year_month": "YearMonth",
+        "idx_items_iso_week": "ISOWeekLabel",
+    },
+}
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION analytics.create_month_partitions(parent regclass, months text[])
+        RETURNS integer LANGUAGE plpgsql AS $$
+        DECLARE
+            nsp     text;
+            rel     text;
+            m       text;
+            created integer := 0;
+        BEGIN
+            SELECT n.nspname, c.relname INTO nsp, rel
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.oid = parent;
+            FOREACH m IN ARRAY months LOOP
+                CONTINUE WHEN m IS NULL OR m !~ '^[0-9]{4}-[0-9]{2}$';
+                CONTINUE WHEN to_regclass(format('%I.%I', nsp, rel || '_' || replace(m, '-', '_'))) IS NOT NULL;
+                EXECUTE format(
+                    'CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                    nsp, rel || '_' || replace(m, '-', '_'), parent,
+                    m, to_char(to_date(m, 'YYYY-MM') + interval '1 month', 'YYYY-MM')
+                );
+                created := created + 1;
+            END LOOP;
+            RETURN created;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION analytics.drop_expired_partitions(parent regclass, keep_months integer)
+        RETURNS integer LANGUAGE plpgsql AS $$
+        DECLARE
+            cutoff  text;
+            part    regclass;
+            dropped integer := 0;
+        BEGIN
+            IF keep_months IS NULL OR keep_months <= 0 THEN
+                RETURN 0;
+            END IF;
+            -- Keep the current month and the keep_months - 1 before it
+            cutoff := to_char(date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months - 1), 'YYYY-MM');
+            FOR part IN
+                SELECT c.oid::regclass
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = parent
+                  AND substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \\(''([^'']+)''\\)') <= cutoff
+            LOOP
+                EXECUTE format('DROP TABLE %s', part);
+                dropped := dropped + 1;
+            END LOOP;
+            RETURN dropped;
+        END
+        $$
+    """)
+
+    for table in _TABLES:
+        op.execute(f"ALTER TABLE analytics.{table} RENAME TO {table}_unpartitioned")
+        op.execute(f"""
+            CREATE TABLE analytics.{table} (LIKE analytics.{table}_unpartitioned INCLUDING DEFAULTS)
+            PARTITION BY RANGE ("YearMonth")
+        """)
+        # Keep the id sequence alive when the flat table is dropped
+        op.execute(f"ALTER SEQUENCE analytics.{table}_id_seq OWNED BY analytics.{table}.id")
+        op.execute(f"CREATE TABLE analytics.{table}_default PARTITION OF analytics.{table} DEFAULT")
+        op.execute(f"""
+            SELECT analytics.create_month_partitions(
+                'analytics.{table}'::regclass,
+                ARRAY(SELECT DISTINCT "YearMonth" FROM analytics.{table}_unpartitioned)
+            )
+        """)
+        op.execute(f"INSERT INTO analytics.{table} SELECT * FROM analytics.{table}_unpartitioned")
+        op.execute(f"DROP TABLE analytics.{table}_unpartitioned")
+        for statement in _INDEXES[table]:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in _TABLES:
+        op.execute(f"ALTER TABLE analytics.{table} RENAME TO {table}_partitioned")
+        op.execute(f"CREATE TABLE analytics.{table} (LIKE analytics.{table}_partitioned INCLUDING DEFAULTS)")
+        op.execute(f"ALTER SEQUENCE analytics.{table}_id_seq OWNED BY analytics.{table}.id")
+        op.execute(f"INSERT INTO analytics.{table} SELECT * FROM analytics.{table}_partitioned")
+        op.execute(f"DROP TABLE analytics.{table}_partitioned")
+        op.execute(f"ALTER TABLE analytics.{table} ADD PRIMARY KEY (id)")
+        for name, column in _FLAT_INDEXES[table].items():
+            op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON analytics.{table} ("{column}")')
+    op.execute("DROP FUNCTION IF EXISTS analytics.drop_expired_partitions(regclass, integer)")
+    op.execute("DROP FUNCTION IF EXISTS analytics.create_month_partitions(regclass, text[])")
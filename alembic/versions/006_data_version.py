@@ -0,0 +1,36 @@
+"""Published data version for dashboard cache invalidation.
+
+The dashboard caches query results per data version (dashboard_cache.py)
+instead of for a fixed five minutes.  DuckDB and Parquet snapshots carry
+their version in the CURRENT pointer (snapshot_store); Postgres gets a
+one-row counter that the sync increments in the transaction that swaps the
+new tables in (and --refresh-views after refreshing the views).  Adds:
+  - data_version: version (only grows) and published_at.  It is not a
+    sync table, so the schema swap carries it into each new live schema.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS analytics.data_version (
+            id           SMALLINT    PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            version      BIGINT      NOT NULL,
+            published_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("INSERT INTO analytics.data_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS analytics.data_version")
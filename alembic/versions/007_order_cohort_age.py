@@ -0,0 +1,39 @@
+"""Order cohort age on order_lookup.
+
+The dashboard's period cube (dashboard_shared.fetch_period_cube) and the
+period_items view split item totals into new and existing customers by the
+order's cohort age.  They derived it per read with a MIN(MonthsSinceCohort)
+subquery over sales; the sync now stores it once per order.  Adds:
+  - order_lookup."MonthsSinceCohort": the order's earliest
+    MonthsSinceCohort in sales.  Backfilled here; the sync rebuilds
+    order_lookup in full every run.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE analytics.order_lookup ADD COLUMN IF NOT EXISTS "MonthsSinceCohort" SMALLINT')
+    op.execute("""
+        UPDATE analytics.order_lookup ol
+        SET "MonthsSinceCohort" = s.cohort_month
+        FROM (
+            SELECT "OrderID_Std", MIN("MonthsSinceCohort") AS cohort_month
+            FROM analytics.sales
+            GROUP BY "OrderID_Std"
+        ) s
+        WHERE s."OrderID_Std" = ol."OrderID_Std"
+    """)
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE analytics.order_lookup DROP COLUMN IF EXISTS "MonthsSinceCohort"')
@@ -0,0 +1,152 @@
+"""
+Benchmark concurrent dashboard sessions on one DuckDB connection vs the cursor pool.
+
+Each simulated session runs the uncached queries of the Executive Pulse,
+Operations Center and Financial Performance pages for the latest month (the
+period cube they project from, and the Pareto view) in its own thread (as
+Streamlit runs every session's rerun), all at once:
+
+  shared  - every thread queries the same DuckDB connection (the former
+            get_connection() result)
+  pooled  - every query borrows a cursor from dashboard_shared._DuckPool
+
+Reports wall time, per-session latency and the pool's cursor wait, for a
+growing number of sessions.  Results are printed and written to
+logs/duckdb_pool_benchmark_<timestamp>.json.
+
+Usage:
+    python benchmark_duckdb_pool.py                  # 1, 2, 4, 8 sessions
+    python benchmark_duckdb_pool.py --sessions 16 --pool-size 8
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import duckdb
+
+from config import DB_PATH, DUCKDB_FILE_KEY, DUCKDB_POOL_SIZE, LOGS_PATH
+from snapshot_store import current_db_path
+
+SESSION_COUNTS = (1, 2, 4, 8)
+
+
+def _open(path: Path):
+    """Open the snapshot read-only as the dashboard would."""
+    if not DUCKDB_FILE_KEY:
+        return duckdb.connect(str(path), read_only=True)
+    con = duckdb.connect(":memory:")
+    sql_path = str(path).replace("\\", "/")
+    con.execute(f"ATTACH '{sql_path}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}', READ_ONLY)")
+    con.execute("USE db")
+    return con
+
+
+def _page_run(con, fetch_periods: tuple, selected: str) -> None:
+    """One session's page loads, uncached (bypass the snapshot cache)."""
+    import dashboard_shared as ds
+    import section_data as sd
+    from dashboard_cache import uncached
+
+    with uncached():
+        ds.fetch_period_cube(con, fetch_periods)
+        sd.fetch_pareto_data(con, selected)
+
+
+def _run_sessions(con, sessions: int, args: tuple) -> dict:
+    latencies = [0.0] * sessions
+    errors = []
+    barrier = threading.Barrier(sessions)
+
+    def session(i):
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            _page_run(con, *args)
+        except Exception as exc:  # a shared connection may fail under concurrent use
+            errors.append(f"{type(exc).__name__}: {exc}")
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "wall_ms": round((time.perf_counter() - start) * 1000, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "errors": len(errors),
+    }
+
+
+def run_benchmark(session_counts=SESSION_COUNTS, pool_size: int = DUCKDB_POOL_SIZE) -> dict:
+    import dashboard_shared as ds
+
+    source = current_db_path(DB_PATH)
+    shared = _open(source)
+    pool = ds._DuckPool(_open(source), pool_size)
+    available = ds.fetch_available_periods(shared, False)
+    _window, fetch_periods = ds.compute_fetch_periods(available[-1], available)
+    args = (tuple(fetch_periods), available[-1])
+    _page_run(shared, *args)  # warm-up: file pages, prepared plans
+
+    results = {}
+    for sessions in session_counts:
+        before = ds.duckdb_pool_stats()
+        pooled = _run_sessions(pool, sessions, args)
+        after = ds.duckdb_pool_stats()
+        pooled["cursor_waits"] = after["waits"] - before["waits"]
+        pooled["cursor_wait_ms"] = round(after["wait_ms"] - before["wait_ms"], 1)
+        results[sessions] = {"shared": _run_sessions(shared, sessions, args), "pooled": pooled}
+    shared.close()
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "source": source.name,
+        "pool_size": pool_size,
+        "period": available[-1],
+        "sessions": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent dashboard sessions: shared connection vs cursor pool")
+    parser.add_argument("--sessions", type=int, nargs="*", default=list(SESSION_COUNTS), help="Concurrent session counts")
+    parser.add_argument("--pool-size", type=int, default=DUCKDB_POOL_SIZE, help="Cursors in the pool")
+    args = parser.parse_args()
+
+    source = current_db_path(DB_PATH)
+    if not source.exists():
+        print(f"[SKIP] No DuckDB snapshot at {source}")
+        return
+
+    import logging
+
+    logging.disable(logging.WARNING)  # streamlit "no runtime" noise from the fetcher modules
+    report = run_benchmark(args.sessions, args.pool_size)
+
+    print(f"\nSource: {report['source']}  period {report['period']}, pool of {report['pool_size']} cursors\n")
+    print(f"  {'sessions':>8}  {'':<7}{'wall ms':>9}{'p50 ms':>9}{'max ms':>9}{'errors':>8}{'waits':>7}{'queued ms':>11}")
+    for sessions, r in report["sessions"].items():
+        for mode in ("shared", "pooled"):
+            m = r[mode]
+            waits = f"{m['cursor_waits']:>7}{m['cursor_wait_ms']:>11.1f}" if mode == "pooled" else ""
+            print(f"  {sessions:>8}  {mode:<7}{m['wall_ms']:>9.1f}{m['p50_ms']:>9.1f}{m['max_ms']:>9.1f}{m['errors']:>8}{waits}")
+
+    LOGS_PATH.mkdir(parents=True, exist_ok=True)
+    out = LOGS_PATH / f"duckdb_pool_benchmark_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\n[OK] Written to {out}")
+
+
+if __name__ == "__main__":
+    main()
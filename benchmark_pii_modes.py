@@ -0,0 +1,192 @@
+"""
+Benchmark dashboard query latency: whole-file vs sidecar PII encryption.
+
+Builds three copies of the CURRENT DuckDB snapshot in a scratch folder:
+  plain    - no encryption (baseline)
+  file     - whole snapshot encrypted (DUCKDB_PII_MODE=file)
+  sidecar  - plaintext analytics tables, Phone/Email moved to an encrypted
+             -pii sidecar (DUCKDB_PII_MODE=sidecar)
+then opens each the way the dashboard does and times its batch fetchers
+(uncached).  "cold" is a fresh connection per run (pages read and, for
+file mode, decrypted from disk); "warm" repeats on one open connection.
+Results are printed and written to logs/pii_benchmark_<timestamp>.json.
+
+Run against a whole-file or unencrypted snapshot; a sidecar-mode snapshot has
+no PII left to split.  Uses DUCKDB_KEY, or a throwaway key for the scratch
+copies when none is configured.
+
+Usage:
+    python benchmark_pii_modes.py              # 5 runs per mode
+    python benchmark_pii_modes.py --runs 10
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import duckdb
+
+from config import DB_PATH, DUCKDB_FILE_KEY, DUCKDB_KEY, LOGS_PATH
+from snapshot_store import current_db_path, pii_path
+
+MODES = ("plain", "file", "sidecar")
+
+
+def _build_variants(source: Path, workdir: Path, key: str) -> dict[str, Path]:
+    """Copy ``source`` into one database file per mode under ``workdir``."""
+    from cleancloud_to_duckdb import _enable_encrypted_writes, split_pii
+
+    paths = {mode: workdir / f"{mode}.duckdb" for mode in MODES}
+    con = duckdb.connect(":memory:")
+    _enable_encrypted_writes(con)
+    src_key = f", ENCRYPTION_KEY '{DUCKDB_FILE_KEY}'" if DUCKDB_FILE_KEY else ""
+    con.execute(f"ATTACH '{_sql_path(source)}' AS src (READ_ONLY{src_key})")
+    con.execute(f"ATTACH '{_sql_path(paths['plain'])}' AS plain")
+    con.execute("COPY FROM DATABASE src TO plain")
+    con.execute(f"ATTACH '{_sql_path(paths['file'])}' AS file_enc (ENCRYPTION_KEY '{key}')")
+    con.execute("COPY FROM DATABASE src TO file_enc")
+    con.close()
+
+    shutil.copyfile(paths["plain"], paths["sidecar"])
+    con = duckdb.connect(str(paths["sidecar"]))
+    split_pii(con, paths["sidecar"], key=key)
+    con.execute("CHECKPOINT")
+    con.close()
+    return paths
+
+
+def _sql_path(path: Path) -> str:
+    return str(path).replace("\\", "/")
+
+
+def _open(mode: str, path: Path, key: str):
+    """Open ``path`` read-only as the dashboard would in ``mode``."""
+    if mode != "file":
+        return duckdb.connect(str(path), read_only=True)
+    con = duckdb.connect(":memory:")
+    con.execute(f"ATTACH '{_sql_path(path)}' AS db (ENCRYPTION_KEY '{key}', READ_ONLY)")
+    con.execute("USE db")
+    return con
+
+
+def _dashboard_queries(con) -> list[tuple]:
+    """(label, uncached fetcher, args) for the dashboard's page-load fetchers."""
+    import customer_report_shared as cr
+    import dashboard_shared as ds
+    import section_data as sd
+
+    months = tuple(
+        r[0] for r in con.execute("SELECT DISTINCT YearMonth FROM sales WHERE YearMonth IS NOT NULL ORDER BY 1 DESC LIMIT 12").fetchall()
+    )
+    weeks = tuple(
+        r[0] for r in con.execute("SELECT DISTINCT ISOWeekLabel FROM sales WHERE ISOWeekLabel IS NOT NULL ORDER BY 1 DESC LIMIT 12").fetchall()
+    )
+    return [
+        ("measures_monthly", ds.fetch_measures_batch, (months,)),
+        ("measures_weekly", ds.fetch_measures_batch, (weeks,)),
+        ("customer_insights", sd.fetch_customer_insights_batch, (months,)),
+        ("cohort", sd.fetch_cohort_batch, (months,)),
+        ("logistics", sd.fetch_logistics_batch, (months,)),
+        ("operations", sd.fetch_operations_batch, (months,)),
+        ("payments", sd.fetch_payments_batch, (months,)),
+        ("customer_measures", cr.fetch_customer_measures_batch, (months,)),
+    ]
+
+
+def _time_queries(con, queries: list[tuple]) -> dict[str, float]:
+    from dashboard_cache import uncached
+
+    timings = {}
+    for label, fetcher, args in queries:
+        start = time.perf_counter()
+        with uncached():  # bypass the snapshot cache, the period cube's included
+            fetcher(con, *args)
+        timings[label] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def _time_pii_lookup(path: Path, key: str, mode: str) -> float:
+    """ms to fetch Phone/Email for 100 customers (the only PII read path)."""
+    start = time.perf_counter()
+    con = _open(mode, path, key)
+    if mode == "sidecar":
+        # attach_pii reads DUCKDB_KEY; attach directly so a throwaway key works too
+        con.execute(f"ATTACH '{_sql_path(pii_path(path))}' AS pii (ENCRYPTION_KEY '{key}', READ_ONLY)")
+        source = "pii.customer_pii"
+    else:
+        source = "customers"
+    con.execute(f"SELECT CustomerID_Std, Phone, Email FROM {source} ORDER BY CustomerID_Std LIMIT 100").fetchall()
+    con.close()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_benchmark(runs: int = 5) -> dict:
+    source = current_db_path(DB_PATH)
+    if not source.exists():
+        raise FileNotFoundError(f"No DuckDB snapshot at {source} — run cleancloud_to_duckdb.py first")
+    key = DUCKDB_KEY or "pii-benchmark-scratch-key"
+
+    workdir = Path(tempfile.mkdtemp(prefix="pii_bench_"))
+    try:
+        paths = _build_variants(source, workdir, key)
+        results = {}
+        for mode in MODES:
+            cold_runs, warm_runs = [], []
+            for _ in range(runs):
+                con = _open(mode, paths[mode], key)
+                queries = _dashboard_queries(con)
+                cold_runs.append(_time_queries(con, queries))
+                con.close()
+            con = _open(mode, paths[mode], key)
+            queries = _dashboard_queries(con)
+            _time_queries(con, queries)
+            for _ in range(runs):
+                warm_runs.append(_time_queries(con, queries))
+            con.close()
+
+            labels = [q[0] for q in queries]
+            results[mode] = {
+                "size_mb": round(paths[mode].stat().st_size / (1024 * 1024), 2),
+                "cold_ms": {l: round(statistics.median(r[l] for r in cold_runs), 2) for l in labels},
+                "warm_ms": {l: round(statistics.median(r[l] for r in warm_runs), 2) for l in labels},
+                "pii_lookup_ms": round(statistics.median(_time_pii_lookup(paths[mode], key, mode) for _ in range(runs)), 2),
+            }
+            results[mode]["cold_total_ms"] = round(sum(results[mode]["cold_ms"].values()), 2)
+            results[mode]["warm_total_ms"] = round(sum(results[mode]["warm_ms"].values()), 2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"timestamp": datetime.now().isoformat(), "source": source.name, "runs": runs, "modes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard latency per DuckDB PII encryption mode")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per mode (median reported)")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.disable(logging.WARNING)  # streamlit "no runtime" noise from the fetcher modules
+    report = run_benchmark(args.runs)
+
+    print(f"\nSource: {report['source']}  (median of {report['runs']} runs)\n")
+    print(f"  {'mode':<10}{'size MB':>9}{'cold ms':>10}{'warm ms':>10}{'PII ms':>9}")
+    for mode, r in report["modes"].items():
+        print(f"  {mode:<10}{r['size_mb']:>9.1f}{r['cold_total_ms']:>10.1f}{r['warm_total_ms']:>10.1f}{r['pii_lookup_ms']:>9.1f}")
+
+    LOGS_PATH.mkdir(parents=True, exist_ok=True)
+    out = LOGS_PATH / f"pii_benchmark_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\n[OK] Written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark result assembly in the dashboard batch fetchers.
+
+A batch fetcher runs its queries and then assembles the per-period dicts the
+pages read.  Two measurements:
+
+  fetchers   - each batch fetcher run uncached against the CURRENT DuckDB
+               snapshot ("total"), then re-run on a connection that replays
+               its recorded query results from memory ("assembly": the
+               fetch minus the queries).
+  synthetic  - one (period, category) result like fetch_operations_batch's,
+               at growing period counts, assembled with the former
+               boolean-mask lookup (df[(df.period == p) & (df.cat == c)] per
+               value) and with dashboard_shared.keyed_rows.
+
+Results are printed and written to logs/assembly_benchmark_<timestamp>.json.
+
+Usage:
+    python benchmark_result_assembly.py              # 5 runs, median reported
+    python benchmark_result_assembly.py --runs 10
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import duckdb
+
+from config import DB_PATH, DUCKDB_FILE_KEY, LOGS_PATH
+from snapshot_store import current_db_path
+
+CATEGORIES = ("Professional Wear", "Traditional Wear", "Home Linens", "Extras", "Others")
+COLUMNS = {"items": 0, "revenue": 0.0, "express_items": 0}
+PERIOD_COUNTS = (12, 52, 104, 260)
+
+
+def _open(path: Path):
+    """Open the snapshot read-only as the dashboard would."""
+    if not DUCKDB_FILE_KEY:
+        return duckdb.connect(str(path), read_only=True)
+    con = duckdb.connect(":memory:")
+    sql_path = str(path).replace("\\", "/")
+    con.execute(f"ATTACH '{sql_path}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}', READ_ONLY)")
+    con.execute("USE db")
+    return con
+
+
+def _fetchers(con) -> list[tuple]:
+    """(label, uncached fetcher, args) for the dashboard's batch fetchers."""
+    import customer_report_shared as cr
+    import dashboard_shared as ds
+    import section_data as sd
+
+    months = tuple(
+        r[0] for r in con.execute("SELECT DISTINCT YearMonth FROM sales WHERE YearMonth IS NOT NULL ORDER BY 1 DESC LIMIT 12").fetchall()
+    )
+    weeks = tuple(
+        r[0] for r in con.execute("SELECT DISTINCT ISOWeekLabel FROM sales WHERE ISOWeekLabel IS NOT NULL ORDER BY 1 DESC LIMIT 26").fetchall()
+    )
+    return [
+        ("measures_monthly", ds.fetch_measures_batch, (months,)),
+        ("measures_weekly", ds.fetch_measures_batch, (weeks,)),
+        ("customer_insights", sd.fetch_customer_insights_batch, (months,)),
+        ("cohort", sd.fetch_cohort_batch, (months,)),
+        ("extended_cohort", sd.fetch_extended_cohort_batch, (months,)),
+        ("reactivation", sd.fetch_reactivation_batch, (months,)),
+        ("logistics", sd.fetch_logistics_batch, (months,)),
+        ("operations_weekly", sd.fetch_operations_batch, (weeks,)),
+        ("payments", sd.fetch_payments_batch, (months,)),
+        ("customer_measures", cr.fetch_customer_measures_batch, (months,)),
+        ("new_customer_detail", cr.fetch_new_customer_detail_batch, (months,)),
+    ]
+
+
+class _Recorded:
+    __slots__ = ("_df",)
+
+    def __init__(self, df):
+        self._df = df
+
+    def df(self):
+        return self._df
+
+
+class _ReplayConnection:
+    """Connection stand-in that records each query's result once and replays it from memory."""
+
+    def __init__(self, con):
+        self._con = con
+        self._results = {}
+
+    def execute(self, sql, params=None):
+        key = (sql, repr(params))
+        if key not in self._results:
+            self._results[key] = self._con.execute(sql, params).df()
+        return _Recorded(self._results[key])
+
+
+def _time_fetch_ms(con, fetcher, args) -> float:
+    from dashboard_cache import uncached
+
+    start = time.perf_counter()
+    with uncached():  # bypass the snapshot cache, the period cube's included
+        fetcher(con, *args)
+    return (time.perf_counter() - start) * 1000
+
+
+def _synthetic_frame(n_periods: int):
+    import pandas as pd
+
+    periods = [f"{2000 + i // 12}-{i % 12 + 1:02d}" for i in range(n_periods)]
+    rows = [(p, c, i, float(i), i % 7) for i, (p, c) in enumerate((p, c) for p in periods for c in CATEGORIES)]
+    return periods, pd.DataFrame(rows, columns=["period", "Item_Category", *COLUMNS])
+
+
+def _assemble_masked(df, periods) -> dict:
+    """The former per-value lookup: one boolean-mask scan of the frame per (period, category)."""
+    out = {}
+    for p in periods:
+        for cat in CATEGORIES:
+            row = df[(df["period"] == p) & (df["Item_Category"] == cat)]
+            out[p, cat] = {c: type(d)(row[c].iloc[0]) if len(row) else d for c, d in COLUMNS.items()}
+    return out
+
+
+def _assemble_keyed(df, periods) -> dict:
+    from dashboard_shared import keyed_rows
+
+    rows = keyed_rows(df, ("period", "Item_Category"), COLUMNS)
+    return {(p, cat): rows[p, cat] for p in periods for cat in CATEGORIES}
+
+
+def _median_ms(fn, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def run_benchmark(runs: int = 5) -> dict:
+    synthetic = {}
+    for n in PERIOD_COUNTS:
+        periods, df = _synthetic_frame(n)
+        assert _assemble_masked(df, periods) == _assemble_keyed(df, periods)
+        masked = _median_ms(lambda: _assemble_masked(df, periods), runs)
+        keyed = _median_ms(lambda: _assemble_keyed(df, periods), runs)
+        synthetic[n] = {"rows": len(df), "masked_ms": masked, "keyed_ms": keyed}
+
+    fetchers = {}
+    source = current_db_path(DB_PATH)
+    if source.exists():
+        con = _open(source)
+        replay = _ReplayConnection(con)
+        for label, fetcher, args in _fetchers(con):
+            _time_fetch_ms(replay, fetcher, args)  # warm-up, records the results
+            total = statistics.median(_time_fetch_ms(con, fetcher, args) for _ in range(runs))
+            assembly = statistics.median(_time_fetch_ms(replay, fetcher, args) for _ in range(runs))
+            fetchers[label] = {"periods": len(args[0]), "total_ms": round(total, 3), "assembly_ms": round(assembly, 3)}
+        con.close()
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "source": source.name if source.exists() else None,
+        "runs": runs,
+        "fetchers": fetchers,
+        "synthetic": synthetic,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-fetch result assembly in the dashboard batch fetchers")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (median reported)")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.disable(logging.WARNING)  # streamlit "no runtime" noise from the fetcher modules
+    report = run_benchmark(args.runs)
+
+    if report["fetchers"]:
+        print(f"\nSource: {report['source']}  (median of {report['runs']} runs)\n")
+        print(f"  {'fetcher':<22}{'periods':>8}{'total ms':>10}{'assembly ms':>13}")
+        for label, r in report["fetchers"].items():
+            print(f"  {label:<22}{r['periods']:>8}{r['total_ms']:>10.2f}{r['assembly_ms']:>13.3f}")
+    else:
+        print(f"\n[SKIP] No DuckDB snapshot at {current_db_path(DB_PATH)} — fetcher timings skipped")
+
+    print(f"\n  Synthetic (period x {len(CATEGORIES)} categories x {len(COLUMNS)} columns):\n")
+    print(f"  {'periods':>8}{'rows':>8}{'masked ms':>12}{'keyed ms':>11}{'speed-up':>10}")
+    for n, r in report["synthetic"].items():
+        speedup = r["masked_ms"] / r["keyed_ms"] if r["keyed_ms"] else 0.0
+        print(f"  {n:>8}{r['rows']:>8}{r['masked_ms']:>12.2f}{r['keyed_ms']:>11.3f}{speedup:>9.0f}x")
+
+    LOGS_PATH.mkdir(parents=True, exist_ok=True)
+    out = LOGS_PATH / f"assembly_benchmark_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\n[OK] Written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Warm the dashboard query cache after a refresh publishes new data.
+
+Runs every cached fetcher the pages request (executive_pulse,
+customer_analytics, operations_center, financial_performance) for the most
+recent DASHBOARD_WARM_PERIODS selectable periods of each grain, with the same
+arguments the pages pass: the display window from compute_fetch_periods, or
+the selected period.  Results land in the on-disk tier of dashboard_cache
+under the new data version, where every dashboard process finds them on its
+first request.
+
+Needs MOONWALK_CACHE_DIR pointing at the directory the dashboard uses;
+without a disk tier there is nothing shared to fill and the warm-up is
+skipped.  moonwalk_flow.py and refresh_cli.py call warm_dashboard_cache()
+after publishing.
+
+Usage:
+    python cache_warmer.py                # most recent DASHBOARD_WARM_PERIODS periods per grain
+    python cache_warmer.py --periods 6
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from config import DASHBOARD_CACHE_DIR, DASHBOARD_WARM_PERIODS
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_BOTH = (False, True)  # monthly, weekly
+_MONTHLY = (False,)
+
+
+def _page_fetches() -> list[tuple]:
+    """(fetcher, argument, grains) for each cached fetch the pages make.
+
+    ``argument`` is "window" (tuple of the fetch periods), "period" (the
+    selected period) or None; pages that show a view in monthly mode only
+    never request it for a week.
+    """
+    import customer_report_shared as cr
+    import dashboard_shared as ds
+    import section_data as sd
+
+    return [
+        # executive_pulse
+        (ds.fetch_measures_batch, "window", _BOTH),
+        (sd.fetch_yoy_batch, "window", _BOTH),
+        # customer_analytics
+        (cr.fetch_new_customer_detail_batch, "window", _MONTHLY),
+        (sd.fetch_reactivation_batch, "window", _MONTHLY),
+        (sd.fetch_customer_insights_batch, "window", _MONTHLY),
+        (sd.fetch_rfm_snapshot, "period", _MONTHLY),
+        (sd.fetch_clv_estimate, None, _MONTHLY),
+        (sd.fetch_extended_cohort_batch, "window", _MONTHLY),
+        (sd.fetch_retention_heatmap, None, _MONTHLY),
+        (cr.fetch_customer_measures_batch, "window", _BOTH),
+        # operations_center / financial_performance
+        (sd.fetch_logistics_batch, "window", _BOTH),
+        (sd.fetch_operations_batch, "window", _BOTH),
+        (sd.fetch_payments_batch, "window", _BOTH),
+        (sd.fetch_pareto_data, "period", _MONTHLY),
+        (sd.fetch_outstanding, None, _BOTH),
+    ]
+
+
+def _plan(con, recent: int) -> list[tuple]:
+    """Distinct (fetcher, args) calls for the ``recent`` latest periods of each grain."""
+    from dashboard_shared import compute_fetch_periods, fetch_available_periods
+
+    calls = {}  # insertion-ordered set
+    for weekly in _BOTH:
+        available = fetch_available_periods(con, weekly)
+        for selected in reversed(available[-recent:] if recent > 0 else []):
+            _window, fetch_periods = compute_fetch_periods(selected, available)
+            for fetcher, argument, grains in _page_fetches():
+                if weekly not in grains:
+                    continue
+                args = {"window": (tuple(fetch_periods),), "period": (selected,), None: ()}[argument]
+                calls[fetcher, args] = None
+    return list(calls)
+
+
+def warm_dashboard_cache(recent: int = DASHBOARD_WARM_PERIODS) -> dict:
+    """Fill the shared cache for the data just published; a fetch that fails is logged and skipped."""
+    if not DASHBOARD_CACHE_DIR:
+        logger.info("  [SKIP] MOONWALK_CACHE_DIR not set — no shared cache to warm")
+        return {"skipped": True}
+
+    import dashboard_cache
+    from dashboard_shared import get_connection
+
+    start = time.perf_counter()
+    con = get_connection()
+    calls = _plan(con, recent)
+    before = dashboard_cache.cache_stats()
+    failed = []
+    for fetcher, args in calls:
+        try:
+            fetcher(con, *args)
+        except Exception as exc:
+            failed.append(fetcher.__name__)
+            logger.warning(f"  [WARN] {fetcher.__name__}{args!r} not warmed: {exc}")
+    stats = dashboard_cache.cache_stats()
+
+    summary = {
+        "version": stats["version"],
+        "fetches": len(calls),
+        "computed": stats["misses"] - before["misses"] - len(failed),
+        "already_cached": stats["disk_hits"] - before["disk_hits"],
+        "failed": len(failed),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+    logger.info(
+        f"  [OK] Warmed dashboard cache ({summary['version']}): {summary['fetches']} fetches,"
+        f" {summary['computed']} computed, {summary['already_cached']} already cached,"
+        f" {summary['failed']} failed in {summary['elapsed_s']:.1f}s"
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the dashboard query cache for the current data version")
+    parser.add_argument(
+        "--periods",
+        type=int,
+        default=DASHBOARD_WARM_PERIODS,
+        help="Most recent selectable periods to warm per grain",
+    )
+    args = parser.parse_args()
+    summary = warm_dashboard_cache(args.periods)
+    sys.exit(1 if summary.get("failed") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,28 @@ Replaces Excel PowerPivot with a proper database.
 
 Usage:
     python etl/cleancloud_to_duckdb.py
+    python etl/cleancloud_to_duckdb.py --incremental   # reload changed months only
+    python etl/cleancloud_to_duckdb.py --inprocess     # run the ETL first, hand frames over in memory
+
+In-process mode: main(frames=...) takes the Polars transform outputs from
+cleancloud_to_excel_MASTER.main(outputs=...) and registers them with DuckDB
+through Arrow, so the build skips the staging files entirely.
 
 Output:
-    analytics.duckdb (single-file database, ~50-100MB)
+    analytics-<version>.duckdb (single-file database, ~50-100MB) next to
+    DB_PATH, published via the CURRENT pointer (see snapshot_store.py)
 """
 
 import duckdb
+import hashlib
 import json
+import polars as pl
+import re
+import statistics
 import time
 from pathlib import Path
-from datetime import datetime
-import os
+from datetime import date, datetime
+import shutil
 import sys
 
 
@@ -25,9 +36,27 @@ import sys
 # CONFIGURATION (centralized in config.py)
 # =====================================================================
 
-from config import LOCAL_STAGING_PATH, DB_PATH, LOGS_PATH, DUCKDB_KEY
+from config import (
+    LOCAL_STAGING_PATH,
+    DB_PATH,
+    LOGS_PATH,
+    DUCKDB_KEY,
+    DUCKDB_FILE_KEY,
+    DUCKDB_PII_SIDECAR,
+    SERVING_MODE,
+)
 
 from logger_config import setup_logger
+from dashboard_queries import QUERIES, grain_context, named_query
+from insights_engine import (
+    ALL_PERIODS,
+    INSIGHT_COLUMNS,
+    INSIGHTS_VERSION,
+    build_insight_rows,
+    diff_periods,
+    monthly_bounds,
+)
+from snapshot_store import current_db_path, next_version, pii_path, publish, snapshot_path
 
 logger = setup_logger(__name__)
 
@@ -140,20 +169,99 @@ DROP_COLUMNS = {
     ],
 }
 
+# Transform output key (cleancloud_to_excel_MASTER shared_data) per table, for
+# in-process builds that read the Polars frames instead of the staged files
+FRAME_KEYS = {
+    "sales": "all_sales_df",
+    "items": "all_items_df",
+    "customers": "all_customers_df",
+    "customer_quality": "customer_quality_df",
+    "dim_period": "dim_period_df",
+}
+
+# dim_period keys denormalized onto fact tables: {table: {key column: source date column}}.
+# Monthly keys follow OrderCohortMonth and weekly keys follow Earned_Date, matching the
+# joins in get_grain_context(); items use ItemDate for both grains.
+PERIOD_KEY_COLUMNS = {
+    "sales": {"YearMonth": "OrderCohortMonth", "YearQuarter": "OrderCohortMonth", "ISOWeekLabel": "Earned_Date"},
+    "items": {"YearMonth": "ItemDate", "YearQuarter": "ItemDate", "ISOWeekLabel": "ItemDate"},
+    "customer_quality": {
+        "YearMonth": "OrderCohortMonth",
+        "YearQuarter": "OrderCohortMonth",
+        "ISOWeekLabel": "OrderCohortMonth",
+    },
+}
+
+# PII columns moved to the encrypted sidecar (DUCKDB_PII_MODE=sidecar), keyed by CustomerID_Std
+PII_COLUMNS = {"customers": ["Phone", "Email"]}
+
+# Month partition column per fact table for incremental refreshes.  The
+# partition_manifest table stores one fingerprint per (table, month) of the
+# staged file; only months whose fingerprint changed are deleted and reloaded.
+PARTITION_COLUMNS = {
+    "sales": "OrderCohortMonth",
+    "items": "ItemDate",
+    "customer_quality": "OrderCohortMonth",
+}
+# Bump when load/typing logic changes so the next incremental run rebuilds in full
+MANIFEST_VERSION = 2
+
+# Physical sort order per table: dominant filter key first so row-group
+# min/max zone maps prune period scans, then customer for per-customer reads.
+CLUSTER_KEYS = {
+    "sales": ["YearMonth", "CustomerID_Std"],
+    "items": ["YearMonth", "CustomerID_Std"],
+    "customer_quality": ["YearMonth", "CustomerID_Std"],
+    "customers": ["CustomerID_Std"],
+}
+
+# Index candidates (name, table, column).  advise_indexes() replays the
+# dashboard queries that read each one (dashboard_queries.QUERIES) and keeps
+# the index only when the median of INDEX_TIMING_RUNS replays beats the
+# zone-map scan by INDEX_MIN_SPEEDUP.  Low-cardinality columns (e.g.
+# Transaction_Type) are not candidates: an equality filter on them matches
+# too many rows for an ART probe.
+INDEX_CANDIDATES = [
+    ("idx_sales_customer", "sales", "CustomerID_Std"),
+    ("idx_sales_order", "sales", "OrderID_Std"),
+    ("idx_sales_cohort_month", "sales", "OrderCohortMonth"),
+    ("idx_sales_earned_date", "sales", "Earned_Date"),
+    ("idx_items_customer", "items", "CustomerID_Std"),
+    ("idx_items_order", "items", "OrderID_Std"),
+    ("idx_items_date", "items", "ItemDate"),
+    ("idx_customers_id", "customers", "CustomerID_Std"),
+    ("idx_customers_raw_id", "customers", "CustomerID_Raw"),
+    ("idx_cust_quality_id", "customer_quality", "CustomerID_Std"),
+    ("idx_cust_quality_month", "customer_quality", "OrderCohortMonth"),
+    ("idx_period_date", "dim_period", "Date"),
+    ("idx_period_yearmonth", "dim_period", "YearMonth"),
+    ("idx_period_isoweeklabel", "dim_period", "ISOWeekLabel"),
+    ("idx_order_lookup_id", "order_lookup", "OrderID_Std"),
+]
+INDEX_MIN_SPEEDUP = 1.5
+INDEX_TIMING_RUNS = 5  # timed replays per side; the medians are compared
+# Periods each query is replayed with: the latest display window plus the
+# period before it (get_display_window / compute_fetch_periods)
+INDEX_REPLAY_PERIODS = {"monthly": 7, "weekly": 14}
+
 
 # =====================================================================
 # VALIDATION
 # =====================================================================
 
 
-def validate_csvs():
-    """Check all CSV files exist"""
+def validate_csvs(frames: dict | None = None):
+    """Check all CSV files exist (tables supplied as in-process frames are not read from disk)"""
     logger.info("\n" + "=" * 70)
     logger.info("CSV VALIDATION")
     logger.info("=" * 70)
     logger.info("")
     missing = []
     for table_name, csv_file in CSV_FILES.items():
+        frame = _frame(table_name, frames)
+        if frame is not None:
+            logger.info(f"  [OK] In-process: {FRAME_KEYS[table_name]} ({frame.height:,} rows)")
+            continue
         csv_path = CSV_FOLDER / csv_file
         if not csv_path.exists():
             missing.append(csv_file)
@@ -180,56 +288,120 @@ def validate_csvs():
 # =====================================================================
 
 
-def create_database():
-    """Create DuckDB database and load all tables using native CSV reader"""
+def _enable_encrypted_writes(conn):
+    """Load httpfs when available: DuckDB writes encrypted files only with its OpenSSL crypto."""
+    try:
+        conn.execute("LOAD httpfs")
+    except duckdb.Error:
+        pass
 
-    logger.info("\n" + "=" * 70)
-    logger.info("DUCKDB ETL - LOADING DATA")
-    logger.info("=" * 70)
-    logger.info("")
-    # Build into a temp file, then swap — avoids locking issues if
-    # the dashboard currently has analytics.duckdb open in read-only mode.
-    tmp_path = DB_PATH.with_suffix(".duckdb.tmp")
-    if tmp_path.exists():
-        tmp_path.unlink()
-
-    if DUCKDB_KEY:
-        tmp_path_str = str(tmp_path).replace("\\", "/")
+
+def _connect_db(db_file: Path):
+    """Open ``db_file`` read-write, attaching with the encryption key in whole-file mode."""
+    if DUCKDB_FILE_KEY:
+        db_file_str = str(db_file).replace("\\", "/")
         conn = duckdb.connect(":memory:")
-        conn.execute(f"ATTACH '{tmp_path_str}' AS db (ENCRYPTION_KEY '{DUCKDB_KEY}')")
+        _enable_encrypted_writes(conn)
+        conn.execute(f"ATTACH '{db_file_str}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}')")
         conn.execute("USE db")
-        logger.info(f"  Building new ENCRYPTED database: {tmp_path.name}")
     else:
-        conn = duckdb.connect(str(tmp_path))
-        logger.info(f"  Building new database: {tmp_path.name}")
-    logger.info("")
-    total_rows = 0
+        conn = duckdb.connect(str(db_file))
+    return conn
+
+
+def split_pii(conn, db_file: Path, table: str = "customers", key: str | None = None) -> int:
+    """Move PII columns of ``table`` into the encrypted sidecar of ``db_file``.
+
+    The sidecar's ``customer_pii`` (CustomerID_Std + PII_COLUMNS) is rebuilt in
+    full; the columns are then dropped so the snapshot itself holds no PII and
+    needs no decryption to scan.  Returns the rows written to the sidecar.
+    """
+    _start = datetime.now()
+    existing = {r[0] for r in conn.execute(f"DESCRIBE {table}").fetchall()}
+    cols = [c for c in PII_COLUMNS["customers"] if c in existing]
+    if not cols:
+        return 0
+    sidecar = pii_path(db_file)
+    sidecar.unlink(missing_ok=True)
+    _enable_encrypted_writes(conn)
+    sidecar_str = str(sidecar).replace("\\", "/")
+    conn.execute(f"ATTACH '{sidecar_str}' AS pii (ENCRYPTION_KEY '{key or DUCKDB_KEY}')")
+    try:
+        col_sql = ", ".join(f'"{c}"' for c in cols)
+        conn.execute(f"CREATE TABLE pii.customer_pii AS SELECT CustomerID_Std, {col_sql} FROM {table}")
+        rows = conn.execute("SELECT COUNT(*) FROM pii.customer_pii").fetchone()[0]
+    finally:
+        conn.execute("DETACH pii")
+    for col in cols:
+        conn.execute(f'ALTER TABLE {table} DROP COLUMN "{col}"')
+    _profile_entries.append(
+        {"phase": "split_pii", "elapsed_s": round((datetime.now() - _start).total_seconds(), 3), "rows": rows}
+    )
+    logger.info(f"  [OK] Moved {', '.join(cols)} ({rows:,} rows) to encrypted sidecar {sidecar.name}")
+    return rows
+
+
+def _frame(table_name: str, frames: dict | None) -> pl.DataFrame | None:
+    return frames.get(FRAME_KEYS[table_name]) if frames else None
 
-    # Load each table — prefer Parquet when available, fall back to CSV
-    for table_name, csv_file in CSV_FILES.items():
-        csv_path = CSV_FOLDER / csv_file
-        parquet_path = csv_path.with_suffix(".parquet")
 
+def _register_frames(conn, frames: dict | None) -> list[str]:
+    """Expose in-process Polars frames to ``conn`` as Arrow-backed views ``frame_<table>``.
+
+    DuckDB scans the Arrow buffers in place, so nothing is serialized.
+    Returns the registered view names (unregister once loaded).
+    """
+    names = []
+    for table_name in CSV_FILES:
+        frame = _frame(table_name, frames)
+        if frame is not None:
+            conn.register(f"frame_{table_name}", frame.to_arrow())
+            names.append(f"frame_{table_name}")
+    return names
+
+
+def _source_relation(table_name: str, frames: dict | None = None) -> tuple[str, str]:
+    """``(FROM-clause relation, format)`` for a table — a registered in-process frame,
+    else its staged Parquet file when available, else CSV."""
+    if _frame(table_name, frames) is not None:
+        return f"frame_{table_name}", "arrow"
+    csv_path = CSV_FOLDER / CSV_FILES[table_name]
+    parquet_path = csv_path.with_suffix(".parquet")
+    if parquet_path.exists():
+        pq_path_str = str(parquet_path).replace("\\", "/")
+        return f"read_parquet('{pq_path_str}')", "parquet"
+    csv_path_str = str(csv_path).replace("\\", "/")
+    return f"read_csv_auto('{csv_path_str}', header=true, all_varchar=false, sample_size=-1)", "csv"
+
+
+def _partition_expr(column: str) -> str:
+    """Month partition key ('YYYY-MM', '' when the date is missing) of a raw or typed date column."""
+    return f"COALESCE(strftime(TRY_CAST(\"{column}\" AS DATE), '%Y-%m'), '')"
+
+
+def _load_tables(
+    conn, tables: dict[str, str], months: dict[str, list[str]] | None = None, frames: dict | None = None
+) -> int:
+    """Load staged files (or in-process ``frames``) into ``tables`` ({logical name: physical name}).
+
+    ``months`` restricts partitioned tables to the given month partitions.
+    Returns the total row count loaded.
+    """
+    total_rows = 0
+    registered = _register_frames(conn, frames)
+    for table_name, target in tables.items():
         logger.info(f"  Loading {table_name}...")
         start = datetime.now()
 
-        if parquet_path.exists():
-            # Parquet: faster, type-preserving, smaller
-            pq_path_str = str(parquet_path).replace("\\", "/")
-            conn.execute(f"CREATE TABLE {table_name} AS SELECT * FROM read_parquet('{pq_path_str}')")
-            source_fmt = "parquet"
-        else:
-            # CSV fallback
-            csv_path_str = str(csv_path).replace("\\", "/")
-            conn.execute(
-                f"CREATE TABLE {table_name} AS "
-                f"SELECT * FROM read_csv_auto('{csv_path_str}', header=true, "
-                f"all_varchar=false, sample_size=-1)"
-            )
-            source_fmt = "csv"
+        relation, source_fmt = _source_relation(table_name, frames)
+        where = ""
+        if months is not None and table_name in months:
+            month_sql = ", ".join(f"'{m}'" for m in months[table_name]) or "NULL"
+            where = f" WHERE {_partition_expr(PARTITION_COLUMNS[table_name])} IN ({month_sql})"
+        conn.execute(f"CREATE TABLE {target} AS SELECT * FROM {relation}{where}")
 
         # Get row count
-        row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {target}").fetchone()[0]
         total_rows += row_count
 
         elapsed = (datetime.now() - start).total_seconds()
@@ -237,24 +409,30 @@ def create_database():
             {"phase": f"load_{table_name}", "elapsed_s": round(elapsed, 3), "rows": row_count, "format": source_fmt}
         )
         logger.info(f"    [OK] {row_count:,} rows loaded in {elapsed:.1f}s ({source_fmt})")
+    for name in registered:
+        conn.unregister(name)
+    return total_rows
 
-    logger.info("")
-    logger.info(f"  TOTAL: {total_rows:,} rows across {len(CSV_FILES)} tables")
 
+def _apply_column_types(conn, tables: dict[str, str]):
+    """Cast dates/booleans/integers/ENUMs and drop redundant columns on ``tables`` ({logical: physical})."""
     # Cast VARCHAR date columns to proper DATE type
     logger.info("")
     logger.info("  Casting date columns to DATE type...")
     _cast_start = datetime.now()
     for table_name, columns in DATE_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
         for col in columns:
             try:
-                pre_meaningful = _count_meaningful_values(conn, table_name, col)
+                pre_meaningful = _count_meaningful_values(conn, target, col)
                 conn.execute(
-                    f'ALTER TABLE {table_name} ALTER COLUMN "{col}" SET DATA TYPE DATE USING TRY_CAST("{col}" AS DATE)'
+                    f'ALTER TABLE {target} ALTER COLUMN "{col}" SET DATA TYPE DATE USING TRY_CAST("{col}" AS DATE)'
                 )
-                _log_cast_loss(conn, table_name, col, pre_meaningful, "DATE")
+                _log_cast_loss(conn, target, col, pre_meaningful, "DATE")
             except Exception as e:
-                logger.info(f"    [WARN] Could not cast {table_name}.{col}: {str(e)[:60]}")
+                logger.info(f"    [WARN] Could not cast {target}.{col}: {str(e)[:60]}")
     _profile_entries.append(
         {"phase": "cast_dates", "elapsed_s": round((datetime.now() - _cast_start).total_seconds(), 3)}
     )
@@ -266,17 +444,20 @@ def create_database():
     _bool_start = datetime.now()
     bool_count = 0
     for table_name, columns in BOOL_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
         for col in columns:
             try:
-                pre_meaningful = _count_meaningful_values(conn, table_name, col)
+                pre_meaningful = _count_meaningful_values(conn, target, col)
                 conn.execute(
-                    f'ALTER TABLE {table_name} ALTER COLUMN "{col}" '
+                    f'ALTER TABLE {target} ALTER COLUMN "{col}" '
                     f'SET DATA TYPE BOOLEAN USING TRY_CAST("{col}" AS BOOLEAN)'
                 )
-                _log_cast_loss(conn, table_name, col, pre_meaningful, "BOOLEAN")
+                _log_cast_loss(conn, target, col, pre_meaningful, "BOOLEAN")
                 bool_count += 1
             except Exception as e:
-                logger.info(f"    [WARN] Could not cast {table_name}.{col}: {str(e)[:60]}")
+                logger.info(f"    [WARN] Could not cast {target}.{col}: {str(e)[:60]}")
     _profile_entries.append(
         {"phase": "cast_booleans", "elapsed_s": round((datetime.now() - _bool_start).total_seconds(), 3)}
     )
@@ -288,17 +469,20 @@ def create_database():
     _int_start = datetime.now()
     int_count = 0
     for table_name, col_types in INT_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
         for col, target_type in col_types.items():
             try:
-                pre_meaningful = _count_meaningful_values(conn, table_name, col)
+                pre_meaningful = _count_meaningful_values(conn, target, col)
                 conn.execute(
-                    f'ALTER TABLE {table_name} ALTER COLUMN "{col}" '
+                    f'ALTER TABLE {target} ALTER COLUMN "{col}" '
                     f'SET DATA TYPE {target_type} USING TRY_CAST("{col}" AS {target_type})'
                 )
-                _log_cast_loss(conn, table_name, col, pre_meaningful, target_type)
+                _log_cast_loss(conn, target, col, pre_meaningful, target_type)
                 int_count += 1
             except Exception as e:
-                logger.info(f"    [WARN] Could not cast {table_name}.{col}: {str(e)[:60]}")
+                logger.info(f"    [WARN] Could not cast {target}.{col}: {str(e)[:60]}")
     _profile_entries.append(
         {"phase": "cast_integers", "elapsed_s": round((datetime.now() - _int_start).total_seconds(), 3)}
     )
@@ -310,12 +494,15 @@ def create_database():
     _drop_start = datetime.now()
     drop_count = 0
     for table_name, columns in DROP_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
         for col in columns:
             try:
-                conn.execute(f'ALTER TABLE {table_name} DROP COLUMN "{col}"')
+                conn.execute(f'ALTER TABLE {target} DROP COLUMN "{col}"')
                 drop_count += 1
             except Exception as e:
-                logger.info(f"    [WARN] Could not drop {table_name}.{col}: {str(e)[:60]}")
+                logger.info(f"    [WARN] Could not drop {target}.{col}: {str(e)[:60]}")
     _profile_entries.append(
         {"phase": "drop_columns", "elapsed_s": round((datetime.now() - _drop_start).total_seconds(), 3)}
     )
@@ -328,104 +515,268 @@ def create_database():
     enum_count = 0
     created_enums = set()
     for table_name, col_defs in ENUM_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
         for col, values in col_defs.items():
             # Pre-load validation: detect unknown values in source data
             actual_values = conn.execute(
-                f'SELECT DISTINCT "{col}" FROM {table_name} WHERE "{col}" IS NOT NULL'
+                f'SELECT DISTINCT "{col}" FROM {target} WHERE "{col}" IS NOT NULL'
             ).fetchall()
             actual_set = {row[0] for row in actual_values}
             expected_set = set(values)
             unknown = actual_set - expected_set
             if unknown:
-                logger.warning(f"    [WARN] {table_name}.{col} has unknown values not in ENUM spec: {unknown}")
+                logger.warning(f"    [WARN] {target}.{col} has unknown values not in ENUM spec: {unknown}")
 
             # Use a shared ENUM name so identical types are reused across tables
+            # (and across incremental refreshes of an existing snapshot)
             enum_name = f"enum_{col.lower()}"
             if enum_name not in created_enums:
                 values_sql = ", ".join(f"'{v}'" for v in values)
-                conn.execute(f"CREATE TYPE {enum_name} AS ENUM ({values_sql})")
+                conn.execute(f"CREATE TYPE IF NOT EXISTS {enum_name} AS ENUM ({values_sql})")
                 created_enums.add(enum_name)
             try:
-                pre_meaningful = _count_meaningful_values(conn, table_name, col)
+                pre_meaningful = _count_meaningful_values(conn, target, col)
                 conn.execute(
-                    f'ALTER TABLE {table_name} ALTER COLUMN "{col}" '
+                    f'ALTER TABLE {target} ALTER COLUMN "{col}" '
                     f'SET DATA TYPE {enum_name} USING TRY_CAST("{col}" AS {enum_name})'
                 )
-                _log_cast_loss(conn, table_name, col, pre_meaningful, enum_name)
+                _log_cast_loss(conn, target, col, pre_meaningful, enum_name)
                 enum_count += 1
             except Exception as e:
-                logger.info(f"    [WARN] Could not cast {table_name}.{col} to ENUM: {str(e)[:60]}")
+                logger.info(f"    [WARN] Could not cast {target}.{col} to ENUM: {str(e)[:60]}")
     _profile_entries.append(
         {"phase": "cast_enums", "elapsed_s": round((datetime.now() - _enum_start).total_seconds(), 3)}
     )
     logger.info(f"    [OK] {enum_count} columns cast to ENUM ({len(created_enums)} types created)")
 
+
+def create_database(db_file: Path, frames: dict | None = None):
+    """Create DuckDB database at ``db_file`` and load all tables (staged files or in-process ``frames``)"""
+
+    logger.info("\n" + "=" * 70)
+    logger.info("DUCKDB ETL - LOADING DATA")
+    logger.info("=" * 70)
+    logger.info("")
+    # Build into a new snapshot file that no reader has open yet; main()
+    # publishes it through the CURRENT pointer once the build is complete.
+    if db_file.exists():
+        db_file.unlink()
+    pii_path(db_file).unlink(missing_ok=True)
+
+    conn = _connect_db(db_file)
+    encrypted = "ENCRYPTED " if DUCKDB_FILE_KEY else ""
+    logger.info(f"  Building new {encrypted}database: {db_file.name}")
+    logger.info("")
+
+    # Load each table — in-process frames first, then Parquet, falling back to CSV
+    total_rows = _load_tables(conn, {t: t for t in CSV_FILES}, frames=frames)
+
+    logger.info("")
+    logger.info(f"  TOTAL: {total_rows:,} rows across {len(CSV_FILES)} tables")
+
+    _apply_column_types(conn, {t: t for t in CSV_FILES})
+    if DUCKDB_PII_SIDECAR:
+        split_pii(conn, db_file)
+
+    add_period_keys(conn)
+    cluster_tables(conn)
+
     return conn
 
 
+def add_period_keys(conn, tables: dict[str, str] | None = None):
+    """Copy dim_period keys onto the fact tables so period filters skip the join.
+
+    Each table is rebuilt once with one LEFT JOIN per distinct source date
+    column; rows whose date is missing from dim_period get NULL keys (the same
+    rows the old inner join dropped).  ``tables`` maps logical to physical
+    names (staging tables during an incremental refresh).
+    """
+    tables = tables or {t: t for t in PERIOD_KEY_COLUMNS}
+    logger.info("")
+    logger.info("  Denormalizing period keys onto fact tables...")
+    _start = datetime.now()
+    for table_name, keys in PERIOD_KEY_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        target = tables[table_name]
+        sources = list(dict.fromkeys(keys.values()))
+        joins = "\n".join(
+            f'LEFT JOIN dim_period p{n} ON t."{src}" = p{n}.Date' for n, src in enumerate(sources)
+        )
+        key_sql = ", ".join(f"p{sources.index(src)}.{key} AS {key}" for key, src in keys.items())
+        conn.execute(f"CREATE OR REPLACE TABLE {target} AS SELECT t.*, {key_sql} FROM {target} t {joins}")
+        logger.info(f"    [OK] {target}: {', '.join(keys)}")
+    _profile_entries.append(
+        {"phase": "period_keys", "elapsed_s": round((datetime.now() - _start).total_seconds(), 3)}
+    )
+
+
+def cluster_tables(conn):
+    """Rewrite each table sorted by CLUSTER_KEYS (NULL keys last).
+
+    DuckDB keeps min/max statistics per row group, so once rows are stored in
+    period order a ``YearMonth = $1`` filter only reads the row groups for that
+    month instead of the whole table.
+    """
+    logger.info("")
+    logger.info("  Clustering tables by period, customer...")
+    _start = datetime.now()
+    for table_name, keys in CLUSTER_KEYS.items():
+        order_sql = ", ".join(f'"{k}" NULLS LAST' for k in keys)
+        conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM {table_name} ORDER BY {order_sql}")
+        logger.info(f"    [OK] {table_name} ORDER BY {', '.join(keys)}")
+    _profile_entries.append(
+        {"phase": "cluster_tables", "elapsed_s": round((datetime.now() - _start).total_seconds(), 3)}
+    )
+
+
 # =====================================================================
 # CREATE INDEXES FOR PERFORMANCE
 # =====================================================================
 
 
+def _replay_workload(conn, table: str, column: str) -> list[tuple[str, str, object]]:
+    """``(name, SQL, $1 value)`` for every registered dashboard query that reads ``table``.``column``.
+
+    Period queries are replayed at both grains, month-only ones monthly, each
+    bound to the latest display window (one label for single-period queries).
+    """
+    reads = re.compile(rf"\b(?:FROM|JOIN)\s+{table}\b")
+    mentions = re.compile(rf"\b{column}\b")
+    windows = {}
+    workload = []
+    for name, (param, template) in QUERIES.items():
+        grains = ("monthly", "weekly") if param.startswith("period") else ("monthly",)
+        for grain in grains:
+            _, sql = named_query(name, grain_context(grain))
+            if not (reads.search(sql) and mentions.search(sql)):
+                continue
+            if grain not in windows:
+                key = grain_context(grain)["period_key"]
+                windows[grain] = [
+                    r[0]
+                    for r in conn.execute(f"""
+                        SELECT DISTINCT {key} FROM sales WHERE {key} IS NOT NULL
+                        ORDER BY 1 DESC LIMIT {INDEX_REPLAY_PERIODS[grain]}
+                    """).fetchall()
+                ][::-1]
+            if windows[grain]:
+                workload.append((name, sql, windows[grain] if param.endswith("s") else windows[grain][-1]))
+    return workload
+
+
+def _time_workload(conn, workload: list) -> list[float]:
+    """Replay ``workload`` once untimed, then INDEX_TIMING_RUNS times; ms per timed run."""
+    for _name, sql, value in workload:
+        conn.execute(sql, [value]).fetchall()
+    runs = []
+    for _ in range(INDEX_TIMING_RUNS):
+        t0 = time.perf_counter()
+        for _name, sql, value in workload:
+            conn.execute(sql, [value]).fetchall()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return runs
+
+
+def advise_indexes(conn) -> list[dict]:
+    """Benchmark each INDEX_CANDIDATES entry and keep only the ones that pay off.
+
+    For every candidate the registered dashboard queries that read its column
+    (dashboard_queries.QUERIES) are replayed with the latest display window,
+    first against the clustered table alone, then with the ART index in place.
+    The index is dropped again unless the median replay gets INDEX_MIN_SPEEDUP
+    times faster; a candidate no dashboard query reads is not built at all.
+    Returns one result dict per candidate (also written to the profile).
+    """
+    results = []
+    for idx_name, table, column in INDEX_CANDIDATES:
+        workload = _replay_workload(conn, table, column)
+        queries = sorted({name for name, _sql, _value in workload})
+        if not workload:
+            results.append({"index": idx_name, "table": table, "column": column, "queries": [], "kept": False})
+            logger.info(f"  [SKIP] {idx_name}: no dashboard query reads {table}.{column}")
+            continue
+
+        scan_runs = _time_workload(conn, workload)
+        t0 = time.perf_counter()
+        conn.execute(f'CREATE INDEX {idx_name} ON {table}("{column}")')
+        build_ms = (time.perf_counter() - t0) * 1000
+        index_runs = _time_workload(conn, workload)
+
+        scan_ms, index_ms = statistics.median(scan_runs), statistics.median(index_runs)
+        speedup = scan_ms / index_ms if index_ms > 0 else float("inf")
+        kept = speedup >= INDEX_MIN_SPEEDUP
+        if not kept:
+            conn.execute(f"DROP INDEX {idx_name}")
+        results.append(
+            {
+                "index": idx_name,
+                "table": table,
+                "column": column,
+                "queries": queries,
+                "replays": len(workload),
+                "scan_ms": round(scan_ms, 3),
+                "index_ms": round(index_ms, 3),
+                "scan_runs_ms": [round(ms, 3) for ms in scan_runs],
+                "index_runs_ms": [round(ms, 3) for ms in index_runs],
+                "build_ms": round(build_ms, 3),
+                "speedup": round(speedup, 2),
+                "kept": kept,
+            }
+        )
+        status = "[OK] Kept" if kept else "[SKIP] Dropped"
+        logger.info(
+            f"  {status}: {idx_name} on {table}({column}) — {len(queries)} queries, median "
+            f"{scan_ms:.1f}ms scan vs {index_ms:.1f}ms indexed ({speedup:.1f}x)"
+        )
+    return results
+
+
 def create_indexes(conn):
-    """Create indexes on frequently filtered/joined columns"""
+    """Build order_lookup, then keep only the indexes the advisor finds useful."""
 
     logger.info("\n" + "=" * 70)
     logger.info("CREATING INDEXES")
     logger.info("=" * 70)
     logger.info("")
-    indexes = [
-        # Sales table
-        ("idx_sales_customer", "sales", "CustomerID_Std"),
-        ("idx_sales_order", "sales", "OrderID_Std"),
-        ("idx_sales_cohort_month", "sales", "OrderCohortMonth"),
-        ("idx_sales_earned_date", "sales", "Earned_Date"),
-        ("idx_sales_txn_type", "sales", "Transaction_Type"),
-        # Items table
-        ("idx_items_customer", "items", "CustomerID_Std"),
-        ("idx_items_order", "items", "OrderID_Std"),
-        ("idx_items_date", "items", "ItemDate"),
-        # Customers table
-        ("idx_customers_id", "customers", "CustomerID_Std"),
-        ("idx_customers_raw_id", "customers", "CustomerID_Raw"),
-        # Customer quality table
-        ("idx_cust_quality_id", "customer_quality", "CustomerID_Std"),
-        ("idx_cust_quality_month", "customer_quality", "OrderCohortMonth"),
-        # Period dimension
-        ("idx_period_date", "dim_period", "Date"),
-        ("idx_period_yearmonth", "dim_period", "YearMonth"),
-        ("idx_period_isoweeklabel", "dim_period", "ISOWeekLabel"),
-    ]
-
-    _idx_start = datetime.now()
-    for idx_name, table, column in indexes:
-        try:
-            conn.execute(f'CREATE INDEX {idx_name} ON {table}("{column}")')
-            logger.info(f"  [OK] Created: {idx_name} on {table}({column})")
-        except Exception as e:
-            logger.info(f"  [WARN] Skipped: {idx_name} - {str(e)[:50]}")
-
-    _profile_entries.append(
-        {"phase": "create_indexes", "elapsed_s": round((datetime.now() - _idx_start).total_seconds(), 3)}
-    )
-    logger.info("")
-    logger.info(f"  Indexes created for faster queries")
 
-    # Materialized order lookup for item-to-subscription joins
-    logger.info("")
+    # Materialized order lookup for item joins: subscription flag and the
+    # order's cohort age (its earliest MonthsSinceCohort), which splits item
+    # totals into new and existing customers
     logger.info("  Creating order_lookup table...")
     _ol_start = datetime.now()
     conn.execute("""
         CREATE TABLE order_lookup AS
-        SELECT DISTINCT OrderID_Std, IsSubscriptionService FROM sales
+        SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+               MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+        FROM sales
+        ORDER BY OrderID_Std
     """)
-    conn.execute("CREATE INDEX idx_order_lookup_id ON order_lookup(OrderID_Std)")
     ol_count = conn.execute("SELECT COUNT(*) FROM order_lookup").fetchone()[0]
     _profile_entries.append(
         {"phase": "order_lookup", "elapsed_s": round((datetime.now() - _ol_start).total_seconds(), 3), "rows": ol_count}
     )
     logger.info(f"  [OK] order_lookup: {ol_count:,} distinct orders")
+    logger.info("")
+
+    _idx_start = datetime.now()
+    results = advise_indexes(conn)
+    kept = [r["index"] for r in results if r["kept"]]
+    _profile_entries.append(
+        {
+            "phase": "create_indexes",
+            "elapsed_s": round((datetime.now() - _idx_start).total_seconds(), 3),
+            "min_speedup": INDEX_MIN_SPEEDUP,
+            "timing_runs": INDEX_TIMING_RUNS,
+            "kept": kept,
+            "candidates": results,
+        }
+    )
+    logger.info("")
+    logger.info(f"  {len(kept)} of {len(results)} candidate indexes kept")
 
 
 # =====================================================================
@@ -513,21 +864,390 @@ def validate_data(conn):
 # INSIGHTS TABLE — RULES-BASED AUTOMATED ANALYSIS
 # =====================================================================
 
+# One row per closed month.  Prior-month and prior-year values come from
+# window functions over the dense month list, so every period is evaluated in
+# a single pass instead of one query per rule per period.  Rows are returned
+# from $since on; the aggregates they compare against are computed from
+# $lookback ($lookback_date: its first day), so an incremental refresh only
+# aggregates the months it changed plus the prior periods the rules read.
+# Reactivation keeps each customer's full month list (the previous active
+# month can be any distance back).
+_MONTHLY_AGG_SQL = """
+    WITH months AS (
+        SELECT DISTINCT YearMonth FROM dim_period
+        WHERE YearMonth < strftime(CURRENT_DATE, '%Y-%m') AND YearMonth >= $lookback
+    ),
+    s_agg AS (
+        SELECT p.YearMonth,
+               SUM(s.Total_Num) AS rev,
+               COUNT(DISTINCT CASE WHEN s.Transaction_Type <> 'Invoice Payment' THEN s.CustomerID_Std END) AS cust,
+               COUNT(DISTINCT CASE WHEN s.MonthsSinceCohort = 0 THEN s.CustomerID_Std END) AS new_cust,
+               COUNT(DISTINCT CASE WHEN s.MonthsSinceCohort = 1 THEN s.CustomerID_Std END) AS m1_cust,
+               SUM(CASE WHEN s.Transaction_Type = 'Subscription' OR s.IsSubscriptionService = TRUE
+                        THEN s.Total_Num ELSE 0 END) AS sub_rev,
+               SUM(CAST(s.HasDelivery AS INTEGER)) AS deliveries,
+               SUM(CAST(s.HasPickup AS INTEGER)) AS pickups,
+               SUM(CASE WHEN s.HasDelivery = TRUE THEN s.Total_Num ELSE 0 END)
+                   / NULLIF(SUM(CAST(s.HasDelivery AS INTEGER)), 0) AS rev_per_delivery,
+               SUM(CASE WHEN s.Route_Category = 'Inside Abu Dhabi'
+                        THEN CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER) ELSE 0 END) AS inside_stops,
+               SUM(CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER)) AS stops,
+               SUM(CASE WHEN s.Payment_Type_Std IN ('Stripe', 'Terminal') THEN s.Collections ELSE 0 END) AS digital,
+               SUM(s.Collections) AS collections,
+               AVG(s.DaysToPayment) AS avg_days_payment,
+               SUM(CASE WHEN s.Paid = FALSE AND s.Source = 'CC_2025' THEN s.Total_Num ELSE 0 END) AS outstanding,
+               AVG(s.Processing_Days) AS avg_processing
+        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
+        WHERE s.Earned_Date IS NOT NULL AND s.OrderCohortMonth >= $lookback_date
+        GROUP BY p.YearMonth
+    ),
+    cust_rev AS (
+        SELECT p.YearMonth, s.CustomerID_Std, SUM(s.Total_Num) AS rev
+        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
+        WHERE s.Earned_Date IS NOT NULL AND s.OrderCohortMonth >= $lookback_date
+        GROUP BY p.YearMonth, s.CustomerID_Std
+    ),
+    conc AS (
+        SELECT c.YearMonth, SUM(CASE WHEN c.rev >= t.p80 THEN c.rev ELSE 0 END) AS top20_rev
+        FROM cust_rev c
+        JOIN (
+            SELECT YearMonth, PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY rev) AS p80
+            FROM cust_rev GROUP BY YearMonth
+        ) t ON t.YearMonth = c.YearMonth
+        GROUP BY c.YearMonth
+    ),
+    monthly_active AS (
+        SELECT DISTINCT s.CustomerID_Std, s.OrderCohortMonth AS month_date
+        FROM sales s WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
+    ),
+    with_lag AS (
+        SELECT CustomerID_Std, month_date,
+               LAG(month_date) OVER (PARTITION BY CustomerID_Std ORDER BY month_date) AS prev_month
+        FROM monthly_active
+    ),
+    react AS (
+        SELECT p.YearMonth, COUNT(DISTINCT w.CustomerID_Std) AS reactivated
+        FROM with_lag w JOIN dim_period p ON w.month_date = p.Date
+        WHERE w.prev_month IS NOT NULL AND DATEDIFF('month', w.prev_month, w.month_date) >= 3
+          AND w.month_date >= $lookback_date
+        GROUP BY p.YearMonth
+    ),
+    i_cat AS (
+        SELECT p.YearMonth, i.Item_Category AS name, SUM(i.Quantity) AS qty
+        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
+        WHERE i.ItemDate >= $lookback_date
+        GROUP BY p.YearMonth, i.Item_Category
+    ),
+    i_svc AS (
+        SELECT p.YearMonth, i.Service_Type AS name, SUM(i.Quantity) AS qty
+        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
+        WHERE i.ItemDate >= $lookback_date
+        GROUP BY p.YearMonth, i.Service_Type
+    ),
+    top_cat AS (
+        SELECT YearMonth, CAST(name AS VARCHAR) AS top_category, qty AS top_category_qty
+        FROM i_cat
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY YearMonth ORDER BY qty DESC NULLS LAST, name) = 1
+    ),
+    top_svc AS (
+        SELECT YearMonth, CAST(name AS VARCHAR) AS top_service, qty AS top_service_qty
+        FROM i_svc
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY YearMonth ORDER BY qty DESC NULLS LAST, name) = 1
+    ),
+    i_agg AS (
+        SELECT p.YearMonth,
+               SUM(i.Quantity) AS item_qty,
+               SUM(CASE WHEN i.Express = TRUE THEN i.Quantity ELSE 0 END) AS express_qty
+        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
+        WHERE i.ItemDate >= $lookback_date
+        GROUP BY p.YearMonth
+    ),
+    cq_agg AS (
+        SELECT p.YearMonth,
+               COUNT(DISTINCT CASE WHEN cq.Is_Multi_Service = TRUE THEN cq.CustomerID_Std END) AS multi_service,
+               COUNT(DISTINCT cq.CustomerID_Std) AS cq_total
+        FROM customer_quality cq JOIN dim_period p ON cq.OrderCohortMonth = p.Date
+        WHERE cq.OrderCohortMonth >= $lookback_date
+        GROUP BY p.YearMonth
+    ),
+    base AS (
+        SELECT m.YearMonth AS period,
+               COALESCE(s.rev, 0) AS rev,
+               COALESCE(s.cust, 0) AS cust,
+               COALESCE(s.new_cust, 0) AS new_cust,
+               COALESCE(s.m1_cust, 0) AS m1_cust,
+               COALESCE(s.sub_rev, 0) AS sub_rev,
+               COALESCE(s.deliveries, 0) AS deliveries,
+               COALESCE(s.pickups, 0) AS pickups,
+               s.rev_per_delivery,
+               COALESCE(s.inside_stops, 0) AS inside_stops,
+               COALESCE(s.stops, 0) AS stops,
+               COALESCE(s.digital, 0) AS digital,
+               COALESCE(s.collections, 0) AS collections,
+               s.avg_days_payment,
+               COALESCE(s.outstanding, 0) AS outstanding,
+               s.avg_processing,
+               c.top20_rev,
+               COALESCE(r.reactivated, 0) AS reactivated,
+               tc.YearMonth IS NOT NULL AS has_items,
+               tc.top_category, tc.top_category_qty,
+               ts.top_service, ts.top_service_qty,
+               COALESCE(ia.item_qty, 0) AS item_qty,
+               COALESCE(ia.express_qty, 0) AS express_qty,
+               COALESCE(q.multi_service, 0) AS multi_service,
+               COALESCE(q.cq_total, 0) AS cq_total
+        FROM months m
+        LEFT JOIN s_agg s   ON s.YearMonth = m.YearMonth
+        LEFT JOIN conc c    ON c.YearMonth = m.YearMonth
+        LEFT JOIN react r   ON r.YearMonth = m.YearMonth
+        LEFT JOIN top_cat tc ON tc.YearMonth = m.YearMonth
+        LEFT JOIN top_svc ts ON ts.YearMonth = m.YearMonth
+        LEFT JOIN i_agg ia  ON ia.YearMonth = m.YearMonth
+        LEFT JOIN cq_agg q  ON q.YearMonth = m.YearMonth
+    )
+    SELECT * FROM (
+        SELECT *,
+               LAG(period)                OVER w AS prior_period,
+               LAG(rev)                   OVER w AS prev_rev,
+               LAG(cust)                  OVER w AS prev_cust,
+               LAG(new_cust)              OVER w AS prev_new_cust,
+               LAG(sub_rev)               OVER w AS prev_sub_rev,
+               LAG(inside_stops)          OVER w AS prev_inside_stops,
+               LAG(stops)                 OVER w AS prev_stops,
+               LAG(avg_days_payment)      OVER w AS prev_avg_days_payment,
+               LAG(period, 12)            OVER w AS yoy_period,
+               LAG(rev, 12)               OVER w AS yoy_rev
+        FROM base
+        WINDOW w AS (ORDER BY period)
+    )
+    WHERE period >= $since
+    ORDER BY period
+"""
+
+# One row per completed ISO week.  trend_rev / avg_4wk_rev are computed over
+# weeks that have revenue, matching the original "last 5 revenue weeks" rule.
+# Rows from $since on; aggregates from week $lookback (starting $lookback_date),
+# which must reach the 4 revenue weeks before $since.
+_WEEKLY_AGG_SQL = """
+    WITH weeks AS (
+        SELECT DISTINCT ISOWeekLabel FROM dim_period
+        WHERE IsCurrentISOWeek = FALSE AND Date <= CURRENT_DATE AND ISOWeekLabel >= $lookback
+    ),
+    s_agg AS (
+        SELECT p.ISOWeekLabel,
+               SUM(s.Total_Num) AS rev,
+               COUNT(DISTINCT s.CustomerID_Std) AS cust,
+               SUM(CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER)) AS stops,
+               SUM(CAST(s.HasDelivery AS INTEGER)) AS deliveries,
+               SUM(CAST(s.HasPickup AS INTEGER)) AS pickups,
+               SUM(s.Collections) AS collections,
+               AVG(s.Processing_Days) AS avg_processing
+        FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
+        WHERE s.Is_Earned = TRUE AND p.IsCurrentISOWeek = FALSE AND s.Earned_Date >= $lookback_date
+        GROUP BY p.ISOWeekLabel
+    ),
+    trend AS (
+        SELECT ISOWeekLabel, rev AS trend_rev,
+               AVG(rev) OVER (ORDER BY ISOWeekLabel ROWS BETWEEN 4 PRECEDING AND 1 PRECEDING) AS avg_4wk_rev
+        FROM s_agg
+    ),
+    i_agg AS (
+        SELECT p.ISOWeekLabel, SUM(i.Quantity) AS items
+        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
+        WHERE i.ItemDate >= $lookback_date
+        GROUP BY p.ISOWeekLabel
+    ),
+    base AS (
+        SELECT w.ISOWeekLabel AS period,
+               COALESCE(s.rev, 0) AS rev,
+               COALESCE(s.cust, 0) AS cust,
+               COALESCE(s.stops, 0) AS stops,
+               COALESCE(s.deliveries, 0) AS deliveries,
+               COALESCE(s.pickups, 0) AS pickups,
+               COALESCE(s.collections, 0) AS collections,
+               s.avg_processing,
+               t.trend_rev, t.avg_4wk_rev,
+               COALESCE(i.items, 0) AS items
+        FROM weeks w
+        LEFT JOIN s_agg s ON s.ISOWeekLabel = w.ISOWeekLabel
+        LEFT JOIN trend t ON t.ISOWeekLabel = w.ISOWeekLabel
+        LEFT JOIN i_agg i ON i.ISOWeekLabel = w.ISOWeekLabel
+    )
+    SELECT * FROM (
+        SELECT *,
+               LAG(period) OVER w AS prior_period,
+               LAG(rev)    OVER w AS prev_rev,
+               LAG(cust)   OVER w AS prev_cust,
+               LAG(stops)  OVER w AS prev_stops,
+               LAG(items)  OVER w AS prev_items
+        FROM base
+        WINDOW w AS (ORDER BY period)
+    )
+    WHERE period >= $since
+    ORDER BY period
+"""
+
+
+def _fetch_period_aggregates(conn, sql: str, bounds: dict) -> list[dict]:
+    """Run a period-aggregate query over ``bounds`` (since / lookback) and return one dict per period."""
+    cur = conn.execute(sql, bounds)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _closed_periods(conn, granularity: str) -> list[str]:
+    """Every period the aggregate query would return for ``granularity``, ascending."""
+    if granularity == "monthly":
+        sql = "SELECT DISTINCT YearMonth FROM dim_period WHERE YearMonth < strftime(CURRENT_DATE, '%Y-%m')"
+    else:
+        sql = "SELECT DISTINCT ISOWeekLabel FROM dim_period WHERE IsCurrentISOWeek = FALSE AND Date <= CURRENT_DATE"
+    return sorted(r[0] for r in conn.execute(sql).fetchall() if r[0] is not None)
+
+
+def _weekly_bounds(conn, since: str) -> dict:
+    """Bounds for weeks from ``since``: aggregates from the 4th revenue week before it (the trend window)."""
+    weeks = [
+        r[0]
+        for r in conn.execute(
+            """
+            SELECT DISTINCT p.ISOWeekLabel FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
+            WHERE s.Is_Earned = TRUE AND p.IsCurrentISOWeek = FALSE AND p.ISOWeekLabel < $since
+              AND s.Earned_Date >= (SELECT MIN(Date) FROM dim_period WHERE ISOWeekLabel = $since) - INTERVAL 12 WEEK
+            ORDER BY 1 DESC LIMIT 4
+            """,
+            {"since": since},
+        ).fetchall()
+    ]
+    if len(weeks) < 4:  # gap in trading (or the start of history): aggregate everything before
+        return {**ALL_PERIODS, "since": since}
+    start = conn.execute("SELECT MIN(Date) FROM dim_period WHERE ISOWeekLabel = ?", [weeks[-1]]).fetchone()[0]
+    return {"since": since, "lookback": weeks[-1], "lookback_date": start}
+
+
+def _changed_since(conn, changed: dict[str, list[str]], known: dict[str, dict]) -> dict[str, str | None]:
+    """First period per granularity whose aggregate an incremental refresh can have changed (None: none).
+
+    Monthly aggregates group sales, items and customer_quality by their
+    partition column, so the earliest changed month bounds them.  Weekly
+    sales group by Earned_Date, read from the changed sales partitions both
+    before (prev_db) and after the reload.  Periods missing from the previous
+    refresh (a month or week that has since closed) count as changed, and a
+    period's rules read earlier periods only, so every later one is refreshed.
+    """
+    months = sorted(m for table in PARTITION_COLUMNS for m in changed.get(table, []) if m)
+    month_sql = ", ".join(f"'{m}'" for m in changed.get("sales", [])) or "NULL"
+    where = f"WHERE {_partition_expr(PARTITION_COLUMNS['sales'])} IN ({month_sql})"
+    days = [
+        conn.execute(f"SELECT MIN(Earned_Date) FROM {table} {where}").fetchone()[0]
+        for table in ("sales", "prev_db.sales")
+    ]
+    days += [date(int(m[:4]), int(m[5:7]), 1) for m in changed.get("items", []) if m]
+    days = [d for d in days if d is not None]
+    first_week = None
+    if days:
+        first_week = conn.execute("SELECT MIN(ISOWeekLabel) FROM dim_period WHERE Date >= ?", [min(days)]).fetchone()[0]
+
+    since = {}
+    for granularity, first in (("monthly", months[0] if months else None), ("weekly", first_week)):
+        new = [p for p in _closed_periods(conn, granularity) if p not in known[granularity]]
+        candidates = [p for p in (first, new[0] if new else None) if p]
+        since[granularity] = min(candidates) if candidates else None
+    return since
+
+
+def _attach_previous_db(conn) -> bool:
+    """Attach the published snapshot read-only as ``prev_db`` for insight reuse.
+
+    Returns False (full recompute) when there is no previous DB or it predates
+    insight fingerprints.
+    """
+    prev_path = current_db_path(DB_PATH)
+    if not prev_path.exists():
+        return False
+    db_path_str = str(prev_path).replace("\\", "/")
+    key_opt = f", ENCRYPTION_KEY '{DUCKDB_FILE_KEY}'" if DUCKDB_FILE_KEY else ""
+    try:
+        conn.execute(f"ATTACH '{db_path_str}' AS prev_db (READ_ONLY{key_opt})")
+    except Exception as e:
+        logger.info(f"  [WARN] Could not open previous DB for insight reuse: {str(e)[:60]}")
+        return False
+    try:
+        conn.execute("SELECT 1 FROM prev_db.insight_fingerprints LIMIT 1")
+    except Exception:
+        conn.execute("DETACH prev_db")
+        return False
+    return True
+
 
-def _insert_insight(conn, period, rule_id, category, headline, detail, sentiment, granularity="monthly"):
-    """Insert a single insight row."""
-    conn.execute(
-        "INSERT INTO insights VALUES (?,?,?,?,?,?,?)",
-        [period, rule_id, category, headline, detail, sentiment, granularity],
+def _known_fingerprints(conn, granularity: str) -> dict[str, str]:
+    return dict(
+        conn.execute(
+            "SELECT period, fingerprint FROM prev_db.insight_fingerprints WHERE granularity = ?",
+            [granularity],
+        ).fetchall()
     )
 
 
-def create_insights_table(conn):
-    """Build rules-based insights for the most recent period."""
+def _copy_previous(conn, granularity: str, periods: list[str], fingerprints: bool) -> None:
+    """Copy the insights (and, if ``fingerprints``, the fingerprints) of ``periods`` from prev_db."""
+    if not periods:
+        return
+    conn.register("_reuse_periods", pl.DataFrame({"period": periods}))
+    tables = ("insights", "insight_fingerprints") if fingerprints else ("insights",)
+    for table in tables:
+        conn.execute(
+            f"INSERT INTO {table} SELECT i.* FROM prev_db.{table} i "
+            "JOIN _reuse_periods r ON i.period = r.period WHERE i.granularity = ?",
+            [granularity],
+        )
+    conn.unregister("_reuse_periods")
+
+
+def _refresh_insights(
+    conn, granularity: str, rows: list[dict], known: dict[str, str], carried: list[str]
+) -> tuple[int, int, int]:
+    """Insert insights for every period, reusing unchanged periods from prev_db.
+
+    ``carried`` periods (before the first one an incremental refresh touched)
+    are copied without being aggregated; of ``rows``, those whose fingerprint
+    matches ``known`` are copied instead of re-evaluated.  Returns (insight
+    rows, periods recomputed, periods reused).
+    """
+    _copy_previous(conn, granularity, carried, fingerprints=True)
+    changed, unchanged, fingerprints = diff_periods(rows, known)
+    _copy_previous(conn, granularity, unchanged, fingerprints=False)
+
+    new_rows = build_insight_rows(changed, granularity)
+    if new_rows:
+        conn.register("_new_insights", pl.DataFrame(new_rows, schema=list(INSIGHT_COLUMNS), orient="row"))
+        conn.execute("INSERT INTO insights SELECT * FROM _new_insights")
+        conn.unregister("_new_insights")
+
+    if fingerprints:
+        conn.executemany(
+            "INSERT INTO insight_fingerprints VALUES (?, ?, ?)",
+            [[period, granularity, fp] for period, fp in fingerprints.items()],
+        )
+
+    n = conn.execute("SELECT COUNT(*) FROM insights WHERE granularity = ?", [granularity]).fetchone()[0]
+    return n, len(changed), len(carried) + len(unchanged)
+
+
+def create_insights_table(conn, changed: dict[str, list[str]] | None = None):
+    """Build rules-based insights for every closed month and completed ISO week.
+
+    Period aggregates are computed in one pass per granularity; periods whose
+    aggregate fingerprint matches the previous refresh are copied over from
+    the live DB instead of being re-evaluated.  After an incremental refresh
+    (``changed``: its reloaded months per fact table) only the periods from
+    the first one it could have changed are aggregated; earlier periods are
+    copied as they are.
+    """
     logger.info("\n" + "=" * 70)
     logger.info("BUILDING INSIGHTS TABLE")
     logger.info("=" * 70)
     logger.info("")
+    _start = datetime.now()
 
     conn.execute("DROP TABLE IF EXISTS insights")
     conn.execute("""
@@ -541,702 +1261,259 @@ def create_insights_table(conn):
             granularity VARCHAR DEFAULT 'monthly'
         )
     """)
+    conn.execute("DROP TABLE IF EXISTS insight_fingerprints")
+    conn.execute("""
+        CREATE TABLE insight_fingerprints (
+            period      VARCHAR,
+            granularity VARCHAR,
+            fingerprint VARCHAR
+        )
+    """)
 
-    # Determine current and prior month
-    row = conn.execute(
-        "SELECT MAX(YearMonth) FROM dim_period WHERE YearMonth < strftime(CURRENT_DATE, '%Y-%m')"
-    ).fetchone()
-    if not row or not row[0]:
+    if not _closed_periods(conn, "monthly"):
         logger.info("  [SKIP] No dim_period data — skipping insights")
         return
-    current_period = row[0]
 
-    # Helper: get prior YearMonth string
-    prior_row = conn.execute(f"""
-        SELECT YearMonth FROM dim_period
-        WHERE YearMonth < '{current_period}'
-        ORDER BY YearMonth DESC LIMIT 1
-    """).fetchone()
-    prior_period = prior_row[0] if prior_row else None
-
-    # Helper: get same month prior year
-    yoy_period = f"{int(current_period[:4]) - 1}{current_period[4:]}"
-
-    count = 0
-
-    # REV_MOM — Revenue month-over-month
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.YearMonth = '{current_period}' THEN s.Total_Num ELSE 0 END) AS cur_rev,
-                SUM(CASE WHEN p.YearMonth = '{prior_period}' THEN s.Total_Num ELSE 0 END) AS prev_rev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 0 else "negative"
-            _insert_insight(
-                conn,
-                current_period,
-                "REV_MOM",
-                "revenue",
-                f"Revenue {pct:+.0f}% vs last month",
-                f"Dhs {r[0]:,.0f} this month vs Dhs {r[1]:,.0f} last month",
-                sentiment,
-            )
-            count += 1
-
-    # REV_YOY — Revenue year-over-year
-    r = conn.execute(f"""
-        SELECT
-            SUM(CASE WHEN p.YearMonth = '{current_period}' THEN s.Total_Num ELSE 0 END) AS cur_rev,
-            SUM(CASE WHEN p.YearMonth = '{yoy_period}' THEN s.Total_Num ELSE 0 END) AS yoy_rev
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth IN ('{current_period}', '{yoy_period}')
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        pct = (r[0] - r[1]) / r[1] * 100
-        sentiment = "positive" if pct > 2 else ("negative" if pct < -2 else "neutral")
-        _insert_insight(
-            conn,
-            current_period,
-            "REV_YOY",
-            "revenue",
-            f"Revenue {pct:+.0f}% vs same month last year",
-            f"Dhs {r[0]:,.0f} this month vs Dhs {r[1]:,.0f} in {yoy_period}",
-            sentiment,
-        )
-        count += 1
-
-    # CUST_MOM — Active customer count change
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                COUNT(DISTINCT CASE WHEN p.YearMonth = '{current_period}' THEN s.CustomerID_Std END) AS cur,
-                COUNT(DISTINCT CASE WHEN p.YearMonth = '{prior_period}' THEN s.CustomerID_Std END) AS prev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
-              AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 0 else "negative"
-            _insert_insight(
-                conn,
-                current_period,
-                "CUST_MOM",
-                "customers",
-                f"Active customers {pct:+.0f}% vs last month",
-                f"{r[0]:,} active this month vs {r[1]:,} last month",
-                sentiment,
+    has_prev = _attach_previous_db(conn)
+    try:
+        known = {g: _known_fingerprints(conn, g) if has_prev else {} for g in ("monthly", "weekly")}
+        since = {"monthly": "", "weekly": ""}
+        if has_prev and changed is not None:
+            since = _changed_since(conn, changed, known)
+
+        stats = {}
+        for granularity, sql in (("monthly", _MONTHLY_AGG_SQL), ("weekly", _WEEKLY_AGG_SQL)):
+            first = since[granularity]
+            if first is None:
+                rows = []
+            elif not first:
+                rows = _fetch_period_aggregates(conn, sql, ALL_PERIODS)
+            else:
+                bounds = monthly_bounds(first) if granularity == "monthly" else _weekly_bounds(conn, first)
+                rows = _fetch_period_aggregates(conn, sql, bounds)
+            carried = [p for p in _closed_periods(conn, granularity) if first is None or p < first]
+            n, recomputed, reused = _refresh_insights(conn, granularity, rows, known[granularity], carried)
+            stats[granularity] = {
+                "rows": n,
+                "recomputed": recomputed,
+                "reused": reused,
+                "aggregated": len(rows),
+            }
+            label = f"{rows[0]['period']}..{rows[-1]['period']}" if rows else "none"
+            logger.info(
+                f"  [OK] {n:,} {granularity} insights: {len(rows)} periods aggregated ({label}), "
+                f"{recomputed} recomputed, {reused} reused"
             )
-            count += 1
+    finally:
+        if has_prev:
+            conn.execute("DETACH prev_db")
 
-    # NEW_CUST — New customers this month
-    r = conn.execute(f"""
-        SELECT COUNT(DISTINCT s.CustomerID_Std) AS new_c,
-               COUNT(DISTINCT s.CustomerID_Std) * 100.0
-                   / NULLIF(COUNT(DISTINCT s.CustomerID_Std), 0) AS pct_check
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND s.MonthsSinceCohort = 0
-          AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    tot = conn.execute(f"""
-        SELECT COUNT(DISTINCT s.CustomerID_Std) FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
-          AND p.YearMonth = '{current_period}'
-    """).fetchone()[0]
-    if r and r[0] and tot and tot > 0:
-        pct_share = r[0] / tot * 100
-        sentiment = "positive" if pct_share >= 10 else "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "NEW_CUST",
-            "customers",
-            f"{r[0]:,} new customers ({pct_share:.0f}% of active)",
-            f"First-time customers in {current_period}",
-            sentiment,
-        )
-        count += 1
-
-    # M1_RETENTION — M1 retention rate
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                COUNT(DISTINCT CASE WHEN p.YearMonth = '{current_period}' AND s.MonthsSinceCohort = 1 THEN s.CustomerID_Std END) AS m1_cur,
-                COUNT(DISTINCT CASE WHEN p.YearMonth = '{prior_period}' AND s.MonthsSinceCohort = 0 THEN s.CustomerID_Std END) AS m0_prev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            retention = r[0] / r[1] * 100
-            sentiment = "positive" if retention >= 50 else ("negative" if retention < 30 else "neutral")
-            _insert_insight(
-                conn,
-                current_period,
-                "M1_RETENTION",
-                "customers",
-                f"M1 retention: {retention:.0f}%",
-                f"{r[0]:,} of {r[1]:,} prior new customers returned",
-                sentiment,
-            )
-            count += 1
-
-    # REACTIVATIONS — Customers dormant 3+ months returning
-    r = conn.execute(f"""
-        WITH monthly_active AS (
-            SELECT DISTINCT s.CustomerID_Std, s.OrderCohortMonth AS month_date
-            FROM sales s WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
-        ),
-        with_lag AS (
-            SELECT CustomerID_Std, month_date,
-                   LAG(month_date) OVER (PARTITION BY CustomerID_Std ORDER BY month_date) AS prev_month
-            FROM monthly_active
-        ),
-        reactivated AS (
-            SELECT CustomerID_Std, month_date FROM with_lag
-            WHERE prev_month IS NOT NULL AND DATEDIFF('month', prev_month, month_date) >= 3
-        )
-        SELECT COUNT(DISTINCT r.CustomerID_Std)
-        FROM reactivated r JOIN dim_period p ON r.month_date = p.Date
-        WHERE p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[0] and r[0] > 0:
-        sentiment = "positive"
-        _insert_insight(
-            conn,
-            current_period,
-            "REACTIVATIONS",
-            "customers",
-            f"{r[0]:,} customers reactivated after 3+ month gap",
-            f"Customers returning after dormancy in {current_period}",
-            sentiment,
-        )
-        count += 1
-
-    # SUB_SHARE — Subscription revenue share
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.YearMonth = '{current_period}' AND (s.Transaction_Type = 'Subscription' OR s.IsSubscriptionService = TRUE) THEN s.Total_Num ELSE 0 END) AS sub_cur,
-                SUM(CASE WHEN p.YearMonth = '{current_period}' THEN s.Total_Num ELSE 0 END) AS tot_cur,
-                SUM(CASE WHEN p.YearMonth = '{prior_period}' AND (s.Transaction_Type = 'Subscription' OR s.IsSubscriptionService = TRUE) THEN s.Total_Num ELSE 0 END) AS sub_prev,
-                SUM(CASE WHEN p.YearMonth = '{prior_period}' THEN s.Total_Num ELSE 0 END) AS tot_prev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0 and r[3] and r[3] > 0:
-            share_cur = r[0] / r[1] * 100
-            share_prev = r[2] / r[3] * 100
-            diff = share_cur - share_prev
-            sentiment = "positive" if diff > 0 else ("negative" if diff < -2 else "neutral")
-            _insert_insight(
-                conn,
-                current_period,
-                "SUB_SHARE",
-                "revenue",
-                f"Subscription revenue at {share_cur:.0f}% of total ({diff:+.0f}pp vs last month)",
-                f"Dhs {r[0]:,.0f} subscription of Dhs {r[1]:,.0f} total revenue",
-                sentiment,
-            )
-            count += 1
+    conn.execute("CREATE INDEX idx_insights_period ON insights(granularity, period)")
+    _profile_entries.append(
+        {
+            "phase": "insights",
+            "elapsed_s": round((datetime.now() - _start).total_seconds(), 3),
+            **{f"{g}_{k}": v for g, s in stats.items() for k, v in s.items()},
+        }
+    )
 
-    # MULTI_SERVICE — Multi-service customer percentage
-    r = conn.execute(f"""
-        SELECT COUNT(DISTINCT CASE WHEN cq.Is_Multi_Service = TRUE THEN cq.CustomerID_Std END) AS multi,
-               COUNT(DISTINCT cq.CustomerID_Std) AS total
-        FROM customer_quality cq JOIN dim_period p ON cq.OrderCohortMonth = p.Date
-        WHERE p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        pct = r[0] / r[1] * 100
-        sentiment = "positive" if pct >= 20 else "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "MULTI_SERVICE",
-            "customers",
-            f"{pct:.0f}% of customers use multiple services",
-            f"{r[0]:,} of {r[1]:,} customers in {current_period}",
-            sentiment,
-        )
-        count += 1
-
-    # CONCENTRATION — Top-20th-percentile revenue share
-    r = conn.execute(f"""
-        WITH cust_rev AS (
-            SELECT s.CustomerID_Std, SUM(s.Total_Num) AS rev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-            GROUP BY s.CustomerID_Std
-        ),
-        threshold AS (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY rev) AS p80 FROM cust_rev)
-        SELECT SUM(CASE WHEN rev >= t.p80 THEN rev ELSE 0 END) AS top20_rev,
-               SUM(rev) AS total_rev
-        FROM cust_rev, threshold t
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        share = r[0] / r[1] * 100
-        sentiment = "neutral" if share < 70 else ("negative" if share > 85 else "neutral")
-        _insert_insight(
-            conn,
-            current_period,
-            "CONCENTRATION",
-            "revenue",
-            f"Top 20% of customers generate {share:.0f}% of revenue",
-            f"Dhs {r[0]:,.0f} of Dhs {r[1]:,.0f} total in {current_period}",
-            sentiment,
-        )
-        count += 1
 
-    # TOP_CATEGORY — Item category with highest volume
-    r = conn.execute(f"""
-        SELECT i.Item_Category, SUM(i.Quantity) AS qty
-        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
-        WHERE p.YearMonth = '{current_period}'
-        GROUP BY i.Item_Category ORDER BY qty DESC LIMIT 1
-    """).fetchone()
-    if r:
-        _insert_insight(
-            conn,
-            current_period,
-            "TOP_CATEGORY",
-            "operations",
-            f"Top category: {r[0]} ({r[1]:,} items)",
-            f"Highest volume item category in {current_period}",
-            "neutral",
-        )
-        count += 1
+# =====================================================================
+# INCREMENTAL REFRESH — MONTH-PARTITION MANIFEST
+# =====================================================================
 
-    # TOP_SERVICE — Service type with highest volume
-    r = conn.execute(f"""
-        SELECT i.Service_Type, SUM(i.Quantity) AS qty
-        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
-        WHERE p.YearMonth = '{current_period}'
-        GROUP BY i.Service_Type ORDER BY qty DESC LIMIT 1
-    """).fetchone()
-    if r:
-        _insert_insight(
-            conn,
-            current_period,
-            "TOP_SERVICE",
-            "operations",
-            f"Top service: {r[0]} ({r[1]:,} items)",
-            f"Highest volume service type in {current_period}",
-            "neutral",
-        )
-        count += 1
 
-    # EXPRESS_SHARE — Express item share
-    r = conn.execute(f"""
-        SELECT SUM(CASE WHEN i.Express = TRUE THEN i.Quantity ELSE 0 END) AS express_qty,
-               SUM(i.Quantity) AS total_qty
-        FROM items i JOIN dim_period p ON i.ItemDate = p.Date
-        WHERE p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        pct = r[0] / r[1] * 100
-        sentiment = "positive" if pct >= 20 else "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "EXPRESS_SHARE",
-            "operations",
-            f"Express orders: {pct:.0f}% of items",
-            f"{r[0]:,} express of {r[1]:,} total items in {current_period}",
-            sentiment,
-        )
-        count += 1
+def staged_fingerprints(frames: dict | None = None) -> dict[tuple[str, str], tuple[int, str]]:
+    """Fingerprint the staged files (or in-process ``frames``) as ``{(table, month): (rows, fingerprint)}``.
 
-    # DELIVERY_RATE — Deliveries as share of total stops
-    r = conn.execute(f"""
-        SELECT SUM(s.HasDelivery) AS del, SUM(s.HasPickup) AS pck
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[0] is not None and r[1] is not None and (r[0] + r[1]) > 0:
-        rate = r[0] / (r[0] + r[1]) * 100
-        sentiment = "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "DELIVERY_RATE",
-            "operations",
-            f"Delivery rate: {rate:.0f}% ({r[0]:,} deliveries, {r[1]:,} pickups)",
-            f"Total stops: {r[0] + r[1]:,} in {current_period}",
-            sentiment,
+    Partitioned fact tables get one entry per month: row count plus the
+    order-independent sum of row hashes.  Every table also gets a ``"*"`` entry
+    hashing its column names/types, source format, MANIFEST_VERSION and
+    INSIGHTS_VERSION, so a schema, loader or rules change forces a full
+    rebuild (every period's insights included) instead of a partial one.
+    """
+    con = duckdb.connect(":memory:")
+    try:
+        _register_frames(con, frames)
+        fingerprints = {}
+        for table_name in CSV_FILES:
+            relation, source_fmt = _source_relation(table_name, frames)
+            # A frame loads exactly like the Parquet file written from it, so
+            # in-process and file-based runs share one manifest
+            source_fmt = "parquet" if source_fmt == "arrow" else source_fmt
+            columns = [(r[0], r[1]) for r in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+            layout = [MANIFEST_VERSION, INSIGHTS_VERSION, source_fmt, columns]
+            if DUCKDB_PII_SIDECAR and table_name in PII_COLUMNS:
+                layout.append("pii-sidecar")
+            schema = json.dumps(layout)
+            fingerprints[(table_name, "*")] = (len(columns), hashlib.sha1(schema.encode()).hexdigest())
+            if table_name not in PARTITION_COLUMNS:
+                continue
+            rows = con.execute(f"""
+                SELECT {_partition_expr(PARTITION_COLUMNS[table_name])} AS month,
+                       COUNT(*),
+                       CAST(SUM(hash(t)) AS VARCHAR)
+                FROM {relation} t
+                GROUP BY 1
+            """).fetchall()
+            for month, row_count, fingerprint in rows:
+                fingerprints[(table_name, month)] = (row_count, fingerprint)
+        return fingerprints
+    finally:
+        con.close()
+
+
+def write_manifest(conn, fingerprints: dict[tuple[str, str], tuple[int, str]]):
+    """Store the staged-file fingerprints in ``partition_manifest`` for the next incremental run."""
+    conn.execute("""
+        CREATE OR REPLACE TABLE partition_manifest (
+            table_name VARCHAR, month VARCHAR, row_count BIGINT, fingerprint VARCHAR
         )
-        count += 1
+    """)
+    conn.executemany(
+        "INSERT INTO partition_manifest VALUES (?, ?, ?, ?)",
+        [(t, m, n, fp) for (t, m), (n, fp) in sorted(fingerprints.items())],
+    )
 
-    # REV_PER_DELIVERY — Revenue per delivery stop
-    r = conn.execute(f"""
-        SELECT SUM(CASE WHEN s.HasDelivery = TRUE THEN s.Total_Num ELSE 0 END)
-                   / NULLIF(SUM(s.HasDelivery), 0) AS rpd
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[0] is not None:
-        sentiment = "positive" if r[0] >= 100 else "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "REV_PER_DELIVERY",
-            "operations",
-            f"Revenue per delivery: Dhs {r[0]:,.0f}",
-            f"Average revenue generated per delivery stop in {current_period}",
-            sentiment,
-        )
-        count += 1
-
-    # GEO_SHIFT — Inside Abu Dhabi stop share vs prior month
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.YearMonth = '{current_period}' AND s.Route_Category = 'Inside Abu Dhabi' THEN CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER) ELSE 0 END) AS inside_cur,
-                SUM(CASE WHEN p.YearMonth = '{current_period}' THEN CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER) ELSE 0 END) AS total_cur,
-                SUM(CASE WHEN p.YearMonth = '{prior_period}' AND s.Route_Category = 'Inside Abu Dhabi' THEN CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER) ELSE 0 END) AS inside_prev,
-                SUM(CASE WHEN p.YearMonth = '{prior_period}' THEN CAST(s.HasDelivery AS INTEGER) + CAST(s.HasPickup AS INTEGER) ELSE 0 END) AS total_prev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0 and r[3] and r[3] > 0:
-            pct_cur = r[0] / r[1] * 100
-            pct_prev = r[2] / r[3] * 100
-            diff = pct_cur - pct_prev
-            sentiment = "neutral"
-            _insert_insight(
-                conn,
-                current_period,
-                "GEO_SHIFT",
-                "operations",
-                f"Inside Abu Dhabi stops: {pct_cur:.0f}% ({diff:+.0f}pp vs last month)",
-                f"{r[0]:,} inside stops of {r[1]:,} total in {current_period}",
-                sentiment,
-            )
-            count += 1
 
-    # DIGITAL_PAYMENT — Stripe + Terminal share
-    r = conn.execute(f"""
-        SELECT
-            SUM(CASE WHEN s.Payment_Type_Std IN ('Stripe', 'Terminal') THEN s.Collections ELSE 0 END) AS digital,
-            SUM(s.Collections) AS total
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        pct = r[0] / r[1] * 100
-        sentiment = "positive" if pct >= 70 else "neutral"
-        _insert_insight(
-            conn,
-            current_period,
-            "DIGITAL_PAYMENT",
-            "payments",
-            f"Digital payments: {pct:.0f}% of collections",
-            f"Dhs {r[0]:,.0f} stripe+terminal of Dhs {r[1]:,.0f} total in {current_period}",
-            sentiment,
-        )
-        count += 1
+def changed_partitions(staged: dict, known: dict) -> dict[str, list[str]] | None:
+    """Months to reload per fact table, or None when any table's schema entry differs.
 
-    # COLLECTION_RATE — Collections / Revenue
-    r = conn.execute(f"""
-        SELECT SUM(s.Collections) AS coll, SUM(s.Total_Num) AS rev
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        rate = r[0] / r[1] * 100
-        sentiment = "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral")
-        _insert_insight(
-            conn,
-            current_period,
-            "COLLECTION_RATE",
-            "payments",
-            f"Collection rate: {rate:.0f}% of revenue collected",
-            f"Dhs {r[0]:,.0f} collected of Dhs {r[1]:,.0f} earned in {current_period}",
-            sentiment,
-        )
-        count += 1
-
-    # AVG_DAYS_PAYMENT — Avg days to payment vs prior month
-    if prior_period:
-        r = conn.execute(f"""
-            SELECT
-                AVG(CASE WHEN p.YearMonth = '{current_period}' THEN s.DaysToPayment END) AS cur,
-                AVG(CASE WHEN p.YearMonth = '{prior_period}' THEN s.DaysToPayment END) AS prev
-            FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-            WHERE s.Earned_Date IS NOT NULL AND s.DaysToPayment IS NOT NULL
-              AND p.YearMonth IN ('{current_period}', '{prior_period}')
-        """).fetchone()
-        if r and r[0] is not None and r[1] is not None and r[1] > 0:
-            diff = r[0] - r[1]
-            sentiment = "positive" if diff < 0 else ("negative" if diff > 1 else "neutral")
-            _insert_insight(
-                conn,
-                current_period,
-                "AVG_DAYS_PAYMENT",
-                "payments",
-                f"Avg days to payment: {r[0]:.1f} days ({diff:+.1f} vs last month)",
-                f"Average collection cycle in {current_period}",
-                sentiment,
-            )
-            count += 1
+    A month is reloaded when its fingerprint changed, it is new, or it
+    disappeared from the staged file (its rows are deleted).
+    """
+    for table_name in CSV_FILES:
+        if staged.get((table_name, "*")) != known.get((table_name, "*")):
+            return None
+    changed = {}
+    for table_name in PARTITION_COLUMNS:
+        months = {m for (t, m) in staged if t == table_name} | {m for (t, m) in known if t == table_name}
+        months.discard("*")
+        changed[table_name] = sorted(m for m in months if staged.get((table_name, m)) != known.get((table_name, m)))
+    return changed
 
-    # OUTSTANDING_PCT — Outstanding as % of revenue (CC_2025 only)
-    r = conn.execute(f"""
-        SELECT SUM(CASE WHEN s.Paid = FALSE AND s.Source = 'CC_2025' THEN s.Total_Num ELSE 0 END) AS outstanding,
-               SUM(s.Total_Num) AS total_rev
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0 and r[0] is not None:
-        pct = r[0] / r[1] * 100
-        sentiment = "negative" if pct > 10 else ("neutral" if pct > 5 else "positive")
-        _insert_insight(
-            conn,
-            current_period,
-            "OUTSTANDING_PCT",
-            "payments",
-            f"Outstanding: {pct:.0f}% of revenue (Dhs {r[0]:,.0f})",
-            f"Unpaid CC_2025 orders in {current_period}",
-            sentiment,
-        )
-        count += 1
 
-    # PROCESSING_TIME — Flag if avg processing > 3 days
-    r = conn.execute(f"""
-        SELECT AVG(s.Processing_Days) AS avg_proc
-        FROM sales s JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL AND s.Processing_Days IS NOT NULL
-          AND p.YearMonth = '{current_period}'
-    """).fetchone()
-    if r and r[0] is not None:
-        sentiment = "negative" if r[0] > 3.0 else "positive"
-        _insert_insight(
-            conn,
-            current_period,
-            "PROCESSING_TIME",
-            "operations",
-            f"Avg processing time: {r[0]:.1f} days{'  — above target' if r[0] > 3.0 else ''}",
-            f"Average order processing cycle in {current_period}",
-            sentiment,
-        )
-        count += 1
+def _mark_legacy_paid(conn, table_name: str = "sales") -> int:
+    """Mark Legacy orders as Paid (they were settled pre-CleanCloud)."""
+    n = conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE Source = 'Legacy' AND Paid = FALSE").fetchone()[0]
+    conn.execute(f"UPDATE {table_name} SET Paid = TRUE WHERE Source = 'Legacy'")
+    logger.info(f"  [OK] Marked {n:,} Legacy orders as Paid")
+    return n
 
-    logger.info(f"  [OK] {count} monthly insights generated for {current_period}")
-    _create_weekly_insights(conn)
 
+def incremental_refresh(db_file: Path, staged: dict, frames: dict | None = None):
+    """Build ``db_file`` from the published snapshot, reloading only changed months.
 
-def _create_weekly_insights(conn):
-    """Generate 8 WoW insight rules for the last completed ISO week."""
-    row = conn.execute("""
-        SELECT ISOWeekLabel FROM dim_period
-        WHERE IsCurrentISOWeek = FALSE AND Date <= CURRENT_DATE
-        ORDER BY ISOWeekLabel DESC LIMIT 1
-    """).fetchone()
-    if not row:
-        logger.info("  [SKIP] No completed ISO weeks found — skipping weekly insights")
-        return
-    cur_week = row[0]
+    The current snapshot is copied to ``db_file``; changed months of sales,
+    items and customer_quality are loaded into typed ``stage_*`` tables and
+    swapped in (DELETE + INSERT, sorted by CLUSTER_KEYS), customers and
+    dim_period are replaced in full, and order_lookup is patched for the
+    orders those months touch.  Indexes kept by the advisor are maintained in
+    place.  Returns ``(conn, changed)`` or None when a full rebuild is needed.
+    """
+    prev_path = current_db_path(DB_PATH)
+    if not prev_path.exists():
+        logger.info("  [SKIP] No published snapshot — full rebuild")
+        return None
 
-    prior_row = conn.execute(f"""
-        SELECT ISOWeekLabel FROM dim_period
-        WHERE IsCurrentISOWeek = FALSE AND ISOWeekLabel < '{cur_week}'
-        ORDER BY ISOWeekLabel DESC LIMIT 1
-    """).fetchone()
-    prior_week = prior_row[0] if prior_row else None
-
-    count = 0
-
-    # WRev_WOW — Revenue week-over-week
-    if prior_week:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.ISOWeekLabel = '{cur_week}'   THEN s.Total_Num ELSE 0 END) AS cur_rev,
-                SUM(CASE WHEN p.ISOWeekLabel = '{prior_week}' THEN s.Total_Num ELSE 0 END) AS prev_rev
-            FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-            WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel IN ('{cur_week}', '{prior_week}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 2 else ("negative" if pct < -2 else "neutral")
-            _insert_insight(
-                conn,
-                cur_week,
-                "WRev_WOW",
-                "revenue",
-                f"Revenue {pct:+.0f}% vs last week",
-                f"Dhs {r[0]:,.0f} this week vs Dhs {r[1]:,.0f} last week",
-                sentiment,
-                granularity="weekly",
-            )
-            count += 1
-
-    # WRev_TREND — Revenue vs 4-week rolling average
-    r = conn.execute(f"""
-        WITH wk AS (
-            SELECT p.ISOWeekLabel, SUM(s.Total_Num) AS rev
-            FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-            WHERE s.Is_Earned = TRUE AND p.IsCurrentISOWeek = FALSE
-            GROUP BY p.ISOWeekLabel
-            ORDER BY p.ISOWeekLabel DESC LIMIT 5
-        )
-        SELECT
-            MAX(CASE WHEN ISOWeekLabel = '{cur_week}' THEN rev END) AS cur_rev,
-            AVG(CASE WHEN ISOWeekLabel != '{cur_week}' THEN rev END) AS avg_4wk
-        FROM wk
-    """).fetchone()
-    if r and r[0] is not None and r[1] is not None and r[1] > 0:
-        pct = (r[0] - r[1]) / r[1] * 100
-        sentiment = "positive" if pct > 5 else ("negative" if pct < -5 else "neutral")
-        _insert_insight(
-            conn,
-            cur_week,
-            "WRev_TREND",
-            "revenue",
-            f"Revenue {pct:+.0f}% vs 4-week average",
-            f"Dhs {r[0]:,.0f} this week vs Dhs {r[1]:,.0f} avg",
-            sentiment,
-            granularity="weekly",
-        )
-        count += 1
-
-    # WCust_WOW — Active customers week-over-week
-    if prior_week:
-        r = conn.execute(f"""
-            SELECT
-                COUNT(DISTINCT CASE WHEN p.ISOWeekLabel = '{cur_week}'   THEN s.CustomerID_Std END) AS cur,
-                COUNT(DISTINCT CASE WHEN p.ISOWeekLabel = '{prior_week}' THEN s.CustomerID_Std END) AS prev
-            FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-            WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel IN ('{cur_week}', '{prior_week}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 0 else "negative"
-            _insert_insight(
-                conn,
-                cur_week,
-                "WCust_WOW",
-                "customers",
-                f"Active customers {pct:+.0f}% vs last week",
-                f"{r[0]:,} customers this week vs {r[1]:,} last week",
-                sentiment,
-                granularity="weekly",
-            )
-            count += 1
-
-    # WStops_WOW — Total stops week-over-week
-    if prior_week:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.ISOWeekLabel = '{cur_week}'   THEN s.HasDelivery::INT + s.HasPickup::INT ELSE 0 END) AS cur,
-                SUM(CASE WHEN p.ISOWeekLabel = '{prior_week}' THEN s.HasDelivery::INT + s.HasPickup::INT ELSE 0 END) AS prev
-            FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-            WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel IN ('{cur_week}', '{prior_week}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 0 else "negative"
-            _insert_insight(
-                conn,
-                cur_week,
-                "WStops_WOW",
-                "operations",
-                f"Stops {pct:+.0f}% vs last week",
-                f"{r[0]:,} stops this week vs {r[1]:,} last week",
-                sentiment,
-                granularity="weekly",
-            )
-            count += 1
-
-    # WItems_WOW — Items processed week-over-week
-    if prior_week:
-        r = conn.execute(f"""
-            SELECT
-                SUM(CASE WHEN p.ISOWeekLabel = '{cur_week}'   THEN i.Quantity ELSE 0 END) AS cur,
-                SUM(CASE WHEN p.ISOWeekLabel = '{prior_week}' THEN i.Quantity ELSE 0 END) AS prev
-            FROM items i JOIN dim_period p ON i.ItemDate = p.Date
-            WHERE p.ISOWeekLabel IN ('{cur_week}', '{prior_week}')
-        """).fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sentiment = "positive" if pct > 0 else "negative"
-            _insert_insight(
-                conn,
-                cur_week,
-                "WItems_WOW",
-                "operations",
-                f"Items {pct:+.0f}% vs last week",
-                f"{r[0]:,} items this week vs {r[1]:,} last week",
-                sentiment,
-                granularity="weekly",
-            )
-            count += 1
+    logger.info("\n" + "=" * 70)
+    logger.info("DUCKDB ETL - INCREMENTAL REFRESH")
+    logger.info("=" * 70)
+    logger.info("")
+    _start = datetime.now()
 
-    # WProcessing — Avg processing days
-    r = conn.execute(f"""
-        SELECT AVG(s.Processing_Days) AS avg_proc
-        FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-        WHERE s.Is_Earned = TRUE AND s.Processing_Days IS NOT NULL AND p.ISOWeekLabel = '{cur_week}'
-    """).fetchone()
-    if r and r[0] is not None:
-        sentiment = "negative" if r[0] > 3.0 else "positive"
-        _insert_insight(
-            conn,
-            cur_week,
-            "WProcessing",
-            "operations",
-            f"Avg processing: {r[0]:.1f} days{'  — above target' if r[0] > 3.0 else ''}",
-            f"Average order processing time in {cur_week}",
-            sentiment,
-            granularity="weekly",
-        )
-        count += 1
+    shutil.copyfile(prev_path, db_file)
+    try:
+        conn = _connect_db(db_file)
+    except duckdb.Error as e:
+        # e.g. DUCKDB_PII_MODE changed, so the snapshot's encryption no longer matches
+        logger.info(f"  [SKIP] Cannot open {prev_path.name} ({str(e)[:60]}) — full rebuild")
+        db_file.unlink()
+        return None
+    try:
+        known = {
+            (t, m): (n, fp)
+            for t, m, n, fp in conn.execute(
+                "SELECT table_name, month, row_count, fingerprint FROM partition_manifest"
+            ).fetchall()
+        }
+    except duckdb.CatalogException:
+        known = None
+    changed = changed_partitions(staged, known) if known else None
+    if changed is None:
+        logger.info(f"  [SKIP] {prev_path.name} has no manifest or a different schema — full rebuild")
+        conn.close()
+        db_file.unlink()
+        return None
+    logger.info(f"  Base snapshot: {prev_path.name} -> {db_file.name}")
+    for table_name, months in changed.items():
+        shown = ", ".join(months[:6]) + (f" (+{len(months) - 6} more)" if len(months) > 6 else "")
+        logger.info(f"    {table_name}: {len(months)} changed month(s){' — ' + shown if months else ''}")
+    logger.info("")
 
-    # WCollection_Rate — Collections / revenue this week
-    r = conn.execute(f"""
-        SELECT SUM(s.Collections) AS coll, SUM(s.Total_Num) AS rev
-        FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-        WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel = '{cur_week}'
-    """).fetchone()
-    if r and r[1] and r[1] > 0:
-        rate = r[0] / r[1] * 100
-        sentiment = "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral")
-        _insert_insight(
-            conn,
-            cur_week,
-            "WCollection_Rate",
-            "payments",
-            f"Collection rate: {rate:.0f}% of revenue collected",
-            f"Dhs {r[0]:,.0f} collected of Dhs {r[1]:,.0f} earned in {cur_week}",
-            sentiment,
-            granularity="weekly",
+    stage = {t: f"stage_{t}" for t in CSV_FILES}
+    _load_tables(conn, stage, months=changed, frames=frames)
+    _apply_column_types(conn, stage)
+    _mark_legacy_paid(conn, stage["sales"])
+    if DUCKDB_PII_SIDECAR:
+        split_pii(conn, db_file, stage["customers"])
+
+    # Unpartitioned tables are small: replace every row
+    for table_name in CSV_FILES:
+        if table_name in PARTITION_COLUMNS:
+            continue
+        order_sql = ", ".join(f'"{k}" NULLS LAST' for k in CLUSTER_KEYS.get(table_name, []))
+        conn.execute(f"DELETE FROM {table_name}")
+        conn.execute(
+            f"INSERT INTO {table_name} BY NAME SELECT * FROM {stage[table_name]}"
+            + (f" ORDER BY {order_sql}" if order_sql else "")
         )
-        count += 1
+    add_period_keys(conn, {t: stage[t] for t in PARTITION_COLUMNS})
+
+    # Orders in the changed sales months, before and after the reload
+    sales_months = ", ".join(f"'{m}'" for m in changed["sales"]) or "NULL"
+    conn.execute(f"""
+        CREATE TEMP TABLE touched_orders AS
+        SELECT OrderID_Std FROM sales WHERE {_partition_expr(PARTITION_COLUMNS["sales"])} IN ({sales_months})
+        UNION
+        SELECT OrderID_Std FROM {stage["sales"]}
+    """)
 
-    # WDelivery_Rate — Delivery share of total stops
-    r = conn.execute(f"""
-        SELECT SUM(s.HasDelivery::INT) AS del, SUM(s.HasPickup::INT) AS pck
-        FROM sales s JOIN dim_period p ON s.Earned_Date = p.Date
-        WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel = '{cur_week}'
-    """).fetchone()
-    if r and r[0] is not None and r[1] is not None and (r[0] + r[1]) > 0:
-        rate = r[0] / (r[0] + r[1]) * 100
-        _insert_insight(
-            conn,
-            cur_week,
-            "WDelivery_Rate",
-            "operations",
-            f"Delivery rate: {rate:.0f}% ({r[0]:,} deliveries, {r[1]:,} pickups)",
-            f"Total stops: {r[0] + r[1]:,} in {cur_week}",
-            "neutral",
-            granularity="weekly",
-        )
-        count += 1
+    rows_reloaded = 0
+    for table_name, column in PARTITION_COLUMNS.items():
+        if not changed[table_name]:
+            continue
+        month_sql = ", ".join(f"'{m}'" for m in changed[table_name])
+        order_sql = ", ".join(f'"{k}" NULLS LAST' for k in CLUSTER_KEYS[table_name])
+        conn.execute(f"DELETE FROM {table_name} WHERE {_partition_expr(column)} IN ({month_sql})")
+        conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM {stage[table_name]} ORDER BY {order_sql}")
+        rows_reloaded += conn.execute(f"SELECT COUNT(*) FROM {stage[table_name]}").fetchone()[0]
+
+    conn.execute("DELETE FROM order_lookup WHERE OrderID_Std IN (SELECT OrderID_Std FROM touched_orders)")
+    conn.execute("""
+        INSERT INTO order_lookup
+        SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+               MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+        FROM sales
+        WHERE OrderID_Std IN (SELECT OrderID_Std FROM touched_orders)
+        ORDER BY OrderID_Std
+    """)
+    conn.execute("DROP TABLE touched_orders")
+    for target in stage.values():
+        conn.execute(f"DROP TABLE {target}")
 
-    logger.info(f"  [OK] {count} weekly insights generated for {cur_week}")
+    elapsed = (datetime.now() - _start).total_seconds()
+    _profile_entries.append(
+        {
+            "phase": "incremental",
+            "elapsed_s": round(elapsed, 3),
+            "base_snapshot": prev_path.name,
+            "changed_months": changed,
+            "rows_reloaded": rows_reloaded,
+        }
+    )
+    logger.info(f"  [OK] Incremental refresh: {rows_reloaded:,} fact rows reloaded in {elapsed:.1f}s")
+    return conn, changed
 
 
 # =====================================================================
@@ -1244,63 +1521,76 @@ def _create_weekly_insights(conn):
 # =====================================================================
 
 
-def main():
-    """Run complete ETL workflow"""
+def main(incremental: bool = False, frames: dict | None = None):
+    """Run complete ETL workflow.
+
+    With ``incremental=True`` only the month partitions whose staged
+    fingerprint changed since the published snapshot are reloaded; falls back
+    to a full rebuild when there is no compatible snapshot.  ``frames`` (the
+    transform outputs keyed as in FRAME_KEYS) are loaded in place of the
+    staged files for every table they cover.  With MOONWALK_SERVING_MODE=parquet
+    no database is built: the data is published as served Parquet instead
+    (parquet_serving.publish).
+    """
 
     logger.info("\n" + "=" * 70)
     logger.info("MOONWALK ANALYTICS - DUCKDB ETL")
     logger.info("=" * 70)
     logger.info("")
-    logger.info(f"Source: {CSV_FOLDER}")
+    logger.info(f"Source: {'in-process frames' if frames else CSV_FOLDER}")
     logger.info(f"Target: {DB_PATH}")
     logger.info("")
     start_time = datetime.now()
 
     # Step 1: Validate CSVs exist
-    validate_csvs()
+    validate_csvs(frames)
+    if SERVING_MODE == "parquet":
+        import parquet_serving
 
-    # Step 2: Create database and load data
-    conn = create_database()
+        parquet_serving.publish(frames)
+        return
+    staged = staged_fingerprints(frames)
+
+    # Step 2: Create database and load data into the next snapshot version
+    version = next_version(DB_PATH)
+    db_file = snapshot_path(version, DB_PATH)
+    refreshed = incremental_refresh(db_file, staged, frames) if incremental else None
+    mode = "incremental" if refreshed else "full"
+    changed = None
+    if refreshed:
+        conn, changed = refreshed
+    else:
+        conn = create_database(db_file, frames)
 
-    # Step 2b: Mark Legacy orders as Paid (they were settled pre-CleanCloud)
-    n = conn.execute("SELECT COUNT(*) FROM sales WHERE Source = 'Legacy' AND Paid = FALSE").fetchone()[0]
-    conn.execute("UPDATE sales SET Paid = TRUE WHERE Source = 'Legacy'")
-    logger.info(f"  [OK] Marked {n:,} Legacy orders as Paid")
+        # Step 2b: Mark Legacy orders as Paid (they were settled pre-CleanCloud)
+        _mark_legacy_paid(conn)
 
-    # Step 3: Create indexes
-    create_indexes(conn)
+        # Step 3: Create indexes
+        create_indexes(conn)
+    write_manifest(conn, staged)
 
     # Step 4: Validate data
     validate_data(conn)
 
-    # Step 5: Build rules-based insights table
-    create_insights_table(conn)
+    # Step 5: Build rules-based insights table (incremental: only the periods it changed)
+    create_insights_table(conn, changed)
 
-    # Close connection, then atomically swap temp file into place
+    # Close connection, then atomically repoint CURRENT at the new snapshot.
+    # Readers holding the previous snapshot keep it until they reopen.
     conn.close()
-
-    # Replace the live DB file — retry up to 5s for brief locks (e.g. read-only
-    # dashboard connection that just closed), then give up gracefully.
-    tmp_path = DB_PATH.with_suffix(".duckdb.tmp")
-    for attempt in range(5):
-        try:
-            os.replace(str(tmp_path), str(DB_PATH))
-            break
-        except PermissionError:
-            if attempt < 4:
-                time.sleep(1)
-    else:
-        logger.info(f"  [WARN] Could not replace {DB_PATH.name} (in use) — new DB saved as {tmp_path.name}")
+    publish(version, DB_PATH)
 
     elapsed = (datetime.now() - start_time).total_seconds()
-    target = DB_PATH if DB_PATH.exists() else tmp_path
-    db_size_mb = target.stat().st_size / (1024 * 1024)
+    db_size_mb = db_file.stat().st_size / (1024 * 1024)
 
     # Write profiling results
     profile = {
         "timestamp": datetime.now().isoformat(),
         "total_elapsed_s": round(elapsed, 3),
         "db_size_mb": round(db_size_mb, 1),
+        "snapshot_version": version,
+        "mode": mode,
+        "source": "in-process" if frames else "staged",
         "phases": _profile_entries,
     }
     LOGS_PATH.mkdir(parents=True, exist_ok=True)
@@ -1312,7 +1602,7 @@ def main():
     logger.info("ETL COMPLETE!")
     logger.info("=" * 70)
     logger.info("")
-    logger.info(f"  Database: {DB_PATH}")
+    logger.info(f"  Database: {db_file}")
     logger.info(f"  Size: {db_size_mb:.1f} MB")
     logger.info(f"  Time: {elapsed:.1f} seconds")
     logger.info("")
@@ -1324,13 +1614,38 @@ def main():
     logger.info("=" * 70)
 
 
+def run_inprocess(incremental: bool = False) -> list[str]:
+    """Run the Polars ETL and this build in one process with no disk round-trip.
+
+    The transform outputs are handed to main(frames=...) through Arrow while
+    the staging CSV/Parquet files (kept for Excel, Postgres and auditing) are
+    written on background threads.  Waits for those writes before returning
+    the paths of any that failed.
+    """
+    import cleancloud_to_excel_MASTER
+    from helpers import defer_staging_writes, flush_staging_writes
+
+    frames = {}
+    defer_staging_writes()
+    try:
+        if not cleancloud_to_excel_MASTER.main(outputs=frames):
+            raise RuntimeError("ETL pipeline failed — DuckDB build skipped")
+        main(incremental=incremental, frames=frames)
+    finally:
+        frames.clear()
+        failed = flush_staging_writes()
+    return failed
+
+
 # =====================================================================
 # RUN
 # =====================================================================
 
 if __name__ == "__main__":
     try:
-        main()
+        if "--inprocess" in sys.argv:
+            sys.exit(1 if run_inprocess(incremental="--incremental" in sys.argv) else 0)
+        main(incremental="--incremental" in sys.argv)
     except KeyboardInterrupt:
         logger.info("\n\nETL cancelled by user")
         sys.exit(1)
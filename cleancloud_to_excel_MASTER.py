@@ -21,7 +21,7 @@ import tracemalloc
 import json
 from pathlib import Path
 import os
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 import polars as pl
 
 
@@ -33,6 +33,7 @@ PYTHON_SCRIPT_FOLDER = Path(__file__).resolve().parent
 sys.path.insert(0, str(PYTHON_SCRIPT_FOLDER))
 
 from config import LOCAL_STAGING_PATH, DOWNLOADS_PATH, LOGS_PATH
+from helpers import write_staging_file
 from logger_config import setup_logger
 
 # Setup logger
@@ -252,11 +253,10 @@ def check_and_update_dimperiod() -> bool:
 # =====================================================================
 
 def _export_parquet(df: pl.DataFrame, csv_path: str, module_name: str) -> None:
-    """Export a DataFrame to Parquet alongside the CSV output."""
+    """Export a DataFrame to Parquet alongside the CSV output (queued when staging writes are deferred)."""
     parquet_path = Path(csv_path).with_suffix('.parquet')
     try:
-        df.write_parquet(parquet_path)
-        logger.info(f"  [PARQUET] {parquet_path.name} ({parquet_path.stat().st_size / 1024:.0f} KB)")
+        write_staging_file(df, str(parquet_path))
     except Exception as e:
         logger.warning(f"  [WARN] Parquet export failed for {module_name}: {str(e)[:60]}")
 
@@ -398,8 +398,19 @@ def _validate_cross_transform(shared_data: Dict) -> None:
     logger.info("")
 
 
-def run_all_transforms() -> bool:
-    """Run all Python transformation scripts"""
+def run_all_transforms(outputs: Optional[Dict[str, pl.DataFrame]] = None) -> bool:
+    """
+    Run all Python transformation scripts
+
+    Args:
+        outputs: Optional dict that receives each transform's output frame
+            (keyed by transform_name) plus 'dim_period_df', so an in-process
+            consumer (cleancloud_to_duckdb.main(frames=...)) can skip
+            re-reading the staging files
+
+    Returns:
+        True when every transform succeeded
+    """
     
     logger.info("\n" + "=" * 70)
     logger.info("CLEANCLOUD TO EXCEL WORKFLOW (WITH AUTO DIMPERIOD)")
@@ -432,11 +443,11 @@ def run_all_transforms() -> bool:
 
     # Export DimPeriod Parquet (always, since DimPeriod is pre-existing)
     dimperiod_csv = LOCAL_STAGING_PATH / "DimPeriod_Python.csv"
+    dp_df = None
     if dimperiod_csv.exists():
         try:
             dp_df = pl.read_csv(str(dimperiod_csv), infer_schema_length=10000)
             _export_parquet(dp_df, str(dimperiod_csv), "generate_dimperiod")
-            del dp_df
         except Exception:
             pass
 
@@ -475,6 +486,12 @@ def run_all_transforms() -> bool:
     # STEP 3: Cross-transform validation (orphan orders, key integrity)
     _validate_cross_transform(shared_data)
 
+    # Hand the output frames to an in-process consumer (source CSVs are dropped)
+    if outputs is not None:
+        outputs.update({t['transform_name']: shared_data[t['transform_name']] for t in TRANSFORMS})
+        if dp_df is not None:
+            outputs['dim_period_df'] = dp_df
+
     total_elapsed = time.time() - total_start
 
     # Write profiling results
@@ -511,8 +528,17 @@ def run_all_transforms() -> bool:
 # MAIN WORKFLOW
 # =====================================================================
 
-def main() -> None:
-    """Run the complete workflow"""
+def main(outputs: Optional[Dict[str, pl.DataFrame]] = None) -> bool:
+    """
+    Run the complete workflow
+
+    Args:
+        outputs: Optional dict filled with the transform output frames
+            (see run_all_transforms)
+
+    Returns:
+        True when the workflow completed
+    """
     
     logger.info("\n" + "=" * 70)
     logger.info("CLEANCLOUD TO EXCEL - OPTIMIZED WORKFLOW")
@@ -530,7 +556,7 @@ def main() -> None:
     workflow_start = time.time()
     
     # Run transformations
-    success = run_all_transforms()
+    success = run_all_transforms(outputs)
     
     if not success:
         logger.info("\n" + "=" * 70)
@@ -545,7 +571,7 @@ def main() -> None:
         logger.info("    2. Items")
         logger.info("    3. Invoices")
         logger.info("    4. Customers")
-        return
+        return False
     
     # Success!
     workflow_elapsed = time.time() - workflow_start
@@ -572,6 +598,7 @@ def main() -> None:
     logger.info("      No manual updates needed!")
     logger.info("")
     logger.info("=" * 70)
+    return True
 
 
 # =====================================================================
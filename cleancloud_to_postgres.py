@@ -5,30 +5,73 @@ bulk-loads them into the analytics schema in Railway Postgres.  Runs in
 parallel with the DuckDB rebuild during the Tock M migration period.
 
 Key differences from cleancloud_to_duckdb.py:
-  - Schema already exists (migration 001 created it); only TRUNCATE + reload.
+  - Schema already exists (migrations create it).  Each sync rebuilds the
+    tables in a shadow schema (analytics_next), the base tables concurrently
+    over POSTGRES_LOAD_WORKERS connections, then swaps it in for the live
+    analytics schema in one short transaction: dashboard readers never see
+    empty or half-loaded tables or wait on the load.
+  - Tables stream into COPY ... FROM STDIN (CSV) in COPY_BATCH_ROWS slices
+    written straight from Arrow buffers; rows/sec is reported per table.
+  - Delta sync: staging files are fingerprinted per (table, month) in Polars
+    and compared with partition_manifest; unchanged months are copied
+    server-side from the live tables and only changed months are shipped
+    (bytes shipped vs skipped are reported).
+  - sales / items are month-partitioned on "YearMonth" (migration 005): the
+    shadow copies get the live partitions plus any new months, and months
+    older than POSTGRES_RETENTION_MONTHS are neither shipped nor kept.
   - Booleans stored as Int32 in Parquet → cast to Python bool before insert.
   - Date strings ("YYYY-MM-DD") accepted directly by Postgres via psycopg2.
-  - Phone + Email encrypted with pgp_sym_encrypt (Postgres server-side).
+  - Phone + Email encrypted with pgp_sym_encrypt (Postgres server-side), set-based
+    from a temp staging table with the key bound once.
   - order_lookup derived via SQL INSERT ... SELECT after sales is loaded.
-  - Insights SQL ported to Postgres dialect (quoted identifiers, TO_CHAR,
-    AGE() instead of DATEDIFF).
+  - The dashboard's per-period measures are materialized per grain
+    (period_sales/routes/items_monthly/weekly) in the shadow schema, so they
+    swap in with their tables; --refresh-views runs REFRESH MATERIALIZED
+    VIEW CONCURRENTLY on the live views without a sync.
+  - Insights aggregate SQL ported to Postgres dialect (quoted identifiers,
+    TO_CHAR, INTERVAL arithmetic instead of DATEDIFF); rules shared via
+    insights_engine.py and only changed periods are rewritten.
   - Skips silently when ANALYTICS_DATABASE_URL is not configured.
 
 Usage:
     python cleancloud_to_postgres.py
     python cleancloud_to_postgres.py --skip-insights   # faster, data only
+    python cleancloud_to_postgres.py --workers 2       # concurrent table loads
+    python cleancloud_to_postgres.py --full            # ship every partition
+    python cleancloud_to_postgres.py --refresh-views   # refresh live period views only
 """
 
+import argparse
+import hashlib
+import io
+import json
 import sys
 import time
-from datetime import datetime
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
 from pathlib import Path
 
 import polars as pl
 import psycopg2
 import psycopg2.extras
-
-from config import ANALYTICS_DATABASE_URL, ENCRYPTION_KEY, LOCAL_STAGING_PATH
+import psycopg2.pool
+
+from config import (
+    ANALYTICS_DATABASE_URL,
+    ENCRYPTION_KEY,
+    LOCAL_STAGING_PATH,
+    POSTGRES_LOAD_WORKERS,
+    POSTGRES_RETENTION_MONTHS,
+)
+from insights_engine import (
+    ALL_PERIODS,
+    INSIGHT_COLUMNS,
+    INSIGHTS_VERSION,
+    build_insight_rows,
+    diff_periods,
+    monthly_bounds,
+)
 from logger_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -45,8 +88,50 @@ PARQUET_FILES = {
     "dim_period": "DimPeriod_Python.parquet",
 }
 
-# Tables with SERIAL PKs need RESTART IDENTITY on truncate
-SERIAL_PK_TABLES = {"sales", "items"}
+# Shadow-schema sync: the sync tables are rebuilt in SHADOW_SCHEMA and the
+# schemas are swapped; the replaced live schema is renamed to RETIRED_SCHEMA
+# and dropped once readers have let go of it.
+LIVE_SCHEMA = "analytics"
+SHADOW_SCHEMA = "analytics_next"
+RETIRED_SCHEMA = "analytics_prev"
+
+# Tables rebuilt by every sync; everything else in the live schema (enum
+# types, alembic_version, ...) is carried over at the swap
+SYNC_TABLES = [*PARQUET_FILES, "order_lookup", "insights", "insight_fingerprints", "partition_manifest"]
+
+# Incremental insight / delta-sync state copied into the shadow schema before the load
+_CARRIED_ROWS_TABLES = ("insights", "insight_fingerprints", "partition_manifest")
+
+# Month partition column per table for delta syncs (mirrors
+# cleancloud_to_duckdb.py PARTITION_COLUMNS).  partition_manifest stores one
+# fingerprint per (table, month) of the staged file; only months whose
+# fingerprint changed are shipped, the rest are copied server-side from the
+# live table.  Unpartitioned tables are a single partition ('').
+PARTITION_COLUMNS = {
+    "sales": "OrderCohortMonth",
+    "items": "ItemDate",
+    "customer_quality": "OrderCohortMonth",
+}
+# Bump when load/typing logic changes so the next sync ships every table in full
+MANIFEST_VERSION = 1
+
+# Tables range-partitioned by "YearMonth" (migration 005): one partition per
+# month plus a default one; months older than POSTGRES_RETENTION_MONTHS are
+# neither shipped nor kept
+PARTITIONED_TABLES = ("sales", "items")
+
+# Row order within each COPY batch: month, then date, so the BRIN date
+# indexes of each month partition cover narrow block ranges
+_COPY_ORDER = {
+    "sales": ["OrderCohortMonth", "Earned_Date"],
+    "items": ["ItemDate"],
+}
+
+_MONTH = "__month"
+
+# Period key per dashboard grain; each period-measure view is materialized
+# once per grain as <view>_<grain> (see PERIOD-MEASURE VIEWS below)
+PERIOD_GRAINS = {"monthly": "YearMonth", "weekly": "ISOWeekLabel"}
 
 # Columns to exclude before inserting (mirrors cleancloud_to_duckdb.py DROP_COLUMNS)
 _DROP_COLUMNS = {
@@ -81,24 +166,51 @@ _BOOL_COLUMNS = {
     },
 }
 
+# Denormalized period keys: key column -> source date column
+# (mirrors cleancloud_to_duckdb.py PERIOD_KEY_COLUMNS)
+_PERIOD_KEY_COLUMNS = {
+    "sales": {"YearMonth": "OrderCohortMonth", "YearQuarter": "OrderCohortMonth", "ISOWeekLabel": "Earned_Date"},
+    "items": {"YearMonth": "ItemDate", "YearQuarter": "ItemDate", "ISOWeekLabel": "ItemDate"},
+    "customer_quality": {
+        "YearMonth": "OrderCohortMonth",
+        "YearQuarter": "OrderCohortMonth",
+        "ISOWeekLabel": "OrderCohortMonth",
+    },
+}
+
 # PII columns encrypted with pgcrypto in the customers table
 _PII_COLUMNS = {"Phone", "Email"}
 
+# Rows per COPY batch: bounds memory to one slice of the staging file
+COPY_BATCH_ROWS = 50_000
+
+_INTEGER_TYPES = {"smallint", "integer", "bigint"}
+
 
 # =====================================================================
 # CONNECTION
 # =====================================================================
 
 
-def _connect():
-    """Open a psycopg2 connection with analytics as the default schema.
+def _connect(schema: str = LIVE_SCHEMA):
+    """Open a psycopg2 connection with ``schema`` (default analytics) as the default schema.
 
     Uses PostgreSQL startup options to set search_path before any transaction
     begins.  This avoids the SQLAlchemy autobegin trap (see alembic/env.py).
     """
     return psycopg2.connect(
         ANALYTICS_DATABASE_URL,
-        options="-c search_path=analytics,public",
+        options=f"-c search_path={schema},public",
+    )
+
+
+def _connection_pool(size: int, schema: str = LIVE_SCHEMA) -> psycopg2.pool.ThreadedConnectionPool:
+    """Thread-safe pool of up to ``size`` connections, opened on demand (same options as _connect)."""
+    return psycopg2.pool.ThreadedConnectionPool(
+        0,
+        size,
+        ANALYTICS_DATABASE_URL,
+        options=f"-c search_path={schema},public",
     )
 
 
@@ -142,34 +254,286 @@ def _prepare_df(table_name: str, df: pl.DataFrame) -> pl.DataFrame:
     return df
 
 
+def _read_period_lookup() -> pl.DataFrame | None:
+    """Date -> YearMonth / YearQuarter / ISOWeekLabel from the DimPeriod staging file."""
+    pq_path = LOCAL_STAGING_PATH / PARQUET_FILES["dim_period"]
+    csv_path = pq_path.with_suffix(".csv")
+    if pq_path.exists():
+        df = pl.read_parquet(pq_path)
+    elif csv_path.exists():
+        df = pl.read_csv(csv_path, infer_schema_length=0)
+    else:
+        return None
+    return df.select(pl.col("Date").cast(pl.String), "YearMonth", "YearQuarter", "ISOWeekLabel")
+
+
+def _add_period_keys(table_name: str, df: pl.DataFrame, periods: pl.DataFrame | None) -> pl.DataFrame:
+    """Append the dim_period keys for each source date column (NULL when unmatched).
+
+    Accepts a LazyFrame too (returns one), for fingerprinting a staging scan.
+    """
+    keys = _PERIOD_KEY_COLUMNS.get(table_name)
+    if not keys or periods is None:
+        return df
+    for src in dict.fromkeys(keys.values()):
+        wanted = [k for k, s in keys.items() if s == src]
+        lookup = periods.select(pl.col("Date").alias(src), *wanted)
+        if isinstance(df, pl.LazyFrame):
+            lookup = lookup.lazy()
+        df = df.with_columns(pl.col(src).cast(pl.String)).join(lookup, on=src, how="left")
+    return df
+
+
 # =====================================================================
-# BULK LOAD HELPERS
+# DELTA SYNC — PER-PARTITION FINGERPRINTS
 # =====================================================================
 
 
-def _truncate(cur, table_name: str) -> None:
-    restart = "RESTART IDENTITY" if table_name in SERIAL_PK_TABLES else ""
-    cur.execute(f"TRUNCATE analytics.{table_name} {restart} CASCADE")
+def _month_expr(table_name: str) -> pl.Expr:
+    """Month partition key ('YYYY-MM', '' when the date is missing) of a staged or prepared frame."""
+    column = PARTITION_COLUMNS.get(table_name)
+    if column is None:
+        return pl.lit("")
+    return pl.col(column).cast(pl.String).str.slice(0, 7).fill_null("")
 
 
-def _bulk_insert(cur, table_name: str, df: pl.DataFrame) -> int:
-    """Bulk-insert all rows from a prepared DataFrame using execute_values."""
-    col_sql = ", ".join(f'"{c}"' for c in df.columns)
-    rows = df.rows()
+def _month_sql(table_name: str) -> str:
+    """The same partition key computed over a loaded Postgres table."""
+    column = PARTITION_COLUMNS.get(table_name)
+    if column is None:
+        return "''"
+    return f"COALESCE(TO_CHAR(\"{column}\", 'YYYY-MM'), '')"
+
+
+def _staged_fingerprints(
+    table_name: str, pq_path: Path, csv_path: Path, periods: pl.DataFrame | None
+) -> dict[str, tuple[int, str]]:
+    """Fingerprint a staging file locally as ``{month: (rows, fingerprint)}``.
+
+    Each month gets its row count plus the order-independent sum of Polars
+    row hashes over the rows as loaded (period keys included, so a dim_period
+    change reaches the months it touches).  The ``"*"`` entry hashes the
+    column names/types, source format, MANIFEST_VERSION, INSIGHTS_VERSION
+    and Polars version (row hashes are only stable within one version), so a
+    schema, loader or rules change ships the whole table (and rebuilds every
+    period's insights) instead of a partial one.
+    """
+    if pq_path.exists():
+        lf, src = pl.scan_parquet(pq_path), "parquet"
+    else:
+        lf, src = pl.scan_csv(csv_path, infer_schema_length=0), "csv"
+    lf = _add_period_keys(table_name, lf, periods)
+    schema = lf.collect_schema()
+    layout = json.dumps([MANIFEST_VERSION, INSIGHTS_VERSION, pl.__version__, src, [[c, str(d)] for c, d in schema.items()]])
+    fingerprints = {"*": (len(schema), hashlib.sha1(layout.encode()).hexdigest())}
+
+    # Sum the 64-bit hashes as two 32-bit halves so the sums cannot overflow
+    row_hash = pl.struct(pl.all()).hash(seed=0)
+    parts = (
+        lf.group_by(_month_expr(table_name).alias("month"))
+        .agg(pl.len().alias("rows"), (row_hash // 2**32).sum().alias("hi"), (row_hash % 2**32).sum().alias("lo"))
+        .collect()
+    )
+    for month, rows, hi, lo in parts.iter_rows():
+        fingerprints[month] = (rows, f"{hi:x}-{lo:x}")
+    return fingerprints
+
+
+def _known_fingerprints(cur, table_name: str) -> dict[str, tuple[int, str, int]]:
+    """``{month: (rows, fingerprint, csv_bytes)}`` recorded by the last sync of the table."""
+    cur.execute(
+        "SELECT month, row_count, fingerprint, csv_bytes FROM partition_manifest WHERE table_name = %s",
+        (table_name,),
+    )
+    return {month: (rows, fp, csv_bytes) for month, rows, fp, csv_bytes in cur.fetchall()}
+
+
+def _changed_months(staged: dict, known: dict) -> list[str] | None:
+    """Months to ship, or None when the table has no manifest or its ``"*"`` entry differs.
+
+    A month is shipped when its fingerprint changed or it is new; months that
+    disappeared from the staging file are simply not copied across.
+    """
+    if staged["*"] != known.get("*", (None, None))[:2]:
+        return None
+    return sorted(m for m, entry in staged.items() if m != "*" and entry != known.get(m, (None, None))[:2])
+
+
+def _write_manifest(cur, table_name: str, staged: dict, shipped: dict[str, int], known: dict) -> None:
+    """Replace the table's manifest rows; unchanged months keep the bytes they were shipped with."""
+    cur.execute("DELETE FROM partition_manifest WHERE table_name = %s", (table_name,))
     psycopg2.extras.execute_values(
         cur,
-        f"INSERT INTO analytics.{table_name} ({col_sql}) VALUES %s",
-        rows,
-        page_size=2000,
+        "INSERT INTO partition_manifest (table_name, month, row_count, fingerprint, csv_bytes) VALUES %s",
+        [
+            (table_name, month, rows, fp, shipped.get(month, known.get(month, (0, "", 0))[2]))
+            for month, (rows, fp) in sorted(staged.items())
+        ],
     )
-    return len(rows)
 
 
-def _load_customers(conn, df: pl.DataFrame) -> int:
+def _copy_live_rows(cur, table_name: str, months: list[str] | None = None) -> int:
+    """Copy the live table's rows (only ``months``, when given) into the shadow table server-side.
+
+    SERIAL ids are copied as-is, so the shadow sequence is moved past them.
+    """
+    where = f" WHERE {_month_sql(table_name)} = ANY(%s)" if months is not None else ""
+    cur.execute(f"INSERT INTO {table_name} SELECT * FROM {LIVE_SCHEMA}.{table_name}{where}", (months,) if months is not None else None)
+    n = cur.rowcount
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND column_default LIKE 'nextval(%%'",
+        (table_name,),
+    )
+    for (column,) in cur.fetchall():
+        cur.execute(
+            f'SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX("{column}"), 0) + 1, false) FROM {table_name}',
+            (table_name, column),
+        )
+    return n
+
+
+# =====================================================================
+# MONTH PARTITIONS — sales / items (migration 005)
+# =====================================================================
+
+
+def _retention_cutoff(today: date | None = None) -> str | None:
+    """First retained month ('YYYY-MM') under POSTGRES_RETENTION_MONTHS, or None when all months are kept.
+
+    Matches analytics.drop_expired_partitions(): the current month and the
+    POSTGRES_RETENTION_MONTHS - 1 before it are kept.
+    """
+    if POSTGRES_RETENTION_MONTHS <= 0:
+        return None
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (POSTGRES_RETENTION_MONTHS - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _create_partitions(cur, table_name: str, months: list[str]) -> int:
+    """Add the missing month partitions of a partitioned table in the schema being loaded."""
+    cur.execute(
+        f"SELECT {LIVE_SCHEMA}.create_month_partitions(%s::regclass, %s)",
+        (f"{SHADOW_SCHEMA}.{table_name}", months),
+    )
+    return cur.fetchone()[0]
+
+
+def _drop_expired_partitions(cur, table_name: str) -> int:
+    """Drop the month partitions older than POSTGRES_RETENTION_MONTHS (none when it is 0)."""
+    cur.execute(
+        f"SELECT {LIVE_SCHEMA}.drop_expired_partitions(%s::regclass, %s)",
+        (f"{SHADOW_SCHEMA}.{table_name}", POSTGRES_RETENTION_MONTHS),
+    )
+    return cur.fetchone()[0]
+
+
+# =====================================================================
+# BULK LOAD HELPERS
+# =====================================================================
+
+
+def _source_batches(pq_path: Path, csv_path: Path, batch_rows: int = COPY_BATCH_ROWS) -> Iterator[pl.DataFrame]:
+    """Yield a staging file in slices of at most ``batch_rows`` rows.
+
+    Parquet is scanned lazily, one slice per batch, so only the row groups of
+    the current slice are read; the CSV fallback is read once and sliced.
+    """
+    if pq_path.exists():
+        lf = pl.scan_parquet(pq_path)
+        total = lf.select(pl.len()).collect().item()
+        for offset in range(0, total, batch_rows):
+            yield lf.slice(offset, batch_rows).collect()
+    else:
+        yield from pl.read_csv(csv_path, infer_schema_length=0).iter_slices(batch_rows)
+
+
+def _target_types(cur, table_name: str) -> dict[str, str]:
+    """Column -> Postgres data_type for a table in the schema being loaded (current_schema())."""
+    cur.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s",
+        (table_name,),
+    )
+    return dict(cur.fetchall())
+
+
+def _cast_for_copy(df: pl.DataFrame, target_types: dict[str, str]) -> pl.DataFrame:
+    """Round float columns bound for integer columns (COPY rejects "3.0"; INSERT cast it)."""
+    casts = [
+        pl.col(c).round(0).cast(pl.Int64)
+        for c, d in zip(df.columns, df.dtypes)
+        if d.is_float() and target_types.get(c) in _INTEGER_TYPES
+    ]
+    return df.with_columns(casts) if casts else df
+
+
+def _copy_batch(cur, table_name: str, df: pl.DataFrame, months: pl.Series | None = None) -> dict[str, int]:
+    """COPY one prepared batch into the table as CSV (NULL = unquoted empty field).
+
+    Returns the CSV bytes shipped per month partition (``months`` holds each
+    row's month; without it everything counts towards '').
+    """
+    buf = io.BytesIO()
+    if months is None:
+        df.write_csv(buf, include_header=False)
+        shipped = {"": buf.tell()}
+    else:
+        shipped = {}
+        for (month,), part in df.with_columns(months.alias(_MONTH)).partition_by(_MONTH, as_dict=True).items():
+            start = buf.tell()
+            part.drop(_MONTH).write_csv(buf, include_header=False)
+            shipped[month] = buf.tell() - start
+    buf.seek(0)
+    col_sql = ", ".join(f'"{c}"' for c in df.columns)
+    cur.copy_expert(f"COPY {table_name} ({col_sql}) FROM STDIN WITH (FORMAT csv)", buf)
+    return shipped
+
+
+def _copy_table(
+    cur,
+    table_name: str,
+    batches: Iterator[pl.DataFrame],
+    periods: pl.DataFrame | None,
+    only_months: list[str] | None = None,
+) -> tuple[int, int, dict[str, int]]:
+    """Stream source batches (only ``only_months``, when given) into the table with COPY.
+
+    Returns (rows, batches, CSV bytes shipped per month).
+    """
+    target_types = _target_types(cur, table_name)
+    rows = n_batches = 0
+    shipped: dict[str, int] = {}
+    for batch in batches:
+        df = _add_period_keys(table_name, _prepare_df(table_name, batch), periods)
+        order = [c for c in _COPY_ORDER.get(table_name, []) if c in df.columns]
+        if order:
+            df = df.sort(order, nulls_last=True)
+        months = df.with_columns(_month_expr(table_name).alias(_MONTH)).get_column(_MONTH)
+        if only_months is not None:
+            keep = months.is_in(only_months)
+            df, months = df.filter(keep), months.filter(keep)
+            if df.is_empty():
+                continue
+        for month, n_bytes in _copy_batch(cur, table_name, _cast_for_copy(df, target_types), months).items():
+            shipped[month] = shipped.get(month, 0) + n_bytes
+        rows += df.height
+        n_batches += 1
+        if n_batches > 1:
+            logger.info(f"    {table_name}: {rows:,} rows copied ({n_batches} batches)")
+    return rows, n_batches, shipped
+
+
+def _load_customers(conn, df: pl.DataFrame) -> tuple[int, int]:
     """Load customers with pgcrypto encryption on Phone and Email.
 
-    pgp_sym_encrypt() is called server-side; plaintext travels over TLS
-    (sslmode=require is set in ANALYTICS_DATABASE_URL).
+    Plaintext is COPYed into a session-temporary staging table (temp tables
+    are never WAL-logged), then one INSERT ... SELECT pgp_sym_encrypt()
+    encrypts set-based with the key bound once.  ON COMMIT DROP discards the
+    plaintext in the same transaction.  Plaintext travels over TLS
+    (sslmode=require is set in ANALYTICS_DATABASE_URL).  Returns (rows, CSV
+    bytes shipped).
     """
     schema_cols = [
         "CustomerID_Std",
@@ -186,36 +550,29 @@ def _load_customers(conn, df: pl.DataFrame) -> int:
     ]
     present = [c for c in schema_cols if c in df.columns]
     df = _prepare_df("customers", df.select(present))
+    df = df.with_columns([pl.col(c).cast(pl.String) for c in df.columns if c in _PII_COLUMNS])
 
-    # Build per-column SQL fragments; PII columns use pgp_sym_encrypt
     col_sql = ", ".join(f'"{c}"' for c in df.columns)
-    template_parts = [f"pgp_sym_encrypt(%s, %s)" if c in _PII_COLUMNS else "%s" for c in df.columns]
-    template = "(" + ", ".join(template_parts) + ")"
-
-    # For PII columns interleave (value, encryption_key) in the row tuple
-    rows = []
-    for row in df.rows(named=True):
-        values: list = []
-        for col in df.columns:
-            val = row[col]
-            if col in _PII_COLUMNS:
-                values.append(str(val) if val is not None else None)
-                values.append(ENCRYPTION_KEY)
-            else:
-                values.append(val)
-        rows.append(tuple(values))
+    # Staging columns take the target types, except PII which is plaintext
+    stage_sql = ", ".join(f'CAST(NULL AS TEXT) AS "{c}"' if c in _PII_COLUMNS else f'"{c}"' for c in df.columns)
+    select_sql = ", ".join(f'pgp_sym_encrypt("{c}", %(key)s)' if c in _PII_COLUMNS else f'"{c}"' for c in df.columns)
 
     with conn.cursor() as cur:
-        _truncate(cur, "customers")
-        psycopg2.extras.execute_values(
-            cur,
-            f"INSERT INTO analytics.customers ({col_sql}) VALUES %s",
-            rows,
-            template=template,
-            page_size=2000,
+        target_types = _target_types(cur, "customers")
+        cur.execute(
+            f"CREATE TEMP TABLE customers_plain ON COMMIT DROP AS SELECT {stage_sql} FROM customers WITH NO DATA"
         )
-    conn.commit()
-    return len(rows)
+        n_bytes = 0
+        for batch in df.iter_slices(COPY_BATCH_ROWS):
+            n_bytes += _copy_batch(cur, "pg_temp.customers_plain", _cast_for_copy(batch, target_types))[""]
+        cur.execute(
+            f"INSERT INTO customers ({col_sql}) SELECT {select_sql} FROM pg_temp.customers_plain",
+            {"key": ENCRYPTION_KEY},
+        )
+        n = cur.rowcount
+        # Plaintext gone now, not at the end of the (long) sync transaction
+        cur.execute("DROP TABLE pg_temp.customers_plain")
+    return n, n_bytes
 
 
 # =====================================================================
@@ -224,892 +581,877 @@ def _load_customers(conn, df: pl.DataFrame) -> int:
 
 
 def _load_order_lookup(conn) -> int:
-    """Truncate + fill order_lookup from the just-loaded sales table."""
+    """Fill order_lookup from the just-loaded sales table."""
     with conn.cursor() as cur:
-        cur.execute("TRUNCATE analytics.order_lookup")
         cur.execute("""
-            INSERT INTO analytics.order_lookup ("OrderID_Std", "IsSubscriptionService")
-            SELECT DISTINCT "OrderID_Std", "IsSubscriptionService"
-            FROM analytics.sales
+            INSERT INTO order_lookup ("OrderID_Std", "IsSubscriptionService", "MonthsSinceCohort")
+            SELECT DISTINCT "OrderID_Std", "IsSubscriptionService",
+                   MIN("MonthsSinceCohort") OVER (PARTITION BY "OrderID_Std")
+            FROM sales
             WHERE "OrderID_Std" IS NOT NULL
         """)
-        cur.execute("SELECT COUNT(*) FROM analytics.order_lookup")
+        cur.execute("SELECT COUNT(*) FROM order_lookup")
         n = cur.fetchone()[0]
-    conn.commit()
     return n
 
 
 # =====================================================================
 # INSIGHTS — ported from cleancloud_to_duckdb.py to Postgres SQL
 #
-# Key dialect changes:
+# Same period-aggregate queries as the DuckDB loader; the rules themselves
+# live in insights_engine.py.  Key dialect changes:
 #   strftime(CURRENT_DATE, '%Y-%m')  →  TO_CHAR(CURRENT_DATE, 'YYYY-MM')
 #   DATEDIFF('month', d1, d2) >= 3  →  d2 >= d1 + INTERVAL '3 months'
+#   QUALIFY                          →  ROW_NUMBER() in a subquery
 #   All column references quoted with double-quotes
-#   ? placeholders                   →  %s
+#
+# Both queries take the same since / lookback bounds as the DuckDB loader
+# (insights_engine.monthly_bounds / ALL_PERIODS), so a sync aggregates only
+# the periods from the first changed month on.
 # =====================================================================
 
+_MONTHLY_AGG_SQL = """
+    WITH months AS (
+        SELECT DISTINCT "YearMonth" FROM dim_period
+        WHERE "YearMonth" < TO_CHAR(CURRENT_DATE, 'YYYY-MM') AND "YearMonth" >= %(lookback)s
+    ),
+    s_agg AS (
+        SELECT p."YearMonth",
+               SUM(s."Total_Num") AS rev,
+               COUNT(DISTINCT CASE WHEN s."Transaction_Type" <> 'Invoice Payment' THEN s."CustomerID_Std" END) AS cust,
+               COUNT(DISTINCT CASE WHEN s."MonthsSinceCohort" = 0 THEN s."CustomerID_Std" END) AS new_cust,
+               COUNT(DISTINCT CASE WHEN s."MonthsSinceCohort" = 1 THEN s."CustomerID_Std" END) AS m1_cust,
+               SUM(CASE WHEN s."Transaction_Type" = 'Subscription' OR s."IsSubscriptionService" = TRUE
+                        THEN s."Total_Num" ELSE 0 END) AS sub_rev,
+               SUM(CAST(s."HasDelivery" AS INTEGER)) AS deliveries,
+               SUM(CAST(s."HasPickup" AS INTEGER)) AS pickups,
+               SUM(CASE WHEN s."HasDelivery" = TRUE THEN s."Total_Num" ELSE 0 END)
+                   / NULLIF(SUM(CAST(s."HasDelivery" AS INTEGER)), 0) AS rev_per_delivery,
+               SUM(CASE WHEN s."Route_Category" = 'Inside Abu Dhabi'
+                        THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER) ELSE 0 END)
+                   AS inside_stops,
+               SUM(CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)) AS stops,
+               SUM(CASE WHEN s."Payment_Type_Std" IN ('Stripe', 'Terminal') THEN s."Collections" ELSE 0 END)
+                   AS digital,
+               SUM(s."Collections") AS collections,
+               AVG(s."DaysToPayment") AS avg_days_payment,
+               SUM(CASE WHEN s."Paid" = FALSE AND s."Source" = 'CC_2025' THEN s."Total_Num" ELSE 0 END)
+                   AS outstanding,
+               AVG(s."Processing_Days") AS avg_processing
+        FROM sales s
+        JOIN dim_period p ON s."OrderCohortMonth" = p."Date"
+        WHERE s."Earned_Date" IS NOT NULL AND s."OrderCohortMonth" >= %(lookback_date)s
+        GROUP BY p."YearMonth"
+    ),
+    cust_rev AS (
+        SELECT p."YearMonth", s."CustomerID_Std", SUM(s."Total_Num") AS rev
+        FROM sales s
+        JOIN dim_period p ON s."OrderCohortMonth" = p."Date"
+        WHERE s."Earned_Date" IS NOT NULL AND s."OrderCohortMonth" >= %(lookback_date)s
+        GROUP BY p."YearMonth", s."CustomerID_Std"
+    ),
+    conc AS (
+        SELECT c."YearMonth", SUM(CASE WHEN c.rev >= t.p80 THEN c.rev ELSE 0 END) AS top20_rev
+        FROM cust_rev c
+        JOIN (
+            SELECT "YearMonth", PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY rev) AS p80
+            FROM cust_rev GROUP BY "YearMonth"
+        ) t ON t."YearMonth" = c."YearMonth"
+        GROUP BY c."YearMonth"
+    ),
+    monthly_active AS (
+        SELECT DISTINCT s."CustomerID_Std", s."OrderCohortMonth" AS month_date
+        FROM sales s
+        WHERE s."Earned_Date" IS NOT NULL AND s."Transaction_Type" <> 'Invoice Payment'
+    ),
+    with_lag AS (
+        SELECT "CustomerID_Std", month_date,
+               LAG(month_date) OVER (PARTITION BY "CustomerID_Std" ORDER BY month_date) AS prev_month
+        FROM monthly_active
+    ),
+    react AS (
+        SELECT p."YearMonth", COUNT(DISTINCT w."CustomerID_Std") AS reactivated
+        FROM with_lag w JOIN dim_period p ON w.month_date = p."Date"
+        WHERE w.prev_month IS NOT NULL AND w.month_date >= w.prev_month + INTERVAL '3 months'
+          AND w.month_date >= %(lookback_date)s
+        GROUP BY p."YearMonth"
+    ),
+    top_cat AS (
+        SELECT "YearMonth", name AS top_category, qty AS top_category_qty FROM (
+            SELECT p."YearMonth", CAST(i."Item_Category" AS VARCHAR) AS name, SUM(i."Quantity") AS qty,
+                   ROW_NUMBER() OVER (PARTITION BY p."YearMonth"
+                                      ORDER BY SUM(i."Quantity") DESC NULLS LAST, i."Item_Category") AS rn
+            FROM items i JOIN dim_period p ON i."ItemDate" = p."Date"
+            WHERE i."ItemDate" >= %(lookback_date)s
+            GROUP BY p."YearMonth", i."Item_Category"
+        ) ranked WHERE rn = 1
+    ),
+    top_svc AS (
+        SELECT "YearMonth", name AS top_service, qty AS top_service_qty FROM (
+            SELECT p."YearMonth", CAST(i."Service_Type" AS VARCHAR) AS name, SUM(i."Quantity") AS qty,
+                   ROW_NUMBER() OVER (PARTITION BY p."YearMonth"
+                                      ORDER BY SUM(i."Quantity") DESC NULLS LAST, i."Service_Type") AS rn
+            FROM items i JOIN dim_period p ON i."ItemDate" = p."Date"
+            WHERE i."ItemDate" >= %(lookback_date)s
+            GROUP BY p."YearMonth", i."Service_Type"
+        ) ranked WHERE rn = 1
+    ),
+    i_agg AS (
+        SELECT p."YearMonth",
+               SUM(i."Quantity") AS item_qty,
+               SUM(CASE WHEN i."Express" = TRUE THEN i."Quantity" ELSE 0 END) AS express_qty
+        FROM items i JOIN dim_period p ON i."ItemDate" = p."Date"
+        WHERE i."ItemDate" >= %(lookback_date)s
+        GROUP BY p."YearMonth"
+    ),
+    cq_agg AS (
+        SELECT p."YearMonth",
+               COUNT(DISTINCT CASE WHEN cq."Is_Multi_Service" = TRUE THEN cq."CustomerID_Std" END) AS multi_service,
+               COUNT(DISTINCT cq."CustomerID_Std") AS cq_total
+        FROM customer_quality cq
+        JOIN dim_period p ON cq."OrderCohortMonth" = p."Date"
+        WHERE cq."OrderCohortMonth" >= %(lookback_date)s
+        GROUP BY p."YearMonth"
+    ),
+    base AS (
+        SELECT m."YearMonth" AS period,
+               COALESCE(s.rev, 0) AS rev,
+               COALESCE(s.cust, 0) AS cust,
+               COALESCE(s.new_cust, 0) AS new_cust,
+               COALESCE(s.m1_cust, 0) AS m1_cust,
+               COALESCE(s.sub_rev, 0) AS sub_rev,
+               COALESCE(s.deliveries, 0) AS deliveries,
+               COALESCE(s.pickups, 0) AS pickups,
+               s.rev_per_delivery,
+               COALESCE(s.inside_stops, 0) AS inside_stops,
+               COALESCE(s.stops, 0) AS stops,
+               COALESCE(s.digital, 0) AS digital,
+               COALESCE(s.collections, 0) AS collections,
+               s.avg_days_payment,
+               COALESCE(s.outstanding, 0) AS outstanding,
+               s.avg_processing,
+               c.top20_rev,
+               COALESCE(r.reactivated, 0) AS reactivated,
+               tc."YearMonth" IS NOT NULL AS has_items,
+               tc.top_category, tc.top_category_qty,
+               ts.top_service, ts.top_service_qty,
+               COALESCE(ia.item_qty, 0) AS item_qty,
+               COALESCE(ia.express_qty, 0) AS express_qty,
+               COALESCE(q.multi_service, 0) AS multi_service,
+               COALESCE(q.cq_total, 0) AS cq_total
+        FROM months m
+        LEFT JOIN s_agg s    ON s."YearMonth" = m."YearMonth"
+        LEFT JOIN conc c     ON c."YearMonth" = m."YearMonth"
+        LEFT JOIN react r    ON r."YearMonth" = m."YearMonth"
+        LEFT JOIN top_cat tc ON tc."YearMonth" = m."YearMonth"
+        LEFT JOIN top_svc ts ON ts."YearMonth" = m."YearMonth"
+        LEFT JOIN i_agg ia   ON ia."YearMonth" = m."YearMonth"
+        LEFT JOIN cq_agg q   ON q."YearMonth" = m."YearMonth"
+    )
+    SELECT * FROM (
+        SELECT *,
+               LAG(period)           OVER w AS prior_period,
+               LAG(rev)              OVER w AS prev_rev,
+               LAG(cust)             OVER w AS prev_cust,
+               LAG(new_cust)         OVER w AS prev_new_cust,
+               LAG(sub_rev)          OVER w AS prev_sub_rev,
+               LAG(inside_stops)     OVER w AS prev_inside_stops,
+               LAG(stops)            OVER w AS prev_stops,
+               LAG(avg_days_payment) OVER w AS prev_avg_days_payment,
+               LAG(period, 12)       OVER w AS yoy_period,
+               LAG(rev, 12)          OVER w AS yoy_rev
+        FROM base
+        WINDOW w AS (ORDER BY period)
+    ) bounded
+    WHERE period >= %(since)s
+    ORDER BY period
+"""
 
-def _insert_insight(cur, period, rule_id, category, headline, detail, sentiment, granularity="monthly"):
-    cur.execute(
-        """INSERT INTO analytics.insights
-           (period, rule_id, category, headline, detail, sentiment, granularity)
-           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-        (period, rule_id, category, headline, detail, sentiment, granularity),
+_WEEKLY_AGG_SQL = """
+    WITH weeks AS (
+        SELECT DISTINCT "ISOWeekLabel" FROM dim_period
+        WHERE "IsCurrentISOWeek" = FALSE AND "Date" <= CURRENT_DATE AND "ISOWeekLabel" >= %(lookback)s
+    ),
+    s_agg AS (
+        SELECT p."ISOWeekLabel",
+               SUM(s."Total_Num") AS rev,
+               COUNT(DISTINCT s."CustomerID_Std") AS cust,
+               SUM(CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)) AS stops,
+               SUM(CAST(s."HasDelivery" AS INTEGER)) AS deliveries,
+               SUM(CAST(s."HasPickup" AS INTEGER)) AS pickups,
+               SUM(s."Collections") AS collections,
+               AVG(s."Processing_Days") AS avg_processing
+        FROM sales s
+        JOIN dim_period p ON s."Earned_Date" = p."Date"
+        WHERE s."Is_Earned" = TRUE AND p."IsCurrentISOWeek" = FALSE AND s."Earned_Date" >= %(lookback_date)s
+        GROUP BY p."ISOWeekLabel"
+    ),
+    trend AS (
+        SELECT "ISOWeekLabel", rev AS trend_rev,
+               AVG(rev) OVER (ORDER BY "ISOWeekLabel" ROWS BETWEEN 4 PRECEDING AND 1 PRECEDING) AS avg_4wk_rev
+        FROM s_agg
+    ),
+    i_agg AS (
+        SELECT p."ISOWeekLabel", SUM(i."Quantity") AS items
+        FROM items i JOIN dim_period p ON i."ItemDate" = p."Date"
+        WHERE i."ItemDate" >= %(lookback_date)s
+        GROUP BY p."ISOWeekLabel"
+    ),
+    base AS (
+        SELECT w."ISOWeekLabel" AS period,
+               COALESCE(s.rev, 0) AS rev,
+               COALESCE(s.cust, 0) AS cust,
+               COALESCE(s.stops, 0) AS stops,
+               COALESCE(s.deliveries, 0) AS deliveries,
+               COALESCE(s.pickups, 0) AS pickups,
+               COALESCE(s.collections, 0) AS collections,
+               s.avg_processing,
+               t.trend_rev, t.avg_4wk_rev,
+               COALESCE(i.items, 0) AS items
+        FROM weeks w
+        LEFT JOIN s_agg s ON s."ISOWeekLabel" = w."ISOWeekLabel"
+        LEFT JOIN trend t ON t."ISOWeekLabel" = w."ISOWeekLabel"
+        LEFT JOIN i_agg i ON i."ISOWeekLabel" = w."ISOWeekLabel"
     )
+    SELECT * FROM (
+        SELECT *,
+               LAG(period) OVER w AS prior_period,
+               LAG(rev)    OVER w AS prev_rev,
+               LAG(cust)   OVER w AS prev_cust,
+               LAG(stops)  OVER w AS prev_stops,
+               LAG(items)  OVER w AS prev_items
+        FROM base
+        WINDOW w AS (ORDER BY period)
+    ) bounded
+    WHERE period >= %(since)s
+    ORDER BY period
+"""
 
 
-def _create_insights(conn) -> int:
-    """Build rules-based insights for the most recent period.
+def _fetch_period_aggregates(cur, sql: str, bounds: dict) -> list[dict]:
+    """Run a period-aggregate query over ``bounds`` (since / lookback) and return one dict per period."""
+    cur.execute(sql, bounds)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
 
-    Truncates the insights table then regenerates all monthly + weekly rules.
-    Returns the total number of insight rows inserted.
-    """
-    with conn.cursor() as cur:
-        cur.execute("TRUNCATE analytics.insights")
 
-        # Current and prior month
+def _closed_periods(cur, granularity: str) -> list[str]:
+    """Every period the aggregate query would return for ``granularity``, ascending."""
+    if granularity == "monthly":
         cur.execute("""
-            SELECT MAX("YearMonth") FROM analytics.dim_period
-            WHERE "YearMonth" < TO_CHAR(CURRENT_DATE, 'YYYY-MM')
+            SELECT DISTINCT "YearMonth" FROM dim_period WHERE "YearMonth" < TO_CHAR(CURRENT_DATE, 'YYYY-MM')
         """)
-        row = cur.fetchone()
-        if not row or not row[0]:
-            logger.info("  [SKIP] No dim_period data — skipping insights")
-            conn.commit()
-            return 0
-        current_period = row[0]
-
-        cur.execute(
-            """
-            SELECT "YearMonth" FROM analytics.dim_period
-            WHERE "YearMonth" < %s
-            ORDER BY "YearMonth" DESC LIMIT 1
-        """,
-            (current_period,),
-        )
-        row = cur.fetchone()
-        prior_period = row[0] if row else None
-
-        yoy_period = f"{int(current_period[:4]) - 1}{current_period[4:]}"
+    else:
+        cur.execute("""
+            SELECT DISTINCT "ISOWeekLabel" FROM dim_period
+            WHERE "IsCurrentISOWeek" = FALSE AND "Date" <= CURRENT_DATE
+        """)
+    return sorted(r[0] for r in cur.fetchall() if r[0] is not None)
 
-        count = 0
 
-        # REV_MOM
-        if prior_period:
-            cur.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, prior_period, current_period, prior_period),
-            )
-            r = cur.fetchone()
-            if r and r[1] and r[1] > 0:
-                pct = (r[0] - r[1]) / r[1] * 100
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "REV_MOM",
-                    "revenue",
-                    f"Revenue {pct:+.0f}% vs last month",
-                    f"Dhs {r[0]:,.0f} this month vs Dhs {r[1]:,.0f} last month",
-                    "positive" if pct > 0 else "negative",
-                )
-                count += 1
-
-        # REV_YOY
-        cur.execute(
-            """
-            SELECT
-                SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END),
-                SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END)
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL
-              AND p."YearMonth" IN (%s, %s)
+def _weekly_bounds(cur, since: str) -> dict:
+    """Bounds for weeks from ``since``: aggregates from the 4th revenue week before it (the trend window)."""
+    cur.execute(
+        """
+        SELECT DISTINCT p."ISOWeekLabel" FROM sales s JOIN dim_period p ON s."Earned_Date" = p."Date"
+        WHERE s."Is_Earned" = TRUE AND p."IsCurrentISOWeek" = FALSE AND p."ISOWeekLabel" < %(since)s
+          AND s."Earned_Date" >= (SELECT MIN("Date") FROM dim_period WHERE "ISOWeekLabel" = %(since)s)
+                                 - INTERVAL '12 weeks'
+        ORDER BY 1 DESC LIMIT 4
         """,
-            (current_period, yoy_period, current_period, yoy_period),
-        )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sent = "positive" if pct > 2 else ("negative" if pct < -2 else "neutral")
-            _insert_insight(
-                cur,
-                current_period,
-                "REV_YOY",
-                "revenue",
-                f"Revenue {pct:+.0f}% vs same month last year",
-                f"Dhs {r[0]:,.0f} this month vs Dhs {r[1]:,.0f} in {yoy_period}",
-                sent,
-            )
-            count += 1
-
-        # CUST_MOM
-        if prior_period:
+        {"since": since},
+    )
+    weeks = [r[0] for r in cur.fetchall()]
+    if len(weeks) < 4:  # gap in trading (or the start of history): aggregate everything before
+        return {**ALL_PERIODS, "since": since}
+    cur.execute('SELECT MIN("Date") FROM dim_period WHERE "ISOWeekLabel" = %s', (weeks[-1],))
+    return {"since": since, "lookback": weeks[-1], "lookback_date": cur.fetchone()[0]}
+
+
+def _changed_since(
+    cur, changed: dict[str, list[str] | None], known: dict[str, dict], closed: dict[str, list[str]]
+) -> dict[str, str | None]:
+    """First period per granularity whose aggregate this sync can have changed (None: none, "": all).
+
+    ``changed`` holds each fact table's shipped or removed months (None when
+    the table was shipped in full).  Monthly aggregates group by the
+    partition column, so the earliest changed month bounds them; weekly sales
+    group by Earned_Date, read from the changed sales months both in the live
+    schema (before) and the shadow schema (after).  Periods without a stored
+    fingerprint count as changed, and a period's rules only read earlier
+    periods, so every later one is refreshed.
+    """
+    if any(changed.get(table, []) is None for table in PARTITION_COLUMNS):
+        return {"monthly": "", "weekly": ""}
+    months = sorted(m for table in PARTITION_COLUMNS for m in changed.get(table, []) if m)
+    days = []
+    if changed.get("sales"):
+        for table in ("sales", f"{LIVE_SCHEMA}.sales"):
             cur.execute(
-                """
-                SELECT
-                    COUNT(DISTINCT CASE WHEN p."YearMonth" = %s THEN s."CustomerID_Std" END),
-                    COUNT(DISTINCT CASE WHEN p."YearMonth" = %s THEN s."CustomerID_Std" END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND s."Transaction_Type" <> 'Invoice Payment'
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, prior_period, current_period, prior_period),
+                f'SELECT MIN("Earned_Date") FROM {table} WHERE {_month_sql("sales")} = ANY(%s)', (changed["sales"],)
             )
-            r = cur.fetchone()
-            if r and r[1] and r[1] > 0:
-                pct = (r[0] - r[1]) / r[1] * 100
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "CUST_MOM",
-                    "customers",
-                    f"Active customers {pct:+.0f}% vs last month",
-                    f"{r[0]:,} active this month vs {r[1]:,} last month",
-                    "positive" if pct > 0 else "negative",
-                )
-                count += 1
-
-        # NEW_CUST
+            days.append(cur.fetchone()[0])
+    days += [date(int(m[:4]), int(m[5:7]), 1) for m in changed.get("items", []) if m]
+    days = [d for d in days if d is not None]
+    first_week = None
+    if days:
+        cur.execute('SELECT MIN("ISOWeekLabel") FROM dim_period WHERE "Date" >= %s', (min(days),))
+        first_week = cur.fetchone()[0]
+
+    since = {}
+    for granularity, first in (("monthly", months[0] if months else None), ("weekly", first_week)):
+        new = [p for p in closed[granularity] if p not in known[granularity]]
+        candidates = [p for p in (first, new[0] if new else None) if p]
+        since[granularity] = min(candidates) if candidates else None
+    return since
+
+
+def _refresh_insights(
+    cur, granularity: str, rows: list[dict], known: dict[str, str], first: str | None, closed: list[str]
+) -> tuple[int, int]:
+    """Replace insights only for periods whose aggregate fingerprint changed.
+
+    ``rows`` cover the periods from ``first`` on (None: no period was
+    aggregated); the carried-over rows of earlier periods are kept as they
+    are.  Returns (periods recomputed, periods reused).
+    """
+    changed, unchanged, fingerprints = diff_periods(rows, known)
+
+    # Changed periods, aggregated periods that have no row any more, and periods that dropped out of dim_period
+    open_periods = set(closed)
+    stale = [r["period"] for r in changed] + [
+        p
+        for p in known
+        if p not in fingerprints and ((first is not None and p >= first) or p not in open_periods)
+    ]
+    if stale:
         cur.execute(
-            """
-            SELECT COUNT(DISTINCT s."CustomerID_Std")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND s."MonthsSinceCohort" = 0
-              AND p."YearMonth" = %s
-        """,
-            (current_period,),
+            "DELETE FROM insights WHERE granularity = %s AND period = ANY(%s)",
+            (granularity, stale),
         )
-        new_c = cur.fetchone()[0] or 0
         cur.execute(
-            """
-            SELECT COUNT(DISTINCT s."CustomerID_Std")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL
-              AND s."Transaction_Type" <> 'Invoice Payment'
-              AND p."YearMonth" = %s
-        """,
-            (current_period,),
+            "DELETE FROM insight_fingerprints WHERE granularity = %s AND period = ANY(%s)",
+            (granularity, stale),
         )
-        tot = cur.fetchone()[0] or 0
-        if new_c and tot and tot > 0:
-            pct_share = new_c / tot * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "NEW_CUST",
-                "customers",
-                f"{new_c:,} new customers ({pct_share:.0f}% of active)",
-                f"First-time customers in {current_period}",
-                "positive" if pct_share >= 10 else "neutral",
-            )
-            count += 1
 
-        # M1_RETENTION
-        if prior_period:
+    new_rows = build_insight_rows(changed, granularity)
+    if new_rows:
+        psycopg2.extras.execute_values(
+            cur,
+            f"INSERT INTO insights ({', '.join(INSIGHT_COLUMNS)}) VALUES %s",
+            new_rows,
+            page_size=2000,
+        )
+    if changed:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO insight_fingerprints (period, granularity, fingerprint) VALUES %s",
+            [(r["period"], granularity, fingerprints[r["period"]]) for r in changed],
+            page_size=2000,
+        )
+    carried = sum(1 for p in known if p in open_periods and p not in fingerprints and (first is None or p < first))
+    return len(changed), len(unchanged) + carried
+
+
+def _create_insights(conn, changed: dict[str, list[str] | None] | None = None) -> int:
+    """Build rules-based insights for every closed month and completed ISO week.
+
+    Only periods whose aggregate fingerprint changed since the last sync are
+    deleted and re-inserted (requires migration 002).  With ``changed`` (the
+    months each fact table shipped or removed this sync, see _load_table)
+    only the periods from the first one those months can affect are
+    aggregated.  Returns the total number of insight rows in the table.
+    """
+    with conn.cursor() as cur:
+        closed = {g: _closed_periods(cur, g) for g in ("monthly", "weekly")}
+        if not closed["monthly"]:
+            logger.info("  [SKIP] No dim_period data — skipping insights")
+            return 0
+        known = {}
+        for granularity in ("monthly", "weekly"):
             cur.execute(
-                """
-                SELECT
-                    COUNT(DISTINCT CASE WHEN p."YearMonth" = %s AND s."MonthsSinceCohort" = 1
-                                        THEN s."CustomerID_Std" END),
-                    COUNT(DISTINCT CASE WHEN p."YearMonth" = %s AND s."MonthsSinceCohort" = 0
-                                        THEN s."CustomerID_Std" END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, prior_period, current_period, prior_period),
+                "SELECT period, fingerprint FROM insight_fingerprints WHERE granularity = %s",
+                (granularity,),
             )
-            r = cur.fetchone()
-            if r and r[1] and r[1] > 0:
-                ret = r[0] / r[1] * 100
-                sent = "positive" if ret >= 50 else ("negative" if ret < 30 else "neutral")
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "M1_RETENTION",
-                    "customers",
-                    f"M1 retention: {ret:.0f}%",
-                    f"{r[0]:,} of {r[1]:,} prior new customers returned",
-                    sent,
-                )
-                count += 1
-
-        # REACTIVATIONS  (DATEDIFF → AGE interval)
-        cur.execute(f"""
-            WITH monthly_active AS (
-                SELECT DISTINCT s."CustomerID_Std",
-                       s."OrderCohortMonth" AS month_date
-                FROM analytics.sales s
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND s."Transaction_Type" <> 'Invoice Payment'
-            ),
-            with_lag AS (
-                SELECT "CustomerID_Std", month_date,
-                       LAG(month_date) OVER (PARTITION BY "CustomerID_Std"
-                                             ORDER BY month_date) AS prev_month
-                FROM monthly_active
-            ),
-            reactivated AS (
-                SELECT "CustomerID_Std", month_date
-                FROM with_lag
-                WHERE prev_month IS NOT NULL
-                  AND month_date >= prev_month + INTERVAL '3 months'
+            known[granularity] = dict(cur.fetchall())
+        since = {"monthly": "", "weekly": ""}
+        if changed is not None:
+            since = _changed_since(cur, changed, known, closed)
+
+        for granularity, sql in (("monthly", _MONTHLY_AGG_SQL), ("weekly", _WEEKLY_AGG_SQL)):
+            first = since[granularity]
+            if first is None:
+                rows = []
+            elif not first:
+                rows = _fetch_period_aggregates(cur, sql, ALL_PERIODS)
+            else:
+                bounds = monthly_bounds(first) if granularity == "monthly" else _weekly_bounds(cur, first)
+                rows = _fetch_period_aggregates(cur, sql, bounds)
+            recomputed, reused = _refresh_insights(
+                cur, granularity, rows, known[granularity], first, closed[granularity]
             )
-            SELECT COUNT(DISTINCT r."CustomerID_Std")
-            FROM reactivated r
-            JOIN analytics.dim_period p ON r.month_date = p."Date"
-            WHERE p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[0] and r[0] > 0:
-            _insert_insight(
-                cur,
-                current_period,
-                "REACTIVATIONS",
-                "customers",
-                f"{r[0]:,} customers reactivated after 3+ month gap",
-                f"Customers returning after dormancy in {current_period}",
-                "positive",
+            logger.info(
+                f"  [OK] {granularity} insights: {len(rows)} periods aggregated, "
+                f"{recomputed} recomputed, {reused} reused"
             )
-            count += 1
 
-        # SUB_SHARE
-        if prior_period:
-            cur.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN p."YearMonth" = %s
-                              AND (s."Transaction_Type" = 'Subscription'
-                                   OR s."IsSubscriptionService" = TRUE)
-                             THEN s."Total_Num" ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s
-                              AND (s."Transaction_Type" = 'Subscription'
-                                   OR s."IsSubscriptionService" = TRUE)
-                             THEN s."Total_Num" ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s THEN s."Total_Num" ELSE 0 END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, current_period, prior_period, prior_period, current_period, prior_period),
-            )
-            r = cur.fetchone()
-            if r and r[1] and r[1] > 0 and r[3] and r[3] > 0:
-                sc = r[0] / r[1] * 100
-                sp = r[2] / r[3] * 100
-                diff = sc - sp
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "SUB_SHARE",
-                    "revenue",
-                    f"Subscription revenue at {sc:.0f}% of total ({diff:+.0f}pp vs last month)",
-                    f"Dhs {r[0]:,.0f} subscription of Dhs {r[1]:,.0f} total revenue",
-                    "positive" if diff > 0 else ("negative" if diff < -2 else "neutral"),
-                )
-                count += 1
-
-        # MULTI_SERVICE
-        cur.execute(
-            """
-            SELECT COUNT(DISTINCT CASE WHEN cq."Is_Multi_Service" = TRUE
-                                        THEN cq."CustomerID_Std" END),
-                   COUNT(DISTINCT cq."CustomerID_Std")
-            FROM analytics.customer_quality cq
-            JOIN analytics.dim_period p ON cq."OrderCohortMonth" = p."Date"
-            WHERE p."YearMonth" = %s
+        cur.execute("SELECT COUNT(*) FROM insights")
+        total = cur.fetchone()[0]
+    return total
+
+
+# =====================================================================
+# PERIOD-MEASURE VIEWS — pre-aggregated dashboard measures
+#
+# The dashboard's period cube (fetch_period_cube in dashboard_shared.py,
+# which the batch measure fetchers project from) groups sales and items by
+# one period.  These materialized views hold the same aggregates per period,
+# per grain, so on Postgres the cube reads a few rows instead of re-running
+# COUNT(DISTINCT) / SUM(CASE ...) over the fact tables.  Rows are at the
+# cube's own grouping, so distinct counts are exact; items rows are split by
+# category / service / subscription flag / cohort age and summed by the
+# reader.  Each view has a unique index on its key, which
+# REFRESH MATERIALIZED VIEW CONCURRENTLY requires.  period_items reads each
+# order's cohort age from order_lookup (migration 007), like the raw cube.
+# =====================================================================
+
+_PERIOD_VIEWS = {
+    "period_sales": (
+        """
+        SELECT s."{period}" AS period,
+               COUNT(DISTINCT CASE WHEN s."Transaction_Type" <> 'Invoice Payment'
+                                   THEN s."CustomerID_Std" END) AS customers,
+               COUNT(DISTINCT CASE WHEN s."Transaction_Type" = 'Subscription'
+                                   THEN s."CustomerID_Std" END) AS subscribers,
+               COUNT(DISTINCT CASE WHEN s."Transaction_Type" <> 'Invoice Payment' AND s."MonthsSinceCohort" = 0
+                                   THEN s."CustomerID_Std" END) AS new_customers,
+               COALESCE(SUM(s."Total_Num"), 0) AS rev_total,
+               COALESCE(SUM(CASE WHEN s."Transaction_Type" = 'Order' AND s."IsSubscriptionService" = FALSE
+                                 THEN s."Total_Num" END), 0) AS rev_client,
+               COALESCE(SUM(CASE WHEN s."Transaction_Type" = 'Subscription' THEN s."Total_Num"
+                                 WHEN s."Transaction_Type" = 'Order' AND s."IsSubscriptionService" = TRUE
+                                 THEN s."Total_Num" END), 0) AS rev_sub,
+               COALESCE(SUM(CASE WHEN s."MonthsSinceCohort" = 0 THEN s."Total_Num" END), 0) AS rev_new,
+               COALESCE(SUM(CASE WHEN s."MonthsSinceCohort" > 0 THEN s."Total_Num" END), 0) AS rev_existing,
+               COALESCE(SUM(s."HasDelivery"::INT), 0) AS deliveries,
+               COALESCE(SUM(s."HasPickup"::INT), 0) AS pickups,
+               SUM(CASE WHEN s."HasDelivery" THEN s."Pieces" ELSE 0 END) AS items_delivered,
+               SUM(CASE WHEN s."HasDelivery" THEN s."Total_Num" ELSE 0 END) AS delivery_revenue,
+               SUM(s."Collections") AS total_collections,
+               SUM(CASE WHEN s."Payment_Type_Std" = 'Stripe' THEN s."Collections" ELSE 0 END) AS stripe,
+               SUM(CASE WHEN s."Payment_Type_Std" = 'Terminal' THEN s."Collections" ELSE 0 END) AS terminal,
+               SUM(CASE WHEN s."Payment_Type_Std" = 'Cash' THEN s."Collections" ELSE 0 END) AS cash,
+               AVG(s."DaysToPayment") AS avg_days_to_payment,
+               AVG(s."Processing_Days") AS avg_processing_time,
+               AVG(s."TimeInStore_Days") AS avg_time_in_store
+        FROM sales s
+        WHERE s."Earned_Date" IS NOT NULL AND s."{period}" IS NOT NULL
+        GROUP BY s."{period}"
         """,
-            (current_period,),
-        )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = r[0] / r[1] * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "MULTI_SERVICE",
-                "customers",
-                f"{pct:.0f}% of customers use multiple services",
-                f"{r[0]:,} of {r[1]:,} customers in {current_period}",
-                "positive" if pct >= 20 else "neutral",
-            )
-            count += 1
-
-        # CONCENTRATION
-        cur.execute(f"""
-            WITH cust_rev AS (
-                SELECT s."CustomerID_Std", SUM(s."Total_Num") AS rev
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-                GROUP BY s."CustomerID_Std"
-            ),
-            threshold AS (
-                SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY rev) AS p80
-                FROM cust_rev
-            )
-            SELECT SUM(CASE WHEN rev >= t.p80 THEN rev ELSE 0 END),
-                   SUM(rev)
-            FROM cust_rev, threshold t
-        """)
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            share = r[0] / r[1] * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "CONCENTRATION",
-                "revenue",
-                f"Top 20% of customers generate {share:.0f}% of revenue",
-                f"Dhs {r[0]:,.0f} of Dhs {r[1]:,.0f} total in {current_period}",
-                "negative" if share > 85 else "neutral",
-            )
-            count += 1
-
-        # TOP_CATEGORY
-        cur.execute(f"""
-            SELECT i."Item_Category", SUM(i."Quantity") AS qty
-            FROM analytics.items i
-            JOIN analytics.dim_period p ON i."ItemDate" = p."Date"
-            WHERE p."YearMonth" = '{current_period}'
-            GROUP BY i."Item_Category" ORDER BY qty DESC LIMIT 1
-        """)
-        r = cur.fetchone()
-        if r:
-            _insert_insight(
-                cur,
-                current_period,
-                "TOP_CATEGORY",
-                "operations",
-                f"Top category: {r[0]} ({r[1]:,} items)",
-                f"Highest volume item category in {current_period}",
-                "neutral",
-            )
-            count += 1
-
-        # TOP_SERVICE
-        cur.execute(f"""
-            SELECT i."Service_Type", SUM(i."Quantity") AS qty
-            FROM analytics.items i
-            JOIN analytics.dim_period p ON i."ItemDate" = p."Date"
-            WHERE p."YearMonth" = '{current_period}'
-            GROUP BY i."Service_Type" ORDER BY qty DESC LIMIT 1
-        """)
-        r = cur.fetchone()
-        if r:
-            _insert_insight(
-                cur,
-                current_period,
-                "TOP_SERVICE",
-                "operations",
-                f"Top service: {r[0]} ({r[1]:,} items)",
-                f"Highest volume service type in {current_period}",
-                "neutral",
-            )
-            count += 1
-
-        # EXPRESS_SHARE
-        cur.execute(f"""
-            SELECT SUM(CASE WHEN i."Express" = TRUE THEN i."Quantity" ELSE 0 END),
-                   SUM(i."Quantity")
-            FROM analytics.items i
-            JOIN analytics.dim_period p ON i."ItemDate" = p."Date"
-            WHERE p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = r[0] / r[1] * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "EXPRESS_SHARE",
-                "operations",
-                f"Express orders: {pct:.0f}% of items",
-                f"{r[0]:,} express of {r[1]:,} total items in {current_period}",
-                "positive" if pct >= 20 else "neutral",
-            )
-            count += 1
-
-        # DELIVERY_RATE
-        cur.execute(f"""
-            SELECT SUM(CAST(s."HasDelivery" AS INTEGER)),
-                   SUM(CAST(s."HasPickup" AS INTEGER))
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[0] is not None and r[1] is not None and (r[0] + r[1]) > 0:
-            rate = r[0] / (r[0] + r[1]) * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "DELIVERY_RATE",
-                "operations",
-                f"Delivery rate: {rate:.0f}% ({r[0]:,} deliveries, {r[1]:,} pickups)",
-                f"Total stops: {r[0] + r[1]:,} in {current_period}",
-                "neutral",
-            )
-            count += 1
-
-        # REV_PER_DELIVERY
-        cur.execute(f"""
-            SELECT SUM(CASE WHEN s."HasDelivery" = TRUE THEN s."Total_Num" ELSE 0 END)
-                       / NULLIF(SUM(CAST(s."HasDelivery" AS INTEGER)), 0)
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[0] is not None:
-            _insert_insight(
-                cur,
-                current_period,
-                "REV_PER_DELIVERY",
-                "operations",
-                f"Revenue per delivery: Dhs {r[0]:,.0f}",
-                f"Average revenue generated per delivery stop in {current_period}",
-                "positive" if r[0] >= 100 else "neutral",
-            )
-            count += 1
+        ("period",),
+    ),
+    "period_routes": (
+        """
+        SELECT s."{period}" AS period, s."Route_Category",
+               COUNT(DISTINCT s."CustomerID_Std") AS customers,
+               SUM(CASE WHEN s."HasDelivery" THEN s."Pieces" ELSE 0 END) AS items,
+               SUM(s."HasDelivery"::INT) + SUM(s."HasPickup"::INT) AS stops,
+               SUM(s."Total_Num") AS revenue
+        FROM sales s
+        WHERE s."Earned_Date" IS NOT NULL AND s."{period}" IS NOT NULL
+          AND s."Route_Category" IN ('Inside Abu Dhabi', 'Outer Abu Dhabi')
+        GROUP BY s."{period}", s."Route_Category"
+        """,
+        ("period", "Route_Category"),
+    ),
+    "period_items": (
+        """
+        SELECT i."{period}" AS period, i."Item_Category", i."Service_Type",
+               COALESCE(ol."IsSubscriptionService", FALSE) AS iss,
+               CASE WHEN ol."MonthsSinceCohort" = 0 THEN 'new'
+                    WHEN COALESCE(ol."MonthsSinceCohort", 1) > 0 THEN 'existing'
+                    ELSE 'other' END AS age,
+               SUM(i."Quantity") AS items,
+               SUM(i."Total") AS revenue,
+               SUM(CASE WHEN i."Express" = TRUE THEN i."Quantity" ELSE 0 END) AS express_items
+        FROM items i
+        LEFT JOIN order_lookup ol ON i."OrderID_Std" = ol."OrderID_Std"
+        WHERE i."{period}" IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+        ("period", "Item_Category", "Service_Type", "iss", "age"),
+    ),
+}
 
-        # GEO_SHIFT
-        if prior_period:
-            cur.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN p."YearMonth" = %s AND s."Route_Category" = 'Inside Abu Dhabi'
-                             THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                             ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s
-                             THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                             ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s AND s."Route_Category" = 'Inside Abu Dhabi'
-                             THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                             ELSE 0 END),
-                    SUM(CASE WHEN p."YearMonth" = %s
-                             THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                             ELSE 0 END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, current_period, prior_period, prior_period, current_period, prior_period),
-            )
-            r = cur.fetchone()
-            if r and r[1] and r[1] > 0 and r[3] and r[3] > 0:
-                pc = r[0] / r[1] * 100
-                pp = r[2] / r[3] * 100
-                diff = pc - pp
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "GEO_SHIFT",
-                    "operations",
-                    f"Inside Abu Dhabi stops: {pc:.0f}% ({diff:+.0f}pp vs last month)",
-                    f"{r[0]:,} inside stops of {r[1]:,} total in {current_period}",
-                    "neutral",
-                )
-                count += 1
-
-        # DIGITAL_PAYMENT
-        cur.execute(f"""
-            SELECT SUM(CASE WHEN s."Payment_Type_Std" IN ('Stripe', 'Terminal')
-                            THEN s."Collections" ELSE 0 END),
-                   SUM(s."Collections")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = r[0] / r[1] * 100
-            _insert_insight(
-                cur,
-                current_period,
-                "DIGITAL_PAYMENT",
-                "payments",
-                f"Digital payments: {pct:.0f}% of collections",
-                f"Dhs {r[0]:,.0f} stripe+terminal of Dhs {r[1]:,.0f} total",
-                "positive" if pct >= 70 else "neutral",
-            )
-            count += 1
-
-        # COLLECTION_RATE
-        cur.execute(f"""
-            SELECT SUM(s."Collections"), SUM(s."Total_Num")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            rate = r[0] / r[1] * 100
-            sent = "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral")
-            _insert_insight(
-                cur,
-                current_period,
-                "COLLECTION_RATE",
-                "payments",
-                f"Collection rate: {rate:.0f}% of revenue collected",
-                f"Dhs {r[0]:,.0f} collected of Dhs {r[1]:,.0f} earned",
-                sent,
-            )
-            count += 1
 
-        # AVG_DAYS_PAYMENT
-        if prior_period:
-            cur.execute(
-                """
-                SELECT
-                    AVG(CASE WHEN p."YearMonth" = %s THEN s."DaysToPayment" END),
-                    AVG(CASE WHEN p."YearMonth" = %s THEN s."DaysToPayment" END)
-                FROM analytics.sales s
-                JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-                WHERE s."Earned_Date" IS NOT NULL AND s."DaysToPayment" IS NOT NULL
-                  AND p."YearMonth" IN (%s, %s)
-            """,
-                (current_period, prior_period, current_period, prior_period),
-            )
-            r = cur.fetchone()
-            if r and r[0] is not None and r[1] is not None and r[1] > 0:
-                diff = r[0] - r[1]
-                sent = "positive" if diff < 0 else ("negative" if diff > 1 else "neutral")
-                _insert_insight(
-                    cur,
-                    current_period,
-                    "AVG_DAYS_PAYMENT",
-                    "payments",
-                    f"Avg days to payment: {r[0]:.1f} days ({diff:+.1f} vs last month)",
-                    f"Average collection cycle in {current_period}",
-                    sent,
-                )
-                count += 1
-
-        # OUTSTANDING_PCT
-        cur.execute(f"""
-            SELECT SUM(CASE WHEN s."Paid" = FALSE AND s."Source" = 'CC_2025'
-                            THEN s."Total_Num" ELSE 0 END),
-                   SUM(s."Total_Num")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0 and r[0] is not None:
-            pct = r[0] / r[1] * 100
-            sent = "negative" if pct > 10 else ("neutral" if pct > 5 else "positive")
-            _insert_insight(
-                cur,
-                current_period,
-                "OUTSTANDING_PCT",
-                "payments",
-                f"Outstanding: {pct:.0f}% of revenue (Dhs {r[0]:,.0f})",
-                f"Unpaid CC_2025 orders in {current_period}",
-                sent,
-            )
-            count += 1
-
-        # PROCESSING_TIME
-        cur.execute(f"""
-            SELECT AVG(s."Processing_Days")
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."OrderCohortMonth" = p."Date"
-            WHERE s."Earned_Date" IS NOT NULL AND s."Processing_Days" IS NOT NULL
-              AND p."YearMonth" = '{current_period}'
-        """)
-        r = cur.fetchone()
-        if r and r[0] is not None:
-            sent = "negative" if r[0] > 3.0 else "positive"
-            _insert_insight(
-                cur,
-                current_period,
-                "PROCESSING_TIME",
-                "operations",
-                f"Avg processing time: {r[0]:.1f} days" + ("  - above target" if r[0] > 3.0 else ""),
-                f"Average order processing cycle in {current_period}",
-                sent,
-            )
-            count += 1
+def _period_view_names() -> list[str]:
+    """Names of the materialized period-measure views, one per view and grain."""
+    return [f"{view}_{grain}" for view in _PERIOD_VIEWS for grain in PERIOD_GRAINS]
 
-        logger.info(f"  [OK] {count} monthly insights for {current_period}")
-        count += _create_weekly_insights(cur)
 
-    conn.commit()
-    return count
+def _create_period_views(conn) -> int:
+    """Materialize the period-measure views over the loaded tables of the connection's schema.
 
+    Runs inside the shadow build, so the views swap in together with the
+    tables they summarize.  Returns the total number of view rows.
+    """
+    total = 0
+    with conn.cursor() as cur:
+        for view, (sql, key) in _PERIOD_VIEWS.items():
+            for grain, period in PERIOD_GRAINS.items():
+                name = f"{view}_{grain}"
+                cur.execute(f"CREATE MATERIALIZED VIEW {name} AS {sql.format(period=period)}")
+                total += cur.rowcount
+                columns = ", ".join(f'"{c}"' for c in key)
+                cur.execute(f"CREATE UNIQUE INDEX {name}_key ON {name} ({columns})")
+    return total
+
+
+def _refresh_period_views() -> list[str]:
+    """REFRESH MATERIALIZED VIEW CONCURRENTLY every live period-measure view.
+
+    A sync rebuilds the views with their tables (see main), so this is only
+    needed after editing the live tables in place.  Readers keep querying the
+    old contents until each refresh commits; data_version is bumped after the
+    last one.  Returns the views refreshed.
+    """
+    conn = _connect(LIVE_SCHEMA)
+    refreshed = []
+    try:
+        for name in _period_view_names():
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{LIVE_SCHEMA}.{name}",))
+                if not cur.fetchone()[0]:
+                    continue
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {LIVE_SCHEMA}.{name}")
+            conn.commit()
+            refreshed.append(name)
+        if refreshed:
+            with conn.cursor() as cur:
+                _bump_data_version(cur)
+            conn.commit()
+    finally:
+        conn.close()
+    return refreshed
 
-def _create_weekly_insights(cur) -> int:
-    """Generate WoW insight rules for the last completed ISO week."""
-    cur.execute("""
-        SELECT "ISOWeekLabel" FROM analytics.dim_period
-        WHERE "IsCurrentISOWeek" = FALSE AND "Date" <= CURRENT_DATE
-        ORDER BY "ISOWeekLabel" DESC LIMIT 1
-    """)
-    row = cur.fetchone()
-    if not row:
-        logger.info("  [SKIP] No completed ISO weeks — skipping weekly insights")
-        return 0
-    cur_week = row[0]
 
-    cur.execute(
-        """
-        SELECT "ISOWeekLabel" FROM analytics.dim_period
-        WHERE "IsCurrentISOWeek" = FALSE AND "ISOWeekLabel" < %s
-        ORDER BY "ISOWeekLabel" DESC LIMIT 1
-    """,
-        (cur_week,),
-    )
-    row = cur.fetchone()
-    prior_week = row[0] if row else None
+# =====================================================================
+# SHADOW SCHEMA — build in analytics_next, then swap
+#
+# The empty shadow tables are committed first; each base table is then
+# loaded and indexed in its own transaction on a pooled connection (see
+# _load_base_tables), and the derived tables, insights and ANALYZE follow in
+# one more.  Readers of the live schema are never blocked, and a failed sync
+# drops the shadow schema.  The swap is a final short transaction that only
+# renames schemas and moves the objects the sync does not rebuild; no live
+# table is locked.
+# =====================================================================
 
-    count = 0
 
-    # WRev_WOW
-    if prior_week:
-        cur.execute(
-            """
-            SELECT
-                SUM(CASE WHEN p."ISOWeekLabel" = %s THEN s."Total_Num" ELSE 0 END),
-                SUM(CASE WHEN p."ISOWeekLabel" = %s THEN s."Total_Num" ELSE 0 END)
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-            WHERE s."Is_Earned" = TRUE
-              AND p."ISOWeekLabel" IN (%s, %s)
-        """,
-            (cur_week, prior_week, cur_week, prior_week),
-        )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            sent = "positive" if pct > 2 else ("negative" if pct < -2 else "neutral")
-            _insert_insight(
-                cur,
-                cur_week,
-                "WRev_WOW",
-                "revenue",
-                f"Revenue {pct:+.0f}% vs last week",
-                f"Dhs {r[0]:,.0f} this week vs Dhs {r[1]:,.0f} last week",
-                sent,
-                "weekly",
-            )
-            count += 1
-
-    # WRev_TREND (vs 4-week avg)
-    cur.execute(f"""
-        WITH wk AS (
-            SELECT p."ISOWeekLabel", SUM(s."Total_Num") AS rev
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-            WHERE s."Is_Earned" = TRUE AND p."IsCurrentISOWeek" = FALSE
-            GROUP BY p."ISOWeekLabel"
-            ORDER BY p."ISOWeekLabel" DESC LIMIT 5
-        )
-        SELECT
-            MAX(CASE WHEN "ISOWeekLabel" = '{cur_week}' THEN rev END),
-            AVG(CASE WHEN "ISOWeekLabel" != '{cur_week}' THEN rev END)
-        FROM wk
-    """)
-    r = cur.fetchone()
-    if r and r[0] is not None and r[1] is not None and r[1] > 0:
-        pct = (r[0] - r[1]) / r[1] * 100
-        sent = "positive" if pct > 5 else ("negative" if pct < -5 else "neutral")
-        _insert_insight(
-            cur,
-            cur_week,
-            "WRev_TREND",
-            "revenue",
-            f"Revenue {pct:+.0f}% vs 4-week average",
-            f"Dhs {r[0]:,.0f} this week vs Dhs {r[1]:,.0f} avg",
-            sent,
-            "weekly",
-        )
-        count += 1
+def _create_shadow(cur) -> None:
+    """Create SHADOW_SCHEMA with empty, index-free copies of SYNC_TABLES.
 
-    # WCust_WOW
-    if prior_week:
+    Partitioned tables keep their partition key and get the live table's
+    partitions, SERIAL columns get their own sequence (the live one is
+    dropped with the live table) and the incremental insight and delta-sync
+    state is copied across.
+    """
+    cur.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SHADOW_SCHEMA}")
+    for table in SYNC_TABLES:
         cur.execute(
-            """
-            SELECT
-                COUNT(DISTINCT CASE WHEN p."ISOWeekLabel" = %s THEN s."CustomerID_Std" END),
-                COUNT(DISTINCT CASE WHEN p."ISOWeekLabel" = %s THEN s."CustomerID_Std" END)
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-            WHERE s."Is_Earned" = TRUE AND p."ISOWeekLabel" IN (%s, %s)
-        """,
-            (cur_week, prior_week, cur_week, prior_week),
+            "SELECT pg_get_partkeydef(c.oid) FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relname = %s",
+            (LIVE_SCHEMA, table),
         )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            _insert_insight(
-                cur,
-                cur_week,
-                "WCust_WOW",
-                "customers",
-                f"Active customers {pct:+.0f}% vs last week",
-                f"{r[0]:,} customers this week vs {r[1]:,} last week",
-                "positive" if pct > 0 else "negative",
-                "weekly",
-            )
-            count += 1
-
-    # WStops_WOW
-    if prior_week:
+        partition_key = cur.fetchone()[0]
         cur.execute(
-            """
-            SELECT
-                SUM(CASE WHEN p."ISOWeekLabel" = %s
-                         THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                         ELSE 0 END),
-                SUM(CASE WHEN p."ISOWeekLabel" = %s
-                         THEN CAST(s."HasDelivery" AS INTEGER) + CAST(s."HasPickup" AS INTEGER)
-                         ELSE 0 END)
-            FROM analytics.sales s
-            JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-            WHERE s."Is_Earned" = TRUE AND p."ISOWeekLabel" IN (%s, %s)
-        """,
-            (cur_week, prior_week, cur_week, prior_week),
+            f"CREATE TABLE {SHADOW_SCHEMA}.{table} "
+            f"(LIKE {LIVE_SCHEMA}.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            + (f" PARTITION BY {partition_key}" if partition_key else "")
         )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            _insert_insight(
-                cur,
-                cur_week,
-                "WStops_WOW",
-                "operations",
-                f"Stops {pct:+.0f}% vs last week",
-                f"{r[0]:,} stops this week vs {r[1]:,} last week",
-                "positive" if pct > 0 else "negative",
-                "weekly",
+        if partition_key:
+            # Same partitions as the live table; the load adds new months
+            cur.execute(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+                (f"{LIVE_SCHEMA}.{table}",),
             )
-            count += 1
-
-    # WItems_WOW
-    if prior_week:
+            for partition, bound in cur.fetchall():
+                cur.execute(f"CREATE TABLE {SHADOW_SCHEMA}.{partition} PARTITION OF {SHADOW_SCHEMA}.{table} {bound}")
         cur.execute(
-            """
-            SELECT
-                SUM(CASE WHEN p."ISOWeekLabel" = %s THEN i."Quantity" ELSE 0 END),
-                SUM(CASE WHEN p."ISOWeekLabel" = %s THEN i."Quantity" ELSE 0 END)
-            FROM analytics.items i
-            JOIN analytics.dim_period p ON i."ItemDate" = p."Date"
-            WHERE p."ISOWeekLabel" IN (%s, %s)
-        """,
-            (cur_week, prior_week, cur_week, prior_week),
+            "SELECT column_name, pg_get_serial_sequence(%s, column_name) FROM information_schema.columns "
+            "WHERE table_schema = %s AND table_name = %s AND column_default LIKE 'nextval(%%'",
+            (f"{LIVE_SCHEMA}.{table}", LIVE_SCHEMA, table),
         )
-        r = cur.fetchone()
-        if r and r[1] and r[1] > 0:
-            pct = (r[0] - r[1]) / r[1] * 100
-            _insert_insight(
-                cur,
-                cur_week,
-                "WItems_WOW",
-                "operations",
-                f"Items {pct:+.0f}% vs last week",
-                f"{r[0]:,} items this week vs {r[1]:,} last week",
-                "positive" if pct > 0 else "negative",
-                "weekly",
-            )
-            count += 1
+        for column, live_seq in cur.fetchall():
+            seq = f"{SHADOW_SCHEMA}.{live_seq.split('.')[-1]}"
+            cur.execute(f'CREATE SEQUENCE {seq} OWNED BY {SHADOW_SCHEMA}.{table}."{column}"')
+            cur.execute(f"ALTER TABLE {SHADOW_SCHEMA}.{table} ALTER COLUMN \"{column}\" SET DEFAULT nextval('{seq}')")
+    for table in _CARRIED_ROWS_TABLES:
+        cur.execute(f"INSERT INTO {SHADOW_SCHEMA}.{table} SELECT * FROM {LIVE_SCHEMA}.{table}")
+
 
-    # WProcessing
+def _build_indexes(cur, tables: list[str]) -> int:
+    """Recreate the live indexes (and primary/unique keys) of ``tables`` on their loaded shadow copies."""
     cur.execute(
         """
-        SELECT AVG(s."Processing_Days")
-        FROM analytics.sales s
-        JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-        WHERE s."Is_Earned" = TRUE AND s."Processing_Days" IS NOT NULL
-          AND p."ISOWeekLabel" = %s
-    """,
-        (cur_week,),
+        SELECT t.relname, i.relname, pg_get_indexdef(i.oid), con.conname, con.contype
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        LEFT JOIN pg_constraint con ON con.conindid = i.oid AND con.contype IN ('p', 'u')
+        WHERE n.nspname = %s AND t.relname = ANY(%s)
+        """,
+        (LIVE_SCHEMA, list(tables)),
     )
-    r = cur.fetchone()
-    if r and r[0] is not None:
-        _insert_insight(
-            cur,
-            cur_week,
-            "WProcessing",
-            "operations",
-            f"Avg processing: {r[0]:.1f} days" + ("  - above target" if r[0] > 3.0 else ""),
-            f"Average order processing time in {cur_week}",
-            "negative" if r[0] > 3.0 else "positive",
-            "weekly",
+    indexes = cur.fetchall()
+    for table, index, indexdef, constraint, kind in indexes:
+        # Indexes on a partitioned table read "ON ONLY"; without it they cascade to every partition
+        indexdef = indexdef.replace(f" ON ONLY {LIVE_SCHEMA}.", f" ON {LIVE_SCHEMA}.", 1)
+        cur.execute(indexdef.replace(f" ON {LIVE_SCHEMA}.", f" ON {SHADOW_SCHEMA}.", 1))
+        if constraint:
+            key = "PRIMARY KEY" if kind == "p" else "UNIQUE"
+            cur.execute(f"ALTER TABLE {SHADOW_SCHEMA}.{table} ADD CONSTRAINT {constraint} {key} USING INDEX {index}")
+    return len(indexes)
+
+
+def _swap_schemas(conn) -> list[str]:
+    """Promote SHADOW_SCHEMA to LIVE_SCHEMA in one short transaction.
+
+    The live schema is renamed to RETIRED_SCHEMA; enum types, functions and
+    every relation the sync does not rebuild (alembic_version, ...) move into
+    the new live schema.  The period-measure views are rebuilt, not moved:
+    the retired ones read the retired tables.  data_version is bumped in the
+    same transaction.  Returns the names carried over.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER SCHEMA {LIVE_SCHEMA} RENAME TO {RETIRED_SCHEMA}")
+        cur.execute(f"ALTER SCHEMA {SHADOW_SCHEMA} RENAME TO {LIVE_SCHEMA}")
+
+        cur.execute(
+            """
+            SELECT format('ALTER TYPE %%I.%%I SET SCHEMA %%I', n.nspname, t.typname, %s), t.typname
+            FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+            WHERE n.nspname = %s AND t.typtype IN ('e', 'd')
+            UNION ALL
+            SELECT format('ALTER ROUTINE %%s SET SCHEMA %%I', p.oid::regprocedure, %s), p.proname
+            FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+            WHERE n.nspname = %s
+            UNION ALL
+            SELECT format(
+                       'ALTER %%s %%I.%%I SET SCHEMA %%I',
+                       CASE c.relkind WHEN 'v' THEN 'VIEW' WHEN 'm' THEN 'MATERIALIZED VIEW'
+                                      WHEN 'S' THEN 'SEQUENCE' ELSE 'TABLE' END,
+                       n.nspname, c.relname, %s
+                   ),
+                   c.relname
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+              AND c.relkind IN ('r', 'p', 'v', 'm', 'S', 'f')
+              AND NOT c.relispartition
+              AND c.relname <> ALL(%s)
+              -- sequences owned by a column move (or are dropped) with their table
+              AND NOT (c.relkind = 'S' AND EXISTS (
+                  SELECT 1 FROM pg_depend d
+                  WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid AND d.deptype IN ('a', 'i')
+              ))
+            """,
+            (
+                LIVE_SCHEMA, RETIRED_SCHEMA, LIVE_SCHEMA, RETIRED_SCHEMA, LIVE_SCHEMA, RETIRED_SCHEMA,
+                [*SYNC_TABLES, *_period_view_names()],
+            ),
         )
-        count += 1
+        moves = cur.fetchall()
+        for statement, _ in moves:
+            cur.execute(statement)
+        _bump_data_version(cur)
+    conn.commit()
+    return [name for _, name in moves]
+
 
-    # WCollection_Rate
+def _bump_data_version(cur) -> int | None:
+    """Increment the live data_version (migration 006) so dashboards drop cached results.
+
+    Runs in the transaction that publishes the new data.  Returns the new
+    version, or None before migration 006 (dashboards then key on the schema).
+    """
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{LIVE_SCHEMA}.data_version",))
+    exists = cur.fetchone()
+    if not exists or not exists[0]:
+        return None
     cur.execute(
-        """
-        SELECT SUM(s."Collections"), SUM(s."Total_Num")
-        FROM analytics.sales s
-        JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-        WHERE s."Is_Earned" = TRUE AND p."ISOWeekLabel" = %s
-    """,
-        (cur_week,),
+        f"UPDATE {LIVE_SCHEMA}.data_version SET version = version + 1, published_at = now() RETURNING version"
     )
-    r = cur.fetchone()
-    if r and r[1] and r[1] > 0:
-        rate = r[0] / r[1] * 100
-        sent = "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral")
-        _insert_insight(
-            cur,
-            cur_week,
-            "WCollection_Rate",
-            "payments",
-            f"Collection rate: {rate:.0f}% of revenue collected",
-            f"Dhs {r[0]:,.0f} collected of Dhs {r[1]:,.0f} earned in {cur_week}",
-            sent,
-            "weekly",
-        )
-        count += 1
+    row = cur.fetchone()
+    return row[0] if row else None
 
-    # WDelivery_Rate
-    cur.execute(
-        """
-        SELECT SUM(CAST(s."HasDelivery" AS INTEGER)),
-               SUM(CAST(s."HasPickup" AS INTEGER))
-        FROM analytics.sales s
-        JOIN analytics.dim_period p ON s."Earned_Date" = p."Date"
-        WHERE s."Is_Earned" = TRUE AND p."ISOWeekLabel" = %s
-    """,
-        (cur_week,),
+
+def _drop_retired(conn) -> bool:
+    """Drop RETIRED_SCHEMA (non-fatal: a reader still holding an old table just defers it to the next sync)."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '10s'")
+            cur.execute(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE")
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.warning(f"  [WARN] Could not drop {RETIRED_SCHEMA} yet ({str(e).strip()}) — retried next sync")
+        return False
+
+
+# =====================================================================
+# PARALLEL BASE-TABLE LOAD
+# =====================================================================
+
+
+def _load_table(pool, table_name: str, periods: pl.DataFrame | None, full: bool = False) -> dict:
+    """Load, fix up and index one base table in its own transaction on a pooled connection.
+
+    The staging file is fingerprinted per month and compared with
+    partition_manifest: unchanged months are copied server-side from the live
+    table and only changed or new months are shipped over COPY (everything
+    when ``full``, on the first sync, or when the table's layout changed).
+    Returns the table's load stats (rows, batches, elapsed_s, rows_per_s,
+    index_s, source, rows_shipped, partitions_shipped/skipped,
+    bytes_shipped/skipped, changed_months: the months shipped or removed,
+    None when the table was shipped in full).  A missing staging file keeps
+    the live rows.
+    """
+    pq_path = LOCAL_STAGING_PATH / PARQUET_FILES[table_name]
+    csv_path = pq_path.with_suffix(".csv")
+    src = "parquet" if pq_path.exists() else "csv" if csv_path.exists() else "live"
+
+    conn = pool.getconn()
+    try:
+        t0 = time.time()
+        with conn.cursor() as cur:
+            known = _known_fingerprints(cur, table_name)
+        staged, shipped = None, {}
+        n_shipped = n_batches = 0
+        partitioned = table_name in PARTITIONED_TABLES
+        if src == "live":
+            logger.warning(f"  [WARN] {PARQUET_FILES[table_name]} not found — keeping live {table_name} rows")
+            with conn.cursor() as cur:
+                n = _copy_live_rows(cur, table_name)
+            kept = [m for m in known if m != "*"]
+            changed_months = []
+        else:
+            staged = _staged_fingerprints(table_name, pq_path, csv_path, periods)
+            cutoff = _retention_cutoff() if partitioned else None
+            expired = [m for m in staged if cutoff and m not in ("*", "") and m < cutoff]
+            for month in expired:
+                del staged[month]
+            changed = None if full else _changed_months(staged, known)
+            kept = [] if changed is None else [m for m in staged if m != "*" and m not in changed]
+            # Months that left the staging file (or passed retention) change the aggregates too
+            removed = [m for m in known if m != "*" and m not in staged]
+            changed_months = None if changed is None else sorted({*changed, *removed})
+            # A full load still leaves out the months past retention
+            ship = changed if changed is not None or not expired else [m for m in staged if m != "*"]
+            with conn.cursor() as cur:
+                if partitioned:
+                    _create_partitions(cur, table_name, [m for m in staged if m not in ("*", "")])
+                n = _copy_live_rows(cur, table_name, kept) if kept else 0
+            if changed is None or changed:
+                if table_name == "customers":
+                    df = pl.read_parquet(pq_path) if src == "parquet" else pl.read_csv(csv_path, infer_schema_length=0)
+                    n_shipped, n_bytes = _load_customers(conn, df)
+                    shipped, n_batches = {"": n_bytes}, 1
+                else:
+                    with conn.cursor() as cur:
+                        n_shipped, n_batches, shipped = _copy_table(
+                            cur, table_name, _source_batches(pq_path, csv_path, COPY_BATCH_ROWS), periods, ship
+                        )
+            n += n_shipped
+        elapsed = time.time() - t0
+
+        with conn.cursor() as cur:
+            if partitioned:
+                n_dropped = _drop_expired_partitions(cur, table_name)
+                if n_dropped:
+                    logger.info(f"  [OK] {table_name}: dropped {n_dropped} month partition(s) past retention")
+            if staged is not None:
+                _write_manifest(cur, table_name, staged, shipped, known)
+            if table_name == "sales":
+                # Mark Legacy orders as Paid (same logic as DuckDB loader), before indexing
+                cur.execute("""UPDATE sales SET "Paid" = TRUE
+                               WHERE "Source" = 'Legacy' AND "Paid" = FALSE""")
+                logger.info(f"  [OK] Marked {cur.rowcount:,} Legacy orders as Paid")
+            t1 = time.time()
+            n_idx = _build_indexes(cur, [table_name])
+            index_s = time.time() - t1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+    bytes_shipped = sum(shipped.values())
+    bytes_skipped = sum(known[m][2] for m in kept if m in known)
+    rate = n / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"  [OK] {table_name}: {n:,} rows in {elapsed:.1f}s ({src}, {rate:,.0f} rows/s)"
+        f" + {n_idx} indexes in {index_s:.1f}s"
     )
-    r = cur.fetchone()
-    if r and r[0] is not None and r[1] is not None and (r[0] + r[1]) > 0:
-        rate = r[0] / (r[0] + r[1]) * 100
-        _insert_insight(
-            cur,
-            cur_week,
-            "WDelivery_Rate",
-            "operations",
-            f"Delivery rate: {rate:.0f}% ({r[0]:,} deliveries, {r[1]:,} pickups)",
-            f"Total stops: {r[0] + r[1]:,} in {cur_week}",
-            "neutral",
-            "weekly",
-        )
-        count += 1
+    logger.info(
+        f"    {table_name}: shipped {len(shipped)} partition(s) / {bytes_shipped / 1e6:.1f} MB,"
+        f" kept {len(kept)} / {bytes_skipped / 1e6:.1f} MB server-side"
+    )
+    return {
+        "rows": n,
+        "batches": n_batches,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rate),
+        "index_s": round(index_s, 2),
+        "source": src,
+        "rows_shipped": n_shipped,
+        "partitions_shipped": len(shipped),
+        "partitions_skipped": len(kept),
+        "changed_months": changed_months,
+        "bytes_shipped": bytes_shipped,
+        "bytes_skipped": bytes_skipped,
+    }
+
+
+def _load_base_tables(periods: pl.DataFrame | None, workers: int, full: bool = False) -> dict[str, dict]:
+    """Load the PARQUET_FILES tables into the shadow schema over up to ``workers`` connections.
+
+    Tables are independent until order_lookup and insights, so each gets its
+    own connection and transaction; the largest staging files start first so
+    the wall time approaches that of the largest table.
+    """
+
+    def _size(table_name: str) -> int:
+        pq_path = LOCAL_STAGING_PATH / PARQUET_FILES[table_name]
+        for path in (pq_path, pq_path.with_suffix(".csv")):
+            if path.exists():
+                return path.stat().st_size
+        return 0
+
+    tables = sorted(PARQUET_FILES, key=_size, reverse=True)
+    workers = max(1, min(workers, len(tables)))
+    pool = _connection_pool(workers, SHADOW_SCHEMA)
+    stats = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pg-load") as executor:
+            futures = {executor.submit(_load_table, pool, t, periods, full): t for t in tables}
+            for future in as_completed(futures):
+                stats[futures[future]] = future.result()
+    finally:
+        pool.closeall()
+    return {t: stats[t] for t in PARQUET_FILES}
 
-    logger.info(f"  [OK] {count} weekly insights for {cur_week}")
-    return count
+
+def _drop_shadow(conn) -> None:
+    """Discard a half-built shadow schema after a failed sync."""
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE")
+    conn.commit()
 
 
 # =====================================================================
@@ -1117,14 +1459,21 @@ def _create_weekly_insights(cur) -> int:
 # =====================================================================
 
 
-def main(skip_insights: bool = False) -> dict:
+def main(skip_insights: bool = False, workers: int | None = None, full: bool = False) -> dict:
     """Sync all Parquet files to Postgres analytics schema.
 
-    Returns a summary dict with row counts and elapsed time.
+    Builds every table in SHADOW_SCHEMA and swaps it in for the live schema
+    at the end.  The base tables load concurrently over ``workers``
+    connections (default POSTGRES_LOAD_WORKERS); only month partitions whose
+    fingerprint changed are shipped unless ``full``.  Tables whose staging
+    file is missing keep their live rows.  Returns a summary dict with row
+    counts, per-table load_stats (see _load_table), load_wall_s /
+    load_workers, bytes_shipped / bytes_skipped and elapsed time.
     Raises RuntimeError if ANALYTICS_DATABASE_URL is not configured.
     """
     if not ANALYTICS_DATABASE_URL:
         raise RuntimeError("ANALYTICS_DATABASE_URL not configured — skipping Postgres sync")
+    workers = workers or POSTGRES_LOAD_WORKERS
 
     logger.info("")
     logger.info("=" * 70)
@@ -1135,63 +1484,89 @@ def main(skip_insights: bool = False) -> dict:
     start = datetime.now()
     summary: dict = {}
 
-    conn = _connect()
-    try:
-        # ── 1. Load primary tables ──────────────────────────────────────
-        for table_name, filename in PARQUET_FILES.items():
-            pq_path = LOCAL_STAGING_PATH / filename
-            csv_path = pq_path.with_suffix(".csv")
-
-            if pq_path.exists():
-                df = pl.read_parquet(pq_path)
-                src = "parquet"
-            elif csv_path.exists():
-                df = pl.read_csv(csv_path, infer_schema_length=0)
-                src = "csv"
-            else:
-                logger.warning(f"  [WARN] {filename} not found — skipping {table_name}")
-                continue
-
-            t0 = time.time()
-
-            if table_name == "customers":
-                n = _load_customers(conn, df)
-            else:
-                df = _prepare_df(table_name, df)
-                with conn.cursor() as cur:
-                    _truncate(cur, table_name)
-                    n = _bulk_insert(cur, table_name, df)
-                conn.commit()
+    periods = _read_period_lookup()
 
-            elapsed = time.time() - t0
-            summary[table_name] = n
-            logger.info(f"  [OK] {table_name}: {n:,} rows in {elapsed:.1f}s ({src})")
+    conn = _connect(SHADOW_SCHEMA)
+    try:
+        _drop_retired(conn)  # left behind by an earlier sync, if any
 
-        # ── 2. Mark Legacy orders as Paid (same logic as DuckDB loader) ─
+        # ── 1. Shadow schema: empty copies of the sync tables ──────────
         with conn.cursor() as cur:
-            cur.execute("""UPDATE analytics.sales SET "Paid" = TRUE
-                           WHERE "Source" = 'Legacy' AND "Paid" = FALSE""")
-            n_legacy = cur.rowcount
+            _create_shadow(cur)
         conn.commit()
-        logger.info(f"  [OK] Marked {n_legacy:,} Legacy orders as Paid")
 
-        # ── 3. Derive order_lookup ──────────────────────────────────────
-        t0 = time.time()
-        n_ol = _load_order_lookup(conn)
-        summary["order_lookup"] = n_ol
-        logger.info(f"  [OK] order_lookup: {n_ol:,} distinct orders in {time.time() - t0:.1f}s")
+        try:
+            # ── 2. Base tables, concurrently (load + indexes per table) ─
+            t0 = time.time()
+            load_stats = _load_base_tables(periods, workers, full)
+            load_wall = time.time() - t0
+            summary.update({t: s["rows"] for t, s in load_stats.items()})
+            slowest = max(s["elapsed_s"] + s["index_s"] for s in load_stats.values())
+            logger.info(
+                f"  [OK] Base tables loaded in {load_wall:.1f}s over {min(workers, len(load_stats))} connections"
+                f" (slowest table {slowest:.1f}s)"
+            )
+            shipped = sum(s["bytes_shipped"] for s in load_stats.values())
+            skipped = sum(s["bytes_skipped"] for s in load_stats.values())
+            share = shipped / (shipped + skipped) if shipped + skipped else 1.0
+            logger.info(
+                f"  [OK] Shipped {shipped / 1e6:.1f} MB, skipped {skipped / 1e6:.1f} MB unchanged"
+                f" ({share:.0%} of the data sent)"
+            )
 
-        # ── 4. Build insights ───────────────────────────────────────────
-        if not skip_insights:
+            # ── 3. Derive order_lookup ──────────────────────────────────
+            t0 = time.time()
+            with conn.cursor() as cur:
+                _build_indexes(cur, ["order_lookup", *_CARRIED_ROWS_TABLES])
+            n_ol = _load_order_lookup(conn)
+            summary["order_lookup"] = n_ol
+            logger.info(f"  [OK] order_lookup: {n_ol:,} distinct orders in {time.time() - t0:.1f}s")
+
+            # ── 4. Build insights ───────────────────────────────────────
+            if not skip_insights:
+                t0 = time.time()
+                n_ins = _create_insights(conn, {t: s["changed_months"] for t, s in load_stats.items()})
+                summary["insights"] = n_ins
+                logger.info(f"  [OK] insights: {n_ins} rules in {time.time() - t0:.1f}s")
+
+            # ── 5. Period-measure views over the new tables ─────────────
             t0 = time.time()
-            n_ins = _create_insights(conn)
-            summary["insights"] = n_ins
-            logger.info(f"  [OK] insights: {n_ins} rules in {time.time() - t0:.1f}s")
+            n_view_rows = _create_period_views(conn)
+            summary["period_views"] = n_view_rows
+            logger.info(
+                f"  [OK] {len(_period_view_names())} period-measure views: {n_view_rows:,} rows"
+                f" in {time.time() - t0:.1f}s"
+            )
+
+            # ── 6. Planner statistics, commit, swap the schema in ───────
+            with conn.cursor() as cur:
+                for table in [*SYNC_TABLES, *_period_view_names()]:
+                    cur.execute(f"ANALYZE {table}")
+            conn.commit()
+        except Exception:
+            _drop_shadow(conn)
+            raise
 
+        t0 = time.time()
+        carried = _swap_schemas(conn)
+        logger.info(
+            f"  [OK] Swapped {SHADOW_SCHEMA} -> {LIVE_SCHEMA} in {time.time() - t0:.2f}s"
+            f" (carried over: {', '.join(carried) or 'nothing'})"
+        )
+        _drop_retired(conn)
+
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
     elapsed = (datetime.now() - start).total_seconds()
+    summary["load_stats"] = load_stats
+    summary["load_wall_s"] = round(load_wall, 1)
+    summary["load_workers"] = min(workers, len(load_stats))
+    summary["bytes_shipped"] = shipped
+    summary["bytes_skipped"] = skipped
     summary["elapsed_s"] = round(elapsed, 1)
 
     logger.info("")
@@ -1201,10 +1576,22 @@ def main(skip_insights: bool = False) -> dict:
 
 
 if __name__ == "__main__":
-    skip = "--skip-insights" in sys.argv
+    parser = argparse.ArgumentParser(description="Sync the staged Parquet files to the Postgres analytics schema")
+    parser.add_argument("--skip-insights", action="store_true", help="Faster, data only")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent table loads (connections)")
+    parser.add_argument("--full", action="store_true", help="Ship every partition, ignoring the manifest")
+    parser.add_argument(
+        "--refresh-views", action="store_true", help="Only refresh the live period-measure views (no sync)"
+    )
+    args = parser.parse_args()
     try:
-        result = main(skip_insights=skip)
-        print("Summary:", result)
+        if args.refresh_views:
+            if not ANALYTICS_DATABASE_URL:
+                raise RuntimeError("ANALYTICS_DATABASE_URL not configured — skipping view refresh")
+            print("Refreshed:", ", ".join(_refresh_period_views()) or "nothing")
+        else:
+            result = main(skip_insights=args.skip_insights, workers=args.workers, full=args.full)
+            print("Summary:", result)
     except RuntimeError as e:
         print(f"Skipped: {e}")
     except Exception as e:
@@ -39,6 +39,38 @@ else:
     PYTHON_SCRIPT_FOLDER = Path(os.environ.get("MOONWALK_SCRIPTS", str(_SCRIPT_DIR)))
     DB_PATH = _DATA_DIR / "analytics.duckdb"
 
+# Versioned DuckDB snapshots: each build writes analytics-<version>.duckdb next
+# to DB_PATH and a CURRENT pointer names the live one (see snapshot_store.py)
+DUCKDB_SNAPSHOT_KEEP = int(os.environ.get("MOONWALK_SNAPSHOT_KEEP", "3"))
+
+# Dashboard DuckDB serving (dashboard_shared._DuckPool): cursors over the one
+# read-only snapshot that concurrent sessions run their queries on, DuckDB
+# worker threads (0 = one per core) and memory limit (empty = DuckDB default)
+DUCKDB_POOL_SIZE = int(os.environ.get("MOONWALK_DUCKDB_POOL_SIZE", "4"))
+DUCKDB_THREADS = int(os.environ.get("MOONWALK_DUCKDB_THREADS", "0"))
+DUCKDB_MEMORY_LIMIT = os.environ.get("MOONWALK_DUCKDB_MEMORY_LIMIT", "")
+
+# Dashboard data source: "duckdb" (build analytics.duckdb) or "parquet" (typed
+# views over versioned parquet-<version>/ directories, see parquet_serving.py)
+SERVING_MODE = os.environ.get("MOONWALK_SERVING_MODE", "duckdb").lower()
+PARQUET_SERVING_PATH = DB_PATH.parent / "parquet_serving" / "parquet"
+
+# Dashboard query cache (see dashboard_cache.py): results are keyed on the
+# published data version and never expire by time.  The in-memory tier holds at
+# most MAX_ENTRIES results and MAX_MB of estimated result size per process
+# (whichever is reached first evicts the least recently used), plus an optional
+# directory shared by every dashboard process (empty disables the on-disk tier)
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.environ.get("MOONWALK_CACHE_MAX_ENTRIES", "512"))
+DASHBOARD_CACHE_MAX_MB = float(os.environ.get("MOONWALK_CACHE_MAX_MB", "256"))
+DASHBOARD_CACHE_DIR = os.environ.get("MOONWALK_CACHE_DIR", "")
+# Seconds between checks of the Postgres data_version (snapshot pointers are read on every fetch)
+DASHBOARD_VERSION_POLL_S = float(os.environ.get("MOONWALK_CACHE_VERSION_POLL_S", "5"))
+# Most recent selectable periods per grain that cache_warmer.py pre-computes after a refresh
+DASHBOARD_WARM_PERIODS = int(os.environ.get("MOONWALK_CACHE_WARM_PERIODS", "3"))
+# Worker threads running a page's fetchers, and fetchers' independent queries,
+# concurrently (dashboard_shared.prefetch / query_dfs); 1 runs them in series
+DASHBOARD_FETCH_WORKERS = int(os.environ.get("MOONWALK_FETCH_WORKERS", "4"))
+
 # Derived file paths
 SALES_CSV = str(LOCAL_STAGING_PATH / "All_Sales_Python.csv")
 ITEMS_CSV = str(LOCAL_STAGING_PATH / "All_Items_Python.csv")
@@ -69,6 +101,15 @@ def _get_duckdb_key():
 
 DUCKDB_KEY = _get_duckdb_key()
 
+# How DUCKDB_KEY protects customer PII (Phone, Email):
+#   "file"    — the whole analytics snapshot is encrypted (every query decrypts)
+#   "sidecar" — analytics tables stay plaintext; Phone/Email move to an
+#               encrypted <snapshot>-pii.duckdb attached only when PII is needed
+DUCKDB_PII_MODE = os.environ.get("MOONWALK_DUCKDB_PII_MODE", "file").lower()
+DUCKDB_PII_SIDECAR = DUCKDB_PII_MODE == "sidecar" and bool(DUCKDB_KEY)
+# Key for opening the analytics snapshot itself (empty when PII is in the sidecar)
+DUCKDB_FILE_KEY = "" if DUCKDB_PII_SIDECAR else DUCKDB_KEY
+
 # =====================================================================
 # LOGGING CONFIGURATION
 # =====================================================================
@@ -179,6 +220,17 @@ def _get_analytics_database_url():
 
 ANALYTICS_DATABASE_URL = _get_analytics_database_url()
 
+# Pooled connections kept open by the dashboard/API engine (db.database);
+# as many again may overflow under load
+POSTGRES_POOL_SIZE = int(os.environ.get("MOONWALK_PG_POOL_SIZE", "4"))
+
+# Connections (one base table each) used concurrently by the Postgres sync
+POSTGRES_LOAD_WORKERS = int(os.environ.get("MOONWALK_PG_LOAD_WORKERS", "4"))
+
+# Months of sales/items kept in Postgres (current month included); older month
+# partitions are dropped by every sync.  0 keeps the full history.
+POSTGRES_RETENTION_MONTHS = int(os.environ.get("MOONWALK_PG_RETENTION_MONTHS", "0"))
+
 
 def _get_encryption_key():
     """Load symmetric encryption key for pgcrypto PII columns (Phone, Email).
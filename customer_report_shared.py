@@ -1,7 +1,8 @@
 """
 Shared data layer for the Customer Report.
 
-Provides batch SQL fetch for customer acquisition and per-customer item measures:
+Projects customer acquisition and per-customer item measures from the
+period cube (dashboard_shared.fetch_period_cube):
 - active_customers / active_subscribers / active_clients
 - new_customers / new_customer_pct
 - items / subscriber items / client items (and per-customer ratios)
@@ -10,89 +11,32 @@ Provides batch SQL fetch for customer acquisition and per-customer item measures
 """
 
 import time
-import streamlit as st
-from dashboard_shared import get_grain_context, _log_query_time
+from dashboard_cache import snapshot_cached
+from dashboard_shared import cube_totals, fetch_period_cube, keyed_rows, _log_query_time
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_customer_measures_batch(_con, periods_tuple):
-    """Fetch customer, item, and revenue measures for multiple periods in three queries."""
+    """Fetch customer, item, and revenue measures for multiple periods (from the period cube)."""
     _t0 = time.perf_counter()
     periods = list(periods_tuple)
-    ctx = get_grain_context(periods)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-    placeholders = ", ".join(f"'{p}'" for p in periods)
+    cube = fetch_period_cube(_con, periods_tuple)
 
-    # Query 1: customer counts
-    cust_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-               COUNT(DISTINCT s.CustomerID_Std) AS active_customers,
-               COUNT(DISTINCT CASE
-                   WHEN s.MonthsSinceCohort = 0 THEN s.CustomerID_Std
-               END) AS new_customers,
-               COUNT(DISTINCT CASE
-                   WHEN s.Transaction_Type = 'Subscription' THEN s.CustomerID_Std
-               END) AS active_subscribers
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Transaction_Type <> 'Invoice Payment'
-          AND s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
-
-    # Query 2: item counts
-    items_df = _con.execute(f"""
-        SELECT sub.period,
-               COALESCE(SUM(sub.qty), 0) AS items_total,
-               COALESCE(SUM(CASE WHEN sub.iss = FALSE THEN sub.qty END), 0) AS items_client,
-               COALESCE(SUM(CASE WHEN sub.iss = TRUE THEN sub.qty END), 0) AS items_sub
-        FROM (
-            SELECT {period_col} AS period, i.Quantity AS qty,
-                   COALESCE(ol.IsSubscriptionService, FALSE) AS iss
-            FROM items i
-            JOIN dim_period p ON i.ItemDate = p.Date
-            LEFT JOIN order_lookup ol ON i.OrderID_Std = ol.OrderID_Std
-            WHERE {period_col} IN ({placeholders})
-        ) sub
-        GROUP BY sub.period
-    """).df()
-
-    # Query 3: revenue totals
-    rev_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-               COALESCE(SUM(s.Total_Num), 0) AS rev_total,
-               COALESCE(SUM(CASE
-                   WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = FALSE
-                   THEN s.Total_Num END), 0) AS rev_client,
-               COALESCE(SUM(CASE
-                   WHEN s.Transaction_Type = 'Subscription' THEN s.Total_Num
-                   WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = TRUE
-                   THEN s.Total_Num END), 0) AS rev_sub
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+    sales = keyed_rows(
+        cube["sales"],
+        "period",
+        {"customers": 0, "new_customers": 0, "subscribers": 0, "rev_total": 0.0, "rev_client": 0.0, "rev_sub": 0.0},
+    )
+    items = cube_totals(cube["items"], ("period", "iss"), {"items": 0})
 
     result = {}
     for pd in periods:
-        c_row = cust_df[cust_df["period"] == pd]
-        active = int(c_row["active_customers"].iloc[0]) if len(c_row) else 0
-        new = int(c_row["new_customers"].iloc[0]) if len(c_row) else 0
-        subscribers = int(c_row["active_subscribers"].iloc[0]) if len(c_row) else 0
+        c = sales[pd]
+        active, new, subscribers = c["customers"], c["new_customers"], c["subscribers"]
         clients = active - subscribers
-
-        i_row = items_df[items_df["period"] == pd]
-        items_total = int(i_row["items_total"].iloc[0]) if len(i_row) else 0
-        items_sub = int(i_row["items_sub"].iloc[0]) if len(i_row) else 0
-        items_client = int(i_row["items_client"].iloc[0]) if len(i_row) else 0
-
-        r_row = rev_df[rev_df["period"] == pd]
-        rev_total = float(r_row["rev_total"].iloc[0]) if len(r_row) else 0.0
-        rev_client = float(r_row["rev_client"].iloc[0]) if len(r_row) else 0.0
-        rev_sub = float(r_row["rev_sub"].iloc[0]) if len(r_row) else 0.0
+        items_sub, items_client = items[pd, True]["items"], items[pd, False]["items"]
+        items_total = items_sub + items_client
+        rev_total, rev_client, rev_sub = c["rev_total"], c["rev_client"], c["rev_sub"]
 
         result[pd] = {
             # Customer counts
@@ -119,75 +63,28 @@ def fetch_customer_measures_batch(_con, periods_tuple):
     return result
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_new_customer_detail_batch(_con, months_tuple):
-    """Fetch new vs existing customer splits for items and revenue."""
+    """Fetch new vs existing customer splits for items and revenue (from the period cube)."""
     _t0 = time.perf_counter()
     months = list(months_tuple)
-    placeholders = ", ".join(f"'{m}'" for m in months)
-
-    # Query 1: customer counts (reuse same logic as above)
-    cust_df = _con.execute(f"""
-        SELECT p.YearMonth,
-               COUNT(DISTINCT s.CustomerID_Std) AS active_customers,
-               COUNT(DISTINCT CASE
-                   WHEN s.MonthsSinceCohort = 0 THEN s.CustomerID_Std
-               END) AS new_customers
-        FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Transaction_Type <> 'Invoice Payment'
-          AND s.Earned_Date IS NOT NULL
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth
-    """).df()
+    cube = fetch_period_cube(_con, months_tuple)
 
-    # Query 2: revenue split by new/existing
-    rev_df = _con.execute(f"""
-        SELECT p.YearMonth,
-               COALESCE(SUM(CASE WHEN s.MonthsSinceCohort = 0 THEN s.Total_Num END), 0) AS rev_new,
-               COALESCE(SUM(CASE WHEN s.MonthsSinceCohort > 0 THEN s.Total_Num END), 0) AS rev_existing
-        FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth
-    """).df()
-
-    # Query 3: items split by new/existing
-    items_df = _con.execute(f"""
-        SELECT p.YearMonth AS ym,
-               COALESCE(SUM(CASE WHEN sc.MonthsSinceCohort = 0 THEN i.Quantity END), 0) AS items_new,
-               COALESCE(SUM(CASE WHEN COALESCE(sc.MonthsSinceCohort, 1) > 0 THEN i.Quantity END), 0) AS items_existing
-        FROM items i
-        JOIN dim_period p ON i.ItemDate = p.Date
-        LEFT JOIN (
-            SELECT DISTINCT OrderID_Std, MonthsSinceCohort FROM sales
-        ) sc ON i.OrderID_Std = sc.OrderID_Std
-        WHERE p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth
-    """).df()
+    sales = keyed_rows(
+        cube["sales"], "period", {"customers": 0, "new_customers": 0, "rev_new": 0.0, "rev_existing": 0.0}
+    )
+    items = cube_totals(cube["items"], ("period", "age"), {"items": 0})
 
     result = {}
     for m in months:
-        c_row = cust_df[cust_df["YearMonth"] == m]
-        active = int(c_row["active_customers"].iloc[0]) if len(c_row) else 0
-        new = int(c_row["new_customers"].iloc[0]) if len(c_row) else 0
-
-        r_row = rev_df[rev_df["YearMonth"] == m]
-        rev_new = float(r_row["rev_new"].iloc[0]) if len(r_row) else 0.0
-        rev_existing = float(r_row["rev_existing"].iloc[0]) if len(r_row) else 0.0
-
-        i_row = items_df[items_df["ym"] == m]
-        items_new = int(i_row["items_new"].iloc[0]) if len(i_row) else 0
-        items_existing = int(i_row["items_existing"].iloc[0]) if len(i_row) else 0
-
+        s = sales[m]
         result[m] = {
-            "new_customers": new,
-            "existing_customers": active - new,
-            "new_items": items_new,
-            "existing_items": items_existing,
-            "new_revenue": rev_new,
-            "existing_revenue": rev_existing,
+            "new_customers": s["new_customers"],
+            "existing_customers": s["customers"] - s["new_customers"],
+            "new_items": items[m, "new"]["items"],
+            "existing_items": items[m, "existing"]["items"],
+            "new_revenue": s["rev_new"],
+            "existing_revenue": s["rev_existing"],
         }
     _log_query_time("fetch_new_customer_detail_batch", time.perf_counter() - _t0, len(months))
     return result
@@ -0,0 +1,389 @@
+"""Snapshot-versioned cache for the dashboard's query fetchers.
+
+Replaces ``@st.cache_data(ttl=300)`` on the fetchers in dashboard_shared,
+section_data and customer_report_shared.  A result is keyed on
+(fetcher, arguments, data version) and never expires by time:
+
+  - data version: the snapshot the CURRENT pointer names (snapshot_store) for
+    DuckDB and Parquet serving, or the Postgres data_version row that the sync
+    bumps in the transaction swapping the new tables in (migration 006).  A
+    refresh publishes a new version, so the next fetch misses and every entry
+    of older versions is dropped.
+  - memory tier: LRU per process, bounded by DASHBOARD_CACHE_MAX_ENTRIES
+    results and DASHBOARD_CACHE_MAX_MB of estimated result size (a period
+    cube or customer frame weighs far more than a KPI dict).
+  - disk tier (DASHBOARD_CACHE_DIR, optional): one folder per data version,
+    shared by every dashboard process.  DataFrames are stored as Arrow IPC
+    (Feather) files and the rest of a result as JSON; results that cannot be
+    stored exactly stay in memory only.
+
+Postgres is asked for its version at most every DASHBOARD_VERSION_POLL_S
+seconds; the file pointers are read on every fetch.  Hits return a copy, as
+st.cache_data does, so callers may mutate what they get.  Concurrent misses
+on one key compute it once: the other callers wait for that result (pages
+prefetch fetchers that share the period cube).
+
+Usage:
+    from dashboard_cache import snapshot_cached
+
+    @snapshot_cached
+    def fetch_something(_con, periods_tuple):
+        ...
+"""
+
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import (
+    ANALYTICS_DATABASE_URL,
+    DASHBOARD_CACHE_DIR,
+    DASHBOARD_CACHE_MAX_ENTRIES,
+    DASHBOARD_CACHE_MAX_MB,
+    DASHBOARD_VERSION_POLL_S,
+    DB_PATH,
+    DIMPERIOD_CSV,
+    ITEMS_CSV,
+    PARQUET_SERVING_PATH,
+    SALES_CSV,
+    SERVING_MODE,
+)
+from logger_config import setup_logger
+from snapshot_store import current_db_path
+
+logger = setup_logger(__name__)
+
+# Disk tier: version folders kept besides the current one (a process still
+# serving the previous version keeps reading its entries until it moves on)
+_KEEP_OLD_VERSIONS = 1
+
+_MISSING = object()
+
+_lock = threading.Lock()
+# (fetcher, args, version) -> result, least recently used first
+_memory: OrderedDict = OrderedDict()
+# key -> estimated bytes of its result (_estimate_bytes), and their sum
+_sizes: dict = {}
+_memory_bytes = {"total": 0}
+# key -> lock held while that key is computed (single-flight)
+_computing: dict = {}
+# Switch for uncached() (benchmarks time the queries, not the cache).  A context
+# variable, so work a fetcher hands to the dashboard's worker threads under
+# contextvars.copy_context() (dashboard_shared._submit) is bypassed with it.
+_bypass = contextvars.ContextVar("dashboard_cache_bypass", default=False)
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_writes": 0, "invalidations": 0}
+# Last data version this process served, and the throttled Postgres lookup
+_current = {"version": None}
+_pg_version = {"value": None, "checked": 0.0}
+
+
+# =====================================================================
+# DATA VERSION
+# =====================================================================
+
+
+def _file_version() -> str:
+    """Version of the file-backed source get_connection() opens (mirrors its fallbacks)."""
+    if SERVING_MODE == "parquet":
+        served = current_db_path(PARQUET_SERVING_PATH)
+        if served.is_dir():
+            return f"parquet-{served.name}"
+    db_file = current_db_path(DB_PATH)
+    if db_file.exists():
+        # The legacy single-file DB_PATH is rebuilt in place: its mtime is part of the version
+        return f"duckdb-{db_file.name}-{db_file.stat().st_mtime_ns}"
+    staged = [Path(p) for p in (SALES_CSV, ITEMS_CSV, DIMPERIOD_CSV)]
+    staged += [p.with_suffix(".parquet") for p in staged]
+    return f"staged-{max((p.stat().st_mtime_ns for p in staged if p.exists()), default=0)}"
+
+
+def _postgres_version(con) -> str:
+    """data_version of the live analytics schema, re-read at most every DASHBOARD_VERSION_POLL_S."""
+    now = time.monotonic()
+    if _pg_version["value"] is None or now - _pg_version["checked"] >= DASHBOARD_VERSION_POLL_S:
+        try:
+            value = f"pg-{con.execute('SELECT version FROM data_version').fetchone()[0]}"
+        except Exception:
+            # Before migration 006: every sync swaps in a new schema, so its oid changes
+            oid = con.execute("SELECT oid FROM pg_namespace WHERE nspname = current_schema()").fetchone()[0]
+            value = f"pg-schema-{oid}"
+        _pg_version.update(value=value, checked=now)
+    return _pg_version["value"]
+
+
+def data_version(con) -> str:
+    """Version of the data ``con`` serves; changes whenever a refresh publishes new data."""
+    if ANALYTICS_DATABASE_URL:
+        return _postgres_version(con)
+    return _file_version()
+
+
+def _observe(version: str) -> None:
+    """Drop every entry of other versions the first time this process serves ``version``."""
+    if version == _current["version"]:
+        return
+    with _lock:
+        previous = _current["version"]
+        if version == previous:
+            return
+        _current["version"] = version
+        stale = [key for key in _memory if key[2] != version]
+        for key in stale:
+            _forget(key)
+        if previous is not None:
+            _stats["invalidations"] += 1
+    if previous is not None:
+        logger.info(f"  [OK] Data version {previous} -> {version}: dropped {len(stale)} cached result(s)")
+    if DASHBOARD_CACHE_DIR:
+        _prune_disk(version)
+
+
+# =====================================================================
+# DISK TIER
+# =====================================================================
+
+
+def _version_dir(version: str) -> Path:
+    return Path(DASHBOARD_CACHE_DIR) / re.sub(r"[^A-Za-z0-9._-]", "_", version)
+
+
+def _entry_stem(name: str, args: tuple) -> str:
+    return f"{name}-{hashlib.sha1(repr(args).encode()).hexdigest()[:20]}"
+
+
+def _encode(value, frames: list):
+    """JSON-ready form of ``value`` with DataFrames moved to ``frames``; TypeError if not storable exactly."""
+    import pandas as pd
+
+    if isinstance(value, pd.DataFrame):
+        frames.append(value)
+        return {"__frame__": len(frames) - 1}
+    if isinstance(value, dict):
+        if "__frame__" in value or not all(isinstance(k, str) for k in value):
+            raise TypeError("only string-keyed dicts can be stored")
+        return {k: _encode(v, frames) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_encode(v, frames) for v in value]
+    if value is None or type(value) in (str, int, float, bool):
+        return value
+    raise TypeError(f"cannot store {type(value).__name__}")
+
+
+def _decode(value, frames: list):
+    if isinstance(value, dict):
+        if len(value) == 1 and "__frame__" in value:
+            return frames[value["__frame__"]]
+        return {k: _decode(v, frames) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v, frames) for v in value]
+    return value
+
+
+def _disk_read(version: str, stem: str):
+    from pyarrow import feather
+
+    folder = _version_dir(version)
+    try:
+        payload = json.loads((folder / f"{stem}.json").read_text())
+        frames = [feather.read_feather(folder / f"{stem}.{i}.arrow") for i in range(payload["frames"])]
+    except FileNotFoundError:
+        return _MISSING
+    except Exception as exc:
+        logger.warning(f"  [WARN] Unreadable cache entry {folder.name}/{stem}: {exc}")
+        return _MISSING
+    return _decode(payload["value"], frames)
+
+
+def _disk_write(version: str, stem: str, value) -> bool:
+    """Store ``value`` for every dashboard process; the JSON file is written last and marks it complete."""
+    from pyarrow import feather
+
+    frames = []
+    try:
+        encoded = _encode(value, frames)
+        payload = json.dumps({"frames": len(frames), "value": encoded}, allow_nan=True)
+    except (TypeError, ValueError):
+        return False
+    folder = _version_dir(version)
+    suffix = f".{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        for i, df in enumerate(frames):
+            path = folder / f"{stem}.{i}.arrow"
+            feather.write_feather(df, path.with_name(path.name + suffix))
+            os.replace(path.with_name(path.name + suffix), path)
+        path = folder / f"{stem}.json"
+        path.with_name(path.name + suffix).write_text(payload)
+        os.replace(path.with_name(path.name + suffix), path)
+    except Exception as exc:
+        logger.warning(f"  [WARN] Could not write cache entry {folder.name}/{stem}: {exc}")
+        return False
+    return True
+
+
+def _prune_disk(version: str) -> None:
+    """Remove version folders other than ``version`` and the newest _KEEP_OLD_VERSIONS before it."""
+    root = Path(DASHBOARD_CACHE_DIR)
+    if not root.is_dir():
+        return
+    current = _version_dir(version).name
+    older = sorted(
+        (p for p in root.iterdir() if p.is_dir() and p.name != current),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for folder in older[_KEEP_OLD_VERSIONS:]:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+# =====================================================================
+# CACHE
+# =====================================================================
+
+
+def _estimate_bytes(value) -> int:
+    """Approximate in-memory size of a fetcher result (DataFrames measured deep)."""
+    import pandas as pd
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_bytes(k) + _estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _forget(key: tuple) -> None:
+    """Drop ``key`` from the memory tier (caller holds _lock)."""
+    del _memory[key]
+    _memory_bytes["total"] -= _sizes.pop(key, 0)
+
+
+def _remember(key: tuple, value) -> None:
+    size = _estimate_bytes(value)
+    max_bytes = DASHBOARD_CACHE_MAX_MB * 1024 * 1024
+    with _lock:
+        if key in _memory:
+            _forget(key)
+        _memory[key] = value
+        _sizes[key] = size
+        _memory_bytes["total"] += size
+        # Least recently used first; the new result stays even if it alone exceeds the budget
+        while len(_memory) > 1 and (len(_memory) > DASHBOARD_CACHE_MAX_ENTRIES or _memory_bytes["total"] > max_bytes):
+            _forget(next(iter(_memory)))
+
+
+def snapshot_cached(fn):
+    """Cache ``fn(_con, *args)`` per (fetcher, args, data version), with no TTL.
+
+    ``_con`` is not part of the key (like st.cache_data's underscore
+    arguments); the rest must be hashable.  ``fn.__wrapped__`` runs ``fn``
+    itself uncached; inside ``uncached()`` so do the cached fetchers it calls.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(_con, *args):
+        if _bypass.get():
+            return fn(_con, *args)
+        version = data_version(_con)
+        _observe(version)
+        key = (name, args, version)
+        with _lock:
+            value = _memory.get(key, _MISSING)
+            if value is not _MISSING:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+        if value is _MISSING and DASHBOARD_CACHE_DIR:
+            value = _disk_read(version, _entry_stem(name, args))
+            if value is not _MISSING:
+                with _lock:
+                    _stats["disk_hits"] += 1
+                _remember(key, value)
+        if value is _MISSING:
+            value = _compute_once(key, lambda: fn(_con, *args), (version, _entry_stem(name, args)))
+        return copy.deepcopy(value)
+
+    return wrapper
+
+
+def _compute_once(key: tuple, compute, disk_entry: tuple):
+    """Run ``compute`` for a missed ``key`` unless another thread already is; then wait for its result."""
+    with _lock:
+        gate = _computing.setdefault(key, threading.Lock())
+    try:
+        with gate:
+            with _lock:
+                value = _memory.get(key, _MISSING)
+                if value is not _MISSING:
+                    _stats["memory_hits"] += 1
+                else:
+                    _stats["misses"] += 1
+            if value is _MISSING:
+                value = compute()
+                _remember(key, value)
+                if DASHBOARD_CACHE_DIR and _disk_write(*disk_entry, value):
+                    with _lock:
+                        _stats["disk_writes"] += 1
+    finally:
+        with _lock:
+            if _computing.get(key) is gate:
+                del _computing[key]
+    return value
+
+
+@contextmanager
+def uncached():
+    """Run every snapshot_cached fetcher called in this context uncached (nothing read or stored).
+
+    Covers the fetchers prefetch() and query_dfs() run on worker threads, which
+    inherit the submitting context.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def clear_cache(disk: bool = False) -> int:
+    """Drop every in-memory entry (and the shared disk tier if ``disk``); returns the entries dropped."""
+    with _lock:
+        dropped = len(_memory)
+        _memory.clear()
+        _sizes.clear()
+        _memory_bytes["total"] = 0
+        _pg_version.update(value=None, checked=0.0)
+    if disk and DASHBOARD_CACHE_DIR:
+        shutil.rmtree(DASHBOARD_CACHE_DIR, ignore_errors=True)
+    return dropped
+
+
+def cache_stats() -> dict:
+    """Hit counts per tier, entries (and estimated MB) held and the data version last served."""
+    with _lock:
+        stats, entries, memory_bytes = dict(_stats), len(_memory), _memory_bytes["total"]
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    hits = stats["memory_hits"] + stats["disk_hits"]
+    return {
+        **stats,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "entries": entries,
+        "max_entries": DASHBOARD_CACHE_MAX_ENTRIES,
+        "memory_mb": round(memory_bytes / (1024 * 1024), 3),
+        "max_mb": DASHBOARD_CACHE_MAX_MB,
+        "disk_tier": bool(DASHBOARD_CACHE_DIR),
+        "version": _current["version"],
+    }
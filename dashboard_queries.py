@@ -0,0 +1,364 @@
+"""SQL templates of the dashboard's registered queries — importable without Streamlit.
+
+The batch fetchers in dashboard_shared and section_data run these through
+query_df() / query_row() / query_dfs() under the names below; the DuckDB
+loader's index advisor (cleancloud_to_duckdb.advise_indexes) replays the same
+templates, so an index is kept only if the queries the dashboard actually
+issues get faster.
+
+Each entry is ``name: (parameter, template)``.  The parameter says what $1
+binds: ``"period"`` / ``"periods"`` — one label or a list of labels of the
+page's grain (YearMonth or ISOWeekLabel) — or ``"month"`` / ``"months"`` for
+queries that only run at the monthly grain.  Templates of the page's grain
+carry ``{period_col}`` / ``{items_period_col}`` / ``{grain}`` placeholders,
+filled from grain_context().
+"""
+
+
+# =====================================================================
+# GRAINS
+# =====================================================================
+
+
+def grain_context(grain: str) -> dict:
+    """Period key columns of ``grain`` ("monthly" / "weekly"); see dashboard_shared.get_grain_context()."""
+    weekly = grain == "weekly"
+    key = "ISOWeekLabel" if weekly else "YearMonth"
+    return {
+        "grain": grain,
+        "period_key": key,
+        "period_col": f"s.{key}",
+        "items_period_col": f"i.{key}",
+        "sales_join": "s.Earned_Date = p.Date" if weekly else "s.OrderCohortMonth = p.Date",
+    }
+
+
+def named_query(name: str, ctx: dict | None = None) -> tuple[str, str]:
+    """``(name, SQL)`` of registered query ``name``, its placeholders filled from ``ctx``."""
+    template = QUERIES[name][1]
+    return name, template.format(**ctx) if ctx else template
+
+
+# =====================================================================
+# TEMPLATES
+# =====================================================================
+
+QUERIES: dict[str, tuple[str, str]] = {
+    # --- dashboard_shared.fetch_measures -----------------------------
+    "period_measures.customers": (
+        "period",
+        """
+        SELECT
+            COUNT(DISTINCT s.CustomerID_Std),
+            COUNT(DISTINCT CASE
+                WHEN s.Transaction_Type = 'Subscription' THEN s.CustomerID_Std
+            END)
+        FROM sales s
+        WHERE s.Transaction_Type <> 'Invoice Payment'
+          AND s.Earned_Date IS NOT NULL
+          AND {period_col} = $1
+    """,
+    ),
+    "period_measures.items": (
+        "period",
+        """
+        SELECT
+            COALESCE(SUM(sub.qty), 0),
+            COALESCE(SUM(CASE WHEN sub.iss = FALSE THEN sub.qty END), 0),
+            COALESCE(SUM(CASE WHEN sub.iss = TRUE THEN sub.qty END), 0)
+        FROM (
+            SELECT i.Quantity AS qty,
+                   COALESCE(ol.IsSubscriptionService, FALSE) AS iss
+            FROM items i
+            LEFT JOIN order_lookup ol ON i.OrderID_Std = ol.OrderID_Std
+            WHERE {items_period_col} = $1
+        ) sub
+    """,
+    ),
+    "period_measures.revenue": (
+        "period",
+        """
+        SELECT
+            COALESCE(SUM(s.Total_Num), 0),
+            COALESCE(SUM(CASE
+                WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = FALSE
+                THEN s.Total_Num END), 0),
+            COALESCE(SUM(CASE
+                WHEN s.Transaction_Type = 'Subscription' THEN s.Total_Num
+                WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = TRUE
+                THEN s.Total_Num END), 0)
+        FROM sales s
+        WHERE s.Earned_Date IS NOT NULL
+          AND {period_col} = $1
+    """,
+    ),
+    "period_measures.stops": (
+        "period",
+        """
+        SELECT
+            COALESCE(SUM(s.HasDelivery::INT), 0),
+            COALESCE(SUM(s.HasPickup::INT), 0)
+        FROM sales s
+        WHERE s.Earned_Date IS NOT NULL
+          AND {period_col} = $1
+    """,
+    ),
+    # --- dashboard_shared.fetch_period_cube (Postgres period-measure views)
+    "period_cube.sales_view": (
+        "periods",
+        """
+            SELECT s.*,
+                   COALESCE(r.inside_customers, 0) AS inside_customers,
+                   COALESCE(r.inside_items, 0) AS inside_items,
+                   COALESCE(r.inside_stops, 0) AS inside_stops,
+                   COALESCE(r.inside_revenue, 0) AS inside_revenue,
+                   COALESCE(r.outer_customers, 0) AS outer_customers,
+                   COALESCE(r.outer_items, 0) AS outer_items,
+                   COALESCE(r.outer_stops, 0) AS outer_stops,
+                   COALESCE(r.outer_revenue, 0) AS outer_revenue
+            FROM period_sales_{grain} s
+            LEFT JOIN (
+                SELECT period,
+                       SUM(CASE WHEN Route_Category = 'Inside Abu Dhabi' THEN customers END) AS inside_customers,
+                       SUM(CASE WHEN Route_Category = 'Inside Abu Dhabi' THEN items END) AS inside_items,
+                       SUM(CASE WHEN Route_Category = 'Inside Abu Dhabi' THEN stops END) AS inside_stops,
+                       SUM(CASE WHEN Route_Category = 'Inside Abu Dhabi' THEN revenue END) AS inside_revenue,
+                       SUM(CASE WHEN Route_Category = 'Outer Abu Dhabi' THEN customers END) AS outer_customers,
+                       SUM(CASE WHEN Route_Category = 'Outer Abu Dhabi' THEN items END) AS outer_items,
+                       SUM(CASE WHEN Route_Category = 'Outer Abu Dhabi' THEN stops END) AS outer_stops,
+                       SUM(CASE WHEN Route_Category = 'Outer Abu Dhabi' THEN revenue END) AS outer_revenue
+                FROM period_routes_{grain}
+                WHERE period = ANY($1)
+                GROUP BY period
+            ) r ON r.period = s.period
+            WHERE s.period = ANY($1)
+        """,
+    ),
+    "period_cube.items_view": (
+        "periods",
+        """
+            SELECT period, Item_Category, Service_Type, iss, age, items, revenue, express_items
+            FROM period_items_{grain}
+            WHERE period = ANY($1)
+        """,
+    ),
+    # --- dashboard_shared.fetch_period_cube (fact tables) ------------
+    "period_cube.sales": (
+        "periods",
+        """
+            SELECT {period_col} AS period,
+                   COUNT(DISTINCT CASE WHEN s.Transaction_Type <> 'Invoice Payment'
+                                       THEN s.CustomerID_Std END) AS customers,
+                   COUNT(DISTINCT CASE WHEN s.Transaction_Type = 'Subscription'
+                                       THEN s.CustomerID_Std END) AS subscribers,
+                   COUNT(DISTINCT CASE WHEN s.Transaction_Type <> 'Invoice Payment' AND s.MonthsSinceCohort = 0
+                                       THEN s.CustomerID_Std END) AS new_customers,
+                   COALESCE(SUM(s.Total_Num), 0) AS rev_total,
+                   COALESCE(SUM(CASE
+                       WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = FALSE
+                       THEN s.Total_Num END), 0) AS rev_client,
+                   COALESCE(SUM(CASE
+                       WHEN s.Transaction_Type = 'Subscription' THEN s.Total_Num
+                       WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = TRUE
+                       THEN s.Total_Num END), 0) AS rev_sub,
+                   COALESCE(SUM(CASE WHEN s.MonthsSinceCohort = 0 THEN s.Total_Num END), 0) AS rev_new,
+                   COALESCE(SUM(CASE WHEN s.MonthsSinceCohort > 0 THEN s.Total_Num END), 0) AS rev_existing,
+                   COALESCE(SUM(s.HasDelivery::INT), 0) AS deliveries,
+                   COALESCE(SUM(s.HasPickup::INT), 0) AS pickups,
+                   SUM(CASE WHEN s.HasDelivery THEN s.Pieces ELSE 0 END) AS items_delivered,
+                   SUM(CASE WHEN s.HasDelivery THEN s.Total_Num ELSE 0 END) AS delivery_revenue,
+                   SUM(s.Collections) AS total_collections,
+                   SUM(CASE WHEN s.Payment_Type_Std = 'Stripe' THEN s.Collections ELSE 0 END) AS stripe,
+                   SUM(CASE WHEN s.Payment_Type_Std = 'Terminal' THEN s.Collections ELSE 0 END) AS terminal,
+                   SUM(CASE WHEN s.Payment_Type_Std = 'Cash' THEN s.Collections ELSE 0 END) AS cash,
+                   AVG(s.DaysToPayment) AS avg_days_to_payment,
+                   AVG(s.Processing_Days) AS avg_processing_time,
+                   AVG(s.TimeInStore_Days) AS avg_time_in_store,
+                   COUNT(DISTINCT CASE WHEN s.Route_Category = 'Inside Abu Dhabi'
+                                       THEN s.CustomerID_Std END) AS inside_customers,
+                   SUM(CASE WHEN s.Route_Category = 'Inside Abu Dhabi' AND s.HasDelivery
+                            THEN s.Pieces ELSE 0 END) AS inside_items,
+                   SUM(CASE WHEN s.Route_Category = 'Inside Abu Dhabi'
+                            THEN s.HasDelivery::INT + s.HasPickup::INT ELSE 0 END) AS inside_stops,
+                   SUM(CASE WHEN s.Route_Category = 'Inside Abu Dhabi' THEN s.Total_Num ELSE 0 END) AS inside_revenue,
+                   COUNT(DISTINCT CASE WHEN s.Route_Category = 'Outer Abu Dhabi'
+                                       THEN s.CustomerID_Std END) AS outer_customers,
+                   SUM(CASE WHEN s.Route_Category = 'Outer Abu Dhabi' AND s.HasDelivery
+                            THEN s.Pieces ELSE 0 END) AS outer_items,
+                   SUM(CASE WHEN s.Route_Category = 'Outer Abu Dhabi'
+                            THEN s.HasDelivery::INT + s.HasPickup::INT ELSE 0 END) AS outer_stops,
+                   SUM(CASE WHEN s.Route_Category = 'Outer Abu Dhabi' THEN s.Total_Num ELSE 0 END) AS outer_revenue
+            FROM sales s
+            WHERE s.Earned_Date IS NOT NULL
+              AND {period_col} = ANY($1)
+            GROUP BY {period_col}
+        """,
+    ),
+    "period_cube.items": (
+        "periods",
+        """
+            SELECT {items_period_col} AS period, i.Item_Category, i.Service_Type,
+                   COALESCE(ol.IsSubscriptionService, FALSE) AS iss,
+                   CASE WHEN ol.MonthsSinceCohort = 0 THEN 'new'
+                        WHEN COALESCE(ol.MonthsSinceCohort, 1) > 0 THEN 'existing'
+                        ELSE 'other' END AS age,
+                   SUM(i.Quantity) AS items,
+                   SUM(i.Total) AS revenue,
+                   SUM(CASE WHEN i.Express = TRUE THEN i.Quantity ELSE 0 END) AS express_items
+            FROM items i
+            LEFT JOIN order_lookup ol ON i.OrderID_Std = ol.OrderID_Std
+            WHERE {items_period_col} = ANY($1)
+            GROUP BY 1, 2, 3, 4, 5
+        """,
+    ),
+    # --- section_data: 02 customer insights --------------------------
+    "customer_insights.active": (
+        "months",
+        """
+        SELECT cq.YearMonth,
+            COUNT(DISTINCT cq.CustomerID_Std) AS active_customers,
+            COUNT(DISTINCT CASE WHEN cq.Is_Multi_Service = TRUE
+                  THEN cq.CustomerID_Std END) AS multi_service
+        FROM customer_quality cq
+        WHERE cq.YearMonth = ANY($1)
+        GROUP BY cq.YearMonth
+    """,
+    ),
+    "customer_insights.top20": (
+        "months",
+        """
+        WITH thresholds AS (
+            SELECT cq.YearMonth,
+                PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY cq.Monthly_Revenue) AS p80_rev,
+                PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY cq.Monthly_Items) AS p80_items
+            FROM customer_quality cq
+            WHERE cq.YearMonth = ANY($1)
+            GROUP BY cq.YearMonth
+        )
+        SELECT cq.YearMonth,
+            t.p80_rev AS spend_threshold,
+            SUM(CASE WHEN cq.Monthly_Revenue >= t.p80_rev THEN cq.Monthly_Revenue ELSE 0 END) AS top20_spend_rev,
+            SUM(cq.Monthly_Revenue) AS total_rev,
+            t.p80_items AS volume_threshold,
+            SUM(CASE WHEN cq.Monthly_Items >= t.p80_items THEN cq.Monthly_Revenue ELSE 0 END) AS top20_vol_rev
+        FROM customer_quality cq
+        JOIN thresholds t ON cq.YearMonth = t.YearMonth
+        WHERE cq.YearMonth = ANY($1)
+        GROUP BY cq.YearMonth, t.p80_rev, t.p80_items
+    """,
+    ),
+    # --- section_data: 03 cohort analysis ----------------------------
+    "cohort.sales": (
+        "months",
+        """
+        SELECT s.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER) AS cohort_month,
+            COUNT(DISTINCT s.CustomerID_Std) AS customers,
+            SUM(s.Total_Num) AS revenue
+        FROM sales s
+        WHERE s.Earned_Date IS NOT NULL
+          AND s.MonthsSinceCohort IN (0, 1)
+          AND s.YearMonth = ANY($1)
+        GROUP BY s.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER)
+    """,
+    ),
+    "cohort.items": (
+        "months",
+        """
+        SELECT i.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER) AS cohort_month,
+            SUM(i.Quantity) AS items
+        FROM items i
+        LEFT JOIN (
+            SELECT DISTINCT OrderID_Std, MonthsSinceCohort FROM sales
+        ) sc ON i.OrderID_Std = sc.OrderID_Std
+        WHERE sc.MonthsSinceCohort IN (0, 1)
+          AND i.YearMonth = ANY($1)
+        GROUP BY i.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER)
+    """,
+    ),
+    "extended_cohort.sales": (
+        "months",
+        """
+        SELECT s.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER) AS cohort_month,
+            COUNT(DISTINCT s.CustomerID_Std) AS customers,
+            SUM(s.Total_Num) AS revenue
+        FROM sales s
+        WHERE s.Earned_Date IS NOT NULL
+          AND s.MonthsSinceCohort IN (0, 1, 2, 3)
+          AND s.YearMonth = ANY($1)
+        GROUP BY s.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER)
+    """,
+    ),
+    "extended_cohort.items": (
+        "months",
+        """
+        SELECT i.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER) AS cohort_month,
+            SUM(i.Quantity) AS items
+        FROM items i
+        LEFT JOIN (
+            SELECT DISTINCT OrderID_Std, MonthsSinceCohort FROM sales
+        ) sc ON i.OrderID_Std = sc.OrderID_Std
+        WHERE sc.MonthsSinceCohort IN (0, 1, 2, 3)
+          AND i.YearMonth = ANY($1)
+        GROUP BY i.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER)
+    """,
+    ),
+    # --- section_data: persona pages ---------------------------------
+    "reactivation.customers": (
+        "months",
+        """
+        WITH monthly_active AS (
+            SELECT DISTINCT s.CustomerID_Std, s.OrderCohortMonth AS month_date, s.YearMonth
+            FROM sales s
+            WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
+        ),
+        with_lag AS (
+            SELECT CustomerID_Std, month_date, YearMonth,
+                   LAG(month_date) OVER (PARTITION BY CustomerID_Std ORDER BY month_date) AS prev_month
+            FROM monthly_active
+        ),
+        reactivated AS (
+            SELECT CustomerID_Std, YearMonth FROM with_lag
+            WHERE prev_month IS NOT NULL AND month_date >= prev_month + INTERVAL '3 months'
+        )
+        SELECT r.YearMonth, COUNT(DISTINCT r.CustomerID_Std) AS reactivated_customers
+        FROM reactivated r
+        WHERE r.YearMonth = ANY($1)
+        GROUP BY r.YearMonth
+    """,
+    ),
+    "rfm.customers": (
+        "month",
+        """
+        WITH period_anchor AS (
+            SELECT MAX(p.Date) AS anchor_date
+            FROM dim_period p WHERE p.YearMonth = $1
+        ),
+        cutoff AS (
+            SELECT DATE_TRUNC('month', anchor_date - INTERVAL '6 months') AS from_date
+            FROM period_anchor
+        )
+        SELECT s.CustomerID_Std,
+               ((SELECT anchor_date FROM period_anchor) - MAX(s.Earned_Date)) AS recency,
+               COUNT(DISTINCT s.OrderID_Std) AS frequency,
+               SUM(s.Total_Num) AS monetary
+        FROM sales s
+        WHERE s.Earned_Date IS NOT NULL
+          AND s.Transaction_Type <> 'Invoice Payment'
+          AND s.OrderCohortMonth >= (SELECT from_date FROM cutoff)
+          AND s.OrderCohortMonth <= (SELECT anchor_date FROM period_anchor)
+        GROUP BY s.CustomerID_Std
+        HAVING SUM(s.Total_Num) > 0
+    """,
+    ),
+    "pareto.customers": (
+        "month",
+        """
+        SELECT s.CustomerID_Std, c.CustomerName, SUM(s.Total_Num) AS revenue
+        FROM sales s
+        JOIN customers c ON s.CustomerID_Std = c.CustomerID_Std
+        WHERE s.Earned_Date IS NOT NULL AND s.YearMonth = $1
+        GROUP BY s.CustomerID_Std, c.CustomerName
+        ORDER BY revenue DESC
+    """,
+    ),
+}
@@ -5,13 +5,20 @@ Provides: DB connection, Dirham formatting, card rendering, SQL measures,
 trend chart rendering, global CSS injection, and month selector.
 """
 
+import contextvars
+import functools
+import hashlib
+import queue
 import re
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import duckdb
 import plotly.graph_objects as go
 import time
 import json
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date
 from pathlib import Path
 
@@ -25,9 +32,19 @@ from config import (
     DIMPERIOD_CSV,
     DB_PATH,
     LOGS_PATH,
-    DUCKDB_KEY,
+    DUCKDB_FILE_KEY,
     ANALYTICS_DATABASE_URL,
+    LOCAL_STAGING_PATH,
+    PARQUET_SERVING_PATH,
+    SERVING_MODE,
+    DUCKDB_POOL_SIZE,
+    DUCKDB_THREADS,
+    DUCKDB_MEMORY_LIMIT,
+    DASHBOARD_FETCH_WORKERS,
 )
+from snapshot_store import current_db_path
+from dashboard_cache import cache_stats, snapshot_cached
+from dashboard_queries import grain_context, named_query
 
 # Use Postgres when ANALYTICS_DATABASE_URL is configured (Tock M parallel-run).
 # Falls back to DuckDB when the URL is absent (local dev without secrets.toml).
@@ -65,6 +82,7 @@ _PG_KEYWORDS = frozenset(
         "WITH",
         "UNION",
         "ALL",
+        "ANY",
         "INSERT",
         "INTO",
         "VALUES",
@@ -110,6 +128,7 @@ _PG_KEYWORDS = frozenset(
         "LEAD",
         "RANK",
         "DENSE_RANK",
+        "UNNEST",
         # Date / time functions
         "DATE_TRUNC",
         "DATE_PART",
@@ -192,71 +211,209 @@ def _pg_quote_identifiers(sql: str) -> str:
     - SQL keywords and all-lowercase identifiers are left untouched.
     - Any unquoted alphanumeric/underscore token that contains an uppercase
       letter and is not a known SQL keyword is wrapped in double-quotes.
+    - After a "." the token is a column, so keyword names (p.Date) are quoted too.
     """
     tokens = re.split(
         r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|\s+|[,()\[\]{}.:;=<>!+\-*/])',
         sql,
     )
     out = []
+    prev = ""
     for tok in tokens:
         if not tok:
             out.append(tok)
-        elif tok[0] in ('"', "'"):
+            continue
+        if tok[0] in ('"', "'"):
             # Already-quoted literal — preserve as-is
             out.append(tok)
         elif re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", tok):
-            # Plain identifier — quote if mixed-case and not a SQL keyword
-            if any(c.isupper() for c in tok) and tok.upper() not in _PG_KEYWORDS:
+            # Plain identifier — quote if mixed-case and not a SQL keyword (or qualified)
+            if any(c.isupper() for c in tok) and (prev == "." or tok.upper() not in _PG_KEYWORDS):
                 out.append(f'"{tok}"')
             else:
                 out.append(tok)
         else:
             out.append(tok)
+        if not tok.isspace():
+            prev = tok
     return "".join(out)
 
 
+# Time spent translating on cache misses (hits cost a dict lookup); with
+# _translate_pg_sql.cache_info() this feeds pg_sql_cache_stats()
+_PG_TRANSLATE_SECONDS = [0.0]
+_PG_TRANSLATE_LOCK = threading.Lock()  # query_dfs/prefetch translate on worker threads
+
+
+@functools.lru_cache(maxsize=256)
+def _translate_pg_sql(sql: str) -> tuple[str, str]:
+    """Translate DuckDB-dialect SQL for Postgres once per distinct SQL text (LRU-cached).
+
+    Returns (pg_sql, bind_sql): ``pg_sql`` has mixed-case identifiers quoted
+    and keeps the $N placeholders (Postgres syntax, used by prepared
+    statements); ``bind_sql`` is the psycopg2 template with %(pN)s
+    placeholders and literal % escaped, for binding client-side.
+    """
+    t0 = time.perf_counter()
+    pg_sql = _pg_quote_identifiers(sql)
+    bind_sql = re.sub(r"\$(\d+)", r"%(p\1)s", pg_sql.replace("%", "%%"))
+    elapsed = time.perf_counter() - t0
+    with _PG_TRANSLATE_LOCK:
+        _PG_TRANSLATE_SECONDS[0] += elapsed
+    return pg_sql, bind_sql
+
+
+def pg_sql_cache_stats() -> dict:
+    """Hit rate, size and miss-side translation time of the translated-SQL cache."""
+    info = _translate_pg_sql.cache_info()
+    with _PG_TRANSLATE_LOCK:
+        translate_s = _PG_TRANSLATE_SECONDS[0]
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "translate_ms": round(translate_s * 1000, 3),
+    }
+
+
+# Postgres result type OIDs -> Polars dtype for the columnar fetch path
+# (COPY ... TO STDOUT arrives as text); other types (text, varchar, enums,
+# intervals, ...) stay strings.  NUMERIC becomes Float64, like DuckDB's .df().
+_PG_COLUMN_TYPES = {
+    16: "bool",
+    20: "int",
+    21: "int",
+    23: "int",
+    26: "int",
+    700: "float",
+    701: "float",
+    1700: "float",
+    1082: "date",
+    1114: "datetime",
+}
+
+# Result columns (name, type OID) per SQL template for the COPY path, bounded;
+# bound parameter values never change a template's columns
+_PG_RESULT_COLUMNS: dict[str, list[tuple[str, int]]] = {}
+_PG_RESULT_COLUMNS_MAX = 512
+
+
 class _PgResult:
-    """Wraps a pending SQLAlchemy query with DuckDB-compatible .df()/.fetchone()."""
+    """Wraps a pending Postgres query with DuckDB-compatible .df()/.pl()/.fetchone()/.fetchall().
 
-    __slots__ = ("_engine", "_sql", "_params")
+    Runs on a pooled connection of the process-wide engine (db.database).
+    .df() / .pl() stream the result through COPY ... TO STDOUT (CSV) and parse
+    it column-wise in Polars, so large results never become per-row Python
+    objects.  .fetchone() / .fetchall() run parameterized SQL as server-side
+    prepared statements, PREPAREd once per pooled connection.
+    """
+
+    __slots__ = ("_engine", "_sql", "_bind_sql", "_params")
 
-    def __init__(self, engine, sql: str, params: dict):
+    def __init__(self, engine, sql: str, bind_sql: str, params: list):
         self._engine = engine
         self._sql = sql
+        self._bind_sql = bind_sql
         self._params = params
 
-    def df(self):
-        import pandas as pd
-        from sqlalchemy import text
+    def _literal_sql(self, cur) -> str:
+        """The SQL with $N parameters bound client-side (COPY takes no parameters)."""
+        if not self._params:
+            return self._sql
+        return cur.mogrify(self._bind_sql, {f"p{i}": v for i, v in enumerate(self._params, 1)}).decode()
+
+    def _columns(self, cur, sql: str) -> list[tuple[str, int]]:
+        """Result column names and type OIDs, from a zero-row run of ``sql`` (cached per SQL template)."""
+        columns = _PG_RESULT_COLUMNS.get(self._sql)
+        if columns is None:
+            cur.execute(f"SELECT * FROM ({sql.rstrip().rstrip(';')}) AS q LIMIT 0")
+            columns = [(d.name, d.type_code) for d in cur.description]
+            if len(_PG_RESULT_COLUMNS) >= _PG_RESULT_COLUMNS_MAX:
+                _PG_RESULT_COLUMNS.clear()
+            _PG_RESULT_COLUMNS[self._sql] = columns
+        return columns
+
+    def pl(self):
+        """Fetch the result as a Polars DataFrame through COPY (CSV), typed from the result columns."""
+        import io
+        import polars as pl
 
         with self._engine.connect() as conn:
-            result = conn.execute(text(self._sql), self._params)
-            rows = result.fetchall()
-            return pd.DataFrame(rows, columns=list(result.keys()))
+            cur = conn.connection.cursor()
+            sql = self._literal_sql(cur)
+            columns = self._columns(cur, sql)
+            names = [name for name, _ in columns]
+            if len(set(names)) < len(names):
+                # Duplicate column names (SELECT * over a join) — row path
+                rows = self.fetchall()
+                return pl.DataFrame([list(r) for r in rows], schema=names, orient="row", strict=False)
+            buf = io.BytesIO()
+            cur.copy_expert(f"COPY ({sql.rstrip().rstrip(';')}) TO STDOUT WITH (FORMAT csv)", buf)
+
+        raw = pl.read_csv(
+            buf.getvalue(),
+            has_header=False,
+            new_columns=names,
+            schema=dict.fromkeys(names, pl.String),
+        ) if buf.tell() else pl.DataFrame(schema=dict.fromkeys(names, pl.String))
+        casts = {
+            "bool": lambda c: pl.col(c) == "t",
+            "int": lambda c: pl.col(c).cast(pl.Int64),
+            "float": lambda c: pl.col(c).cast(pl.Float64),
+            "date": lambda c: pl.col(c).str.to_date("%Y-%m-%d"),
+            "datetime": lambda c: pl.col(c).str.to_datetime(time_unit="us"),
+        }
+        return raw.with_columns(
+            casts[kind](name) for name, oid in columns if (kind := _PG_COLUMN_TYPES.get(oid)) is not None
+        )
 
-    def fetchone(self):
-        from sqlalchemy import text
+    def df(self):
+        """Fetch the result as a pandas DataFrame (converted from .pl() through Arrow)."""
+        return self.pl().to_pandas()
+
+    def _execute(self, conn):
+        """Execute on ``conn``'s DBAPI cursor; parameterized SQL runs as a prepared statement."""
+        cur = conn.connection.cursor()
+        if not self._params:
+            cur.execute(self._sql)
+            return cur
+        # Statement name -> prepared?, kept for the life of the pooled connection
+        prepared = conn.info.setdefault("prepared", {})
+        name = "mw_" + hashlib.sha1(self._sql.encode()).hexdigest()[:16]
+        if name not in prepared:
+            try:
+                cur.execute(f"PREPARE {name} AS {self._sql}")
+                prepared[name] = True
+            except Exception:
+                # e.g. a parameter whose type Postgres cannot infer — bind client-side instead
+                conn.connection.rollback()
+                prepared[name] = False
+        if prepared[name]:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(self._params))})", self._params)
+        else:
+            cur.execute(self._literal_sql(cur))
+        return cur
 
+    def fetchone(self):
         with self._engine.connect() as conn:
-            result = conn.execute(text(self._sql), self._params)
-            return result.fetchone()
+            return self._execute(conn).fetchone()
 
     def fetchall(self):
-        from sqlalchemy import text
-
         with self._engine.connect() as conn:
-            result = conn.execute(text(self._sql), self._params)
-            return result.fetchall()
+            return self._execute(conn).fetchall()
 
 
 class _PgFacade:
     """Wraps a SQLAlchemy engine with a DuckDB-compatible .execute() interface.
 
-    On each .execute() call:
-      1. Runs _pg_quote_identifiers() to add double-quotes around mixed-case
-         column names so Postgres can resolve them correctly.
-      2. Converts DuckDB-style positional params ($1, $2 …) to SQLAlchemy
-         named params (:p1, :p2 …).
+    On each .execute() call looks up _translate_pg_sql(), which runs
+    _pg_quote_identifiers() to add double-quotes around mixed-case column
+    names (so Postgres can resolve them) once per distinct SQL text.
+    DuckDB-style positional params ($1, $2 …) are already Postgres syntax:
+    _PgResult binds them in a prepared statement, or client-side for COPY.
     """
 
     __slots__ = ("_engine",)
@@ -265,23 +422,78 @@ class _PgFacade:
         self._engine = engine
 
     def execute(self, sql: str, params=None):
-        pg_sql = _pg_quote_identifiers(sql)
-        if params:
-            # Replace $N in reverse order to avoid $1 matching inside $10, etc.
-            for i in range(len(params), 0, -1):
-                pg_sql = pg_sql.replace(f"${i}", f":p{i}")
-            param_dict = {f"p{i}": v for i, v in enumerate(params, 1)}
-        else:
-            param_dict = {}
-        return _PgResult(self._engine, pg_sql, param_dict)
+        pg_sql, bind_sql = _translate_pg_sql(sql)
+        return _PgResult(self._engine, pg_sql, bind_sql, list(params or []))
+
+
+# Materialized per-period measures built by every Postgres sync
+# (cleancloud_to_postgres.py _PERIOD_VIEWS), one per view and grain
+_PERIOD_VIEWS = (
+    "period_sales_monthly",
+    "period_sales_weekly",
+    "period_routes_monthly",
+    "period_routes_weekly",
+    "period_items_monthly",
+    "period_items_weekly",
+)
+
+# Columns the period cube reads that the first views lacked; views built
+# before them are bypassed (raw queries) until the next sync rebuilds them
+_PERIOD_VIEW_CUBE_COLUMNS = {
+    "period_sales": ("new_customers", "rev_new", "rev_existing"),
+    "period_items": ("age",),
+}
+
+
+@snapshot_cached
+def _period_views_ready(_con) -> bool:
+    """True when every period-measure view exists, is populated and has the period cube's columns."""
+    columns = [
+        f"('{view}', '{column}')"
+        for view in _PERIOD_VIEWS
+        for column in _PERIOD_VIEW_CUBE_COLUMNS.get(view.rsplit("_", 1)[0], ())
+    ]
+    try:
+        row = _con.execute(f"""
+            SELECT COUNT(*) FROM pg_matviews
+            WHERE schemaname = 'analytics' AND ispopulated
+              AND matviewname IN ({", ".join(f"'{v}'" for v in _PERIOD_VIEWS)})
+        """).fetchone()
+        column_row = _con.execute(f"""
+            SELECT COUNT(*) FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'analytics' AND NOT a.attisdropped
+              AND (c.relname, a.attname) IN ({", ".join(columns)})
+        """).fetchone()
+    except Exception:
+        return False
+    return row[0] == len(_PERIOD_VIEWS) and column_row[0] == len(columns)
+
+
+def use_period_views(con) -> bool:
+    """Whether the period cube should read the period-measure views instead of aggregating sales/items.
+
+    Only on Postgres; DuckDB aggregates its local tables directly, and a
+    database the sync has not yet populated (or whose views predate the
+    cube's columns) falls back to the raw queries.
+    """
+    return isinstance(con, _PgFacade) and _period_views_ready(con)
 
 
 _dash_logger = logging.getLogger("dashboard.profiling")
 
 
 def _log_query_time(func_name: str, elapsed: float, periods: int = 0) -> None:
-    """Log query timing for dashboard profiling."""
-    _dash_logger.debug(f"[QUERY] {func_name}: {elapsed:.3f}s ({periods} periods)")
+    """Log query timing for dashboard profiling (plus the translated-SQL cache on Postgres, cursor pool on DuckDB)."""
+    line = f"[QUERY] {func_name}: {elapsed:.3f}s ({periods} periods)"
+    if _IS_POSTGRES:
+        stats = pg_sql_cache_stats()
+        line += f" | sql cache {stats['hit_rate']:.0%} hits, {stats['translate_ms']:.1f}ms translating"
+    elif _DUCK_POOL_STATS["queries"]:
+        stats = duckdb_pool_stats()
+        line += f" | cursor pool {stats['waits']} waits, {stats['wait_ms']:.1f}ms queued"
+    _dash_logger.debug(line)
 
 
 def write_dashboard_profile(timings: dict) -> None:
@@ -289,12 +501,274 @@ def write_dashboard_profile(timings: dict) -> None:
     try:
         LOGS_PATH.mkdir(parents=True, exist_ok=True)
         profile_path = LOGS_PATH / f"dashboard_profile_{datetime.now():%Y-%m-%d_%H%M%S}.json"
-        profile = {"timestamp": datetime.now().isoformat(), "queries": timings}
+        profile = {"timestamp": datetime.now().isoformat(), "queries": timings, "cache": cache_stats()}
+        registry = query_registry_stats()
+        if registry:
+            profile["registry"] = registry
+        if _IS_POSTGRES:
+            profile["sql_translation"] = pg_sql_cache_stats()
+        elif _DUCK_POOL_STATS["queries"]:
+            profile["duckdb_pool"] = duckdb_pool_stats()
+        interactions = interaction_stats()
+        if interactions:
+            profile["interactions"] = interactions
         profile_path.write_text(json.dumps(profile, indent=2))
     except (OSError, PermissionError):
         pass  # Skip profiling on read-only filesystem (cloud)
 
 
+# =====================================================================
+# FRAGMENTS (selector reruns in isolation)
+# =====================================================================
+# A click on a metric or breakdown button reruns only the fragment holding it
+# (its cards and trend chart) instead of the whole page script: page styling,
+# fetcher calls (and the hashing of their arguments) and sibling charts are not
+# re-executed.  Each fragment rerun is one interaction; its latency is logged
+# and aggregated for the profile.
+
+_INTERACTION_STATS: dict[str, dict] = {}
+_INTERACTION_LOCK = threading.Lock()  # every session reruns its fragments on its own thread
+
+
+def _record_interaction(name: str, elapsed: float) -> None:
+    with _INTERACTION_LOCK:
+        stats = _INTERACTION_STATS.setdefault(name, {"reruns": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["reruns"] += 1
+        stats["total_s"] += elapsed
+        stats["max_s"] = max(stats["max_s"], elapsed)
+    _dash_logger.debug(f"[INTERACTION] {name}: {elapsed:.3f}s (fragment rerun)")
+
+
+def interaction_stats() -> dict:
+    """Fragment reruns (selector clicks) per component and the time each took to render."""
+    with _INTERACTION_LOCK:
+        return {
+            name: {
+                "reruns": stats["reruns"],
+                "mean_ms": round(stats["total_s"] / stats["reruns"] * 1000, 3),
+                "max_ms": round(stats["max_s"] * 1000, 3),
+            }
+            for name, stats in _INTERACTION_STATS.items()
+        }
+
+
+def dashboard_fragment(fn):
+    """Render a dashboard component as an ``st.fragment``, timing its isolated reruns.
+
+    The first render is part of the page run; a widget inside the component then
+    reruns only its body, with the arguments of that last page run.
+    """
+
+    @st.fragment
+    @functools.wraps(fn)
+    def component(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if not (ctx and ctx.fragment_ids_this_run):
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record_interaction(fn.__name__, time.perf_counter() - start)
+
+    return component
+
+
+# =====================================================================
+# QUERY REGISTRY
+# =====================================================================
+
+# Batch fetchers run fixed SQL templates (dashboard_queries.QUERIES) under a
+# stable name ("<fetcher>.<query>"): periods are bound as one list parameter
+# (``period_col = ANY($1)``), never interpolated, so a template has one SQL
+# text per grain however the window moves.  Postgres then prepares it once
+# per pooled connection (_PgResult) and the translated-SQL and result-column
+# caches key on it; DuckDB binds the list on its own prepared statement.
+_QUERY_REGISTRY: dict[str, dict] = {}
+_QUERY_REGISTRY_LOCK = threading.Lock()  # queries run concurrently (query_dfs, prefetch)
+
+# SQL texts one name may take (grain variants); more means a value is being
+# interpolated instead of bound
+_QUERY_VARIANTS_MAX = 4
+
+
+def _registered(name: str, sql: str) -> dict:
+    """Registry entry for ``name``, recording ``sql`` as one of its templates."""
+    with _QUERY_REGISTRY_LOCK:
+        entry = _QUERY_REGISTRY.get(name)
+        if entry is None:
+            entry = _QUERY_REGISTRY[name] = {"templates": set(), "calls": 0, "seconds": 0.0}
+        if sql in entry["templates"]:
+            return entry
+        entry["templates"].add(sql)
+        variants = len(entry["templates"])
+    if variants == _QUERY_VARIANTS_MAX + 1:
+        _dash_logger.warning(
+            f"[QUERY] {name} has more than {_QUERY_VARIANTS_MAX} SQL texts — bind values as $N parameters"
+        )
+    return entry
+
+
+def _run_registered(con, name: str, sql: str, params: tuple, fetch: str):
+    entry = _registered(name, sql)
+    t0 = time.perf_counter()
+    result = getattr(con.execute(sql, list(params)), fetch)()
+    with _QUERY_REGISTRY_LOCK:
+        entry["calls"] += 1
+        entry["seconds"] += time.perf_counter() - t0
+    return result
+
+
+def query_df(con, name: str, sql: str, *params):
+    """Run registered query ``name`` (SQL template + $N parameters) and return a pandas DataFrame."""
+    return _run_registered(con, name, sql, params, "df")
+
+
+def query_row(con, name: str, sql: str, *params):
+    """Run registered query ``name`` (SQL template + $N parameters) and return its first row."""
+    return _run_registered(con, name, sql, params, "fetchone")
+
+
+def query_registry_stats() -> dict:
+    """Calls, total seconds and distinct SQL texts per registered query name."""
+    return {
+        name: {
+            "calls": entry["calls"],
+            "seconds": round(entry["seconds"], 4),
+            "templates": len(entry["templates"]),
+        }
+        for name, entry in sorted(_QUERY_REGISTRY.items())
+    }
+
+
+# =====================================================================
+# CONCURRENT FETCHES
+# =====================================================================
+
+# A page's fetchers (prefetch) and a fetcher's independent queries
+# (query_dfs) run on worker threads, so a render waits for its slowest query
+# rather than their sum.  Each query still borrows its own DuckDB cursor
+# (_DuckPool) or pooled Postgres connection (_PgResult), which bound how
+# many actually run at once; any other connection (a bare DuckDB connection
+# in a script or test) cannot run two queries at once, so its work runs
+# inline.  Two executors: a fetcher waiting on its queries never holds a
+# worker its queries need.
+_EXECUTORS: dict[str, ThreadPoolExecutor] = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def _executor(kind: str) -> ThreadPoolExecutor:
+    with _EXECUTORS_LOCK:
+        if kind not in _EXECUTORS:
+            _EXECUTORS[kind] = ThreadPoolExecutor(DASHBOARD_FETCH_WORKERS, thread_name_prefix=f"dashboard-{kind}")
+        return _EXECUTORS[kind]
+
+
+def _submit(kind: str, con, fn, *args) -> Future:
+    """Run ``fn(*args)`` on the ``kind`` executor, or inline (as a finished Future) if ``con`` is not pooled.
+
+    Worker threads run it in a copy of the caller's context, so dashboard_cache.uncached() carries over.
+    """
+    if DASHBOARD_FETCH_WORKERS > 1 and isinstance(con, (_DuckPool, _PgFacade)):
+        return _executor(kind).submit(contextvars.copy_context().run, fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def prefetch(con, **needs) -> dict[str, Future]:
+    """Start a page's data needs at once; returns a Future per need.
+
+    Each need is ``(fetcher, *args)`` called as ``fetcher(con, *args)``;
+    ``.result()`` returns what the fetcher returns (or raises what it raised):
+
+        data = prefetch(con, payments=(fetch_payments_batch, periods), outstanding=(fetch_outstanding,))
+        pm_data = data["payments"].result()
+    """
+    return {name: _submit("page", con, fetcher, con, *args) for name, (fetcher, *args) in needs.items()}
+
+
+def query_dfs(con, *queries) -> list:
+    """Run independent registered queries concurrently; their DataFrames in order.
+
+    Each query is ``(name, sql, *params)`` as passed to query_df().
+    """
+    if len(queries) < 2:
+        return [query_df(con, *q) for q in queries]
+    futures = [_submit("query", con, query_df, con, *q) for q in queries]
+    return [f.result() for f in futures]
+
+
+# =====================================================================
+# RESULT ASSEMBLY
+# =====================================================================
+
+
+class _KeyedRows(dict):
+    """{key: {column: value}} that reads a key missing from the result as the defaults row."""
+
+    __slots__ = ("_default",)
+
+    def __init__(self, rows: dict, default: dict):
+        super().__init__(rows)
+        self._default = default
+
+    def __missing__(self, key):
+        return self._default
+
+
+def keyed_rows(df, key, defaults: dict) -> dict:
+    """Pivot a query result once into ``{key: {column: value}}`` for per-period lookups.
+
+    ``key`` is a column name, or a tuple of names for tuple keys such as
+    ``(period, category)``.  Only the columns named in ``defaults`` are kept,
+    each converted with ``type(default)`` (a None default keeps the raw value);
+    keys absent from the result read as ``defaults``.  If a key repeats, its
+    first row wins.  One pass over the columns replaces a boolean-mask scan
+    of the frame per lookup.
+    """
+    columns = list(defaults)
+    casts = [None if default is None else type(default) for default in defaults.values()]
+    if isinstance(key, str):
+        keys = df[key].tolist()
+    else:
+        keys = list(zip(*(df[k].tolist() for k in key)))
+    rows = {}
+    for k, values in zip(keys, zip(*(df[c].tolist() for c in columns))):
+        if k not in rows:
+            rows[k] = {c: v if cast is None else cast(v) for c, cast, v in zip(columns, casts, values)}
+    return _KeyedRows(rows, dict(defaults))
+
+
+def cube_totals(df, key, defaults: dict) -> dict:
+    """Sum rows that share a key into ``{key: {column: total}}``; keyed_rows for cube rows.
+
+    ``key`` and ``defaults`` work as in keyed_rows (totals are cast with
+    ``type(default)``, absent keys read as ``defaults``); null cells add
+    nothing.  Used to roll the period cube's items rows up to the grouping a
+    fetcher reports, e.g. ``("period", "Item_Category")``.
+    """
+    columns = list(defaults)
+    casts = [None if default is None else type(default) for default in defaults.values()]
+    if isinstance(key, str):
+        keys = df[key].tolist()
+    else:
+        keys = list(zip(*(df[k].tolist() for k in key)))
+    sums = {}
+    for k, values in zip(keys, zip(*(df[c].tolist() for c in columns))):
+        totals = sums.setdefault(k, [0] * len(columns))
+        for j, v in enumerate(values):
+            if v is not None and v == v:
+                totals[j] += v
+    rows = {}
+    for k, totals in sums.items():
+        rows[k] = {c: v if cast is None else cast(v) for c, cast, v in zip(columns, casts, totals)}
+    return _KeyedRows(rows, dict(defaults))
+
+
 # =====================================================================
 # DIRHAM SYMBOL (CBUAE official SVG, base64-encoded for inline use)
 # =====================================================================
@@ -1082,18 +1556,170 @@ def is_weekly(period_str):
     return "W" in str(period_str)
 
 
+# =====================================================================
+# DUCKDB CURSOR POOL
+# =====================================================================
+
+# Wait/usage counters across every pool (one per open snapshot), for
+# duckdb_pool_stats() and the dashboard profile
+_DUCK_POOL_STATS = {"queries": 0, "waits": 0, "wait_s": 0.0, "max_wait_s": 0.0, "peak_in_use": 0}
+
+
+class _DuckPool:
+    """Bounded pool of cursors over one read-only DuckDB database, with a DuckDB-style .execute().
+
+    A DuckDB connection is not safe to share between threads, and every
+    Streamlit session reruns its page in its own thread.  Each query
+    therefore borrows a cursor (a connection of its own to the same
+    database) for as long as it runs, like _PgFacade borrows a pooled
+    Postgres connection: up to DUCKDB_POOL_SIZE queries run concurrently
+    and the rest wait for a cursor (reported by duckdb_pool_stats()).
+    """
+
+    def __init__(self, con, size: int = DUCKDB_POOL_SIZE):
+        self._con = con  # owns the database; only used to open cursors
+        self._size = max(1, size)
+        self._idle = queue.LifoQueue()  # most recently used cursor first
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        # Cursors start in the default catalog; an encrypted snapshot is ATTACHed as "db"
+        self._database = con.execute("SELECT current_database()").fetchone()[0]
+
+    def _open_cursor(self):
+        cur = self._con.cursor()
+        if cur.execute("SELECT current_database()").fetchone()[0] != self._database:
+            cur.execute(f'USE "{self._database}"')
+        return cur
+
+    def _acquire(self):
+        waited = 0.0
+        try:
+            cur = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                cur = self._open_cursor() if self._opened < self._size else None
+                self._opened += cur is not None
+            if cur is None:
+                # Every cursor is busy: queue for the next one released
+                t0 = time.perf_counter()
+                cur = self._idle.get()
+                waited = time.perf_counter() - t0
+        with self._lock:
+            self._in_use += 1
+            stats = _DUCK_POOL_STATS
+            stats["queries"] += 1
+            stats["peak_in_use"] = max(stats["peak_in_use"], self._in_use)
+            if waited:
+                stats["waits"] += 1
+                stats["wait_s"] += waited
+                stats["max_wait_s"] = max(stats["max_wait_s"], waited)
+        return cur
+
+    def _release(self, cur) -> None:
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(cur)
+
+    def execute(self, sql: str, params=None):
+        return _DuckResult(self, sql, params)
+
+
+class _DuckResult:
+    """Deferred DuckDB query: runs on a pooled cursor when its result is fetched."""
+
+    __slots__ = ("_pool", "_sql", "_params")
+
+    def __init__(self, pool: _DuckPool, sql: str, params):
+        self._pool = pool
+        self._sql = sql
+        self._params = params
+
+    def _fetch(self, method: str):
+        cur = self._pool._acquire()
+        try:
+            return getattr(cur.execute(self._sql, self._params), method)()
+        finally:
+            self._pool._release(cur)
+
+    def df(self):
+        return self._fetch("df")
+
+    def pl(self):
+        return self._fetch("pl")
+
+    def arrow(self):
+        return self._fetch("arrow")
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+
+def _pooled(con) -> _DuckPool:
+    """Apply the DuckDB thread/memory settings to ``con``'s database and serve it through a cursor pool."""
+    if DUCKDB_THREADS > 0:
+        con.execute(f"SET threads = {DUCKDB_THREADS}")
+    if DUCKDB_MEMORY_LIMIT:
+        con.execute(f"SET memory_limit = '{DUCKDB_MEMORY_LIMIT}'")
+    return _DuckPool(con)
+
+
+def duckdb_pool_stats() -> dict:
+    """Queries served by the DuckDB cursor pools and the time they queued for a cursor."""
+    stats = _DUCK_POOL_STATS
+    return {
+        "queries": stats["queries"],
+        "waits": stats["waits"],
+        "wait_ms": round(stats["wait_s"] * 1000, 3),
+        "max_wait_ms": round(stats["max_wait_s"] * 1000, 3),
+        "peak_in_use": stats["peak_in_use"],
+        "pool_size": DUCKDB_POOL_SIZE,
+    }
+
+
 # =====================================================================
 # DATABASE CONNECTION
 # =====================================================================
 
 
-@st.cache_resource
 def get_connection():
     """Open analytics DB — Postgres when ANALYTICS_DATABASE_URL is set, else DuckDB.
 
-    Falls back to in-memory CSV ingestion if the .duckdb file is missing
+    DuckDB opens the snapshot the CURRENT pointer names (see snapshot_store),
+    so a rebuild is picked up on the next rerun without restarting the app.
+    With MOONWALK_SERVING_MODE=parquet it instead serves typed views over the
+    current Parquet directory (parquet_serving).  Falls back to views over the
+    staged Parquet (or in-memory CSV ingestion) if the .duckdb file is missing
     or corrupted.  Shows st.error + st.stop if no data source is available.
+
+    DuckDB sources are shared by every session through a _DuckPool: each
+    query runs on a cursor of its own, so concurrent reruns do not share
+    one connection.
     """
+    if _IS_POSTGRES:
+        return _open_connection(None)
+    if SERVING_MODE == "parquet":
+        served = current_db_path(PARQUET_SERVING_PATH)
+        if served.is_dir():
+            return _open_parquet_connection(served)
+    db_file = current_db_path(DB_PATH)
+    return _open_connection(db_file if db_file.exists() else None)
+
+
+@st.cache_resource(max_entries=2)
+def _open_parquet_connection(folder):
+    """Typed-view cursor pool per Parquet folder (cached; old directories are evicted)."""
+    import parquet_serving
+
+    return _pooled(parquet_serving.connect(folder))
+
+
+@st.cache_resource(max_entries=2)
+def _open_connection(db_file):
+    """Connection (DuckDB: cursor pool) per snapshot path (cached; old snapshots are evicted)."""
     if _IS_POSTGRES:
         from db.database import get_engine
 
@@ -1103,23 +1729,12 @@ def get_connection():
             st.stop()
         return _PgFacade(engine)
 
-    db_tmp = DB_PATH.with_suffix(".duckdb.tmp")
-    db_file = None
-
-    if DB_PATH.exists() and db_tmp.exists():
-        # Use whichever is newer
-        db_file = db_tmp if db_tmp.stat().st_mtime > DB_PATH.stat().st_mtime else DB_PATH
-    elif DB_PATH.exists():
-        db_file = DB_PATH
-    elif db_tmp.exists():
-        db_file = db_tmp
-
     if db_file:
         try:
-            if DUCKDB_KEY:
+            if DUCKDB_FILE_KEY:
                 db_path_str = str(db_file).replace("\\", "/")
                 con = duckdb.connect(":memory:")
-                con.execute(f"ATTACH '{db_path_str}' AS db (ENCRYPTION_KEY '{DUCKDB_KEY}', READ_ONLY)")
+                con.execute(f"ATTACH '{db_path_str}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}', READ_ONLY)")
                 con.execute("USE db")
             else:
                 con = duckdb.connect(str(db_file), read_only=True)
@@ -1127,19 +1742,31 @@ def get_connection():
             for required in ("sales", "dim_period"):
                 if required not in tables:
                     raise RuntimeError(f"Table '{required}' missing from {db_file.name}")
-            # Create order_lookup if missing (backward compat with older DB files)
-            if "order_lookup" not in tables:
+            # Create order_lookup if missing or without cohort age (backward compat with older DB files)
+            ol_columns = (
+                [r[0] for r in con.execute("DESCRIBE order_lookup").fetchall()] if "order_lookup" in tables else []
+            )
+            if "MonthsSinceCohort" not in ol_columns:
                 try:
                     con.execute("""
-                        CREATE TABLE order_lookup AS
-                        SELECT DISTINCT OrderID_Std, IsSubscriptionService FROM sales
+                        CREATE OR REPLACE TABLE order_lookup AS
+                        SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+                               MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+                        FROM sales
                     """)
                 except Exception:
                     pass  # Read-only DB on cloud — order_lookup should be pre-built
-            return con
+            return _pooled(con)
         except Exception as e:
             st.warning(f"Could not open {db_file.name}: {e}. Falling back to CSV.")
 
+    # Staged Parquet fallback — typed views, nothing ingested
+    staged = [LOCAL_STAGING_PATH / Path(p).with_suffix(".parquet").name for p in (SALES_CSV, ITEMS_CSV, DIMPERIOD_CSV)]
+    if all(p.exists() for p in staged):
+        import parquet_serving
+
+        return _pooled(parquet_serving.connect(LOCAL_STAGING_PATH))
+
     # CSV fallback — validate files exist
     missing = [p for p in [SALES_CSV, ITEMS_CSV, DIMPERIOD_CSV] if not Path(p).exists()]
     if missing:
@@ -1150,14 +1777,28 @@ def get_connection():
         st.stop()
 
     con = duckdb.connect()
-    con.execute(f"CREATE TABLE sales AS SELECT * FROM read_csv_auto('{SALES_CSV}')")
-    con.execute(f"CREATE TABLE items AS SELECT * FROM read_csv_auto('{ITEMS_CSV}')")
     con.execute(f"CREATE TABLE dim_period AS SELECT * FROM read_csv_auto('{DIMPERIOD_CSV}')")
+    # Same period keys the ETL denormalizes (see PERIOD_KEY_COLUMNS in cleancloud_to_duckdb.py)
+    con.execute(f"""
+        CREATE TABLE sales AS
+        SELECT s.*, pm.YearMonth, pm.YearQuarter, pw.ISOWeekLabel
+        FROM read_csv_auto('{SALES_CSV}') s
+        LEFT JOIN dim_period pm ON s.OrderCohortMonth = pm.Date
+        LEFT JOIN dim_period pw ON s.Earned_Date = pw.Date
+    """)
+    con.execute(f"""
+        CREATE TABLE items AS
+        SELECT i.*, p.YearMonth, p.YearQuarter, p.ISOWeekLabel
+        FROM read_csv_auto('{ITEMS_CSV}') i
+        LEFT JOIN dim_period p ON i.ItemDate = p.Date
+    """)
     con.execute("""
         CREATE TABLE order_lookup AS
-        SELECT DISTINCT OrderID_Std, IsSubscriptionService FROM sales
+        SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+               MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+        FROM sales
     """)
-    return con
+    return _pooled(con)
 
 
 # =====================================================================
@@ -1166,94 +1807,38 @@ def get_connection():
 
 
 def get_grain_context(period_or_periods):
-    """Return dict with period_col and sales_join for current grain."""
+    """Return the period key columns for the current grain.
+
+    sales, items and customer_quality carry YearMonth / ISOWeekLabel /
+    YearQuarter copied from dim_period at load time, so period filters use
+    ``period_col`` (alias ``s``) or ``items_period_col`` (alias ``i``) directly.
+    ``sales_join`` is kept for queries that still need other dim_period attributes.
+    ``grain`` ("monthly" / "weekly") suffixes the period-measure view names.
+    """
     sample = period_or_periods[0] if isinstance(period_or_periods, (list, tuple)) else period_or_periods
-    weekly = is_weekly(sample)
-    return {
-        "period_col": "p.ISOWeekLabel" if weekly else "p.YearMonth",
-        "sales_join": "s.Earned_Date = p.Date" if weekly else "s.OrderCohortMonth = p.Date",
-    }
+    return grain_context("weekly" if is_weekly(sample) else "monthly")
 
 
 def fetch_measures(con, period):
     """Return all snapshot measures for a given period string (monthly or weekly)."""
     ctx = get_grain_context(period)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-
-    cust_row = con.execute(
-        f"""
-        SELECT
-            COUNT(DISTINCT s.CustomerID_Std),
-            COUNT(DISTINCT CASE
-                WHEN s.Transaction_Type = 'Subscription' THEN s.CustomerID_Std
-            END)
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Transaction_Type <> 'Invoice Payment'
-          AND s.Earned_Date IS NOT NULL
-          AND {period_col} = $1
-    """,
-        [period],
-    ).fetchone()
+
+    cust_row = query_row(con, *named_query("period_measures.customers", ctx), period)
     customers = int(cust_row[0])
     subscribers = int(cust_row[1])
     clients = customers - subscribers
 
-    items_row = con.execute(
-        f"""
-        SELECT
-            COALESCE(SUM(sub.qty), 0),
-            COALESCE(SUM(CASE WHEN sub.iss = FALSE THEN sub.qty END), 0),
-            COALESCE(SUM(CASE WHEN sub.iss = TRUE THEN sub.qty END), 0)
-        FROM (
-            SELECT i.Quantity AS qty,
-                   COALESCE(ol.IsSubscriptionService, FALSE) AS iss
-            FROM items i
-            JOIN dim_period p ON i.ItemDate = p.Date
-            LEFT JOIN order_lookup ol ON i.OrderID_Std = ol.OrderID_Std
-            WHERE {period_col} = $1
-        ) sub
-    """,
-        [period],
-    ).fetchone()
+    items_row = query_row(con, *named_query("period_measures.items", ctx), period)
     items_total = int(items_row[0])
     items_client = int(items_row[1])
     items_sub = int(items_row[2])
 
-    rev_row = con.execute(
-        f"""
-        SELECT
-            COALESCE(SUM(s.Total_Num), 0),
-            COALESCE(SUM(CASE
-                WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = FALSE
-                THEN s.Total_Num END), 0),
-            COALESCE(SUM(CASE
-                WHEN s.Transaction_Type = 'Subscription' THEN s.Total_Num
-                WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = TRUE
-                THEN s.Total_Num END), 0)
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} = $1
-    """,
-        [period],
-    ).fetchone()
+    rev_row = query_row(con, *named_query("period_measures.revenue", ctx), period)
     rev_total = float(rev_row[0])
     rev_client = float(rev_row[1])
     rev_sub = float(rev_row[2])
 
-    stops_row = con.execute(
-        f"""
-        SELECT
-            COALESCE(SUM(s.HasDelivery::INT), 0),
-            COALESCE(SUM(s.HasPickup::INT), 0)
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} = $1
-    """,
-        [period],
-    ).fetchone()
+    stops_row = query_row(con, *named_query("period_measures.stops", ctx), period)
     deliveries = int(stops_row[0])
     pickups = int(stops_row[1])
 
@@ -1273,107 +1858,103 @@ def fetch_measures(con, period):
     }
 
 
-@st.cache_data(ttl=300)
-def fetch_measures_batch(_con, periods_tuple):
-    """Fetch all measures for multiple periods in 4 batched SQL queries."""
-    _t0 = time.perf_counter()
-    periods = list(periods_tuple)
-    ctx = get_grain_context(periods)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-    placeholders = ", ".join(f"'{p}'" for p in periods)
-
-    cust_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-               COUNT(DISTINCT s.CustomerID_Std) AS customers,
-               COUNT(DISTINCT CASE
-                   WHEN s.Transaction_Type = 'Subscription' THEN s.CustomerID_Std
-               END) AS subscribers
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Transaction_Type <> 'Invoice Payment'
-          AND s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+# Route categories the logistics geo split reports, and their period-cube column prefixes
+_CUBE_ROUTES = {"Inside Abu Dhabi": "inside", "Outer Abu Dhabi": "outer"}
 
-    items_df = _con.execute(f"""
-        SELECT sub.period,
-               COALESCE(SUM(sub.qty), 0) AS items_total,
-               COALESCE(SUM(CASE WHEN sub.iss = FALSE THEN sub.qty END), 0) AS items_client,
-               COALESCE(SUM(CASE WHEN sub.iss = TRUE THEN sub.qty END), 0) AS items_sub
-        FROM (
-            SELECT {period_col} AS period, i.Quantity AS qty,
-                   COALESCE(ol.IsSubscriptionService, FALSE) AS iss
-            FROM items i
-            JOIN dim_period p ON i.ItemDate = p.Date
-            LEFT JOIN order_lookup ol ON i.OrderID_Std = ol.OrderID_Std
-            WHERE {period_col} IN ({placeholders})
-        ) sub
-        GROUP BY sub.period
-    """).df()
 
-    rev_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-               COALESCE(SUM(s.Total_Num), 0) AS rev_total,
-               COALESCE(SUM(CASE
-                   WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = FALSE
-                   THEN s.Total_Num END), 0) AS rev_client,
-               COALESCE(SUM(CASE
-                   WHEN s.Transaction_Type = 'Subscription' THEN s.Total_Num
-                   WHEN s.Transaction_Type = 'Order' AND s.IsSubscriptionService = TRUE
-                   THEN s.Total_Num END), 0) AS rev_sub
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+def prior_year_period(period):
+    """The same month or ISO week a year earlier ("2026-02" -> "2025-02", "2026-W06" -> "2025-W06")."""
+    if "W" in period:
+        year, week = period.split("-W")
+        return f"{int(year) - 1}-W{week}"
+    year, month = period.split("-")
+    return f"{int(year) - 1}-{month}"
 
-    stops_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-               COALESCE(SUM(s.HasDelivery::INT), 0) AS deliveries,
-               COALESCE(SUM(s.HasPickup::INT), 0) AS pickups
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
 
-    result = {}
-    for p in periods:
-        c_row = cust_df[cust_df["period"] == p]
-        customers = int(c_row["customers"].iloc[0]) if len(c_row) else 0
-        subscribers = int(c_row["subscribers"].iloc[0]) if len(c_row) else 0
+@snapshot_cached
+def fetch_period_cube(_con, periods_tuple):
+    """Every per-period sales and items aggregate the batch fetchers report, in two passes.
 
-        i_row = items_df[items_df["period"] == p]
-        items_total = int(i_row["items_total"].iloc[0]) if len(i_row) else 0
-        items_client = int(i_row["items_client"].iloc[0]) if len(i_row) else 0
-        items_sub = int(i_row["items_sub"].iloc[0]) if len(i_row) else 0
+    One pass over sales grouped by period (customer counts, revenue splits,
+    stops, collections, processing times, the route split) and one over items
+    grouped by period, category, service, subscription flag and cohort age
+    ("new" / "existing" / "other" from order_lookup.MonthsSinceCohort, the
+    order's earliest cohort age, stored at load time).  The periods'
+    prior-year periods are included, so a page's YoY overlay needs no pass of
+    its own.  On Postgres the same rows come from the period-measure
+    views.
 
-        r_row = rev_df[rev_df["period"] == p]
-        rev_total = float(r_row["rev_total"].iloc[0]) if len(r_row) else 0.0
-        rev_client = float(r_row["rev_client"].iloc[0]) if len(r_row) else 0.0
-        rev_sub = float(r_row["rev_sub"].iloc[0]) if len(r_row) else 0.0
+    fetch_measures_batch, fetch_yoy_batch, fetch_logistics/operations/
+    payments_batch and the customer report fetchers project from this one
+    cached result, so a page render aggregates the fact tables once.  Returns
+    ``{"sales": one row per period, "items": rows to roll up with cube_totals}``.
+    """
+    _t0 = time.perf_counter()
+    periods = list(dict.fromkeys([*periods_tuple, *(prior_year_period(p) for p in periods_tuple)]))
+    ctx = get_grain_context(periods)
 
-        s_row = stops_df[stops_df["period"] == p]
-        deliveries = int(s_row["deliveries"].iloc[0]) if len(s_row) else 0
-        pickups = int(s_row["pickups"].iloc[0]) if len(s_row) else 0
+    if use_period_views(_con):
+        sales_df, items_df = query_dfs(
+            _con,
+            (*named_query("period_cube.sales_view", ctx), periods),
+            (*named_query("period_cube.items_view", ctx), periods),
+        )
+    else:
+        sales_df, items_df = query_dfs(
+            _con,
+            # Pass 1: sales by period
+            (*named_query("period_cube.sales", ctx), periods),
+            # Pass 2: items by period, category, service, subscription flag and cohort age
+            (*named_query("period_cube.items", ctx), periods),
+        )
 
+    _log_query_time("fetch_period_cube", time.perf_counter() - _t0, len(periods))
+    return {"sales": sales_df, "items": items_df}
+
+
+def measures_from_cube(cube, periods):
+    """fetch_measures_batch's per-period measures for ``periods``, read from a period cube."""
+    sales = keyed_rows(
+        cube["sales"],
+        "period",
+        {
+            "customers": 0,
+            "subscribers": 0,
+            "rev_total": 0.0,
+            "rev_client": 0.0,
+            "rev_sub": 0.0,
+            "deliveries": 0,
+            "pickups": 0,
+        },
+    )
+    items = cube_totals(cube["items"], ("period", "iss"), {"items": 0})
+
+    result = {}
+    for p in periods:
+        s, items_client, items_sub = sales[p], items[p, False]["items"], items[p, True]["items"]
         result[p] = {
-            "customers": customers,
-            "clients": customers - subscribers,
-            "subscribers": subscribers,
-            "items": items_total,
+            "customers": s["customers"],
+            "clients": s["customers"] - s["subscribers"],
+            "subscribers": s["subscribers"],
+            "items": items_client + items_sub,
             "items_client": items_client,
             "items_sub": items_sub,
-            "revenues": rev_total,
-            "rev_client": rev_client,
-            "rev_sub": rev_sub,
-            "deliveries": deliveries,
-            "pickups": pickups,
-            "stops": deliveries + pickups,
+            "revenues": s["rev_total"],
+            "rev_client": s["rev_client"],
+            "rev_sub": s["rev_sub"],
+            "deliveries": s["deliveries"],
+            "pickups": s["pickups"],
+            "stops": s["deliveries"] + s["pickups"],
         }
+    return result
+
+
+@snapshot_cached
+def fetch_measures_batch(_con, periods_tuple):
+    """Fetch all measures for multiple periods, projected from the period cube."""
+    _t0 = time.perf_counter()
+    periods = list(periods_tuple)
+    result = measures_from_cube(fetch_period_cube(_con, periods_tuple), periods)
     _log_query_time("fetch_measures_batch", time.perf_counter() - _t0, len(periods))
     return result
 
@@ -1814,6 +2395,29 @@ def inject_global_styles():
 # =====================================================================
 
 
+def fetch_available_periods(con, weekly):
+    """Completed periods with sales, oldest first: ISO weeks when ``weekly``, else months."""
+    if weekly:
+        periods_df = con.execute("""
+            SELECT DISTINCT p.ISOWeekLabel
+            FROM sales s
+            JOIN dim_period p ON s.Earned_Date = p.Date
+            WHERE s.Earned_Date IS NOT NULL
+              AND p.IsCurrentISOWeek = FALSE
+            ORDER BY p.ISOWeekLabel
+        """).df()
+        return periods_df["ISOWeekLabel"].tolist()
+    periods_df = con.execute("""
+        SELECT DISTINCT p.YearMonth
+        FROM sales s
+        JOIN dim_period p ON s.OrderCohortMonth = p.Date
+        WHERE s.Earned_Date IS NOT NULL
+          AND p.IsCurrentMonth = FALSE
+        ORDER BY p.YearMonth
+    """).df()
+    return periods_df["YearMonth"].tolist()
+
+
 def period_selector(con, show_title=True):
     """Render title + period dropdown with segmented monthly/weekly control.
 
@@ -1842,32 +2446,11 @@ def period_selector(con, show_title=True):
     cache_key = "_cached_periods_weekly" if weekly_mode else "_cached_periods_monthly"
     if cache_key not in st.session_state:
         _ps_t0 = time.perf_counter()
-        if weekly_mode:
-            periods_df = con.execute("""
-                SELECT DISTINCT p.ISOWeekLabel
-                FROM sales s
-                JOIN dim_period p ON s.Earned_Date = p.Date
-                WHERE s.Earned_Date IS NOT NULL
-                  AND p.IsCurrentISOWeek = FALSE
-                ORDER BY p.ISOWeekLabel
-            """).df()
-            if len(periods_df) == 0:
-                st.error("No data found.")
-                st.stop()
-            st.session_state[cache_key] = periods_df["ISOWeekLabel"].tolist()
-        else:
-            periods_df = con.execute("""
-                SELECT DISTINCT p.YearMonth
-                FROM sales s
-                JOIN dim_period p ON s.OrderCohortMonth = p.Date
-                WHERE s.Earned_Date IS NOT NULL
-                  AND p.IsCurrentMonth = FALSE
-                ORDER BY p.YearMonth
-            """).df()
-            if len(periods_df) == 0:
-                st.error("No data found.")
-                st.stop()
-            st.session_state[cache_key] = periods_df["YearMonth"].tolist()
+        periods = fetch_available_periods(con, weekly_mode)
+        if not periods:
+            st.error("No data found.")
+            st.stop()
+        st.session_state[cache_key] = periods
         _log_query_time("period_selector", time.perf_counter() - _ps_t0)
     available_periods = st.session_state[cache_key]
 
@@ -1947,7 +2530,7 @@ def render_page_title(text, color):
 def render_footer():
     """Render the standard page footer with data freshness timestamp."""
     st.markdown("---")
-    db_path = Path(DB_PATH)
+    db_path = current_db_path(DB_PATH)
     if db_path.exists():
         mtime = datetime.fromtimestamp(db_path.stat().st_mtime)
         label = f"{mtime.day} {mtime.strftime('%b %Y')}"
@@ -2108,6 +2691,7 @@ def _value_block(data_key, val, current, previous, height):
     )
 
 
+@dashboard_fragment
 def render_metric_selector(
     metrics,
     trend_data,
@@ -2121,6 +2705,8 @@ def render_metric_selector(
 ):
     """Render interactive button-selector layout: buttons+values (left), chart (right).
 
+    A fragment: choosing a metric reruns only this selector, not the page.
+
     Parameters:
         metrics      -- list of (label, data_key) tuples (1-3 items)
         trend_data   -- dict {period_str: {key: value, ...}}
@@ -2213,6 +2799,100 @@ def render_metric_selector(
         )
 
 
+def _option_key(name):
+    """Metric-key form of a breakdown option: "Wash & Press" -> "wash_and_press"."""
+    return name.lower().replace(" ", "_").replace("&", "and")
+
+
+@dashboard_fragment
+def render_breakdown_selector(
+    options,
+    breakdown,
+    trend_data,
+    window,
+    available_periods,
+    selected_period,
+    state_key,
+    key_prefix,
+    metric_prefix,
+    header_color,
+    sub_color,
+):
+    """Render a row of option buttons, the active option's sub-cards and its items trend chart.
+
+    A fragment like render_metric_selector: choosing an option reruns only this section.
+
+    Parameters:
+        options      -- option labels, e.g. item categories (first is the default)
+        breakdown    -- per-period field holding {option: {"items", "revenue"}}
+        trend_data   -- dict {period_str: {key: value, ...}}
+        window       -- list of display periods
+        available_periods -- full list of available periods
+        selected_period   -- currently selected period
+        state_key    -- session state key for tracking the active option
+        key_prefix   -- widget key prefix for the buttons and chart
+        metric_prefix -- METRIC_CONFIG prefix of the per-option items trend
+        header_color -- bar color for the chart
+        sub_color    -- sub-card background
+    """
+    if state_key not in st.session_state:
+        st.session_state[state_key] = options[0]
+
+    cols = st.columns(len(options))
+    for i, option in enumerate(options):
+        with cols[i]:
+            st.button(
+                option,
+                key=f"{key_prefix}_btn_{i}",
+                on_click=_set_metric,
+                args=(state_key, option),
+                use_container_width=True,
+                type="primary" if st.session_state[state_key] == option else "secondary",
+            )
+
+    active = st.session_state[state_key]
+    p_idx = available_periods.index(selected_period)
+    cur = trend_data.get(selected_period, {}).get(breakdown, {}).get(active, {})
+    prev = trend_data.get(available_periods[p_idx - 1], {}) if p_idx > 0 else {}
+    prev = prev.get(breakdown, {}).get(active, {})
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(
+            sub_card(
+                "Items",
+                fmt_count(cur.get("items", 0)),
+                change_html(cur.get("items", 0), prev.get("items")),
+                sub_color,
+            ),
+            unsafe_allow_html=True,
+        )
+    with c2:
+        st.markdown(
+            sub_card(
+                "Revenue",
+                fmt_dhs_sub(cur.get("revenue", 0)),
+                change_html(cur.get("revenue", 0), prev.get("revenue")),
+                sub_color,
+            ),
+            unsafe_allow_html=True,
+        )
+
+    safe = _option_key(active)
+    _, center, _ = st.columns([1, 18, 1])
+    with center:
+        render_trend_chart_v2(
+            f"{key_prefix}_{safe}_items",
+            trend_data,
+            window,
+            available_periods,
+            METRIC_CONFIG[f"{metric_prefix}_{safe}_items"],
+            header_color,
+            show_title=True,
+            height=300,
+        )
+
+
 def render_detail_page(page_key):
     """Render a complete detail page for the given metric category."""
     cfg = PAGE_CONFIG[page_key]
@@ -7,25 +7,76 @@ Usage:
     status = check_db()            # "connected" | "not_configured" | "error: ..."
 """
 
-from sqlalchemy import create_engine, text
+import logging
+import threading
 
-from config import ANALYTICS_DATABASE_URL
+from sqlalchemy import create_engine, make_url, text
+
+from config import ANALYTICS_DATABASE_URL, POSTGRES_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# One engine (and connection pool) per process, created on first use
+_engine = None
+_engine_lock = threading.Lock()
 
 
 def get_engine():
-    """Return a SQLAlchemy engine pointed at the analytics schema.
+    """Return the process-wide SQLAlchemy engine pointed at the analytics schema.
+
+    The first call creates the engine with a pool of POSTGRES_POOL_SIZE
+    connections (plus as many overflow) and opens them up front, so the first
+    dashboard queries do not pay for TCP/TLS/auth setup.  Later calls return
+    the same engine.
 
     Returns None when ANALYTICS_DATABASE_URL is not configured so that the
     dashboard can fall back to DuckDB during the parallel-run period (Phase M2-M5).
     """
+    global _engine
     if not ANALYTICS_DATABASE_URL:
         return None
-    return create_engine(
-        ANALYTICS_DATABASE_URL,
-        pool_pre_ping=True,
-        # Set search_path so all unqualified table references resolve to analytics.
-        connect_args={"options": "-csearch_path=analytics,public"},
-    )
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = make_url(ANALYTICS_DATABASE_URL)
+                if url.drivername in ("postgres", "postgresql"):
+                    # psycopg2 is the installed driver and dashboard_shared uses its COPY API;
+                    # newer SQLAlchemy defaults a bare postgresql:// URL to psycopg 3
+                    url = url.set(drivername="postgresql+psycopg2")
+                engine = create_engine(
+                    url,
+                    pool_size=POSTGRES_POOL_SIZE,
+                    max_overflow=POSTGRES_POOL_SIZE,
+                    pool_pre_ping=True,
+                    # Railway closes idle connections; recycle before it does
+                    pool_recycle=1800,
+                    # Reuse the most recently returned (warmest) connection first
+                    pool_use_lifo=True,
+                    # Set search_path so all unqualified table references resolve to analytics.
+                    connect_args={"options": "-csearch_path=analytics,public"},
+                )
+                _warm_up(engine, POSTGRES_POOL_SIZE)
+                _engine = engine
+    return _engine
+
+
+def _warm_up(engine, n: int) -> int:
+    """Open up to ``n`` pooled connections and return them to the pool; returns how many opened.
+
+    Non-fatal: an unreachable server is reported by check_db / the first query.
+    """
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        logger.warning(f"Postgres pool warm-up stopped after {len(conns)} connection(s): {exc}")
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
 
 
 def check_db() -> str:
@@ -6,9 +6,10 @@ All vectorized helpers use Polars expressions for high-performance data processi
 """
 
 import polars as pl
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 
 from config import (
     DOWNLOADS_PATH, LOCAL_STAGING_PATH,
@@ -503,6 +504,68 @@ def polars_format_dates_for_csv(df: pl.DataFrame, date_columns: List[str]) -> pl
     return df
 
 
+# =====================================================================
+# STAGING FILE WRITES (IMMEDIATE OR BACKGROUND)
+# =====================================================================
+
+# When the transform outputs are consumed in-process (DuckDB reads the frames
+# directly), the staging CSV/Parquet files only serve Excel and audit readers,
+# so their writes can run on background threads off the critical path.
+_staging_pool: Optional[ThreadPoolExecutor] = None
+_staging_writes: List[Tuple[str, Future]] = []
+
+
+def _write_staging(df: pl.DataFrame, path: str) -> None:
+    if str(path).endswith(".parquet"):
+        df.write_parquet(path)
+    else:
+        df.write_csv(path)
+    logger.info(f"  [OK] Saved to: {path}")
+
+
+def defer_staging_writes(max_workers: int = 2) -> None:
+    """Queue subsequent write_staging_file() calls on background threads until flush_staging_writes()."""
+    global _staging_pool
+    if _staging_pool is None:
+        _staging_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="staging-write")
+
+
+def write_staging_file(df: pl.DataFrame, path: str) -> None:
+    """
+    Write a staging output (.csv or .parquet by extension).
+
+    Writes immediately (raising on failure) unless defer_staging_writes() is
+    active, in which case the write is queued and errors surface from
+    flush_staging_writes().
+    """
+    if _staging_pool is None:
+        _write_staging(df, path)
+    else:
+        _staging_writes.append((str(path), _staging_pool.submit(_write_staging, df, path)))
+
+
+def flush_staging_writes() -> List[str]:
+    """
+    Wait for queued staging writes and return to immediate writes.
+
+    Returns:
+        Paths whose write failed (each failure is logged)
+    """
+    global _staging_pool
+    failed = []
+    for path, future in _staging_writes:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"  [ERROR] Staging write failed for {path}: {str(e)[:80]}")
+            failed.append(path)
+    _staging_writes.clear()
+    if _staging_pool is not None:
+        _staging_pool.shutdown(wait=True)
+        _staging_pool = None
+    return failed
+
+
 # =====================================================================
 # DATA INTEGRITY VALIDATION
 # =====================================================================
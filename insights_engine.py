@@ -0,0 +1,486 @@
+"""Insights rules engine — shared by the DuckDB and Postgres loaders.
+
+Each loader computes one aggregate row per period (window functions over
+period aggregates supply the prior-month, prior-year and rolling values), then
+hands the rows to the evaluators below.  Keeping the rule thresholds and the
+wording here means both backends produce identical insights.
+
+Every aggregate row is fingerprinted.  A period is only re-evaluated when its
+fingerprint differs from the one stored by the previous refresh; unchanged
+periods keep their existing insight rows.  Bump INSIGHTS_VERSION whenever a
+rule's threshold or wording changes so every period is rebuilt once.
+"""
+
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+INSIGHTS_VERSION = 1
+
+# Column order of the insights table (both backends)
+INSIGHT_COLUMNS = ("period", "rule_id", "category", "headline", "detail", "sentiment", "granularity")
+
+
+# =====================================================================
+# FINGERPRINTS
+# =====================================================================
+
+
+def _normalize(value):
+    """Make aggregate values hash-stable across backends and float summation order."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (float, Decimal)):
+        return round(float(value), 4)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def row_fingerprint(row: dict) -> str:
+    """Return a stable hash of one period's aggregate row (plus the rules version)."""
+    payload = {k: _normalize(v) for k, v in sorted(row.items())}
+    payload["__version__"] = INSIGHTS_VERSION
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def diff_periods(rows: list[dict], known: dict[str, str]) -> tuple[list[dict], list[str], dict[str, str]]:
+    """Split aggregate rows into (changed rows, unchanged periods, new fingerprints).
+
+    ``known`` maps period -> fingerprint from the previous refresh.
+    """
+    changed, unchanged, fingerprints = [], [], {}
+    for row in rows:
+        fp = row_fingerprint(row)
+        fingerprints[row["period"]] = fp
+        if known.get(row["period"]) == fp:
+            unchanged.append(row["period"])
+        else:
+            changed.append(row)
+    return changed, unchanged, fingerprints
+
+
+# =====================================================================
+# AGGREGATE BOUNDS
+#
+# Both loaders' aggregate queries return periods from "since" on and read
+# the fact tables from "lookback" ("lookback_date": its first day), so an
+# incremental refresh aggregates only the periods it changed plus the prior
+# periods the rules compare against.
+# =====================================================================
+
+# Aggregate every period (full build, or no fingerprints from a previous refresh)
+ALL_PERIODS = {"since": "", "lookback": "", "lookback_date": date(1, 1, 1)}
+
+
+def monthly_bounds(since: str) -> dict:
+    """Bounds for months from ``since``: aggregates from 12 months earlier (the YoY comparison)."""
+    year, month = divmod(int(since[:4]) * 12 + int(since[5:7]) - 1 - 12, 12)
+    return {"since": since, "lookback": f"{year:04d}-{month + 1:02d}", "lookback_date": date(year, month + 1, 1)}
+
+
+# =====================================================================
+# MONTHLY RULES
+# =====================================================================
+
+
+def evaluate_monthly(r: dict) -> list[tuple]:
+    """Evaluate the monthly rules for one period aggregate row.
+
+    Returns (rule_id, category, headline, detail, sentiment) tuples.
+    """
+    period = r["period"]
+    out = []
+
+    # REV_MOM — Revenue month-over-month
+    if r["prior_period"] and r["prev_rev"] and r["prev_rev"] > 0:
+        pct = (r["rev"] - r["prev_rev"]) / r["prev_rev"] * 100
+        out.append(
+            (
+                "REV_MOM",
+                "revenue",
+                f"Revenue {pct:+.0f}% vs last month",
+                f"Dhs {r['rev']:,.0f} this month vs Dhs {r['prev_rev']:,.0f} last month",
+                "positive" if pct > 0 else "negative",
+            )
+        )
+
+    # REV_YOY — Revenue year-over-year
+    if r["yoy_rev"] and r["yoy_rev"] > 0:
+        pct = (r["rev"] - r["yoy_rev"]) / r["yoy_rev"] * 100
+        out.append(
+            (
+                "REV_YOY",
+                "revenue",
+                f"Revenue {pct:+.0f}% vs same month last year",
+                f"Dhs {r['rev']:,.0f} this month vs Dhs {r['yoy_rev']:,.0f} in {r['yoy_period']}",
+                "positive" if pct > 2 else ("negative" if pct < -2 else "neutral"),
+            )
+        )
+
+    # CUST_MOM — Active customer count change
+    if r["prior_period"] and r["prev_cust"] and r["prev_cust"] > 0:
+        pct = (r["cust"] - r["prev_cust"]) / r["prev_cust"] * 100
+        out.append(
+            (
+                "CUST_MOM",
+                "customers",
+                f"Active customers {pct:+.0f}% vs last month",
+                f"{r['cust']:,} active this month vs {r['prev_cust']:,} last month",
+                "positive" if pct > 0 else "negative",
+            )
+        )
+
+    # NEW_CUST — New customers this month
+    if r["new_cust"] and r["cust"] and r["cust"] > 0:
+        pct_share = r["new_cust"] / r["cust"] * 100
+        out.append(
+            (
+                "NEW_CUST",
+                "customers",
+                f"{r['new_cust']:,} new customers ({pct_share:.0f}% of active)",
+                f"First-time customers in {period}",
+                "positive" if pct_share >= 10 else "neutral",
+            )
+        )
+
+    # M1_RETENTION — M1 retention rate
+    if r["prior_period"] and r["prev_new_cust"] and r["prev_new_cust"] > 0:
+        retention = r["m1_cust"] / r["prev_new_cust"] * 100
+        out.append(
+            (
+                "M1_RETENTION",
+                "customers",
+                f"M1 retention: {retention:.0f}%",
+                f"{r['m1_cust']:,} of {r['prev_new_cust']:,} prior new customers returned",
+                "positive" if retention >= 50 else ("negative" if retention < 30 else "neutral"),
+            )
+        )
+
+    # REACTIVATIONS — Customers dormant 3+ months returning
+    if r["reactivated"] and r["reactivated"] > 0:
+        out.append(
+            (
+                "REACTIVATIONS",
+                "customers",
+                f"{r['reactivated']:,} customers reactivated after 3+ month gap",
+                f"Customers returning after dormancy in {period}",
+                "positive",
+            )
+        )
+
+    # SUB_SHARE — Subscription revenue share
+    if r["prior_period"] and r["rev"] and r["rev"] > 0 and r["prev_rev"] and r["prev_rev"] > 0:
+        share_cur = r["sub_rev"] / r["rev"] * 100
+        share_prev = r["prev_sub_rev"] / r["prev_rev"] * 100
+        diff = share_cur - share_prev
+        out.append(
+            (
+                "SUB_SHARE",
+                "revenue",
+                f"Subscription revenue at {share_cur:.0f}% of total ({diff:+.0f}pp vs last month)",
+                f"Dhs {r['sub_rev']:,.0f} subscription of Dhs {r['rev']:,.0f} total revenue",
+                "positive" if diff > 0 else ("negative" if diff < -2 else "neutral"),
+            )
+        )
+
+    # MULTI_SERVICE — Multi-service customer percentage
+    if r["cq_total"] and r["cq_total"] > 0:
+        pct = r["multi_service"] / r["cq_total"] * 100
+        out.append(
+            (
+                "MULTI_SERVICE",
+                "customers",
+                f"{pct:.0f}% of customers use multiple services",
+                f"{r['multi_service']:,} of {r['cq_total']:,} customers in {period}",
+                "positive" if pct >= 20 else "neutral",
+            )
+        )
+
+    # CONCENTRATION — Top-20th-percentile revenue share
+    if r["rev"] and r["rev"] > 0 and r["top20_rev"] is not None:
+        share = r["top20_rev"] / r["rev"] * 100
+        out.append(
+            (
+                "CONCENTRATION",
+                "revenue",
+                f"Top 20% of customers generate {share:.0f}% of revenue",
+                f"Dhs {r['top20_rev']:,.0f} of Dhs {r['rev']:,.0f} total in {period}",
+                "negative" if share > 85 else "neutral",
+            )
+        )
+
+    # TOP_CATEGORY / TOP_SERVICE — Highest item volume
+    if r["has_items"]:
+        out.append(
+            (
+                "TOP_CATEGORY",
+                "operations",
+                f"Top category: {r['top_category']} ({r['top_category_qty']:,} items)",
+                f"Highest volume item category in {period}",
+                "neutral",
+            )
+        )
+        out.append(
+            (
+                "TOP_SERVICE",
+                "operations",
+                f"Top service: {r['top_service']} ({r['top_service_qty']:,} items)",
+                f"Highest volume service type in {period}",
+                "neutral",
+            )
+        )
+
+    # EXPRESS_SHARE — Express item share
+    if r["item_qty"] and r["item_qty"] > 0:
+        pct = r["express_qty"] / r["item_qty"] * 100
+        out.append(
+            (
+                "EXPRESS_SHARE",
+                "operations",
+                f"Express orders: {pct:.0f}% of items",
+                f"{r['express_qty']:,} express of {r['item_qty']:,} total items in {period}",
+                "positive" if pct >= 20 else "neutral",
+            )
+        )
+
+    # DELIVERY_RATE — Deliveries as share of total stops
+    if r["deliveries"] is not None and r["pickups"] is not None and (r["deliveries"] + r["pickups"]) > 0:
+        rate = r["deliveries"] / (r["deliveries"] + r["pickups"]) * 100
+        out.append(
+            (
+                "DELIVERY_RATE",
+                "operations",
+                f"Delivery rate: {rate:.0f}% ({r['deliveries']:,} deliveries, {r['pickups']:,} pickups)",
+                f"Total stops: {r['deliveries'] + r['pickups']:,} in {period}",
+                "neutral",
+            )
+        )
+
+    # REV_PER_DELIVERY — Revenue per delivery stop
+    if r["rev_per_delivery"] is not None:
+        out.append(
+            (
+                "REV_PER_DELIVERY",
+                "operations",
+                f"Revenue per delivery: Dhs {r['rev_per_delivery']:,.0f}",
+                f"Average revenue generated per delivery stop in {period}",
+                "positive" if r["rev_per_delivery"] >= 100 else "neutral",
+            )
+        )
+
+    # GEO_SHIFT — Inside Abu Dhabi stop share vs prior month
+    if r["prior_period"] and r["stops"] and r["stops"] > 0 and r["prev_stops"] and r["prev_stops"] > 0:
+        pct_cur = r["inside_stops"] / r["stops"] * 100
+        pct_prev = r["prev_inside_stops"] / r["prev_stops"] * 100
+        diff = pct_cur - pct_prev
+        out.append(
+            (
+                "GEO_SHIFT",
+                "operations",
+                f"Inside Abu Dhabi stops: {pct_cur:.0f}% ({diff:+.0f}pp vs last month)",
+                f"{r['inside_stops']:,} inside stops of {r['stops']:,} total in {period}",
+                "neutral",
+            )
+        )
+
+    # DIGITAL_PAYMENT — Stripe + Terminal share
+    if r["collections"] and r["collections"] > 0:
+        pct = r["digital"] / r["collections"] * 100
+        out.append(
+            (
+                "DIGITAL_PAYMENT",
+                "payments",
+                f"Digital payments: {pct:.0f}% of collections",
+                f"Dhs {r['digital']:,.0f} stripe+terminal of Dhs {r['collections']:,.0f} total in {period}",
+                "positive" if pct >= 70 else "neutral",
+            )
+        )
+
+    # COLLECTION_RATE — Collections / Revenue
+    if r["rev"] and r["rev"] > 0:
+        rate = r["collections"] / r["rev"] * 100
+        out.append(
+            (
+                "COLLECTION_RATE",
+                "payments",
+                f"Collection rate: {rate:.0f}% of revenue collected",
+                f"Dhs {r['collections']:,.0f} collected of Dhs {r['rev']:,.0f} earned in {period}",
+                "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral"),
+            )
+        )
+
+    # AVG_DAYS_PAYMENT — Avg days to payment vs prior month
+    cur_days, prev_days = r["avg_days_payment"], r["prev_avg_days_payment"]
+    if r["prior_period"] and cur_days is not None and prev_days is not None and prev_days > 0:
+        diff = cur_days - prev_days
+        out.append(
+            (
+                "AVG_DAYS_PAYMENT",
+                "payments",
+                f"Avg days to payment: {cur_days:.1f} days ({diff:+.1f} vs last month)",
+                f"Average collection cycle in {period}",
+                "positive" if diff < 0 else ("negative" if diff > 1 else "neutral"),
+            )
+        )
+
+    # OUTSTANDING_PCT — Outstanding as % of revenue (CC_2025 only)
+    if r["rev"] and r["rev"] > 0:
+        pct = r["outstanding"] / r["rev"] * 100
+        out.append(
+            (
+                "OUTSTANDING_PCT",
+                "payments",
+                f"Outstanding: {pct:.0f}% of revenue (Dhs {r['outstanding']:,.0f})",
+                f"Unpaid CC_2025 orders in {period}",
+                "negative" if pct > 10 else ("neutral" if pct > 5 else "positive"),
+            )
+        )
+
+    # PROCESSING_TIME — Flag if avg processing > 3 days
+    if r["avg_processing"] is not None:
+        avg = r["avg_processing"]
+        out.append(
+            (
+                "PROCESSING_TIME",
+                "operations",
+                f"Avg processing time: {avg:.1f} days{'  — above target' if avg > 3.0 else ''}",
+                f"Average order processing cycle in {period}",
+                "negative" if avg > 3.0 else "positive",
+            )
+        )
+
+    return out
+
+
+# =====================================================================
+# WEEKLY RULES
+# =====================================================================
+
+
+def evaluate_weekly(r: dict) -> list[tuple]:
+    """Evaluate the 8 WoW rules for one ISO week aggregate row."""
+    week = r["period"]
+    out = []
+
+    # WRev_WOW — Revenue week-over-week
+    if r["prior_period"] and r["prev_rev"] and r["prev_rev"] > 0:
+        pct = (r["rev"] - r["prev_rev"]) / r["prev_rev"] * 100
+        out.append(
+            (
+                "WRev_WOW",
+                "revenue",
+                f"Revenue {pct:+.0f}% vs last week",
+                f"Dhs {r['rev']:,.0f} this week vs Dhs {r['prev_rev']:,.0f} last week",
+                "positive" if pct > 2 else ("negative" if pct < -2 else "neutral"),
+            )
+        )
+
+    # WRev_TREND — Revenue vs 4-week rolling average
+    if r["trend_rev"] is not None and r["avg_4wk_rev"] is not None and r["avg_4wk_rev"] > 0:
+        pct = (r["trend_rev"] - r["avg_4wk_rev"]) / r["avg_4wk_rev"] * 100
+        out.append(
+            (
+                "WRev_TREND",
+                "revenue",
+                f"Revenue {pct:+.0f}% vs 4-week average",
+                f"Dhs {r['trend_rev']:,.0f} this week vs Dhs {r['avg_4wk_rev']:,.0f} avg",
+                "positive" if pct > 5 else ("negative" if pct < -5 else "neutral"),
+            )
+        )
+
+    # WCust_WOW — Active customers week-over-week
+    if r["prior_period"] and r["prev_cust"] and r["prev_cust"] > 0:
+        pct = (r["cust"] - r["prev_cust"]) / r["prev_cust"] * 100
+        out.append(
+            (
+                "WCust_WOW",
+                "customers",
+                f"Active customers {pct:+.0f}% vs last week",
+                f"{r['cust']:,} customers this week vs {r['prev_cust']:,} last week",
+                "positive" if pct > 0 else "negative",
+            )
+        )
+
+    # WStops_WOW — Total stops week-over-week
+    if r["prior_period"] and r["prev_stops"] and r["prev_stops"] > 0:
+        pct = (r["stops"] - r["prev_stops"]) / r["prev_stops"] * 100
+        out.append(
+            (
+                "WStops_WOW",
+                "operations",
+                f"Stops {pct:+.0f}% vs last week",
+                f"{r['stops']:,} stops this week vs {r['prev_stops']:,} last week",
+                "positive" if pct > 0 else "negative",
+            )
+        )
+
+    # WItems_WOW — Items processed week-over-week
+    if r["prior_period"] and r["prev_items"] and r["prev_items"] > 0:
+        pct = (r["items"] - r["prev_items"]) / r["prev_items"] * 100
+        out.append(
+            (
+                "WItems_WOW",
+                "operations",
+                f"Items {pct:+.0f}% vs last week",
+                f"{r['items']:,} items this week vs {r['prev_items']:,} last week",
+                "positive" if pct > 0 else "negative",
+            )
+        )
+
+    # WProcessing — Avg processing days
+    if r["avg_processing"] is not None:
+        avg = r["avg_processing"]
+        out.append(
+            (
+                "WProcessing",
+                "operations",
+                f"Avg processing: {avg:.1f} days{'  — above target' if avg > 3.0 else ''}",
+                f"Average order processing time in {week}",
+                "negative" if avg > 3.0 else "positive",
+            )
+        )
+
+    # WCollection_Rate — Collections / revenue this week
+    if r["rev"] and r["rev"] > 0:
+        rate = r["collections"] / r["rev"] * 100
+        out.append(
+            (
+                "WCollection_Rate",
+                "payments",
+                f"Collection rate: {rate:.0f}% of revenue collected",
+                f"Dhs {r['collections']:,.0f} collected of Dhs {r['rev']:,.0f} earned in {week}",
+                "positive" if rate >= 90 else ("negative" if rate < 70 else "neutral"),
+            )
+        )
+
+    # WDelivery_Rate — Delivery share of total stops
+    if r["deliveries"] is not None and r["pickups"] is not None and (r["deliveries"] + r["pickups"]) > 0:
+        rate = r["deliveries"] / (r["deliveries"] + r["pickups"]) * 100
+        out.append(
+            (
+                "WDelivery_Rate",
+                "operations",
+                f"Delivery rate: {rate:.0f}% ({r['deliveries']:,} deliveries, {r['pickups']:,} pickups)",
+                f"Total stops: {r['deliveries'] + r['pickups']:,} in {week}",
+                "neutral",
+            )
+        )
+
+    return out
+
+
+EVALUATORS = {"monthly": evaluate_monthly, "weekly": evaluate_weekly}
+
+
+def build_insight_rows(rows: list[dict], granularity: str) -> list[tuple]:
+    """Evaluate every aggregate row and return insights-table tuples."""
+    evaluate = EVALUATORS[granularity]
+    out = []
+    for row in rows:
+        for rule_id, category, headline, detail, sentiment in evaluate(row):
+            out.append((row["period"], rule_id, category, headline, detail, sentiment, granularity))
+    return out
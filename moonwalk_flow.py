@@ -1,8 +1,9 @@
 """Prefect orchestration flow for Moonwalk Analytics refresh pipeline.
 
-Wraps ETL -> DuckDB -> Notion pipeline as a Prefect flow with retries
-and task-level visibility.  Notion tasks are non-fatal: exceptions are
-caught and logged as warnings so the flow always completes.
+Wraps ETL -> DuckDB -> Postgres -> cache warm-up -> Notion pipeline as a
+Prefect flow with retries and task-level visibility.  Postgres, warm-up and
+Notion tasks are non-fatal: exceptions are caught and logged as warnings so
+the flow always completes.
 
 Usage:
     python moonwalk_flow.py             # run directly
@@ -18,22 +19,18 @@ sys.path.insert(0, str(Path(__file__).resolve().parent))
 from prefect import flow, task, get_run_logger
 
 from config import ANALYTICS_DATABASE_URL, DB_PATH, LOCAL_STAGING_PATH
+from snapshot_store import current_db_path, current_version
 
 
 def _resolve_db_path():
-    """Return the freshest readable DuckDB path.
+    """Return the DuckDB snapshot the CURRENT pointer names.
 
-    After a rebuild the live file may still be locked by the dashboard;
-    cleancloud_to_duckdb.py writes the new DB to DB_PATH + '.tmp' in that case.
-    This function returns the .tmp path if it is newer than the live file,
-    otherwise returns the live DB_PATH.
+    cleancloud_to_duckdb.py writes each rebuild to a new
+    analytics-<version>.duckdb and repoints CURRENT at it, so the live file is
+    never overwritten while the dashboard holds it open.  Falls back to
+    DB_PATH before the first versioned build.
     """
-    tmp = DB_PATH.with_suffix(".duckdb.tmp")
-    if tmp.exists():
-        live_mtime = DB_PATH.stat().st_mtime if DB_PATH.exists() else 0
-        if tmp.stat().st_mtime > live_mtime:
-            return tmp
-    return DB_PATH
+    return current_db_path(DB_PATH)
 
 
 _REQUIRED_CSVS = [
@@ -72,32 +69,36 @@ def run_etl():
 
 
 @task(name="run-duckdb", retries=1, retry_delay_seconds=5)
-def run_duckdb():
-    """Rebuild DuckDB analytics database (~0.5s)."""
+def run_duckdb(incremental: bool = False):
+    """Rebuild DuckDB analytics database (~0.5s); incremental reloads changed months only."""
     log = get_run_logger()
-    log.info("Starting DuckDB rebuild...")
+    log.info(f"Starting DuckDB {'incremental refresh' if incremental else 'rebuild'}...")
     import cleancloud_to_duckdb
 
-    cleancloud_to_duckdb.main()
-
-    # Try to promote .tmp -> live; if locked by dashboard, log and continue.
-    # Subsequent tasks use _resolve_db_path() to prefer .tmp when it is fresher.
-    tmp_path = DB_PATH.with_suffix(".duckdb.tmp")
-    if tmp_path.exists():
-        try:
-            import shutil
-
-            shutil.move(str(tmp_path), str(DB_PATH))
-            log.info(f"DuckDB rebuild complete - promoted .tmp to {DB_PATH}")
-        except Exception:
-            log.warning(f"DuckDB rebuild complete - live file locked, .tmp retained at {tmp_path}")
-    elif DB_PATH.exists():
-        size_mb = DB_PATH.stat().st_size / (1024 * 1024)
-        log.info(f"DuckDB rebuild complete - {size_mb:.1f} MB at {DB_PATH}")
+    cleancloud_to_duckdb.main(incremental=incremental)
+
+    db_file = _resolve_db_path()
+    if db_file.exists():
+        size_mb = db_file.stat().st_size / (1024 * 1024)
+        log.info(f"DuckDB rebuild complete - snapshot v{current_version(DB_PATH)}, {size_mb:.1f} MB at {db_file}")
     else:
         log.info("DuckDB rebuild complete")
 
 
+@task(name="run-etl-duckdb-inprocess", retries=1, retry_delay_seconds=5)
+def run_etl_duckdb_inprocess(incremental: bool = False):
+    """Run ETL and DuckDB in one process: frames go to DuckDB through Arrow, staging files are written in the background."""
+    log = get_run_logger()
+    log.info("Starting in-process ETL -> DuckDB...")
+    import cleancloud_to_duckdb
+
+    failed = cleancloud_to_duckdb.run_inprocess(incremental=incremental)
+    if failed:
+        # Postgres and Excel read these files — stop rather than sync stale data
+        raise RuntimeError(f"Staging writes failed: {', '.join(failed)}")
+    log.info(f"In-process refresh complete - snapshot v{current_version(DB_PATH)} at {_resolve_db_path()}")
+
+
 @task(name="run-postgres", retries=1, retry_delay_seconds=5)
 def run_postgres():
     """Bulk-load Parquet files into Railway Postgres analytics schema (non-fatal).
@@ -113,15 +114,40 @@ def run_postgres():
         import cleancloud_to_postgres
 
         summary = cleancloud_to_postgres.main()
-        rows = {k: v for k, v in summary.items() if k != "elapsed_s"}
+        stat_keys = ("elapsed_s", "load_stats", "load_wall_s", "load_workers", "bytes_shipped", "bytes_skipped")
+        rows = {k: v for k, v in summary.items() if k not in stat_keys}
         log.info(
             f"Postgres sync complete in {summary.get('elapsed_s', 0):.1f}s — "
             + ", ".join(f"{k}={v}" for k, v in rows.items())
         )
+        for table, stats in summary.get("load_stats", {}).items():
+            log.info(
+                f"  {table}: {stats['rows_per_s']:,} rows/s over {stats['batches']} COPY batch(es),"
+                f" {stats['bytes_shipped'] / 1e6:.1f} MB shipped / {stats['bytes_skipped'] / 1e6:.1f} MB skipped"
+            )
     except Exception as exc:
         log.warning(f"Postgres sync failed (non-fatal): {exc}")
 
 
+@task(name="warm-dashboard-cache", retries=0)
+def warm_dashboard_cache():
+    """Pre-compute the dashboard pages for the data just published (non-fatal)."""
+    log = get_run_logger()
+    try:
+        import cache_warmer
+
+        summary = cache_warmer.warm_dashboard_cache()
+        if summary.get("skipped"):
+            log.info("MOONWALK_CACHE_DIR not set — skipping dashboard cache warm-up")
+        else:
+            log.info(
+                f"Dashboard cache warmed for {summary['version']} in {summary['elapsed_s']:.1f}s — "
+                f"{summary['computed']} computed, {summary['failed']} failed"
+            )
+    except Exception as exc:
+        log.warning(f"Dashboard cache warm-up failed (non-fatal): {exc}")
+
+
 @task(name="push-notion-narrative", retries=2, retry_delay_seconds=10)
 def push_notion_narrative():
     """Push GPT-4o-mini narrative insights to Notion portal toggle (non-fatal)."""
@@ -129,7 +155,6 @@ def push_notion_narrative():
     try:
         import notion_push
 
-        notion_push.DB_PATH = _resolve_db_path()
         notion_push.run(log=log.info)
     except Exception as exc:
         log.warning(f"Notion narrative push failed (non-fatal): {exc}")
@@ -141,8 +166,13 @@ def push_notion_narrative():
 
 
 @flow(name="moonwalk-refresh", log_prints=True)
-def moonwalk_refresh():
-    """Full Moonwalk Analytics refresh: ETL -> DuckDB -> Postgres -> Notion."""
+def moonwalk_refresh(incremental: bool = False, inprocess: bool = False):
+    """Full Moonwalk Analytics refresh: ETL -> DuckDB -> Postgres -> cache warm-up -> Notion.
+
+    ``incremental=True`` (intraday runs) reloads only the DuckDB month
+    partitions whose staged data changed.  ``inprocess=True`` hands the ETL
+    frames to DuckDB in memory instead of round-tripping the staging files.
+    """
     log = get_run_logger()
     flow_start = time.time()
     timings: dict[str, float] = {}
@@ -153,9 +183,13 @@ def moonwalk_refresh():
         timings[label] = time.time() - t0
 
     _run("Validate CSVs", validate_source_csvs)
-    _run("ETL pipeline", run_etl)
-    _run("DuckDB rebuild", run_duckdb)
+    if inprocess:
+        _run("ETL + DuckDB", lambda: run_etl_duckdb_inprocess(incremental=incremental))
+    else:
+        _run("ETL pipeline", run_etl)
+        _run("DuckDB rebuild", lambda: run_duckdb(incremental=incremental))
     _run("Postgres sync", run_postgres)
+    _run("Cache warm-up", warm_dashboard_cache)
     _run("Notion narrative", push_notion_narrative)
 
     total = time.time() - flow_start
@@ -19,7 +19,8 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from config import DB_PATH, DUCKDB_KEY, NOTION_API_KEY, NOTION_KPI_DB_ID, NOTION_PAGE_ID, NOTION_TOKEN
+from config import DB_PATH, DUCKDB_FILE_KEY, NOTION_API_KEY, NOTION_KPI_DB_ID, NOTION_PAGE_ID, NOTION_TOKEN, SERVING_MODE
+from snapshot_store import current_db_path
 
 _BASE_URL = "https://loomi-performance-analytics.streamlit.app"
 _DB_TITLE = "Moonwalk KPI Tracker"
@@ -30,14 +31,19 @@ _DB_TITLE = "Moonwalk KPI Tracker"
 
 
 def _open_db():
-    """Open encrypted DuckDB connection (read-only) using the ATTACH pattern."""
+    """Open encrypted DuckDB connection (read-only) on the CURRENT snapshot (ATTACH pattern), or the served Parquet views."""
     import duckdb
 
+    if SERVING_MODE == "parquet":
+        import parquet_serving
+
+        return parquet_serving.connect()
+    db_path = str(current_db_path(DB_PATH)).replace("\\", "/")
     con = duckdb.connect(":memory:")
-    if DUCKDB_KEY:
-        con.execute(f"ATTACH '{DB_PATH}' AS db (ENCRYPTION_KEY '{DUCKDB_KEY}', READ_ONLY)")
+    if DUCKDB_FILE_KEY:
+        con.execute(f"ATTACH '{db_path}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}', READ_ONLY)")
     else:
-        con.execute(f"ATTACH '{DB_PATH}' AS db (READ_ONLY)")
+        con.execute(f"ATTACH '{db_path}' AS db (READ_ONLY)")
     con.execute("USE db")
     return con
 
@@ -21,7 +21,8 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from config import DB_PATH, DUCKDB_KEY, NOTION_API_KEY, NOTION_PAGE_ID, NOTION_TOKEN
+from config import DB_PATH, DUCKDB_FILE_KEY, NOTION_API_KEY, NOTION_PAGE_ID, NOTION_TOKEN, SERVING_MODE
+from snapshot_store import current_db_path
 
 _BASE_URL = "https://loomi-performance-analytics.streamlit.app"
 _INSIGHTS_HEADING = "📊 Latest Insights"
@@ -43,14 +44,19 @@ _PERSONA_CONFIG = [
 
 
 def _open_db():
-    """Open encrypted DuckDB connection using the ATTACH pattern."""
+    """Open encrypted DuckDB connection on the CURRENT snapshot (ATTACH pattern), or the served Parquet views."""
     import duckdb
 
+    if SERVING_MODE == "parquet":
+        import parquet_serving
+
+        return parquet_serving.connect()
+    db_path = str(current_db_path(DB_PATH)).replace("\\", "/")
     con = duckdb.connect(":memory:")
-    if DUCKDB_KEY:
-        con.execute(f"ATTACH '{DB_PATH}' AS db (ENCRYPTION_KEY '{DUCKDB_KEY}', READ_ONLY)")
+    if DUCKDB_FILE_KEY:
+        con.execute(f"ATTACH '{db_path}' AS db (ENCRYPTION_KEY '{DUCKDB_FILE_KEY}', READ_ONLY)")
     else:
-        con.execute(f"ATTACH '{DB_PATH}' AS db (READ_ONLY)")
+        con.execute(f"ATTACH '{db_path}' AS db (READ_ONLY)")
     con.execute("USE db")
     return con
 
@@ -222,20 +228,18 @@ def _fetch_ep_weekly_snapshot(con) -> dict | None:
         target_weeks AS (SELECT w FROM cur_week UNION ALL SELECT w FROM prev_week),
         sales_weekly AS (
             SELECT
-                p.ISOWeekLabel                               AS week,
+                s.ISOWeekLabel                               AS week,
                 ROUND(SUM(s.Total_Num), 0)                  AS revenue,
                 SUM(s.HasDelivery::INT + s.HasPickup::INT)  AS stops
             FROM sales s
-            JOIN dim_period p ON s.Earned_Date = p.Date
-            WHERE s.Is_Earned = TRUE AND p.ISOWeekLabel IN (SELECT w FROM target_weeks)
-            GROUP BY p.ISOWeekLabel
+            WHERE s.Is_Earned = TRUE AND s.ISOWeekLabel IN (SELECT w FROM target_weeks)
+            GROUP BY s.ISOWeekLabel
         ),
         items_weekly AS (
-            SELECT p.ISOWeekLabel AS week, SUM(i.Quantity) AS items
+            SELECT i.ISOWeekLabel AS week, SUM(i.Quantity) AS items
             FROM items i
-            JOIN dim_period p ON i.ItemDate = p.Date
-            WHERE p.ISOWeekLabel IN (SELECT w FROM target_weeks)
-            GROUP BY p.ISOWeekLabel
+            WHERE i.ISOWeekLabel IN (SELECT w FROM target_weeks)
+            GROUP BY i.ISOWeekLabel
         ),
         first_order AS (
             SELECT CustomerID_Std, MIN(Earned_Date) AS first_date
@@ -22,6 +22,7 @@ from dashboard_shared import (
     inject_global_styles,
     is_weekly,
     period_selector,
+    prefetch,
     render_footer,
     render_metric_selector,
     render_page_title,
@@ -49,6 +50,20 @@ render_page_title("Customer Analytics", hdr)
 selected_period, available_periods = period_selector(con, show_title=False)
 window, fetch_periods = compute_fetch_periods(selected_period, available_periods)
 
+# Every tab's data at once (monthly-only views are skipped for weeks)
+needs = {"customer_measures": (fetch_customer_measures_batch, tuple(fetch_periods))}
+if not is_weekly(selected_period):
+    needs.update(
+        new_customers=(fetch_new_customer_detail_batch, tuple(fetch_periods)),
+        reactivation=(fetch_reactivation_batch, tuple(fetch_periods)),
+        insights=(fetch_customer_insights_batch, tuple(fetch_periods)),
+        rfm=(fetch_rfm_snapshot, selected_period),
+        clv=(fetch_clv_estimate,),
+        cohort=(fetch_extended_cohort_batch, tuple(fetch_periods)),
+        heatmap=(fetch_retention_heatmap,),
+    )
+data = prefetch(con, **needs)
+
 _CA_TABS = ["Acquisition", "Segmentation", "Cohort", "Per-Customer"]
 tab1, tab2, tab3, tab4 = st.tabs(["👥 Acquisition", "🎯 Segmentation", "📅 Cohort", "📊 Per-Customer"])
 activate_tab_from_url(_CA_TABS)
@@ -58,8 +73,8 @@ with tab1:
     if is_weekly(selected_period):
         st.info("This view is available in monthly mode only.")
     else:
-        new_data = fetch_new_customer_detail_batch(con, tuple(fetch_periods))
-        react_data = fetch_reactivation_batch(con, tuple(fetch_periods))
+        new_data = data["new_customers"].result()
+        react_data = data["reactivation"].result()
 
         # Merge reactivation into new_data
         for m in new_data:
@@ -128,7 +143,7 @@ with tab2:
     if is_weekly(selected_period):
         st.info("This view is available in monthly mode only.")
     else:
-        ci_data = fetch_customer_insights_batch(con, tuple(fetch_periods))
+        ci_data = data["insights"].result()
         cur = ci_data.get(selected_period, {})
         p_idx = available_periods.index(selected_period)
         prev_ci = ci_data.get(available_periods[p_idx - 1], {}) if p_idx > 0 else {}
@@ -179,7 +194,7 @@ with tab2:
         st.markdown("---")
         render_section_heading("RFM Segmentation", hdr)
 
-        rfm_df = fetch_rfm_snapshot(con, selected_period)
+        rfm_df = data["rfm"].result()
         if len(rfm_df) < 5:
             st.info("Not enough data for RFM segmentation this period.")
         else:
@@ -302,7 +317,7 @@ with tab2:
 
         st.markdown("---")
         render_section_heading("Customer Lifetime Value (Simple)", hdr)
-        clv = fetch_clv_estimate(con)
+        clv = data["clv"].result()
         clv_cols = st.columns(3)
         for i, (label, val) in enumerate(
             [
@@ -323,8 +338,8 @@ with tab3:
     if is_weekly(selected_period):
         st.info("This view is available in monthly mode only.")
     else:
-        cohort_data = fetch_extended_cohort_batch(con, tuple(fetch_periods))
-        heatmap_df = fetch_retention_heatmap(con)
+        cohort_data = data["cohort"].result()
+        heatmap_df = data["heatmap"].result()
 
         cur = cohort_data.get(selected_period, {})
         p_idx = available_periods.index(selected_period)
@@ -434,7 +449,7 @@ with tab3:
 
 # ─── PER-CUSTOMER TAB ────────────────────────────────────────────────
 with tab4:
-    cm_data = fetch_customer_measures_batch(con, tuple(fetch_periods))
+    cm_data = data["customer_measures"].result()
 
     render_section_heading("Items per Customer", hdr)
     render_metric_selector(
@@ -22,6 +22,7 @@ from dashboard_shared import (
     inject_global_styles,
     is_weekly,
     period_selector,
+    prefetch,
     render_footer,
     render_trend_chart_v3,
     sub_card,
@@ -40,6 +41,11 @@ stop_hdr = COLORS["stops"]["header"]
 
 selected_period, available_periods = period_selector(con, show_title=True)
 window, fetch_periods = compute_fetch_periods(selected_period, available_periods)
+data = prefetch(
+    con,
+    trend=(fetch_measures_batch, tuple(fetch_periods)),
+    yoy=(fetch_yoy_batch, tuple(fetch_periods)),
+)
 
 _EP_TABS = ["Snapshot", "Trends", "Insights"]
 tab1, tab2, tab3 = st.tabs(["📊 Snapshot", "📈 Trends", "💡 Insights"])
@@ -61,8 +67,8 @@ with tab1:
                 key="ep_pdf_dl",
             )
 
-    trend_data = fetch_measures_batch(con, tuple(fetch_periods))
-    yoy_data = fetch_yoy_batch(con, tuple(fetch_periods))
+    trend_data = data["trend"].result()
+    yoy_data = data["yoy"].result()
 
     cur = trend_data.get(selected_period, {})
     p_idx = available_periods.index(selected_period)
@@ -218,8 +224,8 @@ with tab1:
 
 # ─── TRENDS TAB ──────────────────────────────────────────────────────
 with tab2:
-    trend_data = fetch_measures_batch(con, tuple(fetch_periods))
-    yoy_trend = fetch_yoy_batch(con, tuple(fetch_periods))
+    trend_data = data["trend"].result()
+    yoy_trend = data["yoy"].result()
 
     row1 = st.columns(2)
     row2 = st.columns(2)
@@ -292,7 +298,8 @@ with tab2:
 with tab3:
     try:
         insights_df = con.execute(
-            "SELECT * FROM insights WHERE granularity = 'monthly' ORDER BY category, rule_id"
+            "SELECT * FROM insights WHERE granularity = $1 AND period = $2 ORDER BY category, rule_id",
+            ["weekly" if is_weekly(selected_period) else "monthly", selected_period],
         ).df()
     except Exception:
         insights_df = None
@@ -300,7 +307,7 @@ with tab3:
         st.info("Run `python cleancloud_to_duckdb.py` to build the insights table.")
     else:
         if len(insights_df) == 0:
-            st.info("No insights generated yet. Check your data and re-run DuckDB ETL.")
+            st.info(f"No insights for {selected_period}. Check your data and re-run DuckDB ETL.")
         else:
             DOT = {"positive": "🟢", "negative": "🔴", "neutral": "🟡"}
             categories = insights_df["category"].unique()
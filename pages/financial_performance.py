@@ -24,6 +24,7 @@ from dashboard_shared import (
     inject_global_styles,
     is_weekly,
     period_selector,
+    prefetch,
     render_footer,
     render_metric_selector,
     render_page_title,
@@ -42,8 +43,18 @@ render_page_title("Financial Performance", hdr)
 selected_period, available_periods = period_selector(con, show_title=False)
 window, fetch_periods = compute_fetch_periods(selected_period, available_periods)
 
-pm_data = fetch_payments_batch(con, tuple(fetch_periods))
-ops_data = fetch_operations_batch(con, tuple(fetch_periods))
+# Every tab's data at once: the render waits for the slowest fetch, not their sum
+needs = {
+    "payments": (fetch_payments_batch, tuple(fetch_periods)),
+    "operations": (fetch_operations_batch, tuple(fetch_periods)),
+    "outstanding": (fetch_outstanding,),
+}
+if not is_weekly(selected_period):
+    needs["pareto"] = (fetch_pareto_data, selected_period)
+data = prefetch(con, **needs)
+
+pm_data = data["payments"].result()
+ops_data = data["operations"].result()
 
 pm_cur = pm_data.get(selected_period, {})
 pm_idx = available_periods.index(selected_period)
@@ -210,7 +221,7 @@ with tab3:
     if is_weekly(selected_period):
         st.info("This view is available in monthly mode only.")
     else:
-        pareto_df = fetch_pareto_data(con, selected_period)
+        pareto_df = data["pareto"].result()
         if len(pareto_df) == 0:
             st.info("No revenue data for this period.")
         else:
@@ -299,7 +310,7 @@ with tab3:
 
 # ─── OUTSTANDING TAB ─────────────────────────────────────────────────
 with tab4:
-    outstanding = fetch_outstanding(con)
+    outstanding = data["outstanding"].result()
     order_count = outstanding.get("order_count", 0)
 
     if order_count == 0:
@@ -9,7 +9,6 @@ import streamlit as st
 
 from dashboard_shared import (
     COLORS,
-    METRIC_CONFIG,
     activate_tab_from_url,
     change_html,
     compute_fetch_periods,
@@ -24,11 +23,12 @@ from dashboard_shared import (
     inject_global_styles,
     is_weekly,
     period_selector,
+    prefetch,
+    render_breakdown_selector,
     render_footer,
     render_metric_selector,
     render_page_title,
     render_section_heading,
-    render_trend_chart_v2,
     sub_card,
 )
 from section_data import fetch_logistics_batch, fetch_operations_batch
@@ -45,8 +45,13 @@ render_page_title("Operations Center", hdr)
 selected_period, available_periods = period_selector(con, show_title=False)
 window, fetch_periods = compute_fetch_periods(selected_period, available_periods)
 
-lg_data = fetch_logistics_batch(con, tuple(fetch_periods))
-ops_data = fetch_operations_batch(con, tuple(fetch_periods))
+data = prefetch(
+    con,
+    logistics=(fetch_logistics_batch, tuple(fetch_periods)),
+    operations=(fetch_operations_batch, tuple(fetch_periods)),
+)
+lg_data = data["logistics"].result()
+ops_data = data["operations"].result()
 
 lg_cur = lg_data.get(selected_period, {})
 lg_idx = available_periods.index(selected_period)
@@ -277,126 +282,35 @@ with tab3:
     CATEGORIES = ["Professional Wear", "Traditional Wear", "Home Linens", "Extras", "Others"]
     SERVICES = ["Wash & Press", "Dry Cleaning", "Press Only", "Other Service"]
 
-    def _safe_key(name):
-        return name.lower().replace(" ", "_").replace("&", "and")
-
     render_section_heading("By Item Category", hdr)
-
-    if "oc_category" not in st.session_state:
-        st.session_state["oc_category"] = CATEGORIES[0]
-
-    cat_cols = st.columns(len(CATEGORIES))
-    for i, cat in enumerate(CATEGORIES):
-        with cat_cols[i]:
-            is_active = st.session_state["oc_category"] == cat
-            if st.button(
-                cat,
-                key=f"oc_cat_btn_{i}",
-                use_container_width=True,
-                type="primary" if is_active else "secondary",
-            ):
-                st.session_state["oc_category"] = cat
-                st.rerun()
-
-    sel_cat = st.session_state["oc_category"]
-    cat_data = ops_cur.get("categories", {}).get(sel_cat, {})
-    prev_cat = ops_prev.get("categories", {}).get(sel_cat, {}) if ops_prev else {}
-
-    sc1, sc2 = st.columns(2)
-    with sc1:
-        st.markdown(
-            sub_card(
-                "Items",
-                fmt_count(cat_data.get("items", 0)),
-                change_html(cat_data.get("items", 0), prev_cat.get("items")),
-                sub_bg,
-            ),
-            unsafe_allow_html=True,
-        )
-    with sc2:
-        st.markdown(
-            sub_card(
-                "Revenue",
-                fmt_dhs_sub(cat_data.get("revenue", 0)),
-                change_html(cat_data.get("revenue", 0), prev_cat.get("revenue")),
-                sub_bg,
-            ),
-            unsafe_allow_html=True,
-        )
-
-    safe_cat = _safe_key(sel_cat)
-    items_key = f"cat_{safe_cat}_items"
-    _, center, _ = st.columns([1, 18, 1])
-    with center:
-        render_trend_chart_v2(
-            f"oc_cat_{safe_cat}_items",
-            ops_data,
-            window,
-            available_periods,
-            METRIC_CONFIG[items_key],
-            hdr,
-            show_title=True,
-            height=300,
-        )
+    render_breakdown_selector(
+        CATEGORIES,
+        "categories",
+        ops_data,
+        window,
+        available_periods,
+        selected_period,
+        "oc_category",
+        "oc_cat",
+        "cat",
+        hdr,
+        sub_bg,
+    )
 
     render_section_heading("By Service Type", hdr)
-
-    if "oc_service" not in st.session_state:
-        st.session_state["oc_service"] = SERVICES[0]
-
-    svc_cols = st.columns(len(SERVICES))
-    for i, svc in enumerate(SERVICES):
-        with svc_cols[i]:
-            is_active = st.session_state["oc_service"] == svc
-            if st.button(
-                svc,
-                key=f"oc_svc_btn_{i}",
-                use_container_width=True,
-                type="primary" if is_active else "secondary",
-            ):
-                st.session_state["oc_service"] = svc
-                st.rerun()
-
-    sel_svc = st.session_state["oc_service"]
-    svc_data = ops_cur.get("services", {}).get(sel_svc, {})
-    prev_svc = ops_prev.get("services", {}).get(sel_svc, {}) if ops_prev else {}
-
-    ss1, ss2 = st.columns(2)
-    with ss1:
-        st.markdown(
-            sub_card(
-                "Items",
-                fmt_count(svc_data.get("items", 0)),
-                change_html(svc_data.get("items", 0), prev_svc.get("items")),
-                sub_bg,
-            ),
-            unsafe_allow_html=True,
-        )
-    with ss2:
-        st.markdown(
-            sub_card(
-                "Revenue",
-                fmt_dhs_sub(svc_data.get("revenue", 0)),
-                change_html(svc_data.get("revenue", 0), prev_svc.get("revenue")),
-                sub_bg,
-            ),
-            unsafe_allow_html=True,
-        )
-
-    safe_svc = _safe_key(sel_svc)
-    svc_items_key = f"svc_{safe_svc}_items"
-    _, svc_center, _ = st.columns([1, 18, 1])
-    with svc_center:
-        render_trend_chart_v2(
-            f"oc_svc_{safe_svc}_items",
-            ops_data,
-            window,
-            available_periods,
-            METRIC_CONFIG[svc_items_key],
-            hdr,
-            show_title=True,
-            height=300,
-        )
+    render_breakdown_selector(
+        SERVICES,
+        "services",
+        ops_data,
+        window,
+        available_periods,
+        selected_period,
+        "oc_service",
+        "oc_svc",
+        "svc",
+        hdr,
+        sub_bg,
+    )
 
     st.markdown("---")
     render_section_heading("Express & Efficiency", hdr)
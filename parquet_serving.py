@@ -0,0 +1,271 @@
+"""Serve the dashboard straight from Parquet: typed DuckDB views, no analytics.duckdb build.
+
+For small deployments (and the Streamlit Cloud fallback) the dashboard can run
+on an in-memory DuckDB whose tables are views over Parquet files:
+
+  - publish() copies the staged Parquet (or in-process frames) into a new
+    versioned directory — fact tables hive-partitioned by month — computes the
+    insights table once, and swaps the CURRENT pointer (snapshot_store), so a
+    refresh is "write Parquet, swap a directory".
+  - create_views() defines one view per table with the same DATE / BOOLEAN /
+    integer / ENUM casts, dropped columns, period keys and Legacy-Paid rule
+    that cleancloud_to_duckdb.create_database() applies to its tables.
+  - Monthly filters on YearMonth prune month partitions (YearMonth *is* the
+    partition column); Parquet row-group statistics serve the rest.
+
+Enable with MOONWALK_SERVING_MODE=parquet.
+
+Usage:
+    python parquet_serving.py        # publish the staged Parquet files
+"""
+
+import json
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from config import LOGS_PATH, PARQUET_SERVING_PATH
+from logger_config import setup_logger
+from snapshot_store import current_db_path, next_version, publish as publish_snapshot, snapshot_path
+
+logger = setup_logger(__name__)
+
+# Profiling accumulator
+_profile_entries = []
+
+# Columns never copied into the served directory (dashboard does not read them)
+SERVED_EXCLUDE = {"customers": ["Phone", "Email"]}
+
+
+# =====================================================================
+# VIEW DEFINITIONS
+# =====================================================================
+
+
+def _sql_path(path: Path) -> str:
+    return str(path).replace("\\", "/")
+
+
+def _relation(folder: Path, table_name: str) -> str | None:
+    """FROM-clause relation for a table in ``folder``, with a ``month`` column on fact tables.
+
+    Understands both layouts: a published directory (``sales/month=YYYY-MM/``
+    partitions, ``customers.parquet``) and the flat staging folder
+    (``All_Sales_Python.parquet``), where ``month`` is derived on the fly.
+    """
+    from cleancloud_to_duckdb import CSV_FILES, PARTITION_COLUMNS, _partition_expr
+
+    partitioned = folder / table_name
+    if partitioned.is_dir():
+        glob = _sql_path(partitioned / "*" / "*.parquet")
+        return f"read_parquet('{glob}', hive_partitioning = true, hive_types = {{'month': VARCHAR}})"
+    for path in (folder / f"{table_name}.parquet", folder / CSV_FILES[table_name].replace(".csv", ".parquet")):
+        if path.exists():
+            relation = f"read_parquet('{_sql_path(path)}')"
+            if table_name in PARTITION_COLUMNS:
+                month = f"NULLIF({_partition_expr(PARTITION_COLUMNS[table_name])}, '')"
+                relation = f"(SELECT *, {month} AS month FROM {relation})"
+            return relation
+    return None
+
+
+def _typed_select(conn, table_name: str, relation: str) -> str:
+    """SELECT over ``relation`` applying cleancloud_to_duckdb's casts and dropped columns."""
+    from cleancloud_to_duckdb import BOOL_COLUMNS, DATE_COLUMNS, DROP_COLUMNS, ENUM_COLUMNS, INT_COLUMNS
+
+    present = {r[0] for r in conn.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()}
+    replace = {}
+    for col in DATE_COLUMNS.get(table_name, []):
+        replace[col] = f'TRY_CAST("{col}" AS DATE)'
+    for col in BOOL_COLUMNS.get(table_name, []):
+        replace[col] = f'TRY_CAST("{col}" AS BOOLEAN)'
+    for col, target_type in INT_COLUMNS.get(table_name, {}).items():
+        replace[col] = f'TRY_CAST("{col}" AS {target_type})'
+    for col in ENUM_COLUMNS.get(table_name, {}):
+        replace[col] = f'TRY_CAST("{col}" AS enum_{col.lower()})'
+    if table_name == "sales" and "Paid" in replace:
+        # Legacy orders were settled pre-CleanCloud (see _mark_legacy_paid)
+        replace["Paid"] = f"CASE WHEN Source = 'Legacy' THEN TRUE ELSE {replace['Paid']} END"
+
+    exclude = [c for c in DROP_COLUMNS.get(table_name, []) + SERVED_EXCLUDE.get(table_name, []) if c in present]
+    replace_sql = ", ".join(f'{expr} AS "{col}"' for col, expr in replace.items() if col in present)
+    exclude_sql = ", ".join(f'"{c}"' for c in exclude)
+    return (
+        "SELECT *"
+        + (f" EXCLUDE ({exclude_sql})" if exclude_sql else "")
+        + (f" REPLACE ({replace_sql})" if replace_sql else "")
+        + f" FROM {relation}"
+    )
+
+
+def create_views(conn, folder: Path) -> list[str]:
+    """Define the analytics tables in ``conn`` as typed views over the Parquet in ``folder``.
+
+    Period keys match add_period_keys(): YearMonth is the month partition
+    (equal to dim_period.YearMonth for every date dim_period covers, i.e. all
+    operational data) so monthly filters prune partitions; YearQuarter and
+    ISOWeekLabel come from dim_period.  Returns the views created.
+    """
+    from cleancloud_to_duckdb import CSV_FILES, ENUM_COLUMNS, PARTITION_COLUMNS, PERIOD_KEY_COLUMNS
+
+    folder = Path(folder)
+    created_enums = set()
+    for col_defs in ENUM_COLUMNS.values():
+        for col, values in col_defs.items():
+            enum_name = f"enum_{col.lower()}"
+            if enum_name not in created_enums:
+                values_sql = ", ".join(f"'{v}'" for v in values)
+                conn.execute(f"CREATE TYPE IF NOT EXISTS {enum_name} AS ENUM ({values_sql})")
+                created_enums.add(enum_name)
+
+    views = []
+    for table_name in ["dim_period"] + [t for t in CSV_FILES if t != "dim_period"]:
+        relation = _relation(folder, table_name)
+        if relation is None:
+            logger.warning(f"  [WARN] No Parquet for {table_name} in {folder}")
+            continue
+        typed = _typed_select(conn, table_name, relation)
+        if table_name not in PERIOD_KEY_COLUMNS:
+            conn.execute(f"CREATE OR REPLACE VIEW {table_name} AS {typed}")
+            views.append(table_name)
+            continue
+
+        aliases = {}
+        keys = []
+        for key, source in PERIOD_KEY_COLUMNS[table_name].items():
+            if key == "YearMonth" and source == PARTITION_COLUMNS.get(table_name):
+                keys.append(f"t.month AS {key}")
+                continue
+            alias = aliases.setdefault(source, f"p{len(aliases)}")
+            keys.append(f"{alias}.{key}")
+        joins = " ".join(f'LEFT JOIN dim_period {a} ON t."{src}" = {a}.Date' for src, a in aliases.items())
+        conn.execute(f"""
+            CREATE OR REPLACE VIEW {table_name} AS
+            SELECT t.* EXCLUDE (month), {", ".join(keys)}
+            FROM ({typed}) t {joins}
+        """)
+        views.append(table_name)
+
+    if "sales" in views:
+        conn.execute("""
+            CREATE OR REPLACE VIEW order_lookup AS
+            SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+                   MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+            FROM sales
+        """)
+        views.append("order_lookup")
+    insights_path = folder / "insights.parquet"
+    if insights_path.exists():
+        conn.execute(f"CREATE OR REPLACE VIEW insights AS SELECT * FROM read_parquet('{_sql_path(insights_path)}')")
+        views.append("insights")
+    return views
+
+
+def connect(folder: Path | None = None):
+    """In-memory DuckDB connection with typed views over ``folder`` (default: CURRENT directory)."""
+    folder = Path(folder) if folder is not None else current_db_path(PARQUET_SERVING_PATH)
+    conn = duckdb.connect(":memory:")
+    create_views(conn, folder)
+    return conn
+
+
+# =====================================================================
+# PUBLISH
+# =====================================================================
+
+
+def _write_table(conn, table_name: str, relation: str, target: Path) -> int:
+    """Copy one table into the served directory; fact tables are partitioned by month."""
+    from cleancloud_to_duckdb import CLUSTER_KEYS, PARTITION_COLUMNS, _partition_expr
+
+    present = {r[0] for r in conn.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()}
+    exclude = [c for c in SERVED_EXCLUDE.get(table_name, []) if c in present]
+    select = "SELECT *" + (f" EXCLUDE ({', '.join(exclude)})" if exclude else "")
+    # Sort like cluster_tables() so row-group min/max statistics stay selective
+    order = ", ".join(f'"{k}" NULLS LAST' for k in CLUSTER_KEYS.get(table_name, []) if k in present)
+    order_sql = f" ORDER BY {order}" if order else ""
+
+    if table_name in PARTITION_COLUMNS:
+        month = f"NULLIF({_partition_expr(PARTITION_COLUMNS[table_name])}, '')"
+        conn.execute(f"""
+            COPY ({select}, {month} AS month FROM {relation}{order_sql})
+            TO '{_sql_path(target / table_name)}' (FORMAT parquet, PARTITION_BY (month))
+        """)
+    else:
+        conn.execute(f"COPY ({select} FROM {relation}{order_sql}) TO '{_sql_path(target / f'{table_name}.parquet')}' (FORMAT parquet)")
+    return conn.execute(f"SELECT COUNT(*) FROM {relation}").fetchone()[0]
+
+
+def publish(frames: dict | None = None) -> Path:
+    """Write the next served Parquet directory and point CURRENT at it.
+
+    Reads the staged Parquet/CSV files, or in-process ``frames`` keyed as in
+    cleancloud_to_duckdb.FRAME_KEYS.  The insights table is computed once here
+    (over the new views) and stored as insights.parquet.
+    """
+    from cleancloud_to_duckdb import CSV_FILES, _register_frames, _source_relation, create_insights_table
+
+    logger.info("\n" + "=" * 70)
+    logger.info("PARQUET SERVING - PUBLISH")
+    logger.info("=" * 70)
+    logger.info("")
+    _start = datetime.now()
+
+    PARQUET_SERVING_PATH.parent.mkdir(parents=True, exist_ok=True)
+    version = next_version(PARQUET_SERVING_PATH)
+    target = snapshot_path(version, PARQUET_SERVING_PATH)
+    if target.exists():
+        shutil.rmtree(target)
+    target.mkdir()
+
+    conn = duckdb.connect(":memory:")
+    try:
+        _register_frames(conn, frames)
+        total_rows = 0
+        for table_name in CSV_FILES:
+            start = datetime.now()
+            relation, source_fmt = _source_relation(table_name, frames)
+            rows = _write_table(conn, table_name, relation, target)
+            total_rows += rows
+            elapsed = (datetime.now() - start).total_seconds()
+            _profile_entries.append(
+                {"phase": f"write_{table_name}", "elapsed_s": round(elapsed, 3), "rows": rows, "format": source_fmt}
+            )
+            logger.info(f"  [OK] {table_name}: {rows:,} rows written in {elapsed:.1f}s ({source_fmt})")
+    finally:
+        conn.close()
+
+    # Insights need the typed tables: evaluate them once over the new views
+    conn = connect(target)
+    try:
+        create_insights_table(conn)
+        conn.execute(f"COPY insights TO '{_sql_path(target / 'insights.parquet')}' (FORMAT parquet)")
+    finally:
+        conn.close()
+
+    publish_snapshot(version, PARQUET_SERVING_PATH)
+    elapsed = (datetime.now() - _start).total_seconds()
+    size_mb = sum(p.stat().st_size for p in target.rglob("*.parquet")) / (1024 * 1024)
+    logger.info(f"  [OK] Published {target.name}: {total_rows:,} rows, {size_mb:.1f} MB in {elapsed:.1f}s")
+
+    profile = {
+        "timestamp": datetime.now().isoformat(),
+        "total_elapsed_s": round(elapsed, 3),
+        "size_mb": round(size_mb, 1),
+        "snapshot_version": version,
+        "phases": _profile_entries,
+    }
+    LOGS_PATH.mkdir(parents=True, exist_ok=True)
+    profile_path = LOGS_PATH / f"parquet_serving_profile_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    profile_path.write_text(json.dumps(profile, indent=2))
+    logger.info(f"  [PROFILE] Written to {profile_path.name}")
+    return target
+
+
+if __name__ == "__main__":
+    publish()
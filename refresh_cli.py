@@ -1,12 +1,16 @@
 """Cross-platform refresh CLI for Moonwalk Analytics.
 
 Runs the ETL pipeline and/or DuckDB rebuild without requiring PowerShell
-or Excel COM automation. Suitable for non-Windows environments.
+or Excel COM automation. Suitable for non-Windows environments.  After a
+successful rebuild it warms the dashboard cache (cache_warmer.py) and pushes
+the Notion narrative.
 
 Usage:
     python refresh_cli.py              # ETL + DuckDB (default)
     python refresh_cli.py --etl-only   # ETL pipeline only
     python refresh_cli.py --duckdb-only  # DuckDB rebuild only
+    python refresh_cli.py --incremental  # reload only changed months into DuckDB
+    python refresh_cli.py --inprocess    # ETL frames -> DuckDB in memory, staging files in background
 """
 
 import argparse
@@ -17,6 +21,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from config import LOCAL_STAGING_PATH, PYTHON_SCRIPT_FOLDER, DB_PATH
+from snapshot_store import current_db_path
 from logger_config import setup_logger
 
 logger = setup_logger("refresh_cli")
@@ -62,8 +67,8 @@ def run_etl() -> bool:
     return True
 
 
-def run_duckdb() -> bool:
-    """Rebuild the DuckDB analytics database."""
+def run_duckdb(incremental: bool = False) -> bool:
+    """Rebuild (or incrementally refresh) the DuckDB analytics database."""
     logger.info("=" * 60)
     logger.info("DuckDB Rebuild")
     logger.info("=" * 60)
@@ -72,7 +77,7 @@ def run_duckdb() -> bool:
     try:
         import cleancloud_to_duckdb
 
-        cleancloud_to_duckdb.main()
+        cleancloud_to_duckdb.main(incremental=incremental)
     except SystemExit as e:
         if e.code and e.code != 0:
             logger.error(f"DuckDB rebuild exited with code {e.code}")
@@ -84,9 +89,59 @@ def run_duckdb() -> bool:
     elapsed = time.perf_counter() - start
     logger.info(f"DuckDB rebuild completed in {elapsed:.1f}s")
 
-    if DB_PATH.exists():
-        size_mb = DB_PATH.stat().st_size / (1024 * 1024)
-        logger.info(f"Database: {DB_PATH} ({size_mb:.1f} MB)")
+    db_file = current_db_path(DB_PATH)
+    if db_file.exists():
+        size_mb = db_file.stat().st_size / (1024 * 1024)
+        logger.info(f"Database: {db_file} ({size_mb:.1f} MB)")
+    return True
+
+
+def _push_notion() -> None:
+    """Optional Notion push (only if env vars set; logs and exits cleanly if not)."""
+    try:
+        from notion_push import run as notion_run
+
+        notion_run(log=logger.info)
+    except Exception as e:
+        logger.warning(f"Notion push failed (non-fatal): {e}")
+
+
+def _warm_cache() -> None:
+    """Pre-compute the dashboard pages for the new data (only with MOONWALK_CACHE_DIR; non-fatal)."""
+    try:
+        from cache_warmer import warm_dashboard_cache
+
+        warm_dashboard_cache()
+    except Exception as e:
+        logger.warning(f"Cache warm-up failed (non-fatal): {e}")
+
+
+def run_inprocess(incremental: bool = False) -> bool:
+    """Run ETL + DuckDB in one process, handing the frames over through Arrow."""
+    logger.info("=" * 60)
+    logger.info("ETL + DuckDB (in-process)")
+    logger.info("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        import cleancloud_to_duckdb
+
+        failed = cleancloud_to_duckdb.run_inprocess(incremental=incremental)
+    except SystemExit as e:
+        if e.code and e.code != 0:
+            logger.error(f"In-process refresh exited with code {e.code}")
+            return False
+        failed = []
+    except Exception as e:
+        logger.error(f"In-process refresh failed: {e}")
+        return False
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"ETL + DuckDB completed in {elapsed:.1f}s")
+
+    if failed:
+        logger.error(f"Staging writes failed: {', '.join(Path(p).name for p in failed)}")
+        return False
     return True
 
 
@@ -104,6 +159,16 @@ def main():
         action="store_true",
         help="Rebuild DuckDB only (skip ETL pipeline)",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reload only month partitions that changed since the last DuckDB build",
+    )
+    parser.add_argument(
+        "--inprocess",
+        action="store_true",
+        help="Hand ETL frames to DuckDB in memory; write staging files in the background",
+    )
     args = parser.parse_args()
 
     # Default: both
@@ -117,6 +182,14 @@ def main():
     total_start = time.perf_counter()
     success = True
 
+    if run_etl_flag and run_duckdb_flag and args.inprocess:
+        if not run_inprocess(incremental=args.incremental):
+            success = False
+        run_etl_flag = run_duckdb_flag = False
+        if success:
+            _warm_cache()
+            _push_notion()
+
     if run_etl_flag:
         if not run_etl():
             success = False
@@ -125,16 +198,11 @@ def main():
                 run_duckdb_flag = False
 
     if run_duckdb_flag:
-        if not run_duckdb():
+        if not run_duckdb(incremental=args.incremental):
             success = False
         else:
-            # Optional Notion push (only if env vars set; logs and exits cleanly if not)
-            try:
-                from notion_push import run as notion_run
-
-                notion_run(log=logger.info)
-            except Exception as e:
-                logger.warning(f"Notion push failed (non-fatal): {e}")
+            _warm_cache()
+            _push_notion()
 
     total_elapsed = time.perf_counter() - total_start
 
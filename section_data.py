@@ -10,8 +10,19 @@ Provides cached batch SQL fetch functions for:
 """
 
 import time
-import streamlit as st
-from dashboard_shared import get_grain_context, _log_query_time
+from dashboard_cache import snapshot_cached
+from dashboard_queries import named_query
+from dashboard_shared import (
+    cube_totals,
+    fetch_period_cube,
+    keyed_rows,
+    measures_from_cube,
+    prior_year_period,
+    query_df,
+    query_dfs,
+    _CUBE_ROUTES,
+    _log_query_time,
+)
 
 
 # =====================================================================
@@ -19,61 +30,39 @@ from dashboard_shared import get_grain_context, _log_query_time
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_customer_insights_batch(_con, months_tuple):
     """Fetch active customers, multi-service, and top-20% analysis."""
     _t0 = time.perf_counter()
     months = list(months_tuple)
-    placeholders = ", ".join(f"'{m}'" for m in months)
-
-    # Query 1: Active customers + multi-service count
-    cust_df = _con.execute(f"""
-        SELECT p.YearMonth,
-            COUNT(DISTINCT cq.CustomerID_Std) AS active_customers,
-            COUNT(DISTINCT CASE WHEN cq.Is_Multi_Service = TRUE
-                  THEN cq.CustomerID_Std END) AS multi_service
-        FROM customer_quality cq
-        JOIN dim_period p ON cq.OrderCohortMonth = p.Date
-        WHERE p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth
-    """).df()
 
-    # Query 2: Top 20% by spend and volume
-    top20_df = _con.execute(f"""
-        WITH thresholds AS (
-            SELECT p.YearMonth,
-                PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY cq.Monthly_Revenue) AS p80_rev,
-                PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY cq.Monthly_Items) AS p80_items
-            FROM customer_quality cq
-            JOIN dim_period p ON cq.OrderCohortMonth = p.Date
-            WHERE p.YearMonth IN ({placeholders})
-            GROUP BY p.YearMonth
-        )
-        SELECT p.YearMonth,
-            t.p80_rev AS spend_threshold,
-            SUM(CASE WHEN cq.Monthly_Revenue >= t.p80_rev THEN cq.Monthly_Revenue ELSE 0 END) AS top20_spend_rev,
-            SUM(cq.Monthly_Revenue) AS total_rev,
-            t.p80_items AS volume_threshold,
-            SUM(CASE WHEN cq.Monthly_Items >= t.p80_items THEN cq.Monthly_Revenue ELSE 0 END) AS top20_vol_rev
-        FROM customer_quality cq
-        JOIN dim_period p ON cq.OrderCohortMonth = p.Date
-        JOIN thresholds t ON p.YearMonth = t.YearMonth
-        WHERE p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth, t.p80_rev, t.p80_items
-    """).df()
+    cust_df, top20_df = query_dfs(
+        _con,
+        # Query 1: Active customers + multi-service count
+        (*named_query("customer_insights.active"), months),
+        # Query 2: Top 20% by spend and volume
+        (*named_query("customer_insights.top20"), months),
+    )
+
+    cust = keyed_rows(cust_df, "YearMonth", {"active_customers": 0, "multi_service": 0})
+    top20 = keyed_rows(
+        top20_df,
+        "YearMonth",
+        {
+            "spend_threshold": 0.0,
+            "top20_spend_rev": 0.0,
+            "total_rev": 0.0,
+            "volume_threshold": 0.0,
+            "top20_vol_rev": 0.0,
+        },
+    )
 
     result = {}
     for m in months:
-        c_row = cust_df[cust_df["YearMonth"] == m]
-        active = int(c_row["active_customers"].iloc[0]) if len(c_row) else 0
-        multi = int(c_row["multi_service"].iloc[0]) if len(c_row) else 0
-
-        t_row = top20_df[top20_df["YearMonth"] == m]
-        spend_thresh = float(t_row["spend_threshold"].iloc[0]) if len(t_row) else 0.0
-        top20_spend_rev = float(t_row["top20_spend_rev"].iloc[0]) if len(t_row) else 0.0
-        total_rev = float(t_row["total_rev"].iloc[0]) if len(t_row) else 0.0
-        vol_thresh = float(t_row["volume_threshold"].iloc[0]) if len(t_row) else 0.0
-        top20_vol_rev = float(t_row["top20_vol_rev"].iloc[0]) if len(t_row) else 0.0
+        active, multi = cust[m]["active_customers"], cust[m]["multi_service"]
+        t = top20[m]
+        spend_thresh, top20_spend_rev, total_rev = t["spend_threshold"], t["top20_spend_rev"], t["total_rev"]
+        vol_thresh, top20_vol_rev = t["volume_threshold"], t["top20_vol_rev"]
 
         result[m] = {
             "ci_active_customers": active,
@@ -94,51 +83,30 @@ def fetch_customer_insights_batch(_con, months_tuple):
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_cohort_batch(_con, months_tuple):
     """Fetch M0/M1 customer counts, items, revenue, and retention metrics."""
     _t0 = time.perf_counter()
     months = list(months_tuple)
-    placeholders = ", ".join(f"'{m}'" for m in months)
 
-    # Query 1: M0/M1 customer counts + revenue
-    sales_df = _con.execute(f"""
-        SELECT p.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER) AS cohort_month,
-            COUNT(DISTINCT s.CustomerID_Std) AS customers,
-            SUM(s.Total_Num) AS revenue
-        FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL
-          AND s.MonthsSinceCohort IN (0, 1)
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER)
-    """).df()
+    sales_df, items_df = query_dfs(
+        _con,
+        # Query 1: M0/M1 customer counts + revenue
+        (*named_query("cohort.sales"), months),
+        # Query 2: M0/M1 items
+        (*named_query("cohort.items"), months),
+    )
 
-    # Query 2: M0/M1 items
-    items_df = _con.execute(f"""
-        SELECT p.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER) AS cohort_month,
-            SUM(i.Quantity) AS items
-        FROM items i
-        JOIN dim_period p ON i.ItemDate = p.Date
-        LEFT JOIN (
-            SELECT DISTINCT OrderID_Std, MonthsSinceCohort FROM sales
-        ) sc ON i.OrderID_Std = sc.OrderID_Std
-        WHERE sc.MonthsSinceCohort IN (0, 1)
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER)
-    """).df()
+    sales_by = keyed_rows(sales_df, ("YearMonth", "cohort_month"), {"customers": 0, "revenue": 0.0})
+    items_by = keyed_rows(items_df, ("YearMonth", "cohort_month"), {"items": 0})
 
     result = {}
     for m in months:
         row = {}
         for cm in (0, 1):
             prefix = f"m{cm}"
-            s_row = sales_df[(sales_df["YearMonth"] == m) & (sales_df["cohort_month"] == cm)]
-            i_row = items_df[(items_df["YearMonth"] == m) & (items_df["cohort_month"] == cm)]
-
-            customers = int(s_row["customers"].iloc[0]) if len(s_row) else 0
-            revenue = float(s_row["revenue"].iloc[0]) if len(s_row) else 0.0
-            items = int(i_row["items"].iloc[0]) if len(i_row) else 0
+            customers, revenue = sales_by[m, cm]["customers"], sales_by[m, cm]["revenue"]
+            items = items_by[m, cm]["items"]
 
             row[f"{prefix}_customers"] = customers
             row[f"{prefix}_revenue"] = revenue
@@ -184,78 +152,45 @@ def compute_cohort_retention(trend_data, available_months, selected_month):
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_logistics_batch(_con, periods_tuple):
-    """Fetch stops, delivery metrics, and geographic distribution."""
+    """Fetch stops, delivery metrics, and geographic distribution (from the period cube)."""
     _t0 = time.perf_counter()
     periods = list(periods_tuple)
-    ctx = get_grain_context(periods)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-    placeholders = ", ".join(f"'{p}'" for p in periods)
-
-    # Query 1: Headlines
-    head_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-            SUM(s.HasDelivery::INT) + SUM(s.HasPickup::INT) AS total_stops,
-            SUM(CASE WHEN s.HasDelivery THEN s.Pieces ELSE 0 END) AS items_delivered,
-            SUM(CASE WHEN s.HasDelivery THEN s.Total_Num ELSE 0 END) AS delivery_revenue,
-            SUM(s.Total_Num) AS total_revenue,
-            SUM(s.HasDelivery::INT) AS deliveries,
-            SUM(s.HasPickup::INT) AS pickups,
-            SUM(CASE WHEN s.HasDelivery THEN s.Total_Num ELSE 0 END)
-                / NULLIF(SUM(s.HasDelivery::INT), 0) AS rev_per_delivery
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+    cube = fetch_period_cube(_con, periods_tuple)
 
-    # Query 2: Geographic split
-    geo_df = _con.execute(f"""
-        SELECT {period_col} AS period, s.Route_Category,
-            COUNT(DISTINCT s.CustomerID_Std) AS customers,
-            SUM(CASE WHEN s.HasDelivery THEN s.Pieces ELSE 0 END) AS items,
-            SUM(s.HasDelivery::INT) + SUM(s.HasPickup::INT) AS stops,
-            SUM(s.Total_Num) AS revenue
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND s.Route_Category IN ('Inside Abu Dhabi', 'Outer Abu Dhabi')
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}, s.Route_Category
-    """).df()
+    defaults = {"items_delivered": 0, "delivery_revenue": 0.0, "rev_total": 0.0, "deliveries": 0, "pickups": 0}
+    for prefix in _CUBE_ROUTES.values():
+        defaults.update(
+            {f"{prefix}_customers": 0, f"{prefix}_items": 0, f"{prefix}_stops": 0, f"{prefix}_revenue": 0.0}
+        )
+    sales = keyed_rows(cube["sales"], "period", defaults)
 
     result = {}
     for p in periods:
-        h_row = head_df[head_df["period"] == p]
-        total_stops = int(h_row["total_stops"].iloc[0]) if len(h_row) else 0
-        items_delivered = int(h_row["items_delivered"].iloc[0]) if len(h_row) else 0
-        delivery_rev = float(h_row["delivery_revenue"].iloc[0]) if len(h_row) else 0.0
-        total_rev = float(h_row["total_revenue"].iloc[0]) if len(h_row) else 0.0
-        deliveries = int(h_row["deliveries"].iloc[0]) if len(h_row) else 0
-        pickups = int(h_row["pickups"].iloc[0]) if len(h_row) else 0
-        rpd_val = h_row["rev_per_delivery"].iloc[0] if len(h_row) else None
-        rev_per_delivery = float(rpd_val) if rpd_val is not None and not (rpd_val != rpd_val) else 0.0
-
-        geo = {}
-        for cat in ("Inside Abu Dhabi", "Outer Abu Dhabi"):
-            g_row = geo_df[(geo_df["period"] == p) & (geo_df["Route_Category"] == cat)]
-            geo[cat] = {
-                "customers": int(g_row["customers"].iloc[0]) if len(g_row) else 0,
-                "items": int(g_row["items"].iloc[0]) if len(g_row) else 0,
-                "stops": int(g_row["stops"].iloc[0]) if len(g_row) else 0,
-                "revenue": float(g_row["revenue"].iloc[0]) if len(g_row) else 0.0,
+        h = sales[p]
+        deliveries, pickups = h["deliveries"], h["pickups"]
+        total_stops = deliveries + pickups
+        delivery_rev, total_rev = h["delivery_revenue"], h["rev_total"]
+
+        geo = {
+            cat: {
+                "customers": h[f"{prefix}_customers"],
+                "items": h[f"{prefix}_items"],
+                "stops": h[f"{prefix}_stops"],
+                "revenue": h[f"{prefix}_revenue"],
             }
+            for cat, prefix in _CUBE_ROUTES.items()
+        }
 
         result[p] = {
             "lg_total_stops": total_stops,
-            "lg_items_delivered": items_delivered,
+            "lg_items_delivered": h["items_delivered"],
             "lg_delivery_rev_pct": delivery_rev / total_rev if total_rev > 0 else 0.0,
             "lg_delivery_rate": deliveries / total_stops if total_stops > 0 else 0.0,
             "lg_deliveries": deliveries,
             "lg_pickups": pickups,
-            "lg_rev_per_delivery": rev_per_delivery,
+            "lg_rev_per_delivery": delivery_rev / deliveries if deliveries > 0 else 0.0,
             "geo": geo,
         }
     _log_query_time("fetch_logistics_batch", time.perf_counter() - _t0, len(periods))
@@ -267,51 +202,22 @@ def fetch_logistics_batch(_con, periods_tuple):
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_operations_batch(_con, periods_tuple):
-    """Fetch items and revenue by Item_Category and Service_Type."""
+    """Fetch items and revenue by Item_Category and Service_Type (from the period cube)."""
     _t0 = time.perf_counter()
     periods = list(periods_tuple)
-    ctx = get_grain_context(periods)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-    placeholders = ", ".join(f"'{p}'" for p in periods)
-
-    # Query 1: By Item_Category (includes express totals for express_share)
-    cat_df = _con.execute(f"""
-        SELECT {period_col} AS period, i.Item_Category,
-            SUM(i.Quantity) AS items, SUM(i.Total) AS revenue,
-            SUM(CASE WHEN i.Express = TRUE THEN i.Quantity ELSE 0 END) AS express_items
-        FROM items i
-        JOIN dim_period p ON i.ItemDate = p.Date
-        WHERE {period_col} IN ({placeholders})
-        GROUP BY {period_col}, i.Item_Category
-    """).df()
-
-    # Query 2: By Service_Type
-    svc_df = _con.execute(f"""
-        SELECT {period_col} AS period, i.Service_Type,
-            SUM(i.Quantity) AS items, SUM(i.Total) AS revenue
-        FROM items i
-        JOIN dim_period p ON i.ItemDate = p.Date
-        WHERE {period_col} IN ({placeholders})
-        GROUP BY {period_col}, i.Service_Type
-    """).df()
-
-    # Query 3: Processing efficiency metrics
-    proc_df = _con.execute(f"""
-        SELECT {period_col} AS period,
-            AVG(s.Processing_Days) AS avg_processing_time,
-            AVG(s.TimeInStore_Days) AS avg_time_in_store
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+    cube = fetch_period_cube(_con, periods_tuple)
 
     categories = ["Professional Wear", "Traditional Wear", "Home Linens", "Extras", "Others"]
     services = ["Wash & Press", "Dry Cleaning", "Press Only", "Other Service"]
 
+    cat_rows = cube_totals(
+        cube["items"], ("period", "Item_Category"), {"items": 0, "revenue": 0.0, "express_items": 0}
+    )
+    svc_rows = cube_totals(cube["items"], ("period", "Service_Type"), {"items": 0, "revenue": 0.0})
+    proc_rows = keyed_rows(cube["sales"], "period", {"avg_processing_time": 0.0, "avg_time_in_store": 0.0})
+
     result = {}
     for pd in periods:
         row = {"categories": {}, "services": {}}
@@ -319,33 +225,28 @@ def fetch_operations_batch(_con, periods_tuple):
         all_items_total = 0
         express_total = 0
         for cat in categories:
-            c_row = cat_df[(cat_df["period"] == pd) & (cat_df["Item_Category"] == cat)]
-            items = int(c_row["items"].iloc[0]) if len(c_row) else 0
-            revenue = float(c_row["revenue"].iloc[0]) if len(c_row) else 0.0
-            express_cat = int(c_row["express_items"].iloc[0]) if len(c_row) else 0
+            c = cat_rows[pd, cat]
+            items, revenue = c["items"], c["revenue"]
             row["categories"][cat] = {"items": items, "revenue": revenue}
             safe = cat.lower().replace(" ", "_").replace("&", "and")
             row[f"cat_{safe}_items"] = items
             row[f"cat_{safe}_rev"] = revenue
             all_items_total += items
-            express_total += express_cat
+            express_total += c["express_items"]
 
         row["express_items"] = express_total
         row["express_share"] = express_total / all_items_total if all_items_total > 0 else 0.0
 
         for svc in services:
-            s_row = svc_df[(svc_df["period"] == pd) & (svc_df["Service_Type"] == svc)]
-            items = int(s_row["items"].iloc[0]) if len(s_row) else 0
-            revenue = float(s_row["revenue"].iloc[0]) if len(s_row) else 0.0
+            items, revenue = svc_rows[pd, svc]["items"], svc_rows[pd, svc]["revenue"]
             row["services"][svc] = {"items": items, "revenue": revenue}
             safe = svc.lower().replace(" ", "_").replace("&", "and")
             row[f"svc_{safe}_items"] = items
             row[f"svc_{safe}_rev"] = revenue
 
         # Processing efficiency
-        p_row = proc_df[proc_df["period"] == pd]
-        row["ops_avg_processing_time"] = float(p_row["avg_processing_time"].iloc[0]) if len(p_row) else 0.0
-        row["ops_avg_time_in_store"] = float(p_row["avg_time_in_store"].iloc[0]) if len(p_row) else 0.0
+        row["ops_avg_processing_time"] = proc_rows[pd]["avg_processing_time"]
+        row["ops_avg_time_in_store"] = proc_rows[pd]["avg_time_in_store"]
 
         result[pd] = row
     _log_query_time("fetch_operations_batch", time.perf_counter() - _t0, len(periods))
@@ -357,41 +258,16 @@ def fetch_operations_batch(_con, periods_tuple):
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_payments_batch(_con, periods_tuple):
-    """Fetch revenue, collections by method, and processing metrics."""
+    """Fetch revenue, collections by method, and processing metrics (from the period cube)."""
     _t0 = time.perf_counter()
     periods = list(periods_tuple)
-    ctx = get_grain_context(periods)
-    period_col, sales_join = ctx["period_col"], ctx["sales_join"]
-    placeholders = ", ".join(f"'{p}'" for p in periods)
-
-    df = _con.execute(f"""
-        SELECT {period_col} AS period,
-            SUM(s.Total_Num) AS revenue,
-            SUM(s.Collections) AS total_collections,
-            SUM(CASE WHEN s.Payment_Type_Std = 'Stripe' THEN s.Collections ELSE 0 END) AS stripe,
-            SUM(CASE WHEN s.Payment_Type_Std = 'Terminal' THEN s.Collections ELSE 0 END) AS terminal,
-            SUM(CASE WHEN s.Payment_Type_Std = 'Cash' THEN s.Collections ELSE 0 END) AS cash,
-            AVG(s.DaysToPayment) AS avg_days_to_payment
-        FROM sales s
-        JOIN dim_period p ON {sales_join}
-        WHERE s.Earned_Date IS NOT NULL
-          AND {period_col} IN ({placeholders})
-        GROUP BY {period_col}
-    """).df()
+    cube = fetch_period_cube(_con, periods_tuple)
 
-    result = {}
-    for p in periods:
-        r = df[df["period"] == p]
-        result[p] = {
-            "pm_revenue": float(r["revenue"].iloc[0]) if len(r) else 0.0,
-            "pm_total_collections": float(r["total_collections"].iloc[0]) if len(r) else 0.0,
-            "pm_stripe": float(r["stripe"].iloc[0]) if len(r) else 0.0,
-            "pm_terminal": float(r["terminal"].iloc[0]) if len(r) else 0.0,
-            "pm_cash": float(r["cash"].iloc[0]) if len(r) else 0.0,
-            "pm_avg_days_to_payment": float(r["avg_days_to_payment"].iloc[0]) if len(r) else 0.0,
-        }
+    columns = ("total_collections", "stripe", "terminal", "cash", "avg_days_to_payment")
+    rows = keyed_rows(cube["sales"], "period", dict.fromkeys(("rev_total", *columns), 0.0))
+    result = {p: {"pm_revenue": rows[p]["rev_total"], **{f"pm_{c}": rows[p][c] for c in columns}} for p in periods}
     _log_query_time("fetch_payments_batch", time.perf_counter() - _t0, len(periods))
     return result
 
@@ -401,79 +277,43 @@ def fetch_payments_batch(_con, periods_tuple):
 # =====================================================================
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_yoy_batch(_con, periods_tuple):
     """Fetch prior-year data for the given periods (for YoY overlay in v3 charts).
 
-    Derives prior-year period strings ("2026-02" -> "2025-02", "2026-W06" -> "2025-W06"),
-    fetches measures for those prior periods, then re-keys the result to the current periods.
+    Reads the measures of the prior-year periods ("2026-02" -> "2025-02", "2026-W06" -> "2025-W06")
+    from the window's period cube, which includes them, keyed by the current periods.
     """
-    from dashboard_shared import fetch_measures_batch
-
     periods = list(periods_tuple)
-
-    def _prior_year(p):
-        if "W" in p:
-            parts = p.split("-W")
-            return f"{int(parts[0]) - 1}-W{parts[1]}"
-        parts = p.split("-")
-        return f"{int(parts[0]) - 1}-{parts[1]}"
-
-    prior_periods = [_prior_year(p) for p in periods]
-    prior_data = fetch_measures_batch(_con, tuple(prior_periods))
-
-    # Re-key: prior period string -> current period string
-    result = {}
-    for cur, prior in zip(periods, prior_periods):
-        result[cur] = prior_data.get(prior, {})
-    return result
+    prior_periods = [prior_year_period(p) for p in periods]
+    prior_data = measures_from_cube(fetch_period_cube(_con, periods_tuple), prior_periods)
+    return {cur: prior_data[prior] for cur, prior in zip(periods, prior_periods)}
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_extended_cohort_batch(_con, months_tuple):
     """Fetch M0-M3 customer counts, items, revenue for cohort analysis."""
     _t0 = time.perf_counter()
     months = list(months_tuple)
-    placeholders = ", ".join(f"'{m}'" for m in months)
 
-    # Query 1: M0-M3 customer counts + revenue
-    sales_df = _con.execute(f"""
-        SELECT p.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER) AS cohort_month,
-            COUNT(DISTINCT s.CustomerID_Std) AS customers,
-            SUM(s.Total_Num) AS revenue
-        FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        WHERE s.Earned_Date IS NOT NULL
-          AND s.MonthsSinceCohort IN (0, 1, 2, 3)
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth, CAST(s.MonthsSinceCohort AS INTEGER)
-    """).df()
+    sales_df, items_df = query_dfs(
+        _con,
+        # Query 1: M0-M3 customer counts + revenue
+        (*named_query("extended_cohort.sales"), months),
+        # Query 2: M0-M3 items
+        (*named_query("extended_cohort.items"), months),
+    )
 
-    # Query 2: M0-M3 items
-    items_df = _con.execute(f"""
-        SELECT p.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER) AS cohort_month,
-            SUM(i.Quantity) AS items
-        FROM items i
-        JOIN dim_period p ON i.ItemDate = p.Date
-        LEFT JOIN (
-            SELECT DISTINCT OrderID_Std, MonthsSinceCohort FROM sales
-        ) sc ON i.OrderID_Std = sc.OrderID_Std
-        WHERE sc.MonthsSinceCohort IN (0, 1, 2, 3)
-          AND p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth, CAST(sc.MonthsSinceCohort AS INTEGER)
-    """).df()
+    sales_by = keyed_rows(sales_df, ("YearMonth", "cohort_month"), {"customers": 0, "revenue": 0.0})
+    items_by = keyed_rows(items_df, ("YearMonth", "cohort_month"), {"items": 0})
 
     result = {}
     for m in months:
         row = {}
         for cm in (0, 1, 2, 3):
             prefix = f"m{cm}"
-            s_row = sales_df[(sales_df["YearMonth"] == m) & (sales_df["cohort_month"] == cm)]
-            i_row = items_df[(items_df["YearMonth"] == m) & (items_df["cohort_month"] == cm)]
-
-            customers = int(s_row["customers"].iloc[0]) if len(s_row) else 0
-            revenue = float(s_row["revenue"].iloc[0]) if len(s_row) else 0.0
-            items = int(i_row["items"].iloc[0]) if len(i_row) else 0
+            customers, revenue = sales_by[m, cm]["customers"], sales_by[m, cm]["revenue"]
+            items = items_by[m, cm]["items"]
 
             row[f"{prefix}_customers"] = customers
             row[f"{prefix}_revenue"] = revenue
@@ -486,7 +326,7 @@ def fetch_extended_cohort_batch(_con, months_tuple):
     return result
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_retention_heatmap(_con):
     """Fetch all-time cohort retention data for heatmap rendering."""
     _t0 = time.perf_counter()
@@ -507,72 +347,30 @@ def fetch_retention_heatmap(_con):
     return df
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_reactivation_batch(_con, months_tuple):
     """Fetch reactivated customers (dormant 3+ months then returning) per month."""
     _t0 = time.perf_counter()
     months = list(months_tuple)
-    placeholders = ", ".join(f"'{m}'" for m in months)
-
-    df = _con.execute(f"""
-        WITH monthly_active AS (
-            SELECT DISTINCT s.CustomerID_Std, s.OrderCohortMonth AS month_date
-            FROM sales s
-            WHERE s.Earned_Date IS NOT NULL AND s.Transaction_Type <> 'Invoice Payment'
-        ),
-        with_lag AS (
-            SELECT CustomerID_Std, month_date,
-                   LAG(month_date) OVER (PARTITION BY CustomerID_Std ORDER BY month_date) AS prev_month
-            FROM monthly_active
-        ),
-        reactivated AS (
-            SELECT CustomerID_Std, month_date FROM with_lag
-            WHERE prev_month IS NOT NULL AND month_date >= prev_month + INTERVAL '3 months'
-        )
-        SELECT p.YearMonth, COUNT(DISTINCT r.CustomerID_Std) AS reactivated_customers
-        FROM reactivated r JOIN dim_period p ON r.month_date = p.Date
-        WHERE p.YearMonth IN ({placeholders})
-        GROUP BY p.YearMonth
-    """).df()
 
-    result = {}
-    for m in months:
-        r_row = df[df["YearMonth"] == m]
-        result[m] = {"reactivated_customers": int(r_row["reactivated_customers"].iloc[0]) if len(r_row) else 0}
+    df = query_df(_con, *named_query("reactivation.customers"), months)
+
+    reactivated = keyed_rows(df, "YearMonth", {"reactivated_customers": 0})
+    result = {m: {"reactivated_customers": reactivated[m]["reactivated_customers"]} for m in months}
     _log_query_time("fetch_reactivation_batch", time.perf_counter() - _t0, len(months))
     return result
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_rfm_snapshot(_con, selected_period):
     """Fetch per-customer RFM raw data for customers active in last 6 months."""
     _t0 = time.perf_counter()
-    df = _con.execute(f"""
-        WITH period_anchor AS (
-            SELECT MAX(p.Date) AS anchor_date
-            FROM dim_period p WHERE p.YearMonth = '{selected_period}'
-        ),
-        cutoff AS (
-            SELECT DATE_TRUNC('month', anchor_date - INTERVAL '6 months') AS from_date
-            FROM period_anchor
-        )
-        SELECT s.CustomerID_Std,
-               ((SELECT anchor_date FROM period_anchor) - MAX(s.Earned_Date)) AS recency,
-               COUNT(DISTINCT s.OrderID_Std) AS frequency,
-               SUM(s.Total_Num) AS monetary
-        FROM sales s
-        WHERE s.Earned_Date IS NOT NULL
-          AND s.Transaction_Type <> 'Invoice Payment'
-          AND s.OrderCohortMonth >= (SELECT from_date FROM cutoff)
-          AND s.OrderCohortMonth <= (SELECT anchor_date FROM period_anchor)
-        GROUP BY s.CustomerID_Std
-        HAVING SUM(s.Total_Num) > 0
-    """).df()
+    df = query_df(_con, *named_query("rfm.customers"), selected_period)
     _log_query_time("fetch_rfm_snapshot", time.perf_counter() - _t0, 1)
     return df
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_clv_estimate(_con):
     """Fetch simple CLV estimate (avg monthly revenue × avg active months)."""
     _t0 = time.perf_counter()
@@ -594,24 +392,16 @@ def fetch_clv_estimate(_con):
     return {"avg_monthly_rev": float(r[0]), "avg_lifespan": float(r[1]), "simple_clv": float(r[2])}
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_pareto_data(_con, selected_period):
     """Fetch per-customer revenue for the selected period (for Pareto/concentration chart)."""
     _t0 = time.perf_counter()
-    df = _con.execute(f"""
-        SELECT s.CustomerID_Std, c.CustomerName, SUM(s.Total_Num) AS revenue
-        FROM sales s
-        JOIN dim_period p ON s.OrderCohortMonth = p.Date
-        JOIN customers c ON s.CustomerID_Std = c.CustomerID_Std
-        WHERE s.Earned_Date IS NOT NULL AND p.YearMonth = '{selected_period}'
-        GROUP BY s.CustomerID_Std, c.CustomerName
-        ORDER BY revenue DESC
-    """).df()
+    df = query_df(_con, *named_query("pareto.customers"), selected_period)
     _log_query_time("fetch_pareto_data", time.perf_counter() - _t0, 1)
     return df
 
 
-@st.cache_data(ttl=300)
+@snapshot_cached
 def fetch_outstanding(_con):
     """Fetch outstanding (Paid=FALSE, Source=CC_2025) order summary, aging, by-customer, and all orders."""
     _t0 = time.perf_counter()
@@ -0,0 +1,181 @@
+"""Versioned DuckDB snapshots with an atomic CURRENT pointer.
+
+Every DuckDB build writes a fresh ``analytics-<version>.duckdb`` next to
+DB_PATH and, once the file is closed and complete, publishes it by atomically
+replacing the one-line ``CURRENT`` file with the snapshot's name.  Readers
+resolve CURRENT each time they open the database, so:
+  - a build never has to overwrite a file a dashboard is holding open,
+  - readers switch to the new snapshot on their next open (no downtime),
+  - the version number only grows, so it doubles as a cache key.
+
+The same scheme versions the served Parquet directories (parquet-<version>/
+under PARQUET_SERVING_PATH's folder, with their own CURRENT).
+
+Only the newest DUCKDB_SNAPSHOT_KEEP published snapshots are kept; files still
+open by a reader (Windows) are skipped and retried on the next publish.
+Before the first versioned build there is no CURRENT file and readers fall back
+to the legacy single-file DB_PATH.
+
+In DUCKDB_PII_MODE=sidecar each snapshot has an encrypted companion
+``analytics-<version>-pii.duckdb`` holding customer Phone/Email; it is pruned
+with its snapshot and attached only by code that needs PII (attach_pii).
+"""
+
+import os
+import re
+import shutil
+from pathlib import Path
+
+from config import DB_PATH, DUCKDB_KEY, DUCKDB_SNAPSHOT_KEEP
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+POINTER_NAME = "CURRENT"
+PII_SUFFIX = "-pii"
+
+
+def _base(db_path: Path | None) -> Path:
+    return Path(db_path) if db_path is not None else DB_PATH
+
+
+def _pattern(base: Path) -> re.Pattern:
+    return re.compile(rf"^{re.escape(base.stem)}-(\d+){re.escape(base.suffix)}$")
+
+
+def pointer_path(db_path: Path | None = None) -> Path:
+    """Location of the CURRENT pointer for a DB_PATH-style base path."""
+    return _base(db_path).with_name(POINTER_NAME)
+
+
+def snapshot_path(version: int, db_path: Path | None = None) -> Path:
+    """``analytics-000042.duckdb`` for version 42 (name derived from DB_PATH)."""
+    base = _base(db_path)
+    return base.with_name(f"{base.stem}-{version:06d}{base.suffix}")
+
+
+def pii_path(db_file: Path) -> Path:
+    """Encrypted PII sidecar of a snapshot: ``analytics-000042-pii.duckdb``."""
+    db_file = Path(db_file)
+    return db_file.with_name(f"{db_file.stem}{PII_SUFFIX}{db_file.suffix}")
+
+
+def attach_pii(con, db_file: Path | None = None, alias: str = "pii") -> bool:
+    """Attach the PII sidecar of ``db_file`` (default: CURRENT) read-only as ``alias``.
+
+    Exposes ``<alias>.customer_pii`` (CustomerID_Std, Phone, Email).  Returns
+    False when there is no key or no sidecar (whole-file mode, where Phone and
+    Email are still columns of ``customers``).
+    """
+    sidecar = pii_path(db_file if db_file is not None else current_db_path())
+    if not DUCKDB_KEY or not sidecar.exists():
+        return False
+    path_str = str(sidecar).replace("\\", "/")
+    con.execute(f"ATTACH '{path_str}' AS {alias} (ENCRYPTION_KEY '{DUCKDB_KEY}', READ_ONLY)")
+    return True
+
+
+def list_versions(db_path: Path | None = None) -> list[int]:
+    """Versions of every snapshot file on disk (published or not), ascending."""
+    base = _base(db_path)
+    if not base.parent.exists():
+        return []
+    pattern = _pattern(base)
+    return sorted(int(m.group(1)) for p in base.parent.iterdir() if (m := pattern.match(p.name)))
+
+
+def _sidecar_versions(base: Path) -> list[int]:
+    """Versions of every PII sidecar on disk, including those whose snapshot is already gone."""
+    if not base.parent.exists():
+        return []
+    pattern = re.compile(rf"^{re.escape(base.stem)}-(\d+){re.escape(PII_SUFFIX + base.suffix)}$")
+    return sorted(int(m.group(1)) for p in base.parent.iterdir() if (m := pattern.match(p.name)))
+
+
+def current_version(db_path: Path | None = None) -> int | None:
+    """Version named by CURRENT, or None before the first published build."""
+    base = _base(db_path)
+    try:
+        name = pointer_path(base).read_text().strip()
+    except FileNotFoundError:
+        return None
+    m = _pattern(base).match(name)
+    return int(m.group(1)) if m else None
+
+
+def current_db_path(db_path: Path | None = None) -> Path:
+    """Snapshot CURRENT points at, else the legacy single-file DB_PATH."""
+    base = _base(db_path)
+    version = current_version(base)
+    if version is not None:
+        path = snapshot_path(version, base)
+        if path.exists():
+            return path
+        logger.warning(f"  [WARN] {POINTER_NAME} names missing snapshot {path.name} — using {base.name}")
+    return base
+
+
+def next_version(db_path: Path | None = None) -> int:
+    """One past the highest version on disk or in CURRENT (monotonic across failed builds)."""
+    base = _base(db_path)
+    known = list_versions(base) + [current_version(base) or 0]
+    return max(known) + 1
+
+
+def publish(version: int, db_path: Path | None = None, keep: int | None = None) -> Path:
+    """Point CURRENT at ``version`` (write-temp + os.replace), then prune old snapshots."""
+    base = _base(db_path)
+    path = snapshot_path(version, base)
+    if not path.exists():
+        raise FileNotFoundError(f"Cannot publish missing snapshot {path}")
+    pointer = pointer_path(base)
+    tmp = pointer.with_name(f"{POINTER_NAME}.tmp")
+    with open(tmp, "w") as f:
+        f.write(path.name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    logger.info(f"  [OK] Published {path.name} as {POINTER_NAME}")
+    prune(base, DUCKDB_SNAPSHOT_KEEP if keep is None else keep)
+    return path
+
+
+def prune(db_path: Path | None = None, keep: int = DUCKDB_SNAPSHOT_KEEP) -> list[int]:
+    """Delete snapshots older than the newest ``keep`` at or below CURRENT.
+
+    Versions above CURRENT belong to a build still in progress and are left
+    alone; abandoned ones fall below CURRENT after the next publish.  A PII
+    sidecar is deleted only once its snapshot is gone, so a snapshot still
+    open by a reader (kept for the next publish) keeps its sidecar too; a
+    sidecar still attached when its snapshot went is retried the same way.
+    Returns the versions removed.
+    """
+    base = _base(db_path)
+    current = current_version(base)
+    if current is None:
+        return []
+    published = [v for v in list_versions(base) if v <= current]
+    removed = []
+    for version in published[: -max(keep, 1)]:
+        path = snapshot_path(version, base)
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+            path.with_name(path.name + ".wal").unlink(missing_ok=True)
+            removed.append(version)
+        except PermissionError:
+            logger.info(f"  [SKIP] {path.name} still open — will retry next publish")
+
+    for version in _sidecar_versions(base):
+        if version > current or snapshot_path(version, base).exists():
+            continue
+        sidecar = pii_path(snapshot_path(version, base))
+        try:
+            sidecar.unlink(missing_ok=True)
+        except PermissionError:
+            logger.info(f"  [SKIP] {sidecar.name} still attached — will retry next publish")
+    if removed:
+        logger.info(f"  [OK] Pruned {len(removed)} old snapshot(s)")
+    return removed
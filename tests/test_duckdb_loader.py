@@ -0,0 +1,361 @@
+"""Tests for the DuckDB loader's post-load table shaping (cleancloud_to_duckdb)."""
+
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+import duckdb
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tests.test_insights import _build_tables
+
+
+@pytest.mark.integration
+class TestPeriodKeys:
+    """add_period_keys denormalizes dim_period labels onto the fact tables."""
+
+    def test_keys_match_dim_period(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con)
+        etl.add_period_keys(con)
+        row = con.execute("""
+            SELECT YearMonth, YearQuarter, ISOWeekLabel FROM sales WHERE Earned_Date = DATE '2024-03-05'
+        """).fetchone()
+        assert row == ("2024-03", "2024-Q1", "2024-W10")
+        assert con.execute("SELECT COUNT(*) FROM items WHERE ISOWeekLabel IS NULL").fetchone()[0] == 0
+        assert con.execute("SELECT DISTINCT ISOWeekLabel FROM customer_quality WHERE YearMonth = '2024-04'").fetchall() == [
+            ("2024-W14",)
+        ]
+        con.close()
+
+
+def _serving_tables(con):
+    """_build_tables plus what the dashboard queries also read: period keys, the remaining columns and customers."""
+    import cleancloud_to_duckdb as etl
+
+    _build_tables(con)
+    etl.add_period_keys(con)
+    for table_name, column in (
+        ("sales", "Pieces INTEGER DEFAULT 1"),
+        ("sales", "TimeInStore_Days DOUBLE DEFAULT 1.0"),
+        ("items", "Total DOUBLE DEFAULT 10.0"),
+        ("customer_quality", "Monthly_Revenue DOUBLE DEFAULT 100.0"),
+        ("customer_quality", "Monthly_Items INTEGER DEFAULT 5"),
+    ):
+        con.execute(f"ALTER TABLE {table_name} ADD COLUMN {column}")
+    con.execute("CREATE TABLE customers AS SELECT DISTINCT CustomerID_Std, CustomerID_Std AS CustomerName FROM sales")
+
+
+@pytest.mark.integration
+class TestClusteringAndIndexAdvisor:
+    """cluster_tables sorts by period/customer; advise_indexes keeps only indexes that pay off."""
+
+    def test_tables_sorted_by_cluster_keys(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con)
+        etl.add_period_keys(con)
+        with patch.object(etl, "CLUSTER_KEYS", {"sales": ["YearMonth", "CustomerID_Std"]}):
+            etl.cluster_tables(con)
+        stored = con.execute("SELECT YearMonth, CustomerID_Std FROM sales").fetchall()
+        assert stored == sorted(stored)
+        con.close()
+
+    def test_advisor_drops_indexes_below_threshold(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _serving_tables(con)
+        candidates = [("idx_sales_order", "sales", "OrderID_Std"), ("idx_items_order", "items", "OrderID_Std")]
+        with (
+            patch.object(etl, "INDEX_CANDIDATES", candidates),
+            patch.object(etl, "INDEX_MIN_SPEEDUP", float("inf")),
+            patch.object(etl, "_profile_entries", []) as prof,
+        ):
+            etl.create_indexes(con)
+        assert [r["kept"] for r in prof[-1]["candidates"]] == [False, False]
+        assert con.execute("SELECT COUNT(*) FROM duckdb_indexes()").fetchone()[0] == 0
+        con.close()
+
+    def test_create_indexes_records_benchmark_in_profile(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _serving_tables(con)
+        candidates = [("idx_sales_customer", "sales", "CustomerID_Std")]
+        with (
+            patch.object(etl, "INDEX_CANDIDATES", candidates),
+            patch.object(etl, "INDEX_MIN_SPEEDUP", 0.0),
+            patch.object(etl, "_profile_entries", []) as prof,
+        ):
+            etl.create_indexes(con)
+        entry = prof[-1]
+        assert entry["phase"] == "create_indexes"
+        assert entry["kept"] == ["idx_sales_customer"]
+        result = entry["candidates"][0]
+        assert {"scan_ms", "index_ms", "speedup", "queries"} <= set(result)
+        assert len(result["scan_runs_ms"]) == len(result["index_runs_ms"]) == etl.INDEX_TIMING_RUNS
+        assert "period_cube.sales" in result["queries"]
+        names = [r[0] for r in con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()]
+        assert names == ["idx_sales_customer"]
+        assert con.execute("SELECT COUNT(*) FROM order_lookup").fetchone()[0] > 0
+        con.close()
+
+    def test_advisor_replays_only_registered_dashboard_queries(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _serving_tables(con)
+        latest = con.execute("SELECT MAX(YearMonth) FROM sales").fetchone()[0]
+        assert [(name, value) for name, _sql, value in etl._replay_workload(con, "dim_period", "Date")] == [
+            ("rfm.customers", latest)
+        ]
+        cube = [value for name, _sql, value in etl._replay_workload(con, "sales", "CustomerID_Std")
+                if name == "period_cube.sales"]
+        months, weeks = con.execute(
+            "SELECT COUNT(DISTINCT YearMonth), COUNT(DISTINCT ISOWeekLabel) FROM sales"
+        ).fetchone()
+        assert [len(v) for v in cube] == [
+            min(etl.INDEX_REPLAY_PERIODS["monthly"], months),
+            min(etl.INDEX_REPLAY_PERIODS["weekly"], weeks),
+        ]
+        unread = [("idx_cust_quality_month", "customer_quality", "OrderCohortMonth")]
+        with patch.object(etl, "INDEX_CANDIDATES", unread):
+            results = etl.advise_indexes(con)
+        assert results == [
+            {"index": "idx_cust_quality_month", "table": "customer_quality", "column": "OrderCohortMonth",
+             "queries": [], "kept": False}
+        ]
+        assert con.execute("SELECT COUNT(*) FROM duckdb_indexes()").fetchone()[0] == 0
+        con.close()
+
+    def test_order_lookup_carries_earliest_cohort_age(self):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con)
+        # Order O3 also has a line two months into its cohort
+        con.execute("INSERT INTO sales SELECT * REPLACE (CAST(MonthsSinceCohort + 2 AS SMALLINT) AS MonthsSinceCohort) "
+                    "FROM sales WHERE OrderID_Std = 'O3'")
+        with patch.object(etl, "INDEX_CANDIDATES", []), patch.object(etl, "_profile_entries", []):
+            etl.create_indexes(con)
+        assert con.execute("SELECT COUNT(*) FROM order_lookup WHERE OrderID_Std = 'O3'").fetchone()[0] == 1
+        assert con.execute("""
+            SELECT COUNT(*) FROM order_lookup ol
+            JOIN (SELECT OrderID_Std, MIN(MonthsSinceCohort) AS m FROM sales GROUP BY 1) s USING (OrderID_Std)
+            WHERE ol.MonthsSinceCohort IS DISTINCT FROM s.m
+        """).fetchone()[0] == 0
+        con.close()
+
+
+def _stage_files(folder, bump_month=None):
+    """Write _build_tables output as the staged Parquet files main() reads (CSV stubs satisfy validate_csvs)."""
+    import cleancloud_to_duckdb as etl
+
+    folder.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect(":memory:")
+    _build_tables(con, bump_month=bump_month)
+    for table_name in ("sales", "items"):
+        con.execute(f"ALTER TABLE {table_name} ADD COLUMN Store_Std VARCHAR DEFAULT 'Moon Walk'")
+    con.execute("ALTER TABLE items ADD COLUMN Source VARCHAR DEFAULT 'CC_2025'")
+    con.execute("""
+        CREATE OR REPLACE TABLE items AS
+        SELECT i.*, s.CustomerID_Std FROM items i JOIN sales s USING (OrderID_Std)
+    """)
+    con.execute("CREATE TABLE customers AS SELECT DISTINCT CustomerID_Std, Store_Std FROM sales")
+    for table_name, csv_file in etl.CSV_FILES.items():
+        (folder / csv_file).write_text("")
+        con.execute(f"COPY {table_name} TO '{folder / csv_file.replace('.csv', '.parquet')}' (FORMAT parquet)")
+    con.close()
+
+
+def _run_main(tmp_path, stage, db_dir, incremental=False, frames=None):
+    import cleancloud_to_duckdb as etl
+
+    db_dir.mkdir(exist_ok=True)
+    with (
+        patch.object(etl, "CSV_FOLDER", stage),
+        patch.object(etl, "DB_PATH", db_dir / "analytics.duckdb"),
+        patch.object(etl, "LOGS_PATH", tmp_path / "logs"),
+        patch.object(etl, "INDEX_CANDIDATES", [("idx_sales_order", "sales", "OrderID_Std")]),
+        patch.object(etl, "_profile_entries", []) as prof,
+    ):
+        etl.main(incremental=incremental, frames=frames)
+    from snapshot_store import current_db_path
+
+    return current_db_path(db_dir / "analytics.duckdb"), prof
+
+
+@pytest.mark.integration
+class TestIncrementalRefresh:
+    """Month-partition manifest drives which fact-table months are reloaded."""
+
+    def test_changed_partitions(self):
+        from cleancloud_to_duckdb import CSV_FILES, changed_partitions
+
+        schema = {(t, "*"): (3, "s") for t in CSV_FILES}
+        known = {**schema, ("sales", "2024-01"): (5, "a"), ("sales", "2024-02"): (5, "b"), ("items", "2024-01"): (1, "c")}
+        staged = {**schema, ("sales", "2024-01"): (5, "a"), ("sales", "2024-03"): (2, "d"), ("items", "2024-01"): (1, "c")}
+        changed = changed_partitions(staged, known)
+        assert changed == {"sales": ["2024-02", "2024-03"], "items": [], "customer_quality": []}
+        assert changed_partitions({**staged, ("items", "*"): (4, "t")}, known) is None
+
+    def test_incremental_matches_full_rebuild(self, tmp_path):
+        _stage_files(tmp_path / "stage")
+        _run_main(tmp_path, tmp_path / "stage", tmp_path / "inc")
+        _stage_files(tmp_path / "stage2", bump_month="2024-03")
+        inc_path, prof = _run_main(tmp_path, tmp_path / "stage2", tmp_path / "inc", incremental=True)
+        full_path, _ = _run_main(tmp_path, tmp_path / "stage2", tmp_path / "full")
+
+        phase = next(p for p in prof if p["phase"] == "incremental")
+        assert phase["changed_months"]["sales"] == ["2024-03"]
+        assert phase["changed_months"]["customer_quality"] == []
+        con = duckdb.connect()
+        con.execute(f"ATTACH '{inc_path}' AS inc (READ_ONLY)")
+        con.execute(f"ATTACH '{full_path}' AS full_db (READ_ONLY)")
+        for table in ("sales", "items", "customer_quality", "order_lookup", "insights", "partition_manifest"):
+            diff = con.execute(f"""
+                SELECT COUNT(*) FROM (
+                    (SELECT * FROM inc.{table} EXCEPT ALL SELECT * FROM full_db.{table})
+                    UNION ALL
+                    (SELECT * FROM full_db.{table} EXCEPT ALL SELECT * FROM inc.{table})
+                )
+            """).fetchone()[0]
+            assert diff == 0, table
+        con.close()
+
+
+@pytest.mark.integration
+class TestInProcessFrames:
+    """Polars frames registered through Arrow build the same snapshot as the staged files."""
+
+    def test_frames_match_staged_build(self, tmp_path):
+        import polars as pl
+        import cleancloud_to_duckdb as etl
+
+        _stage_files(tmp_path / "stage")
+        frames = {
+            etl.FRAME_KEYS[t]: pl.read_parquet(tmp_path / "stage" / f.replace(".csv", ".parquet"))
+            for t, f in etl.CSV_FILES.items()
+        }
+        staged_path, _ = _run_main(tmp_path, tmp_path / "stage", tmp_path / "staged")
+        # An empty source folder proves nothing is read from disk
+        (tmp_path / "empty").mkdir()
+        frame_path, prof = _run_main(tmp_path, tmp_path / "empty", tmp_path / "frames", frames=frames)
+
+        assert {p["format"] for p in prof if p["phase"].startswith("load_")} == {"arrow"}
+        con = duckdb.connect()
+        con.execute(f"ATTACH '{staged_path}' AS staged (READ_ONLY)")
+        con.execute(f"ATTACH '{frame_path}' AS frames (READ_ONLY)")
+        for table in ("sales", "items", "customers", "customer_quality", "dim_period", "partition_manifest"):
+            diff = con.execute(f"""
+                SELECT COUNT(*) FROM (
+                    (SELECT * FROM staged.{table} EXCEPT ALL SELECT * FROM frames.{table})
+                    UNION ALL
+                    (SELECT * FROM frames.{table} EXCEPT ALL SELECT * FROM staged.{table})
+                )
+            """).fetchone()[0]
+            assert diff == 0, table
+        con.close()
+
+
+def _allow_encrypted_writes(conn):
+    """DuckDB writes encrypted files only with httpfs' OpenSSL; fall back to mbedtls where httpfs is absent."""
+    try:
+        conn.execute("LOAD httpfs")
+    except duckdb.Error:
+        conn.execute("SET force_mbedtls_unsafe = 'true'")
+
+
+@pytest.mark.integration
+class TestPiiSidecar:
+    """DUCKDB_PII_MODE=sidecar keeps analytics tables plaintext and PII in an encrypted sidecar."""
+
+    def test_full_build_moves_pii_to_sidecar(self, tmp_path):
+        import cleancloud_to_duckdb as etl
+        import snapshot_store
+
+        stage = tmp_path / "stage"
+        _stage_files(stage)
+        customers = stage / "All_Customers_Python.parquet"
+        con = duckdb.connect()
+        con.execute(f"""
+            COPY (SELECT *, '050' || CustomerID_Std AS Phone, CustomerID_Std || '@example.com' AS Email
+                  FROM read_parquet('{customers}'))
+            TO '{tmp_path / "customers.parquet"}' (FORMAT parquet)
+        """)
+        con.close()
+        (tmp_path / "customers.parquet").replace(customers)
+
+        with (
+            patch.object(etl, "DUCKDB_KEY", "test-key"),
+            patch.object(etl, "DUCKDB_FILE_KEY", ""),
+            patch.object(etl, "DUCKDB_PII_SIDECAR", True),
+            patch.object(etl, "_enable_encrypted_writes", _allow_encrypted_writes),
+        ):
+            db_file, prof = _run_main(tmp_path, stage, tmp_path / "db")
+
+        con = duckdb.connect(str(db_file), read_only=True)
+        columns = {r[0] for r in con.execute("DESCRIBE customers").fetchall()}
+        assert not columns & {"Phone", "Email"}
+        n_customers = con.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        with patch.object(snapshot_store, "DUCKDB_KEY", "test-key"):
+            assert snapshot_store.attach_pii(con, db_file)
+        row = con.execute("""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE p.Email = c.CustomerID_Std || '@example.com')
+            FROM customers c JOIN pii.customer_pii p USING (CustomerID_Std)
+        """).fetchone()
+        assert row == (n_customers, n_customers)
+        assert next(p for p in prof if p["phase"] == "split_pii")["rows"] == n_customers
+        con.close()
+
+
+@pytest.mark.integration
+class TestParquetServing:
+    """Typed views over a published Parquet directory serve the same data as the DuckDB build."""
+
+    def test_views_match_duckdb_build(self, tmp_path):
+        import cleancloud_to_duckdb as etl
+        import parquet_serving
+
+        _stage_files(tmp_path / "stage")
+        db_path, _ = _run_main(tmp_path, tmp_path / "stage", tmp_path / "duck")
+        with (
+            patch.object(etl, "CSV_FOLDER", tmp_path / "stage"),
+            patch.object(parquet_serving, "PARQUET_SERVING_PATH", tmp_path / "served" / "parquet"),
+            patch.object(parquet_serving, "LOGS_PATH", tmp_path / "logs"),
+            patch.object(parquet_serving, "_profile_entries", []),
+        ):
+            target = parquet_serving.publish()
+
+        assert target.name == "parquet-000001"
+        assert (tmp_path / "served" / "CURRENT").read_text().strip() == target.name
+        assert any(p.name.startswith("month=") for p in (target / "sales").iterdir())
+        con = parquet_serving.connect(target)
+        con.execute(f"ATTACH '{db_path}' AS duck (READ_ONLY)")
+        for table in ("sales", "items", "customers", "customer_quality", "dim_period", "order_lookup", "insights"):
+            view_cols = [r[:2] for r in con.execute(f"DESCRIBE {table}").fetchall()]
+            assert view_cols == [r[:2] for r in con.execute(f"DESCRIBE duck.{table}").fetchall()], table
+            diff = con.execute(f"""
+                SELECT COUNT(*) FROM (
+                    (SELECT * FROM {table} EXCEPT ALL SELECT * FROM duck.{table})
+                    UNION ALL
+                    (SELECT * FROM duck.{table} EXCEPT ALL SELECT * FROM {table})
+                )
+            """).fetchone()[0]
+            assert diff == 0, table
+        con.close()
+
+    def test_views_over_flat_staging_folder(self, tmp_path):
+        import parquet_serving
+
+        _stage_files(tmp_path / "stage")
+        con = parquet_serving.connect(tmp_path / "stage")
+        months = con.execute("SELECT COUNT(DISTINCT YearMonth) FROM sales WHERE YearMonth IS NOT NULL").fetchone()[0]
+        assert months > 1
+        assert con.execute("SELECT typeof(Paid) FROM sales LIMIT 1").fetchone()[0] == "BOOLEAN"
+        con.close()
@@ -25,6 +25,9 @@ from helpers import (
     _merge_overlapping_periods,
     polars_format_dates_for_csv,
     polars_validate_output,
+    defer_staging_writes,
+    write_staging_file,
+    flush_staging_writes,
 )
 
 
@@ -485,6 +488,33 @@ class TestPolarsValidateOutput:
         assert any("NULL KEYS" in i for i in result["issues"])
 
 
+# =====================================================================
+# write_staging_file / defer_staging_writes
+# =====================================================================
+
+class TestStagingWrites:
+    def test_immediate_write_by_extension(self, tmp_path):
+        df = pl.DataFrame({"a": [1, 2]})
+        write_staging_file(df, str(tmp_path / "out.csv"))
+        write_staging_file(df, str(tmp_path / "out.parquet"))
+        assert pl.read_csv(tmp_path / "out.csv").equals(df)
+        assert pl.read_parquet(tmp_path / "out.parquet").equals(df)
+
+    def test_deferred_writes_complete_on_flush(self, tmp_path):
+        df = pl.DataFrame({"a": [1, 2]})
+        defer_staging_writes()
+        try:
+            write_staging_file(df, str(tmp_path / "ok.parquet"))
+            write_staging_file(df, str(tmp_path / "missing" / "bad.csv"))
+        finally:
+            failed = flush_staging_writes()
+        assert failed == [str(tmp_path / "missing" / "bad.csv")]
+        assert pl.read_parquet(tmp_path / "ok.parquet").equals(df)
+        # Back to immediate writes: errors raise again
+        with pytest.raises(Exception):
+            write_staging_file(df, str(tmp_path / "missing" / "bad.csv"))
+
+
 # =====================================================================
 # find_cleancloud_file
 # =====================================================================
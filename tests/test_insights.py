@@ -0,0 +1,181 @@
+"""Tests for the full-history insights build (insights_engine + DuckDB loader)."""
+
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+import duckdb
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _build_tables(con, bump_month=None):
+    """Create minimal sales/items/customer_quality/dim_period tables for Jan–Jun 2024.
+
+    ``bump_month`` (YYYY-MM) adds an extra order in that month so its aggregate changes.
+    """
+    con.execute("""
+        CREATE TABLE dim_period AS
+        SELECT CAST(d AS DATE) AS Date,
+               strftime(d, '%Y-%m') AS YearMonth,
+               strftime(d, '%Y') || '-Q' || quarter(d) AS YearQuarter,
+               strftime(d, '%G-W%V') AS ISOWeekLabel,
+               0 AS IsCurrentISOWeek
+        FROM generate_series(DATE '2024-01-01', DATE '2024-06-30', INTERVAL 1 DAY) t(d)
+    """)
+    con.execute("""
+        CREATE TABLE sales AS
+        SELECT 'C' || (n % 7) AS CustomerID_Std,
+               'O' || n AS OrderID_Std,
+               CAST(d AS DATE) AS Earned_Date,
+               CAST(date_trunc('month', d) AS DATE) AS OrderCohortMonth,
+               TRUE AS Is_Earned,
+               CASE WHEN n % 5 = 0 THEN 'Subscription' ELSE 'Order' END AS Transaction_Type,
+               CAST(month(d) - 1 AS SMALLINT) AS MonthsSinceCohort,
+               n % 3 = 0 AS IsSubscriptionService,
+               n % 2 = 0 AS HasDelivery,
+               n % 2 = 1 AS HasPickup,
+               CASE WHEN n % 4 = 0 THEN 'Outer Abu Dhabi' ELSE 'Inside Abu Dhabi' END AS Route_Category,
+               CASE WHEN n % 3 = 0 THEN 'Cash' ELSE 'Stripe' END AS Payment_Type_Std,
+               CAST(100 + n % 50 AS DOUBLE) AS Total_Num,
+               CAST(90 + n % 50 AS DOUBLE) AS Collections,
+               CAST(n % 9 AS SMALLINT) AS DaysToPayment,
+               n % 10 <> 0 AS Paid,
+               'CC_2025' AS Source,
+               CAST(n % 5 AS SMALLINT) AS Processing_Days
+        FROM (
+            SELECT row_number() OVER () AS n, d
+            FROM generate_series(DATE '2024-01-01', DATE '2024-06-30', INTERVAL 2 DAY) t(d)
+        )
+    """)
+    if bump_month:
+        con.execute(f"""
+            INSERT INTO sales
+            SELECT * REPLACE (CAST(Total_Num * 10 AS DOUBLE) AS Total_Num, 'EXTRA' AS OrderID_Std)
+            FROM sales WHERE strftime(OrderCohortMonth, '%Y-%m') = '{bump_month}' LIMIT 1
+        """)
+    con.execute("""
+        CREATE TABLE items AS
+        SELECT OrderID_Std, Earned_Date AS ItemDate,
+               CASE WHEN Total_Num > 120 THEN 'Home Linens' ELSE 'Professional Wear' END AS Item_Category,
+               'Wash & Press' AS Service_Type,
+               CAST(2 AS BIGINT) AS Quantity,
+               HasDelivery AS Express
+        FROM sales
+    """)
+    con.execute("""
+        CREATE TABLE customer_quality AS
+        SELECT DISTINCT CustomerID_Std, OrderCohortMonth, CustomerID_Std = 'C1' AS Is_Multi_Service
+        FROM sales
+    """)
+
+
+@pytest.mark.integration
+class TestInsightsEngine:
+    """Pure rule evaluation + fingerprint behaviour."""
+
+    def test_fingerprint_stable_under_float_noise(self):
+        from insights_engine import row_fingerprint
+
+        a = {"period": "2025-01", "rev": 1000.00001, "cust": 5}
+        b = {"period": "2025-01", "rev": 1000.000012, "cust": 5}
+        assert row_fingerprint(a) == row_fingerprint(b)
+        assert row_fingerprint(a) != row_fingerprint({**a, "cust": 6})
+
+    def test_diff_periods_splits_changed(self):
+        from insights_engine import diff_periods, row_fingerprint
+
+        rows = [{"period": "2025-01", "rev": 1.0}, {"period": "2025-02", "rev": 2.0}]
+        known = {"2025-01": row_fingerprint(rows[0]), "2025-02": "stale"}
+        changed, unchanged, fps = diff_periods(rows, known)
+        assert [r["period"] for r in changed] == ["2025-02"]
+        assert unchanged == ["2025-01"]
+        assert set(fps) == {"2025-01", "2025-02"}
+
+    def test_weekly_wow_rule(self):
+        from insights_engine import evaluate_weekly
+
+        row = {
+            "period": "2025-W03", "prior_period": "2025-W02",
+            "rev": 1100.0, "prev_rev": 1000.0, "trend_rev": None, "avg_4wk_rev": None,
+            "cust": 0, "prev_cust": 0, "stops": 0, "prev_stops": 0, "items": 0, "prev_items": 0,
+            "avg_processing": None, "collections": 0, "deliveries": 0, "pickups": 0,
+        }
+        rules = {r[0]: r for r in evaluate_weekly(row)}
+        assert rules["WRev_WOW"][2] == "Revenue +10% vs last week"
+        assert rules["WRev_WOW"][4] == "positive"
+        assert "WRev_TREND" not in rules
+
+
+@pytest.mark.integration
+class TestInsightsBackfill:
+    """create_insights_table builds every period and reuses unchanged ones."""
+
+    def test_every_closed_month_has_insights(self, tmp_path):
+        import cleancloud_to_duckdb as etl
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con)
+        with patch.object(etl, "DB_PATH", tmp_path / "missing.duckdb"):
+            etl.create_insights_table(con)
+        periods = [r[0] for r in con.execute(
+            "SELECT DISTINCT period FROM insights WHERE granularity = 'monthly' ORDER BY 1"
+        ).fetchall()]
+        assert periods == ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05", "2024-06"]
+        # MoM rules need a prior month, so January has none
+        mom = {r[0] for r in con.execute("SELECT period FROM insights WHERE rule_id = 'REV_MOM'").fetchall()}
+        assert "2024-01" not in mom and "2024-06" in mom
+        assert con.execute("SELECT COUNT(*) FROM insights WHERE granularity = 'weekly'").fetchone()[0] > 0
+        con.close()
+
+    def test_only_changed_periods_recomputed(self, tmp_path):
+        import cleancloud_to_duckdb as etl
+
+        prev_path = tmp_path / "analytics.duckdb"
+        prev = duckdb.connect(str(prev_path))
+        _build_tables(prev)
+        with patch.object(etl, "DB_PATH", tmp_path / "missing.duckdb"):
+            etl.create_insights_table(prev)
+        prev.close()
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con, bump_month="2024-03")
+        with patch.object(etl, "DB_PATH", prev_path), patch.object(etl, "_profile_entries", []) as prof:
+            etl.create_insights_table(con)
+        # March changed; April depends on March through its prior-month values
+        assert prof[-1]["monthly_recomputed"] == 2
+        assert prof[-1]["monthly_reused"] == 4
+        assert con.execute("SELECT COUNT(*) FROM insights WHERE period = '2024-01'").fetchone()[0] > 0
+        con.close()
+
+    def test_incremental_refresh_aggregates_from_first_changed_month(self, tmp_path):
+        import cleancloud_to_duckdb as etl
+
+        prev_path = tmp_path / "analytics.duckdb"
+        prev = duckdb.connect(str(prev_path))
+        _build_tables(prev)
+        with patch.object(etl, "DB_PATH", tmp_path / "missing.duckdb"):
+            etl.create_insights_table(prev)
+        prev.close()
+
+        full = duckdb.connect(":memory:")
+        _build_tables(full, bump_month="2024-05")
+        with patch.object(etl, "DB_PATH", tmp_path / "missing.duckdb"):
+            etl.create_insights_table(full)
+
+        con = duckdb.connect(":memory:")
+        _build_tables(con, bump_month="2024-05")
+        changed = {"sales": ["2024-05"], "items": ["2024-05"], "customer_quality": []}
+        with patch.object(etl, "DB_PATH", prev_path), patch.object(etl, "_profile_entries", []) as prof:
+            etl.create_insights_table(con, changed)
+        # May and June are aggregated; January–April are copied from the live DB
+        assert prof[-1]["monthly_aggregated"] == 2
+        assert prof[-1]["weekly_aggregated"] < full.execute(
+            "SELECT COUNT(DISTINCT period) FROM insight_fingerprints WHERE granularity = 'weekly'"
+        ).fetchone()[0]
+
+        query = "SELECT * FROM {} ORDER BY ALL"
+        for table in ("insights", "insight_fingerprints"):
+            assert con.execute(query.format(table)).fetchall() == full.execute(query.format(table)).fetchall()
+        con.close()
+        full.close()
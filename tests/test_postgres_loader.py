@@ -0,0 +1,442 @@
+"""Tests for the Postgres sync (cleancloud_to_postgres).
+
+Everything except TestLiveSync runs without a server.  TestLiveSync migrates
+and syncs a real database and is skipped unless MOONWALK_TEST_DATABASE_URL
+points at a disposable one (its analytics schemas are dropped first).
+"""
+
+import io
+import os
+
+import pytest
+import polars as pl
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class _CopyCursor:
+    """Records COPY statements and the CSV payload sent with them (plus other SQL)."""
+
+    def __init__(self):
+        self.copies = []
+        self.statements = []
+        self.rowcount = 0
+
+    def copy_expert(self, sql, buf):
+        self.copies.append((sql, buf.read().decode()))
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.cur = _CopyCursor()
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+
+@pytest.mark.integration
+class TestCopyLoad:
+    """Staging files stream into COPY ... FROM STDIN in bounded batches."""
+
+    def test_source_batches_are_bounded(self, tmp_path):
+        from cleancloud_to_postgres import _source_batches
+
+        pq_path = tmp_path / "All_Sales_Python.parquet"
+        pl.DataFrame({"n": list(range(25))}).write_parquet(pq_path, row_group_size=10)
+        batches = list(_source_batches(pq_path, pq_path.with_suffix(".csv"), batch_rows=10))
+        assert [b.height for b in batches] == [10, 10, 5]
+        assert pl.concat(batches)["n"].to_list() == list(range(25))
+
+    def test_float_columns_rounded_for_integer_targets(self):
+        from cleancloud_to_postgres import _cast_for_copy
+
+        df = pl.DataFrame({"Processing_Days": [2.0, None], "Total_Num": [1.5, 2.25]})
+        out = _cast_for_copy(df, {"Processing_Days": "smallint", "Total_Num": "numeric"})
+        assert out["Processing_Days"].dtype == pl.Int64
+        assert out["Processing_Days"].to_list() == [2, None]
+        assert out["Total_Num"].to_list() == [1.5, 2.25]
+
+    def test_copy_batch_round_trips_as_csv(self):
+        from cleancloud_to_postgres import _copy_batch
+
+        df = pl.DataFrame({
+            "Item": ["a,b", 'say "hi"', "line1\nline2", None],
+            "Express": [True, False, None, True],
+            "Total": [1.5, None, 3.0, 4.25],
+        })
+        cur = _CopyCursor()
+        _copy_batch(cur, "items", df)
+        sql, payload = cur.copies[0]
+        assert sql == 'COPY items ("Item", "Express", "Total") FROM STDIN WITH (FORMAT csv)'
+        parsed = pl.read_csv(io.StringIO(payload), has_header=False, new_columns=df.columns, schema_overrides=df.schema)
+        assert parsed.equals(df)
+
+    def test_customers_encrypted_set_based_from_temp_table(self):
+        from unittest.mock import patch
+        import cleancloud_to_postgres as pg
+
+        df = pl.DataFrame({
+            "CustomerID_Std": ["CC-0001", "CC-0002"],
+            "CustomerName": ["A", "B"],
+            "Phone": ["+971500000001", None],
+            "Email": ["a@x.ae", ""],
+        })
+        conn = _RecordingConnection()
+        with patch.object(pg, "ENCRYPTION_KEY", "secret"):
+            pg._load_customers(conn, df)
+
+        cur = conn.cur
+        assert [sql.split(" (")[0] for sql, _ in cur.copies] == ["COPY pg_temp.customers_plain"]
+        assert "secret" not in cur.copies[0][1]
+        assert "+971500000001" in cur.copies[0][1]
+        inserts = [(sql, params) for sql, params in cur.statements if sql.startswith("INSERT")]
+        assert len(inserts) == 1
+        sql, params = inserts[0]
+        assert params == {"key": "secret"}
+        assert 'pgp_sym_encrypt("Phone", %(key)s)' in sql and "FROM pg_temp.customers_plain" in sql
+        assert any("ON COMMIT DROP" in sql for sql, _ in cur.statements)
+        assert cur.statements[-1][0] == "DROP TABLE pg_temp.customers_plain"
+
+    def test_base_tables_load_largest_first_on_pooled_connections(self, tmp_path):
+        import threading
+        from unittest.mock import patch
+        import cleancloud_to_postgres as pg
+
+        for i, filename in enumerate(pg.PARQUET_FILES.values()):
+            (tmp_path / filename).write_bytes(b"x" * (i + 1) * 100)
+        started, threads = [], set()
+
+        class _Pool:
+            closed = False
+
+            def closeall(self):
+                self.closed = True
+
+        def fake_load(pool, table_name, periods, full):
+            started.append(table_name)
+            threads.add(threading.current_thread().name)
+            return {"rows": len(table_name), "elapsed_s": 0.0, "index_s": 0.0}
+
+        pool = _Pool()
+        with (
+            patch.object(pg, "LOCAL_STAGING_PATH", tmp_path),
+            patch.object(pg, "_connection_pool", lambda size, schema: pool),
+            patch.object(pg, "_load_table", fake_load),
+        ):
+            stats = pg._load_base_tables(None, workers=1)
+
+        assert started == list(reversed(pg.PARQUET_FILES))
+        assert list(stats) == list(pg.PARQUET_FILES)
+        assert stats["sales"]["rows"] == len("sales")
+        assert pool.closed and all(t.startswith("pg-load") for t in threads)
+
+
+@pytest.mark.integration
+class TestDeltaSync:
+    """Only month partitions whose staged fingerprint changed are shipped."""
+
+    def _stage(self, tmp_path, totals):
+        pq_path = tmp_path / "All_Sales_Python.parquet"
+        pl.DataFrame({
+            "OrderID_Std": [f"O-{i}" for i in range(len(totals))],
+            "OrderCohortMonth": ["2025-01-01", "2025-01-01", "2025-02-01", None][: len(totals)],
+            "Total_Num": totals,
+        }).write_parquet(pq_path)
+        return pq_path
+
+    def test_fingerprints_change_only_for_edited_month(self, tmp_path):
+        from cleancloud_to_postgres import _changed_months, _staged_fingerprints
+
+        pq_path = self._stage(tmp_path, [10.0, 20.0, 30.0, 40.0])
+        before = _staged_fingerprints("sales", pq_path, pq_path.with_suffix(".csv"), None)
+        assert {m: n for m, (n, _) in before.items() if m != "*"} == {"2025-01": 2, "2025-02": 1, "": 1}
+
+        pq_path = self._stage(tmp_path, [10.0, 20.0, 31.0, 40.0])
+        after = _staged_fingerprints("sales", pq_path, pq_path.with_suffix(".csv"), None)
+        known = {m: (n, fp, 100) for m, (n, fp) in before.items()}
+        assert _changed_months(after, known) == ["2025-02"]
+        assert _changed_months(before, known) == []
+        assert _changed_months(after, {}) is None
+
+    def test_layout_change_ships_whole_table(self, tmp_path):
+        from cleancloud_to_postgres import _changed_months, _staged_fingerprints
+
+        pq_path = self._stage(tmp_path, [10.0, 20.0, 30.0, 40.0])
+        before = _staged_fingerprints("sales", pq_path, pq_path.with_suffix(".csv"), None)
+        pl.read_parquet(pq_path).with_columns(pl.lit(1).alias("Extra")).write_parquet(pq_path)
+        after = _staged_fingerprints("sales", pq_path, pq_path.with_suffix(".csv"), None)
+        assert _changed_months(after, {m: (*v, 0) for m, v in before.items()}) is None
+
+    def test_copy_table_ships_only_changed_months(self, tmp_path):
+        from cleancloud_to_postgres import _copy_table
+
+        pq_path = self._stage(tmp_path, [10.0, 20.0, 30.0, 40.0])
+        cur = _CopyCursor()
+        batches = [pl.read_parquet(pq_path)]
+        rows, n_batches, shipped = _copy_table(cur, "sales", iter(batches), None, only_months=["2025-02", ""])
+        assert (rows, n_batches) == (2, 1)
+        payload = cur.copies[0][1]
+        assert "O-2" in payload and "O-3" in payload and "O-0" not in payload
+        assert set(shipped) == {"2025-02", ""}
+        assert sum(shipped.values()) == len(payload.encode())
+
+
+@pytest.mark.integration
+class TestMonthPartitions:
+    """sales/items are month-partitioned (migration 005) with retention."""
+
+    def test_retention_cutoff(self):
+        from datetime import date
+        from unittest.mock import patch
+        import cleancloud_to_postgres as pg
+
+        with patch.object(pg, "POSTGRES_RETENTION_MONTHS", 0):
+            assert pg._retention_cutoff(date(2026, 10, 18)) is None
+        with patch.object(pg, "POSTGRES_RETENTION_MONTHS", 1):
+            assert pg._retention_cutoff(date(2026, 10, 18)) == "2026-10"
+        with patch.object(pg, "POSTGRES_RETENTION_MONTHS", 12):
+            assert pg._retention_cutoff(date(2026, 10, 18)) == "2025-11"
+        with patch.object(pg, "POSTGRES_RETENTION_MONTHS", 3):
+            assert pg._retention_cutoff(date(2026, 1, 5)) == "2025-11"
+
+    def test_partitioned_indexes_rebuilt_on_every_shadow_partition(self):
+        from cleancloud_to_postgres import _build_indexes
+
+        class _IndexCursor(_CopyCursor):
+            def fetchall(self):
+                return [
+                    ("sales", "idx_sales_customer",
+                     'CREATE INDEX idx_sales_customer ON ONLY analytics.sales USING btree ("CustomerID_Std")',
+                     None, None),
+                    ("dim_period", "dim_period_pkey",
+                     'CREATE UNIQUE INDEX dim_period_pkey ON analytics.dim_period USING btree ("Date")',
+                     "dim_period_pkey", "p"),
+                ]
+
+        cur = _IndexCursor()
+        assert _build_indexes(cur, ["sales", "dim_period"]) == 2
+        executed = [sql for sql, _ in cur.statements[1:]]
+        assert executed == [
+            'CREATE INDEX idx_sales_customer ON analytics_next.sales USING btree ("CustomerID_Std")',
+            'CREATE UNIQUE INDEX dim_period_pkey ON analytics_next.dim_period USING btree ("Date")',
+            "ALTER TABLE analytics_next.dim_period ADD CONSTRAINT dim_period_pkey PRIMARY KEY USING INDEX dim_period_pkey",
+        ]
+
+    def test_copy_batches_written_in_date_order(self):
+        from cleancloud_to_postgres import _copy_table
+
+        df = pl.DataFrame({
+            "OrderID_Std": ["O-1", "O-2", "O-3"],
+            "OrderCohortMonth": ["2025-02-01", "2025-01-01", "2025-01-01"],
+            "Earned_Date": ["2025-02-03", "2025-01-20", "2025-01-02"],
+        })
+        cur = _CopyCursor()
+        _copy_table(cur, "sales", iter([df]), None)
+        payload = cur.copies[0][1]
+        assert [line.split(",")[0] for line in payload.splitlines()] == ["O-3", "O-2", "O-1"]
+
+
+@pytest.mark.integration
+class TestPeriodViews:
+    """Dashboard period measures are materialized per grain in the shadow build."""
+
+    def test_views_built_per_grain_with_unique_key(self):
+        from cleancloud_to_postgres import PERIOD_GRAINS, _create_period_views, _period_view_names
+
+        conn = _RecordingConnection()
+        _create_period_views(conn)
+        statements = [sql for sql, _ in conn.cur.statements]
+        created = [sql for sql in statements if sql.startswith("CREATE MATERIALIZED VIEW")]
+        assert [sql.split()[3] for sql in created] == _period_view_names()
+        assert len(created) == len(PERIOD_GRAINS) * 3
+        assert all('"ISOWeekLabel"' in sql for sql in created if sql.split()[3].endswith("_weekly"))
+        assert all('"YearMonth"' in sql for sql in created if sql.split()[3].endswith("_monthly"))
+        assert (
+            'CREATE UNIQUE INDEX period_items_weekly_key ON period_items_weekly'
+            ' ("period", "Item_Category", "Service_Type", "iss", "age")'
+        ) in statements
+
+    def test_swap_rebuilds_views_instead_of_carrying_them(self):
+        from cleancloud_to_postgres import SYNC_TABLES, _period_view_names, _swap_schemas
+
+        conn = _RecordingConnection()
+        _swap_schemas(conn)
+        excluded = conn.cur.statements[2][1][-1]
+        assert excluded == [*SYNC_TABLES, *_period_view_names()]
+
+
+# =====================================================================
+# LIVE SERVER — migrations, shadow-schema swap, partitions, data_version
+# =====================================================================
+
+TEST_DATABASE_URL = os.environ.get("MOONWALK_TEST_DATABASE_URL", "")
+
+
+def _write_staging(path, march_total=30.0):
+    """Stage three months of orders (Jan–Mar 2025), their items, customers and DimPeriod."""
+    from cleancloud_to_postgres import PARQUET_FILES
+    from generate_dimperiod import generate_dimperiod
+
+    dim_csv = path / "DimPeriod_Python.csv"
+    generate_dimperiod(str(dim_csv), verbose=False).write_parquet(path / PARQUET_FILES["dim_period"])
+    dim_csv.unlink(missing_ok=True)
+    days = ["2025-01-10", "2025-01-20", "2025-02-10", "2025-03-05", "2025-03-25"]
+    sales = pl.DataFrame({
+        "OrderID_Std": [f"M-{i:05d}" for i in range(len(days))],
+        "CustomerID_Std": ["CC-0001", "CC-0002", "CC-0001", "CC-0002", "CC-0001"],
+        "Source": "CC_2025",
+        "Transaction_Type": "Order",
+        "Placed_Date": days,
+        "Earned_Date": days,
+        "OrderCohortMonth": [d[:8] + "01" for d in days],
+        "MonthsSinceCohort": [0.0, 0.0, 1.0, 2.0, 2.0],
+        "Total_Num": [10.0, 20.0, 15.0, march_total, 25.0],
+        "Is_Earned": 1,
+        "IsSubscriptionService": 0,
+        "Paid": 1,
+    })
+    sales.write_parquet(path / PARQUET_FILES["sales"])
+    sales.select(
+        "OrderID_Std", "CustomerID_Std", "Source", pl.col("Placed_Date").alias("ItemDate"),
+        pl.lit("Professional Wear").alias("Item_Category"), pl.lit("Wash & Press").alias("Service_Type"),
+        pl.lit(2).alias("Quantity"), pl.lit(0).alias("Express"),
+    ).write_parquet(path / PARQUET_FILES["items"])
+    pl.DataFrame({
+        "CustomerID_Std": ["CC-0001", "CC-0002"],
+        "CustomerName": ["JOHN DOE", "JANE SMITH"],
+        "CohortMonth": ["2025-01-01", "2025-01-01"],
+        "Phone": ["+971500000001", "+971500000002"],
+        "Email": ["a@example.com", "b@example.com"],
+    }).write_parquet(path / PARQUET_FILES["customers"])
+    sales.group_by("CustomerID_Std", "OrderCohortMonth").agg(
+        pl.col("Total_Num").sum().alias("Monthly_Revenue")
+    ).write_parquet(path / PARQUET_FILES["customer_quality"])
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="MOONWALK_TEST_DATABASE_URL not set")
+class TestLiveSync:
+    """alembic upgrade head, then two syncs through the shadow-schema swap."""
+
+    @pytest.fixture
+    def database(self):
+        import config
+        import psycopg2
+        from alembic import command
+        from alembic.config import Config
+        from cleancloud_to_postgres import LIVE_SCHEMA, RETIRED_SCHEMA, SHADOW_SCHEMA
+
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for schema in (LIVE_SCHEMA, SHADOW_SCHEMA, RETIRED_SCHEMA):
+                cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+        # No config file: alembic.ini's logging setup would disable the ETL loggers
+        root = Path(__file__).resolve().parent.parent
+        cfg = Config()
+        cfg.set_main_option("script_location", str(root / "alembic"))
+        with patch.object(config, "ANALYTICS_DATABASE_URL", TEST_DATABASE_URL):
+            command.upgrade(cfg, "head")
+        yield conn
+        conn.close()
+
+    def _sync(self, staging, full=False):
+        import cleancloud_to_postgres as pg
+
+        with (
+            patch.object(pg, "ANALYTICS_DATABASE_URL", TEST_DATABASE_URL),
+            patch.object(pg, "LOCAL_STAGING_PATH", staging),
+            patch.object(pg, "ENCRYPTION_KEY", "test-key"),
+            patch.object(pg, "POSTGRES_RETENTION_MONTHS", 0),
+        ):
+            return pg.main(workers=2, full=full)
+
+    @staticmethod
+    def _query(conn, sql):
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def _partition_rows(self, conn):
+        """(partition, rows) for every partition of the live sales table."""
+        return self._query(conn, """
+            SELECT c.relname, COUNT(s.*) FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            LEFT JOIN analytics.sales s ON s.tableoid = c.oid
+            WHERE i.inhparent = 'analytics.sales'::regclass
+            GROUP BY c.relname ORDER BY c.relname
+        """)
+
+    def test_two_syncs_swap_schemas_and_keep_partitions(self, database, tmp_path):
+        _write_staging(tmp_path)
+        version = self._query(database, "SELECT version FROM analytics.data_version")[0][0]
+        assert self._query(database, "SELECT version_num FROM analytics.alembic_version") == [("007",)]
+
+        first = self._sync(tmp_path)
+        assert first["sales"] == 5 and first["items"] == 5 and first["customers"] == 2
+        partitions = self._partition_rows(database)
+        assert ("sales_2025_01", 2) in partitions and ("sales_2025_03", 2) in partitions
+
+        _write_staging(tmp_path, march_total=35.0)
+        second = self._sync(tmp_path)
+        sales_stats = second["load_stats"]["sales"]
+        assert (sales_stats["partitions_shipped"], sales_stats["partitions_skipped"]) == (1, 2)
+
+        # Unchanged months were copied across the swap; the edited month was reloaded
+        assert self._partition_rows(database) == partitions
+        assert self._query(database, """
+            SELECT "YearMonth", SUM("Total_Num")::float FROM analytics.sales GROUP BY 1 ORDER BY 1
+        """) == [("2025-01", 30.0), ("2025-02", 15.0), ("2025-03", 60.0)]
+        assert self._query(database, "SELECT COUNT(*) FROM analytics.items")[0][0] == 5
+
+        assert self._query(database, "SELECT version FROM analytics.data_version")[0][0] == version + 2
+        assert self._query(database, "SELECT version_num FROM analytics.alembic_version") == [("007",)]
+        assert self._query(database, """
+            SELECT nspname FROM pg_namespace WHERE nspname IN ('analytics_next', 'analytics_prev')
+        """) == []
+
+    def test_incremental_insights_match_full_rebuild(self, database, tmp_path):
+        import cleancloud_to_postgres as pg
+
+        _write_staging(tmp_path)
+        self._sync(tmp_path)
+        _write_staging(tmp_path, march_total=35.0)
+        fetch, bounds = pg._fetch_period_aggregates, []
+
+        def recording(cur, sql, since):
+            bounds.append(since)
+            return fetch(cur, sql, since)
+
+        with patch.object(pg, "_fetch_period_aggregates", recording):
+            self._sync(tmp_path)
+        # Only March on: aggregates read back to the YoY month
+        assert bounds[0]["since"] == "2025-03" and bounds[0]["lookback"] == "2024-03"
+        assert bounds[1]["since"] == "2025-W10"
+        query = "SELECT * FROM analytics.{} ORDER BY 1, 2, 3"
+        incremental = {t: self._query(database, query.format(t)) for t in ("insights", "insight_fingerprints")}
+
+        self._sync(tmp_path, full=True)
+        for table, rows in incremental.items():
+            assert self._query(database, query.format(table)) == rows
@@ -0,0 +1,136 @@
+"""Tests for versioned DuckDB snapshots and the CURRENT pointer (snapshot_store)."""
+
+import pytest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _write_snapshot(base, version):
+    from snapshot_store import snapshot_path
+
+    path = snapshot_path(version, base)
+    path.write_bytes(b"")
+    return path
+
+
+@pytest.mark.integration
+class TestSnapshotStore:
+    """Version numbering, atomic publish and retention."""
+
+    def test_falls_back_to_db_path_before_first_publish(self, tmp_path):
+        from snapshot_store import current_db_path, current_version, next_version
+
+        base = tmp_path / "analytics.duckdb"
+        assert current_version(base) is None
+        assert current_db_path(base) == base
+        assert next_version(base) == 1
+
+    def test_publish_repoints_current(self, tmp_path):
+        from snapshot_store import current_db_path, current_version, publish
+
+        base = tmp_path / "analytics.duckdb"
+        _write_snapshot(base, 1)
+        publish(1, base)
+        second = _write_snapshot(base, 2)
+        publish(2, base)
+        assert (tmp_path / "CURRENT").read_text().strip() == "analytics-000002.duckdb"
+        assert current_version(base) == 2
+        assert current_db_path(base) == second
+        assert not (tmp_path / "CURRENT.tmp").exists()
+
+    def test_next_version_skips_unpublished_builds(self, tmp_path):
+        from snapshot_store import next_version, publish
+
+        base = tmp_path / "analytics.duckdb"
+        _write_snapshot(base, 1)
+        publish(1, base)
+        _write_snapshot(base, 2)  # failed build, never published
+        assert next_version(base) == 3
+
+    def test_prune_keeps_newest_published(self, tmp_path):
+        from snapshot_store import list_versions, publish
+
+        base = tmp_path / "analytics.duckdb"
+        for v in range(1, 5):
+            _write_snapshot(base, v)
+        _write_snapshot(base, 6)  # in-progress build above CURRENT
+        publish(4, base, keep=2)
+        assert list_versions(base) == [3, 4, 6]
+
+    def test_publish_missing_snapshot_raises(self, tmp_path):
+        from snapshot_store import publish
+
+        with pytest.raises(FileNotFoundError):
+            publish(7, tmp_path / "analytics.duckdb")
+        assert not (tmp_path / "CURRENT").exists()
+
+    def test_prune_removes_pii_sidecars(self, tmp_path):
+        from snapshot_store import list_versions, pii_path, publish
+
+        base = tmp_path / "analytics.duckdb"
+        sidecars = {}
+        for v in range(1, 4):
+            sidecars[v] = pii_path(_write_snapshot(base, v))
+            sidecars[v].write_bytes(b"")
+        assert sidecars[1].name == "analytics-000001-pii.duckdb"
+        assert list_versions(base) == [1, 2, 3]  # sidecars are not snapshots
+        publish(3, base, keep=1)
+        assert [v for v, p in sidecars.items() if p.exists()] == [3]
+
+    @staticmethod
+    def _lock(monkeypatch, locked):
+        """Make unlinking the ``locked`` paths fail as Windows does while a reader holds them open."""
+        unlink = Path.unlink
+
+        def guarded(self, missing_ok=False):
+            if self in locked:
+                raise PermissionError(f"{self.name} is in use")
+            return unlink(self, missing_ok=missing_ok)
+
+        monkeypatch.setattr(Path, "unlink", guarded)
+
+    def test_prune_keeps_sidecar_of_open_snapshot(self, tmp_path, monkeypatch):
+        from snapshot_store import list_versions, pii_path, prune, publish
+
+        base = tmp_path / "analytics.duckdb"
+        sidecars = {}
+        for v in range(1, 4):
+            sidecars[v] = pii_path(_write_snapshot(base, v))
+            sidecars[v].write_bytes(b"")
+        locked = {_write_snapshot(base, 1)}
+        self._lock(monkeypatch, locked)
+        publish(3, base, keep=1)
+        assert list_versions(base) == [1, 3]
+        assert [v for v, p in sidecars.items() if p.exists()] == [1, 3]  # still attachable
+
+        locked.clear()  # reader closed it
+        assert prune(base, keep=1) == [1]
+        assert [v for v, p in sidecars.items() if p.exists()] == [3]
+
+    def test_prune_retries_orphaned_sidecar(self, tmp_path, monkeypatch):
+        from snapshot_store import list_versions, pii_path, prune, publish
+
+        base = tmp_path / "analytics.duckdb"
+        for v in range(1, 3):
+            pii_path(_write_snapshot(base, v)).write_bytes(b"")
+        sidecar = pii_path(base.with_name("analytics-000001.duckdb"))
+        locked = {sidecar}
+        self._lock(monkeypatch, locked)
+        publish(2, base, keep=1)
+        assert list_versions(base) == [2] and sidecar.exists()
+
+        locked.clear()
+        prune(base, keep=1)
+        assert not sidecar.exists()
+
+    def test_prune_removes_parquet_directories(self, tmp_path):
+        from snapshot_store import current_db_path, list_versions, publish, snapshot_path
+
+        base = tmp_path / "parquet"
+        for v in range(1, 4):
+            (snapshot_path(v, base) / "sales" / "month=2024-01").mkdir(parents=True)
+        publish(3, base, keep=1)
+        assert list_versions(base) == [3]
+        assert current_db_path(base).is_dir()
@@ -37,6 +37,14 @@ class TestGrainContext:
         ctx = get_grain_context(["2025-W03", "2025-W04"])
         assert "ISOWeekLabel" in ctx["period_col"]
 
+    def test_denormalized_period_columns(self):
+        """Period filters read the fact-table keys, no dim_period join needed."""
+        from dashboard_shared import get_grain_context
+        ctx = get_grain_context("2025-01")
+        assert ctx["period_col"] == "s.YearMonth"
+        assert ctx["items_period_col"] == "i.YearMonth"
+        assert get_grain_context("2025-W03")["items_period_col"] == "i.ISOWeekLabel"
+
 
 @pytest.mark.integration
 class TestDuckDBQueries:
@@ -242,3 +250,569 @@ class TestOrderLookup:
             "SELECT COUNT(*) FROM order_lookup WHERE OrderID_Std IS NULL"
         ).fetchone()[0]
         assert nulls == 0
+
+
+class _PgCursor:
+    """Stands in for a psycopg2 cursor: records SQL, serves a fixed COPY payload and description."""
+
+    def __init__(self, log, columns, payload=b""):
+        self.log = log
+        self.columns = columns
+        self.payload = payload
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        self.description = [type("Column", (), {"name": n, "type_code": t}) for n, t in self.columns]
+
+    def mogrify(self, sql, params):
+        return (sql % {k: f"'{v}'" for k, v in params.items()}).encode()
+
+    def copy_expert(self, sql, buf):
+        self.log.append((sql, None))
+        buf.write(self.payload)
+
+    def fetchone(self):
+        return (1,)
+
+
+class _PgEngine:
+    """Engine whose every connect() hands out the same pooled connection."""
+
+    def __init__(self, columns, payload=b""):
+        self.log = []
+        self.info = {}
+        self.cursor = _PgCursor(self.log, columns, payload)
+
+    def connect(self):
+        engine = self
+
+        class _Conn:
+            info = engine.info
+
+            class connection:
+                @staticmethod
+                def cursor():
+                    return engine.cursor
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+        return _Conn()
+
+
+@pytest.mark.integration
+class TestPgFacade:
+    """Postgres results stream through COPY and parameterized SQL is prepared once per connection."""
+
+    def test_copy_result_parsed_columnwise_with_types(self):
+        from datetime import date
+        from dashboard_shared import _PgFacade
+
+        columns = [("n", 23), ("name", 1043), ("paid", 16), ("total", 1700), ("day", 1082)]
+        payload = b'1,CC-1,t,10.50,2025-01-02\n2,"",f,,\n3,,t,1,2025-03-04\n'
+        engine = _PgEngine(columns, payload)
+        df = _PgFacade(engine).execute("SELECT n, CustomerName AS name FROM t WHERE m = $1", ["2025-01"]).pl()
+
+        assert df.columns == ["n", "name", "paid", "total", "day"]
+        assert df["n"].to_list() == [1, 2, 3]
+        assert df["name"].to_list() == ["CC-1", "", None]
+        assert df["paid"].to_list() == [True, False, True]
+        assert df["total"].to_list() == [10.5, None, 1.0]
+        assert df["day"].to_list() == [date(2025, 1, 2), None, date(2025, 3, 4)]
+        copy_sql = engine.log[-1][0]
+        assert copy_sql.startswith('COPY (SELECT n, "CustomerName" AS name FROM t WHERE m = \'2025-01\')')
+
+    def test_parameterized_sql_prepared_once_per_connection(self):
+        from dashboard_shared import _PgFacade
+
+        engine = _PgEngine([("n", 20)])
+        con = _PgFacade(engine)
+        for month in ("2025-01", "2025-02"):
+            assert con.execute("SELECT COUNT(*) FROM sales WHERE YearMonth = $1", [month]).fetchone() == (1,)
+
+        prepares = [sql for sql, _ in engine.log if sql.startswith("PREPARE")]
+        executes = [(sql, params) for sql, params in engine.log if sql.startswith("EXECUTE")]
+        assert len(prepares) == 1 and prepares[0].endswith('FROM sales WHERE "YearMonth" = $1')
+        assert [params for _, params in executes] == [["2025-01"], ["2025-02"]]
+
+    def test_engine_created_once_per_process(self):
+        from unittest.mock import MagicMock
+        import db.database as database
+
+        created = MagicMock()
+        with (
+            patch.object(database, "ANALYTICS_DATABASE_URL", "postgresql://u@h/db"),
+            patch.object(database, "_engine", None),
+            patch.object(database, "create_engine", created),
+            patch.object(database, "_warm_up", lambda engine, n: n),
+        ):
+            assert database.get_engine() is database.get_engine()
+        assert created.call_count == 1
+        url = created.call_args.args[0]
+        assert url.drivername == "postgresql+psycopg2"
+
+    def test_translation_cached_per_sql_text(self):
+        from dashboard_shared import _PgFacade, _translate_pg_sql, pg_sql_cache_stats
+
+        _translate_pg_sql.cache_clear()
+        engine = _PgEngine([("n", 20)])
+        con = _PgFacade(engine)
+        sql = "SELECT COUNT(*) FROM sales WHERE YearMonth = $1 AND Source LIKE 'CC%' AND Total_Num > $10"
+        for _ in range(3):
+            con.execute(sql, ["2025-01"])
+
+        stats = pg_sql_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+        assert stats["hit_rate"] == round(2 / 3, 3)
+        pg_sql, bind_sql = _translate_pg_sql(sql)
+        assert pg_sql.endswith('"YearMonth" = $1 AND "Source" LIKE \'CC%\' AND "Total_Num" > $10')
+        assert bind_sql.endswith('"YearMonth" = %(p1)s AND "Source" LIKE \'CC%%\' AND "Total_Num" > %(p10)s')
+
+
+@pytest.mark.integration
+class TestQueryRegistry:
+    """Batch fetchers run named SQL templates with the period list bound as one parameter."""
+
+    def test_period_list_bound_not_interpolated(self):
+        import duckdb
+        import dashboard_shared as ds
+
+        con = duckdb.connect(":memory:")
+        con.execute("""
+            CREATE TABLE sales AS SELECT * FROM (VALUES
+                ('2025-01', 10.0), ('2025-02', 20.0), ('2025-03', 30.0), ('2025-03', 5.0)
+            ) t(YearMonth, Total_Num)
+        """)
+        sql = """
+            SELECT s.YearMonth, SUM(s.Total_Num) AS revenue
+            FROM sales s WHERE s.YearMonth = ANY($1)
+            GROUP BY s.YearMonth ORDER BY s.YearMonth
+        """
+        with patch.dict(ds._QUERY_REGISTRY, clear=True):
+            first = ds.query_df(con, "test.revenue", sql, ["2025-01", "2025-02"])
+            second = ds.query_df(con, "test.revenue", sql, ["2025-02", "2025-03"])
+            hostile = ds.query_df(con, "test.revenue", sql, ["2025-01') OR ('1' = '1"])
+            stats = ds.query_registry_stats()
+
+        assert first["revenue"].tolist() == [10.0, 20.0]
+        assert second["revenue"].tolist() == [20.0, 35.0]
+        assert hostile.empty
+        assert stats["test.revenue"]["calls"] == 3
+        assert stats["test.revenue"]["templates"] == 1
+
+    def test_any_left_unquoted_for_postgres(self):
+        from dashboard_shared import _pg_quote_identifiers
+
+        sql = "SELECT COUNT(*) FROM sales s WHERE s.YearMonth = ANY($1) OR s.ISOWeekLabel IN (SELECT UNNEST($2))"
+        assert _pg_quote_identifiers(sql) == (
+            'SELECT COUNT(*) FROM sales s WHERE s."YearMonth" = ANY($1) OR s."ISOWeekLabel" IN (SELECT UNNEST($2))'
+        )
+        # A qualified keyword-named column is still a column
+        assert _pg_quote_identifiers("SELECT CAST(p.Date AS DATE) FROM dim_period p") == (
+            'SELECT CAST(p."Date" AS DATE) FROM dim_period p'
+        )
+
+
+@pytest.mark.integration
+class TestKeyedRows:
+    """Batch fetchers pivot each query result once instead of mask-filtering it per period."""
+
+    def test_tuple_keys_casts_and_default_fill(self):
+        import pandas as pd
+        from dashboard_shared import keyed_rows
+
+        df = pd.DataFrame({
+            "period": ["2025-01", "2025-01", "2025-02", "2025-01"],
+            "cat": ["A", "B", "A", "A"],
+            "items": [3.0, 4.0, 5.0, 99.0],
+            "revenue": [10, 20, 30, 99],
+            "ratio": [0.5, float("nan"), 1.5, 9.9],
+        })
+        rows = keyed_rows(df, ("period", "cat"), {"items": 0, "revenue": 0.0, "ratio": None})
+
+        assert rows["2025-01", "A"] == {"items": 3, "revenue": 10.0, "ratio": 0.5}
+        assert type(rows["2025-01", "A"]["items"]) is int and type(rows["2025-01", "A"]["revenue"]) is float
+        assert rows["2025-01", "B"]["ratio"] != rows["2025-01", "B"]["ratio"]  # raw NaN kept
+        assert rows["2025-03", "A"] == {"items": 0, "revenue": 0.0, "ratio": None}
+        assert ("2025-03", "A") not in rows
+
+        by_period = keyed_rows(df, "period", {"items": 0})
+        assert by_period["2025-02"] == {"items": 5} and by_period["2024-12"] == {"items": 0}
+
+
+@pytest.mark.integration
+class TestSnapshotCache:
+    """Fetcher results are cached per data version and dropped when a refresh publishes a new one."""
+
+    def test_hits_until_version_changes(self):
+        import dashboard_cache
+
+        calls = []
+
+        @dashboard_cache.snapshot_cached
+        def fetch(_con, periods):
+            calls.append(periods)
+            return {"periods": list(periods)}
+
+        dashboard_cache.clear_cache()
+        with patch("dashboard_cache.data_version", return_value="v1"):
+            first = fetch(None, ("2025-01",))
+            first["periods"].append("mutated")
+            assert fetch(None, ("2025-01",)) == {"periods": ["2025-01"]}  # hit, returned as a copy
+            fetch(None, ("2025-02",))
+        assert calls == [("2025-01",), ("2025-02",)]
+
+        with patch("dashboard_cache.data_version", return_value="v2"):
+            fetch(None, ("2025-01",))
+        assert len(calls) == 3
+        assert dashboard_cache.cache_stats()["entries"] == 1  # v1 entries dropped
+
+    def test_disk_tier_round_trip(self, tmp_path):
+        import pandas as pd
+        import dashboard_cache
+
+        calls = []
+
+        @dashboard_cache.snapshot_cached
+        def fetch(_con, period):
+            calls.append(period)
+            return {"df": pd.DataFrame({"a": [1, 2], "b": ["x", None]}), "n": 2, "ratio": float("nan")}
+
+        dashboard_cache.clear_cache()
+        with patch("dashboard_cache.data_version", return_value="pg-7"), \
+             patch("dashboard_cache.DASHBOARD_CACHE_DIR", str(tmp_path)):
+            stored = fetch(None, "2025-01")
+            dashboard_cache.clear_cache()  # another process: memory empty, disk shared
+            loaded = fetch(None, "2025-01")
+        assert calls == ["2025-01"]
+        pd.testing.assert_frame_equal(loaded["df"], stored["df"])
+        assert loaded["n"] == 2 and loaded["ratio"] != loaded["ratio"]
+        assert (tmp_path / "pg-7").is_dir()
+
+    def test_concurrent_misses_compute_once(self):
+        import threading
+        import time
+        import dashboard_cache
+
+        calls = []
+
+        @dashboard_cache.snapshot_cached
+        def fetch(_con, period):
+            calls.append(period)
+            time.sleep(0.05)
+            return {"period": period}
+
+        dashboard_cache.clear_cache()
+        results = []
+        with patch("dashboard_cache.data_version", return_value="v1"):
+            threads = [threading.Thread(target=lambda: results.append(fetch(None, "2025-01"))) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            with dashboard_cache.uncached():
+                fetch(None, "2025-01")
+        assert calls == ["2025-01", "2025-01"]  # once for the four callers, once uncached
+        assert results == [{"period": "2025-01"}] * 4
+
+    def test_memory_tier_bounded_by_size(self):
+        import pandas as pd
+        import dashboard_cache
+
+        @dashboard_cache.snapshot_cached
+        def fetch(_con, rows):
+            return {"df": pd.DataFrame({"a": range(rows)})}
+
+        dashboard_cache.clear_cache()
+        with patch("dashboard_cache.data_version", return_value="v1"), \
+             patch("dashboard_cache.DASHBOARD_CACHE_MAX_MB", 1.0):
+            for rows in (10, 20, 30):
+                fetch(None, rows)
+            assert dashboard_cache.cache_stats()["entries"] == 3
+            fetch(None, 200_000)  # ~1.5 MB of int64: evicts the small results, kept alone
+            stats = dashboard_cache.cache_stats()
+        assert stats["entries"] == 1 and stats["memory_mb"] > 1.0
+
+    def test_stats_consistent_under_concurrency(self):
+        import threading
+        import dashboard_cache
+
+        @dashboard_cache.snapshot_cached
+        def fetch(_con, period):
+            return {"period": period}
+
+        dashboard_cache.clear_cache()
+        before = dashboard_cache.cache_stats()
+        with patch("dashboard_cache.data_version", return_value="v1"):
+            threads = [
+                threading.Thread(target=lambda: [fetch(None, f"2025-{i % 12 + 1:02d}") for i in range(200)])
+                for _ in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        after = dashboard_cache.cache_stats()
+        lookups = sum(after[k] - before[k] for k in ("memory_hits", "disk_hits", "misses"))
+        assert lookups == 8 * 200
+        assert after["misses"] - before["misses"] == 12
+
+
+@pytest.mark.integration
+class TestCacheWarmer:
+    """The warm-up requests exactly what the pages request for the latest periods."""
+
+    def test_plan_mirrors_page_arguments(self):
+        import cache_warmer
+        import section_data as sd
+        from dashboard_shared import compute_fetch_periods, fetch_measures_batch
+
+        months = [f"2025-{m:02d}" for m in range(1, 13)]
+        weeks = [f"2025-W{w:02d}" for w in range(1, 27)]
+        available = lambda _con, weekly: weeks if weekly else months  # noqa: E731
+        with patch("dashboard_shared.fetch_available_periods", side_effect=available):
+            plan = cache_warmer._plan(None, 2)
+
+        _, latest = compute_fetch_periods("2025-12", months)
+        assert (fetch_measures_batch, (tuple(latest),)) in plan
+        assert (sd.fetch_rfm_snapshot, ("2025-11",)) in plan
+        assert (sd.fetch_rfm_snapshot, ("2025-W26",)) not in plan  # monthly-only view
+        assert len(plan) == len(set(plan))  # fetches shared by pages run once
+        assert sum(1 for fetcher, _ in plan if fetcher is sd.fetch_outstanding) == 1
+
+
+@pytest.mark.integration
+class TestDuckPool:
+    """Concurrent sessions each query on a pooled cursor instead of sharing one connection."""
+
+    def test_concurrent_queries_bounded_by_pool(self):
+        import threading
+        import duckdb
+        from dashboard_shared import _DuckPool, duckdb_pool_stats
+
+        con = duckdb.connect(":memory:")
+        con.execute("ATTACH ':memory:' AS db")
+        con.execute("USE db")  # as for an encrypted snapshot: cursors must follow
+        con.execute("CREATE TABLE t AS SELECT range AS n FROM range(1000)")
+        pool = _DuckPool(con, size=2)
+        before = duckdb_pool_stats()["queries"]
+
+        errors = []
+
+        def session(i):
+            for j in range(20):
+                row = pool.execute("SELECT COUNT(*) + $1 FROM t WHERE n < $2", [i, j]).fetchone()
+                if row[0] != i + j:
+                    errors.append((i, j, row))
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert pool._opened <= 2
+        assert duckdb_pool_stats()["queries"] - before == 120
+        assert list(pool.execute("SELECT n FROM t ORDER BY n LIMIT 2").df()["n"]) == [0, 1]
+
+
+@pytest.mark.integration
+class TestConcurrentFetches:
+    """A page's fetchers and a fetcher's independent queries run concurrently, results unchanged."""
+
+    def test_query_dfs_in_order_on_pool(self):
+        import duckdb
+        from dashboard_shared import _DuckPool, query_dfs
+
+        con = duckdb.connect(":memory:")
+        con.execute("CREATE TABLE t AS SELECT range AS n FROM range(100)")
+        pool = _DuckPool(con, size=2)
+
+        dfs = query_dfs(
+            pool,
+            ("test_concurrent_count", "SELECT COUNT(*) AS c FROM t WHERE n < $1", 10),
+            ("test_concurrent_sum", "SELECT SUM(n) AS s FROM t"),
+            ("test_concurrent_count", "SELECT COUNT(*) AS c FROM t WHERE n < $1", 50),
+        )
+        assert [int(dfs[0]["c"][0]), int(dfs[1]["s"][0]), int(dfs[2]["c"][0])] == [10, 4950, 50]
+
+    def test_prefetch_results_and_errors(self, monkeypatch):
+        import threading
+        import duckdb
+        import dashboard_shared as ds
+
+        def fetch_double(con, x):
+            return threading.current_thread().name.startswith("dashboard-page"), x * 2
+
+        def fetch_broken(con):
+            raise ValueError("no data")
+
+        pool = ds._DuckPool(duckdb.connect(":memory:"), size=1)
+        bare = duckdb.connect(":memory:")  # one connection cannot serve two threads: inline
+        # (workers, connection, whether the fetchers run on the page executor)
+        for workers, con, threaded in ((1, pool, False), (4, pool, True), (4, bare, False)):
+            monkeypatch.setattr(ds, "DASHBOARD_FETCH_WORKERS", workers)
+            data = ds.prefetch(con, a=(fetch_double, 2), b=(fetch_double, 5), broken=(fetch_broken,))
+            assert list(data) == ["a", "b", "broken"]
+            assert (data["a"].result(), data["b"].result()) == ((threaded, 4), (threaded, 10))
+            with pytest.raises(ValueError, match="no data"):
+                data["broken"].result()
+
+    def test_prefetch_inside_uncached_bypasses_cache(self, monkeypatch):
+        import threading
+        import duckdb
+        import dashboard_cache
+        import dashboard_shared as ds
+        from dashboard_cache import cache_stats, snapshot_cached, uncached
+
+        @snapshot_cached
+        def fetch_thread(_con, x):
+            return threading.current_thread().name, x
+
+        monkeypatch.setattr(ds, "DASHBOARD_FETCH_WORKERS", 4)
+        pool = ds._DuckPool(duckdb.connect(":memory:"), size=2)
+        dashboard_cache.clear_cache()
+        with patch("dashboard_cache.data_version", return_value="uncached-test"):
+            before = cache_stats()
+            with uncached():
+                data = ds.prefetch(pool, a=(fetch_thread, 1), b=(fetch_thread, 1))
+                results = [data["a"].result(), data["b"].result()]
+            after = cache_stats()
+
+        assert all(name.startswith("dashboard-page") for name, _ in results)
+        assert {k: after[k] for k in ("memory_hits", "disk_hits", "misses", "entries")} == {
+            k: before[k] for k in ("memory_hits", "disk_hits", "misses", "entries")
+        }
+
+
+@pytest.mark.integration
+class TestPeriodCube:
+    """Batch measure fetchers are projections of one two-pass period cube."""
+
+    def _con(self):
+        import duckdb
+
+        con = duckdb.connect(":memory:")
+        con.execute("""
+            CREATE TABLE sales AS SELECT * FROM (VALUES
+                ('2025-02', 'C1', 'O1', 'Order', 100.0, FALSE, 0, TRUE, TRUE, 3, 100.0, 'Stripe', 'Inside Abu Dhabi'),
+                ('2025-02', 'C2', 'O2', 'Subscription', 300.0, FALSE, 4, FALSE, TRUE, 0, 300.0, 'Cash', 'Outer Abu Dhabi'),
+                ('2025-02', 'C2', 'O3', 'Invoice Payment', 50.0, FALSE, 4, FALSE, FALSE, 0, 50.0, 'Cash', 'Outer Abu Dhabi'),
+                ('2025-03', 'C3', 'O5', 'Order', 120.0, TRUE, 0, TRUE, FALSE, 4, 0.0, 'Stripe', 'Inside Abu Dhabi'),
+                ('2024-02', 'C1', 'O4', 'Order', 80.0, FALSE, 0, FALSE, TRUE, 0, 80.0, 'Terminal', 'Inside Abu Dhabi')
+            ) t(YearMonth, CustomerID_Std, OrderID_Std, Transaction_Type, Total_Num, IsSubscriptionService,
+                MonthsSinceCohort, HasDelivery, HasPickup, Pieces, Collections, Payment_Type_Std, Route_Category)
+        """)
+        con.execute("""
+            ALTER TABLE sales ADD COLUMN Earned_Date DATE DEFAULT DATE '2025-02-01';
+            ALTER TABLE sales ADD COLUMN DaysToPayment DOUBLE DEFAULT 1;
+            ALTER TABLE sales ADD COLUMN Processing_Days DOUBLE DEFAULT 2;
+            ALTER TABLE sales ADD COLUMN TimeInStore_Days DOUBLE DEFAULT 3;
+        """)
+        con.execute("""
+            CREATE TABLE items AS SELECT * FROM (VALUES
+                ('2025-02', 'O1', 'Professional Wear', 'Wash & Press', 2, 40.0, TRUE),
+                ('2025-02', 'O1', 'Home Linens', 'Dry Cleaning', 1, 60.0, FALSE),
+                ('2025-02', 'O2', 'Traditional Wear', 'Press Only', 5, 300.0, FALSE),
+                ('2025-03', 'O5', 'Extras', 'Wash & Press', 4, 120.0, FALSE),
+                ('2024-02', 'O4', 'Extras', 'Wash & Press', 7, 80.0, FALSE)
+            ) t(YearMonth, OrderID_Std, Item_Category, Service_Type, Quantity, Total, Express)
+        """)
+        con.execute("""
+            CREATE TABLE order_lookup AS
+            SELECT DISTINCT OrderID_Std, IsSubscriptionService,
+                   MIN(MonthsSinceCohort) OVER (PARTITION BY OrderID_Std) AS MonthsSinceCohort
+            FROM sales
+        """)
+        return con
+
+    def test_projections_share_two_queries(self):
+        import dashboard_cache
+        import customer_report_shared as cr
+        import dashboard_shared as ds
+        import section_data as sd
+
+        con = self._con()
+        months = ("2025-02", "2025-03")
+        before = ds.query_registry_stats()
+        dashboard_cache.clear_cache()
+        with patch("dashboard_cache.data_version", return_value="cube-test"):
+            measures = ds.fetch_measures_batch(con, months)
+            yoy = sd.fetch_yoy_batch(con, months)
+            logistics = sd.fetch_logistics_batch(con, months)
+            operations = sd.fetch_operations_batch(con, months)
+            payments = sd.fetch_payments_batch(con, months)
+            customers = cr.fetch_customer_measures_batch(con, months)
+            new_detail = cr.fetch_new_customer_detail_batch(con, months)
+        after = ds.query_registry_stats()
+        ran = {name: s["calls"] - before.get(name, {}).get("calls", 0) for name, s in after.items()}
+        assert {name: n for name, n in ran.items() if n} == {"period_cube.sales": 1, "period_cube.items": 1}
+
+        feb = measures["2025-02"]
+        assert (feb["customers"], feb["subscribers"], feb["clients"]) == (2, 1, 1)
+        assert (feb["items"], feb["items_sub"], feb["revenues"], feb["rev_sub"]) == (8, 0, 450.0, 300.0)
+        assert feb["stops"] == 3
+        assert (measures["2025-03"]["items_sub"], measures["2025-03"]["rev_sub"]) == (4, 120.0)
+        assert (yoy["2025-02"]["customers"], yoy["2025-02"]["items"], yoy["2025-03"]["customers"]) == (1, 7, 0)
+        outer = logistics["2025-02"]["geo"]["Outer Abu Dhabi"]
+        assert outer == {"customers": 1, "items": 0, "stops": 1, "revenue": 350.0}
+        assert logistics["2025-02"]["lg_rev_per_delivery"] == 100.0
+        ops = operations["2025-02"]
+        assert (ops["cat_professional_wear_items"], ops["express_share"]) == (2, 0.25)
+        assert (payments["2025-02"]["pm_revenue"], payments["2025-02"]["pm_cash"]) == (450.0, 350.0)
+        assert (customers["2025-02"]["new_customers"], customers["2025-02"]["items_per_customer"]) == (1, 4.0)
+        assert new_detail["2025-02"] == {
+            "new_customers": 1,
+            "existing_customers": 1,
+            "new_items": 3,
+            "existing_items": 5,
+            "new_revenue": 100.0,
+            "existing_revenue": 350.0,
+        }
+
+
+@pytest.mark.integration
+class TestSelectorFragments:
+    """Selector components render as fragments; their isolated reruns are profiled as interactions."""
+
+    def test_interactions_in_profile(self, monkeypatch, tmp_path):
+        import json
+        import dashboard_shared as ds
+
+        monkeypatch.setattr(ds, "LOGS_PATH", tmp_path)
+        monkeypatch.setattr(ds, "_INTERACTION_STATS", {})
+        for elapsed in (0.02, 0.04):
+            ds._record_interaction("render_metric_selector", elapsed)
+
+        assert ds.interaction_stats() == {"render_metric_selector": {"reruns": 2, "mean_ms": 30.0, "max_ms": 40.0}}
+        ds.write_dashboard_profile({})
+        (profile_path,) = tmp_path.glob("dashboard_profile_*.json")
+        assert json.loads(profile_path.read_text())["interactions"] == ds.interaction_stats()
+
+    def test_page_runs_not_counted(self, monkeypatch):
+        import dashboard_shared as ds
+        from streamlit.testing.v1 import AppTest
+
+        def app():
+            import streamlit as st
+            from dashboard_shared import _set_metric, dashboard_fragment
+
+            @dashboard_fragment
+            def picker(options):
+                st.session_state.setdefault("pick", options[0])
+                for option in options:
+                    st.button(option, key=f"btn_{option}", on_click=_set_metric, args=("pick", option))
+                st.markdown(f"picked {st.session_state['pick']}")
+
+            picker(["a", "b"])
+
+        monkeypatch.setattr(ds, "_INTERACTION_STATS", {})
+        at = AppTest.from_function(app).run()
+        at.button(key="btn_b").click().run()  # AppTest reruns the whole script
+        assert [m.value for m in at.markdown] == ["picked b"]
+        assert ds.interaction_stats() == {}
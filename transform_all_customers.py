@@ -14,6 +14,7 @@ from helpers import (
     polars_store_std,
     polars_customer_id_std,
     polars_format_dates_for_csv,
+    write_staging_file,
 )
 from config import LOCAL_STAGING_PATH
 
@@ -230,8 +231,7 @@ def run(shared_data: Optional[Dict[str, Union[pl.DataFrame]]] = None) -> Tuple[p
     df_all = df_all.sort("CustomerID_Std")
 
     # Save
-    df_all.write_csv(output_path)
-    logger.info(f"  [OK] Saved to: {output_path}")
+    write_staging_file(df_all, output_path)
 
     # =====================================================================
     # VALIDATION SUMMARY
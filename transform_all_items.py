@@ -11,7 +11,7 @@ from typing import Optional, Dict, Tuple, Union
 from helpers import (
     find_cleancloud_file, polars_to_date, polars_store_std,
     polars_customer_id_std, polars_item_category, polars_service_type,
-    polars_format_dates_for_csv,
+    polars_format_dates_for_csv, write_staging_file,
 )
 from config import LOCAL_STAGING_PATH, MOONWALK_STORE_ID, HIELO_STORE_ID
 
@@ -246,8 +246,7 @@ def run(shared_data: Optional[Dict[str, Union[pl.DataFrame]]] = None) -> Tuple[p
     # =====================================================================
     logger.info("\nPhase 13: Saving output...")
 
-    df_final.write_csv(output_path)
-    logger.info(f"  [OK] Saved to: {output_path}")
+    write_staging_file(df_final, output_path)
 
     # =====================================================================
     # VALIDATION SUMMARY
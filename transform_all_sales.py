@@ -15,6 +15,7 @@ from helpers import (
     polars_payment_type_std, polars_route_category,
     polars_months_since_cohort, polars_subscription_flag,
     polars_name_standardize, polars_format_dates_for_csv,
+    write_staging_file,
 )
 from config import LOCAL_STAGING_PATH, SUBSCRIPTION_VALIDITY_DAYS
 
@@ -541,8 +542,7 @@ def run(shared_data: Optional[Dict[str, Union[pl.DataFrame]]] = None) -> Tuple[p
     logger.info(f"  [OK] Final output: {df_final.height:,} rows x {len(df_final.columns)} columns")
 
     # Save
-    df_final.write_csv(output_path)
-    logger.info(f"  [OK] Saved to: {output_path}")
+    write_staging_file(df_final, output_path)
 
     # =====================================================================
     # VALIDATION SUMMARY
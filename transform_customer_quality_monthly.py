@@ -9,7 +9,7 @@ import os
 from typing import Optional, Dict, Tuple, Union
 warnings.filterwarnings('ignore')
 
-from helpers import polars_to_date, polars_format_dates_for_csv
+from helpers import polars_to_date, polars_format_dates_for_csv, write_staging_file
 from config import LOCAL_STAGING_PATH
 
 from logger_config import setup_logger
@@ -267,8 +267,7 @@ def run(shared_data: Optional[Dict[str, Union[pl.DataFrame]]] = None) -> Tuple[p
     logger.info(f"  [OK] Final: {df_final.height:,} rows x {len(df_final.columns)} columns")
 
     # Save
-    df_final.write_csv(output_path)
-    logger.info(f"  [OK] Saved to: {output_path}")
+    write_staging_file(df_final, output_path)
 
     # =====================================================================
     # VALIDATION SUMMARY